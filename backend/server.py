@@ -18,14 +18,13 @@ from typing import List, Optional
 import uuid
 from uuid import uuid4
 from datetime import datetime, timedelta, timezone
-from passlib.context import CryptContext
 import jwt
 from jwt import PyJWTError
 import base64
 import hmac
+import mimetypes
 import hashlib
 import time
-import json
 import random
 import struct
 import binascii
@@ -33,7 +32,64 @@ from Crypto.Cipher import AES
 from urllib.parse import parse_qsl
 import psycopg2
 from psycopg2.extras import RealDictCursor
-import requests
+import aiohttp
+from utils.feed import get_feed_page
+from utils.stories_tray import get_stories_tray, invalidate_stories_tray
+from utils.post_visibility import post_visibility_filter, sync_author_privacy, backfill_author_privacy
+from utils.trending import (
+    create_trending_indexes, rebuild_hashtag_buckets, record_post_hashtags,
+    update_post_hashtags, get_trending_hashtags
+)
+from utils.counters import (
+    USER_CARD_PROJECTION, create_counter_indexes, adjust_posts_count, reconcile_user_counters,
+    backfill_user_counters
+)
+from utils.follows import (
+    FOLLOW_ACTIVE, FOLLOW_PENDING, create_follow_indexes, follow, unfollow, approve_follow_request,
+    follow_status, follows_user, get_follow_statuses, get_following_ids, list_follow_edges,
+    remove_user_follows, migrate_follow_arrays
+)
+from utils.notifications import (
+    create_notification_indexes, add_notification, remove_notification, delete_notifications,
+    remove_actor_notifications, read_notification, read_all_notifications, unread_notification_count,
+    list_notifications, serialize_notification, reconcile_notification_counters, migrate_notifications
+)
+from utils.likes import (
+    create_like_indexes, add_like, remove_like, toggle_like, get_liked_ids,
+    delete_target_likes, migrate_embedded_likes
+)
+from utils.password_hashing import password_hasher
+from utils.call_events import call_event_broker, CALL_EVENT_HEARTBEAT_SECONDS
+from utils.signaling_backplane import build_backplane
+from utils.telegram_client import get_telegram_client
+from utils.telegram_file_cache import telegram_file_path_cache
+from utils.media_cache import media_cache
+from utils.media_upload import (
+    MEDIA_SINK, MediaRejected, SpooledMedia, local_media_sink, spool_data_url, spool_upload
+)
+from utils.thumbnails import thumbnail_renderer
+from utils.verification_codes import CodeThrottled, build_code_store
+from utils.outbound import build_outbound_queue
+from utils.outbound_providers import default_providers, whereby_client
+from utils.usernames import (
+    available_username, find_user_by_username, fix_whitespace_usernames, insert_user,
+    migrate_username_lower, normalize_username, taken_usernames, username_taken
+)
+from pymongo.errors import DuplicateKeyError
+from utils.principal_cache import (
+    get_principal, invalidate_principal, load_user_fields, get_principal_cache_stats
+)
+from utils.conversations import (
+    create_messaging_indexes, conversation_id_for, clear_conversation, delete_conversation,
+    resurrect_update, get_message_page, mark_conversation_read, message_read_state,
+    get_inbox_page, increment_inbox_unread, get_total_unread, reconcile_unread_counters,
+    backfill_unread_counters,
+    migrate_deletion_epochs
+)
+from utils.comments import (
+    create_comment_indexes, add_comment, find_comment, delete_comment_thread,
+    delete_post_comments, list_comments, serialize_comment, migrate_embedded_comments
+)
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -69,6 +125,38 @@ async def create_indexes():
         await db.posts.create_index([("userId", 1), ("createdAt", -1)])
         await db.posts.create_index([("caption", "text")], name="post_search_index")
         await db.posts.create_index("createdAt")
+        await db.posts.create_index([("createdAt", -1), ("id", -1)])
+        await db.posts.create_index([("authorIsPrivate", 1), ("createdAt", -1)])
+        
+        # Likes collection (unique edge per user/target)
+        await create_like_indexes(db)
+
+        # Comments collection (threaded, paged per post)
+        await create_comment_indexes(db)
+
+        # Materialized follower counts for "top users"
+        await create_counter_indexes(db)
+
+        # Follow graph edges (paged followers/following lists)
+        await create_follow_indexes(db)
+
+        # Coalesced notification rows
+        await create_notification_indexes(db)
+        
+        # Hashtag counters for trending
+        await create_trending_indexes(db)
+        
+        # Index for stories tray
+        await db.stories.create_index([("expiresAt", 1), ("createdAt", -1)])
+        
+        # Direct message history pages
+        await create_messaging_indexes(db)
+        
+        # OTPs/verification codes expire via TTL
+        await code_store.create_indexes()
+        
+        # Outbound delivery jobs and dead letters
+        await outbound_queue.create_indexes()
         
         logger.info("Database indexes created successfully")
     except Exception as e:
@@ -82,6 +170,7 @@ import os
 os.makedirs("/app/uploads/posts", exist_ok=True)
 os.makedirs("/app/uploads/profiles", exist_ok=True)
 os.makedirs("/app/uploads/stories", exist_ok=True)
+os.makedirs("/app/uploads/thumbnails", exist_ok=True)
 app.mount("/uploads", StaticFiles(directory="/app/uploads"), name="uploads")
 
 # Initialize indexes on startup
@@ -90,6 +179,22 @@ async def startup_event():
     """Run startup tasks"""
     import asyncio
     asyncio.create_task(create_indexes())
+    password_hasher.start()
+    thumbnail_renderer.start()
+    await get_telegram_client().start()
+    asyncio.create_task(media_cache.start())
+    await signaling_manager.start()
+    await outbound_queue.start()
+    asyncio.create_task(backfill_author_privacy(db))
+    asyncio.create_task(rebuild_hashtag_buckets(db))
+    asyncio.create_task(backfill_user_counters(db))
+    asyncio.create_task(migrate_embedded_likes(db))
+    asyncio.create_task(migrate_embedded_comments(db))
+    asyncio.create_task(migrate_deletion_epochs(db))
+    asyncio.create_task(migrate_usernames())
+    asyncio.create_task(migrate_follows())
+    asyncio.create_task(migrate_notifications(db))
+    asyncio.create_task(backfill_unread_counters(db))
 
 # Add compression middleware for better performance
 app.add_middleware(GZipMiddleware, minimum_size=1000)
@@ -97,14 +202,16 @@ app.add_middleware(GZipMiddleware, minimum_size=1000)
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=12)
+# Password hashing runs in utils.password_hashing's process pool (bcrypt, BCRYPT_ROUNDS)
 
 # JWT settings
 SECRET_KEY = os.environ.get("JWT_SECRET", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 1 week
 
+# Shared secret for maintenance endpoints (X-Admin-Key header); unset disables them
+ADMIN_API_KEY = os.environ.get("ADMIN_API_KEY")
+
 
 class MessageRequestBody(BaseModel):
     conversationId: str
@@ -160,8 +267,6 @@ class User(BaseModel):
     pushNotifications: bool = True
     emailNotifications: bool = True
     
-    followers: List[str] = []  # List of user IDs
-    following: List[str] = []  # List of user IDs
     savedPosts: List[str] = []  # List of post IDs
     blockedUsers: List[str] = []  # List of blocked user IDs
     mutedUsers: List[str] = []  # List of muted user IDs (silent - they won't know)
@@ -267,7 +372,7 @@ class Story(BaseModel):
     mediaUrl: str  # Base64 or file_id
     caption: Optional[str] = ""
     isArchived: bool = False
-    likes: List[str] = []  # List of user IDs who liked the story
+    likeCount: int = 0  # Likers live in the likes collection
     createdAt: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     expiresAt: datetime = Field(default_factory=lambda: datetime.now(timezone.utc) + timedelta(hours=24))
 
@@ -284,8 +389,8 @@ class Post(BaseModel):
     mediaType: str  # "image" or "video"
     mediaUrl: str  # Base64 or file_id
     caption: Optional[str] = ""
-    likes: List[str] = []  # List of user IDs
-    comments: List[dict] = []
+    likeCount: int = 0  # Likers live in the likes collection
+    commentCount: int = 0
     isArchived: bool = False
     likesHidden: bool = False
     commentsDisabled: bool = False
@@ -303,18 +408,6 @@ class TelegramLink(BaseModel):
     telegramUserId: str
     createdAt: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
-class Notification(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    userId: str  # Who receives the notification
-    fromUserId: str  # Who triggered the notification
-    fromUsername: str
-    fromUserImage: Optional[str] = None
-    type: str  # "like", "comment", "follow"
-    postId: Optional[str] = None  # For like/comment notifications
-    postImage: Optional[str] = None  # Post thumbnail/image for preview
-    isRead: bool = False
-    createdAt: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
-
 class ChatMessage(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     senderId: str
@@ -334,7 +427,6 @@ class VideoRoomResponse(BaseModel):
 
 # Whereby API Configuration
 WHEREBY_API_KEY = os.getenv("WHEREBY_API_KEY")
-WHEREBY_API_URL = "https://api.whereby.dev/v1/meetings"
 
 # Helper functions
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -347,11 +439,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def get_password_hash(password):
+    return await password_hasher.hash(password)
 
 def verify_telegram_hash(auth_data: dict, bot_token: str) -> bool:
     """
@@ -393,106 +482,89 @@ def verify_telegram_hash(auth_data: dict, bot_token: str) -> bool:
 import random
 import asyncio
 
-# In-memory OTP storage (in production, use Redis or database)
-otp_storage = {}
-email_otp_storage = {}  # Separate storage for email OTPs
+# OTPs and verification codes, shared by all workers (TTL-indexed in Mongo)
+code_store = build_code_store(db)
+
+# Email, SMS and Whereby cleanup jobs; every worker runs the queue loop
+outbound_queue = build_outbound_queue(db, default_providers())
 
 def generate_otp(length: int = 6) -> str:
     """Generate a random OTP"""
     return ''.join([str(random.randint(0, 9)) for _ in range(length)])
 
+async def issue_code(purpose: str, identity, code: Optional[str], data: Optional[dict] = None, expires_in_minutes: int = 10):
+    """Record a code before sending it; 429 with Retry-After when this identity is throttled"""
+    try:
+        await code_store.issue(purpose, identity, code, data=data, ttl_seconds=expires_in_minutes * 60)
+    except CodeThrottled as e:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Too many codes requested. Try again in {e.retry_after} seconds.",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
 async def store_otp(telegram_id: int, otp: str, expires_in_minutes: int = 10):
     """Store OTP with expiration"""
-    expires_at = datetime.now(timezone.utc) + timedelta(minutes=expires_in_minutes)
-    otp_storage[telegram_id] = {
-        'otp': otp,
-        'expires_at': expires_at,
-        'attempts': 0
-    }
-    
-    # Schedule cleanup
-    async def cleanup():
-        await asyncio.sleep(expires_in_minutes * 60)
-        otp_storage.pop(telegram_id, None)
-    
-    asyncio.create_task(cleanup())
+    await issue_code("telegram_otp", telegram_id, otp, expires_in_minutes=expires_in_minutes)
 
 async def verify_otp(telegram_id: int, provided_otp: str) -> bool:
-    """Verify OTP and cleanup if successful"""
-    if telegram_id not in otp_storage:
-        return False
-    
-    otp_data = otp_storage[telegram_id]
-    
-    # Check expiration
-    if datetime.now(timezone.utc) > otp_data['expires_at']:
-        otp_storage.pop(telegram_id, None)
-        return False
-    
-    # Check attempts (max 3)
-    if otp_data['attempts'] >= 3:
-        otp_storage.pop(telegram_id, None)
-        return False
-    
-    # Check OTP
-    if otp_data['otp'] == provided_otp:
-        otp_storage.pop(telegram_id, None)
-        return True
-    else:
-        otp_data['attempts'] += 1
-        return False
+    """Verify OTP (max 3 attempts) and consume it if correct"""
+    return await code_store.verify("telegram_otp", telegram_id, provided_otp) is not None
+
 
 async def send_telegram_otp(telegram_id: int, otp: str):
     """Send OTP via Telegram bot"""
     try:
-        # Import here to avoid circular imports
-        import aiohttp
-        
         bot_token = os.environ.get("TELEGRAM_BOT_TOKEN")
         if not bot_token:
             raise Exception("Telegram bot token not configured")
         
         message = f"🔐 Your LuvHive login code is: *{otp}*\n\nThis code will expire in 10 minutes.\nDo not share this code with anyone!"
         
-        url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
         data = {
             "chat_id": telegram_id,
             "text": message,
             "parse_mode": "Markdown"
         }
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, data=data) as response:
-                if response.status != 200:
-                    raise Exception(f"Failed to send Telegram message: {response.status}")
-                return True
+        status, _ = await get_telegram_client().call(bot_token, "sendMessage", data=data)
+        if status != 200:
+            raise Exception(f"Failed to send Telegram message: {status}")
+        return True
                 
     except Exception as e:
         logger.error(f"Error sending Telegram OTP: {e}")
         return False
 
-async def get_telegram_file_path(file_id: str, bot_token: str) -> str:
-    """Get file_path from Telegram using file_id"""
-    import aiohttp
+async def get_telegram_file_info(file_id: str, bot_token: str) -> Optional[dict]:
+    """
+    getFile result for a file_id (file_path, file_unique_id, file_size)
+    Cached per file_id for less than the link's one-hour validity; concurrent
+    lookups of the same file share one getFile call
+    """
+    async def fetch():
+        status, data = await get_telegram_client().call(
+            bot_token, "getFile", http_method="GET", params={"file_id": file_id}
+        )
+        if status == 200 and data.get("ok") and data["result"].get("file_path"):
+            return data["result"]
+        logger.error(f"Failed to get file path: {status} {data}")
+        return None
+    
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                f"https://api.telegram.org/bot{bot_token}/getFile",
-                params={"file_id": file_id}
-            ) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    if data.get("ok"):
-                        return data["result"]["file_path"]
-                logger.error(f"Failed to get file path: {await resp.text()}")
-                return None
+        return await telegram_file_path_cache.resolve(file_id, fetch)
     except Exception as e:
         logger.error(f"Error getting file path: {e}")
         return None
 
-async def send_media_to_telegram_channel(media_url: str, media_type: str, caption: str, username: str):
+async def get_telegram_file_path(file_id: str, bot_token: str) -> str:
+    """Get file_path from Telegram using file_id"""
+    info = await get_telegram_file_info(file_id, bot_token)
+    return info["file_path"] if info else None
+
+async def send_media_file_to_telegram_channel(media_file, mime_type: str, media_type: str, caption: str, username: str):
     """
-    Send media (photo/video) to Telegram media sink channel
+    Stream a media file object (photo/video) to the Telegram media sink channel
     Returns: (file_id, file_path, telegram_url) or (None, None, None) on failure
     """
     try:
@@ -509,315 +581,137 @@ async def send_media_to_telegram_channel(media_url: str, media_type: str, captio
         # Prepare caption with username
         full_caption = f"📱 New {media_type} from @{username}\n\n{caption}" if caption else f"📱 New {media_type} from @{username}"
         
-        # Handle base64 data URL
-        if media_url.startswith('data:'):
-            # Extract base64 data
-            header, encoded = media_url.split(',', 1)
-            media_data = base64.b64decode(encoded)
-            
-            # Determine proper Telegram endpoint based on MIME type
-            mime_type = header.split(';')[0].replace('data:', '')
-            if mime_type.startswith('image/'):
-                file_ext = 'jpg' if 'jpeg' in mime_type else mime_type.split('/')[-1]
-                endpoint = 'sendPhoto'  # Use sendPhoto for images
-                field_name = 'photo'
-            elif mime_type.startswith('video/'):
-                file_ext = mime_type.split('/')[-1] or 'mp4'
-                endpoint = 'sendVideo'  # Use sendVideo for videos
-                field_name = 'video'
-            else:
-                # Fallback to document for other types
-                file_ext = mime_type.split('/')[-1] or 'bin'
-                endpoint = 'sendDocument'
-                field_name = 'document'
-                logger.warning(f"Unknown media type {mime_type}, using sendDocument")
-            
-            # Create form data with file
+        # Determine proper Telegram endpoint based on MIME type
+        if mime_type.startswith('image/'):
+            file_ext = 'jpg' if 'jpeg' in mime_type else mime_type.split('/')[-1]
+            endpoint = 'sendPhoto'  # Use sendPhoto for images
+            field_name = 'photo'
+        elif mime_type.startswith('video/'):
+            file_ext = mime_type.split('/')[-1] or 'mp4'
+            endpoint = 'sendVideo'  # Use sendVideo for videos
+            field_name = 'video'
+        else:
+            # Fallback to document for other types
+            file_ext = mime_type.split('/')[-1] or 'bin'
+            endpoint = 'sendDocument'
+            field_name = 'document'
+            logger.warning(f"Unknown media type {mime_type}, using sendDocument")
+        
+        # Rebuilt per attempt: a 429 retry has to resend the file from the start
+        def build_form():
+            media_file.seek(0)
             form = aiohttp.FormData()
-            form.add_field(field_name, media_data, filename=f'media.{file_ext}', content_type=mime_type)
+            form.add_field(field_name, media_file, filename=f'media.{file_ext}', content_type=mime_type)
             form.add_field('chat_id', channel_id)
             form.add_field('caption', full_caption[:1024])  # Telegram caption limit
-            
-            url = f"https://api.telegram.org/bot{bot_token}/{endpoint}"
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, data=form) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        if result.get("ok"):
-                            # Extract file_id from the response
-                            message = result.get("result", {})
-                            
-                            # Get file_id based on media type
-                            if endpoint == 'sendPhoto':
-                                # For photos, use the largest size
-                                photos = message.get("photo", [])
-                                if photos:
-                                    file_id = photos[-1].get("file_id")  # Largest photo
-                                else:
-                                    logger.error("No photo in response")
-                                    return None, None, None
-                            elif endpoint == 'sendVideo':
-                                video = message.get("video", {})
-                                file_id = video.get("file_id")
-                            else:
-                                document = message.get("document", {})
-                                file_id = document.get("file_id")
-                            
-                            if not file_id:
-                                logger.error("No file_id in Telegram response")
-                                return None, None, None
-                            
-                            # Get file_path using getFile
-                            file_path = await get_telegram_file_path(file_id, bot_token)
-                            if not file_path:
-                                logger.error("Failed to get file_path from Telegram")
-                                return None, None, None
-                            
-                            # Build proper downloadable URL
-                            telegram_url = f"https://api.telegram.org/file/bot{bot_token}/{file_path}"
-                            
-                            logger.info(f"Successfully sent {media_type} to Telegram channel")
-                            logger.info(f"file_id: {file_id}, file_path: {file_path}")
-                            
-                            return file_id, file_path, telegram_url
-                        else:
-                            logger.error(f"Telegram API returned error: {result}")
-                            return None, None, None
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Failed to send media to Telegram: {response.status} - {error_text}")
-                        return None, None, None
+            return form
+        
+        client = get_telegram_client()
+        status, result = await client.call(bot_token, endpoint, data=build_form)
+        if status != 200:
+            logger.error(f"Failed to send media to Telegram: {status} - {result}")
+            return None, None, None
+        
+        if not result.get("ok"):
+            logger.error(f"Telegram API returned error: {result}")
+            return None, None, None
+        
+        # Extract file_id from the response
+        message = result.get("result", {})
+        
+        # Get file_id based on media type
+        if endpoint == 'sendPhoto':
+            # For photos, use the largest size
+            photos = message.get("photo", [])
+            if photos:
+                file_id = photos[-1].get("file_id")  # Largest photo
+            else:
+                logger.error("No photo in response")
+                return None, None, None
+        elif endpoint == 'sendVideo':
+            video = message.get("video", {})
+            file_id = video.get("file_id")
         else:
-            logger.warning("Media URL is not a base64 data URL, skipping Telegram upload")
+            document = message.get("document", {})
+            file_id = document.get("file_id")
+        
+        if not file_id:
+            logger.error("No file_id in Telegram response")
             return None, None, None
-            
+        
+        # Get file_path using getFile
+        file_path = await get_telegram_file_path(file_id, bot_token)
+        if not file_path:
+            logger.error("Failed to get file_path from Telegram")
+            return None, None, None
+        
+        # Build proper downloadable URL
+        telegram_url = client.file_url(bot_token, file_path)
+        
+        logger.info(f"Successfully sent {media_type} to Telegram channel")
+        logger.info(f"file_id: {file_id}, file_path: {file_path}")
+        
+        return file_id, file_path, telegram_url
+    
     except Exception as e:
         logger.error(f"Error sending media to Telegram channel: {e}")
         import traceback
         traceback.print_exc()
         return None, None, None
 
-async def store_email_otp(email: str, otp: str, expires_in_minutes: int = 10):
-    """Store email OTP with expiration"""
-    expires_at = datetime.now(timezone.utc) + timedelta(minutes=expires_in_minutes)
-    email_otp_storage[email.lower()] = {
-        'otp': otp,
-        'expires_at': expires_at,
-        'attempts': 0
-    }
+async def store_uploaded_media(media: SpooledMedia, folder: str, caption: str, username: str, user_id: str) -> dict:
+    """
+    Put validated media in the configured sink (MEDIA_SINK)
     
-    # Schedule cleanup
-    async def cleanup():
-        await asyncio.sleep(expires_in_minutes * 60)
-        email_otp_storage.pop(email.lower(), None)
+    Telegram is tried first; if it fails the file goes to local disk rather
+    than into the document as base64.
     
-    asyncio.create_task(cleanup())
+    Returns:
+        Fields to merge into the post/story: mediaUrl and, for Telegram,
+        telegramFileId/telegramFilePath
+    """
+    if MEDIA_SINK == "telegram":
+        file_id, file_path, telegram_url = await send_media_file_to_telegram_channel(
+            media.file, media.content_type, media.kind, caption, username
+        )
+        if telegram_url:
+            logger.info(f"✅ Media uploaded to Telegram: {file_id}")
+            return {"mediaUrl": telegram_url, "telegramFileId": file_id, "telegramFilePath": file_path}
+        logger.warning("⚠️ Failed to upload to Telegram, storing media on local disk")
+        media.rewind()
+    return {"mediaUrl": await local_media_sink.store(media, folder, user_id)}
 
-async def verify_email_otp(email: str, provided_otp: str) -> bool:
-    """Verify email OTP and cleanup if successful"""
-    email_key = email.lower()
-    if email_key not in email_otp_storage:
-        return False
-    
-    otp_data = email_otp_storage[email_key]
-    
-    # Check expiration
-    if datetime.now(timezone.utc) > otp_data['expires_at']:
-        email_otp_storage.pop(email_key, None)
-        return False
-    
-    # Check attempts (max 3)
-    if otp_data['attempts'] >= 3:
-        email_otp_storage.pop(email_key, None)
-        return False
+async def schedule_profile_thumbnails(user_id: str, profile_image: Optional[str]):
+    """
+    Render thumbnails for a data-URL profile image in the background
     
-    # Check OTP
-    if otp_data['otp'] == provided_otp:
-        email_otp_storage.pop(email_key, None)
-        return True
-    else:
-        otp_data['attempts'] += 1
-        return False
+    The update is pinned to this exact profileImage, so a job that finishes
+    after the user picked another photo changes nothing.
+    """
+    if not profile_image or not profile_image.startswith('data:'):
+        return
+    try:
+        spooled = await asyncio.to_thread(spool_data_url, profile_image)
+    except MediaRejected:
+        return
+    await thumbnail_renderer.schedule(
+        db.users, {"id": user_id, "profileImage": profile_image}, spooled,
+        f"profile_{user_id}_{uuid4().hex[:8]}",
+        thumbnails_field="profileImageThumbnails", placeholder_field="profileImagePlaceholder"
+    )
+
+async def store_email_otp(email: str, otp: str, expires_in_minutes: int = 10):
+    """Store email OTP with expiration"""
+    await issue_code("email_otp", email, otp, expires_in_minutes=expires_in_minutes)
+
+async def verify_email_otp(email: str, provided_otp: str) -> bool:
+    """Verify email OTP (max 3 attempts) and consume it if correct"""
+    return await code_store.verify("email_otp", email, provided_otp) is not None
 
 async def send_email_otp(email: str, otp: str):
-    """Send OTP via email using SendGrid"""
-    try:
-        from sendgrid import SendGridAPIClient
-        from sendgrid.helpers.mail import Mail
-        
-        sendgrid_api_key = os.environ.get("SENDGRID_API_KEY")
-        
-        if not sendgrid_api_key:
-            logger.error("SendGrid API key not configured")
-            logger.info(f"MOCK EMAIL: OTP {otp} sent to {email}")
-            return True
-        
-        # Create beautiful HTML email
-        html_content = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px; background-color: #f8f9fa;">
-            <div style="background-color: white; padding: 40px; border-radius: 15px; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
-                <div style="text-align: center; margin-bottom: 30px;">
-                    <h1 style="color: #e91e63; margin: 0; font-size: 28px;">💖 LuvHive</h1>
-                    <h2 style="color: #333; margin: 10px 0 0 0; font-size: 22px;">Email Verification</h2>
-                </div>
-                
-                <div style="background: linear-gradient(135deg, #e91e63, #f06292); padding: 25px; border-radius: 12px; text-align: center; margin: 25px 0;">
-                    <p style="color: white; margin: 0 0 15px 0; font-size: 16px; font-weight: 500;">Your Verification Code:</p>
-                    <div style="background-color: white; padding: 15px; border-radius: 8px; display: inline-block;">
-                        <span style="color: #e91e63; font-size: 36px; font-weight: bold; letter-spacing: 8px; font-family: 'Courier New', monospace;">{otp}</span>
-                    </div>
-                </div>
-                
-                <div style="text-align: center; margin: 25px 0;">
-                    <p style="color: #555; font-size: 16px; margin: 0 0 15px 0;">Enter this code on the registration page to verify your email address</p>
-                    <p style="color: #888; font-size: 14px; margin: 0;">⏰ This code expires in <strong>10 minutes</strong></p>
-                </div>
-                
-                <div style="border-top: 1px solid #eee; padding-top: 20px; margin-top: 30px; text-align: center;">
-                    <p style="color: #999; font-size: 13px; margin: 0;">🔒 If you didn't request this code, please ignore this email.</p>
-                    <p style="color: #999; font-size: 13px; margin: 5px 0 0 0;">This is an automated message from LuvHive.</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        
-        # Plain text version
-        text_content = f"""
-        LuvHive Email Verification
-        
-        Your verification code is: {otp}
-        
-        Enter this code on the registration page to verify your email address.
-        
-        This code will expire in 10 minutes.
-        Do not share this code with anyone.
-        
-        If you didn't request this code, please ignore this email.
-        
-        Best regards,
-        LuvHive Team
-        """
-        
-        # Create SendGrid message
-        message = Mail(
-            from_email="no-reply@luvhive.net",
-            to_emails=email,
-            subject="Your LuvHive Verification Code 🔐",
-            html_content=html_content,
-            plain_text_content=text_content
-        )
-        
-        # Send email
-        sg = SendGridAPIClient(sendgrid_api_key)
-        response = sg.send(message)
-        
-        if response.status_code == 202:
-            logger.info(f"SendGrid email sent successfully: OTP {otp} to {email}")
-            return True
-        else:
-            logger.error(f"SendGrid error: Status {response.status_code}")
-            return False
-                
-    except Exception as e:
-        logger.error(f"Error sending SendGrid email: {e}")
-        logger.info(f"MOCK EMAIL: OTP {otp} sent to {email}")
-        return True
-        
-        # Try Twilio Email first (with API Key if available)
-        if twilio_account_sid and (twilio_auth_token or twilio_api_key_secret):
-            try:
-                from twilio.rest import Client
-                
-                # Use API key if available, otherwise use auth token
-                if twilio_api_key_sid and twilio_api_key_secret:
-                    client = Client(twilio_api_key_sid, twilio_api_key_secret, twilio_account_sid)
-                else:
-                    client = Client(twilio_account_sid, twilio_auth_token)
-                
-                # Create HTML email content
-                html_content = f"""
-                <html>
-                <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px; background-color: #f8f9fa;">
-                    <div style="background-color: white; padding: 40px; border-radius: 15px; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
-                        <div style="text-align: center; margin-bottom: 30px;">
-                            <h1 style="color: #e91e63; margin: 0; font-size: 28px;">💖 LuvHive</h1>
-                            <h2 style="color: #333; margin: 10px 0 0 0; font-size: 22px;">Email Verification</h2>
-                        </div>
-                        
-                        <div style="background: linear-gradient(135deg, #e91e63, #f06292); padding: 25px; border-radius: 12px; text-align: center; margin: 25px 0;">
-                            <p style="color: white; margin: 0 0 15px 0; font-size: 16px; font-weight: 500;">Your Verification Code:</p>
-                            <div style="background-color: white; padding: 15px; border-radius: 8px; display: inline-block;">
-                                <span style="color: #e91e63; font-size: 36px; font-weight: bold; letter-spacing: 8px; font-family: 'Courier New', monospace;">{otp}</span>
-                            </div>
-                        </div>
-                        
-                        <div style="text-align: center; margin: 25px 0;">
-                            <p style="color: #555; font-size: 16px; margin: 0 0 15px 0;">Enter this code on the registration page to verify your email address</p>
-                            <p style="color: #888; font-size: 14px; margin: 0;">⏰ This code expires in <strong>10 minutes</strong></p>
-                        </div>
-                        
-                        <div style="border-top: 1px solid #eee; padding-top: 20px; margin-top: 30px; text-align: center;">
-                            <p style="color: #999; font-size: 13px; margin: 0;">🔒 If you didn't request this code, please ignore this email.</p>
-                            <p style="color: #999; font-size: 13px; margin: 5px 0 0 0;">This is an automated message from LuvHive.</p>
-                        </div>
-                    </div>
-                </body>
-                </html>
-                """
-                
-                # Try using Twilio's built-in email service
-                try:
-                    # Use Twilio's email service if available
-                    message = client.messages.create(
-                        body=f"Your LuvHive verification code is: {otp}. This code expires in 10 minutes.",
-                        from_='no-reply@luvhive.net',
-                        to=email
-                    )
-                    logger.info(f"Twilio email sent via messages API: {message.sid}")
-                    return True
-                except Exception as msg_error:
-                    logger.error(f"Twilio messages API error: {msg_error}")
-                    
-                    # Try SendGrid API via Twilio
-                    message = client.sendgrid.v3.mail.send.post(request_body={
-                        "personalizations": [
-                            {
-                                "to": [{"email": email}],
-                                "subject": "Your LuvHive Verification Code 🔐"
-                            }
-                        ],
-                        "from": {"email": "no-reply@luvhive.net", "name": "LuvHive"},
-                        "content": [
-                            {
-                                "type": "text/html",
-                                "value": html_content
-                            }
-                        ]
-                    })
-                
-                if message.status_code == 202:
-                    logger.info(f"Twilio SendGrid email sent successfully: OTP {otp} to {email}")
-                    return True
-                else:
-                    logger.error(f"Twilio SendGrid error: Status {message.status_code}")
-                    return False
-                
-            except Exception as twilio_error:
-                logger.error(f"Twilio email error: {twilio_error}")
-                # Fall through to SendGrid or mock
-        
-        # Try SendGrid as fallback
-        if sendgrid_api_key:
-            from sendgrid import SendGridAPIClient
-            from sendgrid.helpers.mail import Mail
-            
-            sender_email = "no-reply@luvhive.net"
-        
-        # Create HTML email content
-        html_content = f"""
+    """Queue the OTP email; the outbound queue delivers it via SendGrid"""
+    # Create beautiful HTML email
+    html_content = f"""
         <html>
         <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px; background-color: #f8f9fa;">
             <div style="background-color: white; padding: 40px; border-radius: 15px; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
@@ -846,9 +740,9 @@ async def send_email_otp(email: str, otp: str):
         </body>
         </html>
         """
-        
-        # Plain text version
-        text_content = f"""
+    
+    # Plain text version
+    text_content = f"""
         LuvHive Email Verification
         
         Your verification code is: {otp}
@@ -863,87 +757,43 @@ async def send_email_otp(email: str, otp: str):
         Best regards,
         LuvHive Team
         """
-        
-        # Create SendGrid message
-        message = Mail(
-            from_email="no-reply@luvhive.net",
-            to_emails=email,
-            subject="Your LuvHive Verification Code 🔐",
-            html_content=html_content,
-            plain_text_content=text_content
-        )
-        
-        # Send email
-        sg = SendGridAPIClient(sendgrid_api_key)
-        response = sg.send(message)
-        
-        if response.status_code == 202:
-            logger.info(f"SendGrid email sent successfully: OTP {otp} to {email}")
-            return True
-        else:
-            logger.error(f"SendGrid error: Status {response.status_code}")
-            return False
-                
-    except Exception as e:
-        logger.error(f"Error sending SendGrid email: {e}")
-        logger.info(f"MOCK EMAIL: OTP {otp} sent to {email}")
-        return True
+    
+    # The body carries the code: dropped from the job once delivered or dead-lettered
+    await outbound_queue.enqueue("email", {
+        "to": email,
+        "subject": "Your LuvHive Verification Code 🔐",
+        "html": html_content,
+        "text": text_content
+    }, sensitive=True)
+    return True
 
 async def send_mobile_otp(mobile_number: str):
-    """Send OTP via SMS using Twilio Verify"""
-    try:
-        from twilio.rest import Client
-        
-        account_sid = os.environ.get("TWILIO_ACCOUNT_SID")
-        auth_token = os.environ.get("TWILIO_AUTH_TOKEN")
-        
-        if not account_sid or not auth_token:
-            logger.error("Twilio credentials not configured")
-            return False
-        
-        client = Client(account_sid, auth_token)
-        
-        # Format mobile number (add +91 if not present)
-        formatted_number = mobile_number.strip()
-        if not formatted_number.startswith('+'):
-            if formatted_number.startswith('91'):
-                formatted_number = '+' + formatted_number
-            else:
-                formatted_number = '+91' + formatted_number
-        
-        # Send OTP via Twilio Verify
-        verify_service_sid = os.environ.get("TWILIO_VERIFY_SERVICE_SID")
-        verification = client.verify \
-            .v2 \
-            .services(verify_service_sid) \
-            .verifications \
-            .create(to=formatted_number, channel='sms')
-        
-        logger.info(f"Twilio SMS OTP sent: {verification.status} to {formatted_number}")
-        return verification.status == 'pending'
-        
-    except Exception as e:
-        logger.error(f"Error sending mobile OTP: {e}")
-        # For demo, always return True
-        logger.info(f"MOCK SMS: OTP sent to {mobile_number}")
-        return True
+    """Queue a Twilio Verify SMS; Twilio generates and later checks the code"""
+    account_sid = os.environ.get("TWILIO_ACCOUNT_SID")
+    auth_token = os.environ.get("TWILIO_AUTH_TOKEN")
+    
+    if not account_sid or not auth_token:
+        logger.error("Twilio credentials not configured")
+        return False
+    
+    await outbound_queue.enqueue("sms", {"to": format_mobile_number(mobile_number)})
+    return True
+
+def format_mobile_number(mobile_number: str) -> str:
+    """E.164 form, assuming India (+91) when no country code is given"""
+    formatted_number = mobile_number.strip()
+    if not formatted_number.startswith('+'):
+        if formatted_number.startswith('91'):
+            formatted_number = '+' + formatted_number
+        else:
+            formatted_number = '+91' + formatted_number
+    return formatted_number
 
 
 async def send_welcome_email(email: str, full_name: str, username: str):
-    """Send welcome email after successful registration"""
-    try:
-        from sendgrid import SendGridAPIClient
-        from sendgrid.helpers.mail import Mail
-        
-        sendgrid_api_key = os.environ.get("SENDGRID_API_KEY")
-        
-        if not sendgrid_api_key:
-            logger.error("SendGrid API key not configured")
-            logger.info(f"MOCK WELCOME EMAIL: Sent to {email}")
-            return True
-        
-        # Create beautiful HTML welcome email
-        html_content = f"""
+    """Queue the welcome email sent after successful registration"""
+    # Create beautiful HTML welcome email
+    html_content = f"""
         <html>
         <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px; background-color: #f8f9fa;">
             <div style="background-color: white; padding: 40px; border-radius: 15px; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
@@ -1032,9 +882,9 @@ async def send_welcome_email(email: str, full_name: str, username: str):
         </body>
         </html>
         """
-        
-        # Plain text version
-        text_content = f"""
+    
+    # Plain text version
+    text_content = f"""
         Welcome to LuvHive!
         
         Hello, {full_name}!
@@ -1066,31 +916,14 @@ async def send_welcome_email(email: str, full_name: str, username: str):
         
         © 2025 LuvHive. All rights reserved.
         """
-        
-        # Create SendGrid message
-        message = Mail(
-            from_email="no-reply@luvhive.net",
-            to_emails=email,
-            subject=f"Welcome to LuvHive, {full_name}! 💖",
-            html_content=html_content,
-            plain_text_content=text_content
-        )
-        
-        # Send email
-        sg = SendGridAPIClient(sendgrid_api_key)
-        response = sg.send(message)
-        
-        if response.status_code == 202:
-            logger.info(f"Welcome email sent successfully to {email}")
-            return True
-        else:
-            logger.error(f"SendGrid welcome email error: Status {response.status_code}")
-            return False
-                
-    except Exception as e:
-        logger.error(f"Error sending welcome email: {e}")
-        logger.info(f"MOCK WELCOME EMAIL: Sent to {email}")
-        return True
+    
+    await outbound_queue.enqueue("email", {
+        "to": email,
+        "subject": f"Welcome to LuvHive, {full_name}! 💖",
+        "html": html_content,
+        "text": text_content
+    })
+    return True
 
 
 async def verify_mobile_otp(mobile_number: str, otp_code: str):
@@ -1106,22 +939,14 @@ async def verify_mobile_otp(mobile_number: str, otp_code: str):
             return True  # Allow in demo mode
         
         client = Client(account_sid, auth_token)
+        formatted_number = format_mobile_number(mobile_number)
         
-        # Format mobile number
-        formatted_number = mobile_number.strip()
-        if not formatted_number.startswith('+'):
-            if formatted_number.startswith('91'):
-                formatted_number = '+' + formatted_number
-            else:
-                formatted_number = '+91' + formatted_number
-        
-        # Verify OTP
+        # Verify OTP (blocking SDK call, kept off the event loop)
         verify_service_sid = os.environ.get("TWILIO_VERIFY_SERVICE_SID")
-        verification_check = client.verify \
-            .v2 \
-            .services(verify_service_sid) \
-            .verification_checks \
-            .create(to=formatted_number, code=otp_code)
+        verification_check = await asyncio.to_thread(
+            client.verify.v2.services(verify_service_sid).verification_checks.create,
+            to=formatted_number, code=otp_code
+        )
         
         logger.info(f"Twilio SMS verification: {verification_check.status}")
         return verification_check.status == 'approved'
@@ -1149,12 +974,19 @@ async def get_current_user(authorization: str = Header(None)):
     except PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    user = await db.users.find_one({"id": user_id})
+    # Slim, briefly cached principal; routes needing savedPosts/blockedUsers/...
+    # call load_user_fields(), follow state lives in utils.follows
+    user = await get_principal(db, user_id)
     if user is None:
         raise HTTPException(status_code=401, detail="User not found")
     
     return User(**user)
 
+async def require_admin_key(x_admin_key: str = Header(None)):
+    """Reject maintenance calls that don't carry ADMIN_API_KEY"""
+    if not ADMIN_API_KEY or not x_admin_key or not hmac.compare_digest(x_admin_key, ADMIN_API_KEY):
+        raise HTTPException(status_code=403, detail="Admin key required")
+
 # Authentication Routes
 @api_router.post("/auth/register")
 async def register(user_data: UserRegister):
@@ -1177,11 +1009,7 @@ async def register(user_data: UserRegister):
             raise HTTPException(status_code=400, detail="Password must be at least 6 characters")
     
     # Check if username exists (case-insensitive and trimmed)
-    escaped_username = clean_username.replace('.', r'\.')
-    existing_user = await db.users.find_one({
-        "username": {"$regex": f"^{escaped_username}$", "$options": "i"}
-    })
-    if existing_user:
+    if await username_taken(db, clean_username):
         raise HTTPException(status_code=400, detail="Username already exists")
     
     # Check if email already exists
@@ -1191,7 +1019,7 @@ async def register(user_data: UserRegister):
             raise HTTPException(status_code=400, detail="Email already registered")
 
     # Hash password if provided
-    hashed_password = get_password_hash(user_data.password) if user_data.password else None
+    hashed_password = await get_password_hash(user_data.password) if user_data.password else None
     
     # Create user with cleaned data
     user = User(
@@ -1206,7 +1034,11 @@ async def register(user_data: UserRegister):
     )
     
     user_dict = user.dict()
-    await db.users.insert_one(user_dict)
+    try:
+        await insert_user(db, user_dict)
+    except DuplicateKeyError:
+        # Lost a race with a concurrent sign-up for the same name
+        raise HTTPException(status_code=400, detail="Username already exists")
     
     access_token = create_access_token(data={"sub": user.id})
     
@@ -1296,11 +1128,7 @@ async def register_enhanced(
                 raise HTTPException(status_code=400, detail="Mobile number must be 10-15 digits")
         
         # Check if username exists (case-insensitive)
-        escaped_username = clean_username.replace('.', r'\.')
-        existing_user = await db.users.find_one({
-            "username": {"$regex": f"^{escaped_username}$", "$options": "i"}
-        })
-        if existing_user:
+        if await username_taken(db, clean_username):
             raise HTTPException(status_code=400, detail="Username already exists")
         
         # Check if email already exists (only if email provided)
@@ -1327,7 +1155,7 @@ async def register_enhanced(
                     )
         
         # Hash password
-        hashed_password = get_password_hash(password)
+        hashed_password = await get_password_hash(password)
         
         # Create complete user
         user_dict = {
@@ -1347,8 +1175,6 @@ async def register_enhanced(
             "mobileVerified": mobileVerified,
             "emailVerificationToken": None,
             "createdAt": datetime.now(timezone.utc).isoformat(),
-            "followers": [],
-            "following": [],
             "posts": [],
             "savedPosts": [],
             "blockedUsers": [],
@@ -1395,7 +1221,12 @@ async def register_enhanced(
             "telegramId": telegramId if telegramId else None
         }
         
-        await db.users.insert_one(user_dict)
+        try:
+            await insert_user(db, user_dict)
+        except DuplicateKeyError:
+            # Lost a race with a concurrent sign-up for the same name
+            raise HTTPException(status_code=400, detail="Username already exists")
+        await schedule_profile_thumbnails(user_dict["id"], clean_profile_image)
         
         # Generate access token
         access_token = create_access_token(data={"sub": user_dict["id"]})
@@ -1426,13 +1257,15 @@ async def register_enhanced(
 @api_router.post("/auth/login")
 async def login(user_data: UserLogin):
     # Find user with case-insensitive username (handles whitespace issues)
-    clean_username = user_data.username.strip()
-    escaped_username = clean_username.replace('.', r'\.')
-    user = await db.users.find_one({
-        "username": {"$regex": f"^{escaped_username}$", "$options": "i"}
-    })
-    if not user or not verify_password(user_data.password, user["password_hash"]):
+    user = await find_user_by_username(db, user_data.username)
+    if not user:
         raise HTTPException(status_code=401, detail="Invalid username or password")
+    valid, new_hash = await password_hasher.verify_and_update(user_data.password, user.get("password_hash"))
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid username or password")
+    if new_hash:
+        # Stored hash used an outdated bcrypt cost; upgrade it transparently
+        await db.users.update_one({"id": user["id"]}, {"$set": {"password_hash": new_hash}})
     
     # CRITICAL SECURITY: Block login if email not verified
     if not user.get("emailVerified", False):
@@ -1513,12 +1346,7 @@ async def telegram_auth(telegram_data: TelegramAuthRequest):
         # Create new user from Telegram data
         # Generate a unique username if Telegram username is not available
         base_username = telegram_data.username or f"user_{telegram_data.id}"
-        username = base_username
-        counter = 1
-        
-        while await db.users.find_one({"username": username}):
-            username = f"{base_username}{counter}"
-            counter += 1
+        username = await available_username(db, base_username)
         
         # Create complete user with all required fields
         user_dict = {
@@ -1539,8 +1367,6 @@ async def telegram_auth(telegram_data: TelegramAuthRequest):
             "isPremium": False,
             "isPrivate": False,
             "isVerified": False,
-            "following": [],
-            "followers": [],
             "blockedUsers": [],
             "mutedUsers": [],
             "savedPosts": [],
@@ -1552,7 +1378,7 @@ async def telegram_auth(telegram_data: TelegramAuthRequest):
             "createdAt": datetime.now(timezone.utc)
         }
         
-        await db.users.insert_one(user_dict)
+        await insert_user(db, user_dict)
         access_token = create_access_token(data={"sub": user_dict["id"]})
         
         return {
@@ -1624,13 +1450,7 @@ async def telegram_webapp_auth(initData: str = Form(...)):
             }
         else:
             # Create new user
-            username = user_data.get('username') or f"user_{telegram_id}"
-            counter = 1
-            base_username = username
-            
-            while await db.users.find_one({"username": username}):
-                username = f"{base_username}{counter}"
-                counter += 1
+            username = await available_username(db, user_data.get('username') or f"user_{telegram_id}")
             
             new_user = {
                 "id": str(uuid4()),
@@ -1649,8 +1469,6 @@ async def telegram_webapp_auth(initData: str = Form(...)):
                 "authMethod": "telegram_webapp",
                 "isPremium": False,
                 "isPrivate": False,
-                "following": [],
-                "followers": [],
                 "blockedUsers": [],
                 "mutedUsers": [],
                 "savedPosts": [],
@@ -1662,7 +1480,7 @@ async def telegram_webapp_auth(initData: str = Form(...)):
                 "createdAt": datetime.now(timezone.utc)
             }
             
-            await db.users.insert_one(new_user)
+            await insert_user(db, new_user)
             access_token = create_access_token(data={"sub": new_user["id"]})
             
             # Convert datetime to JSON-serializable format
@@ -1765,6 +1583,7 @@ async def verify_telegram_otp(request: VerifyOTPRequest):
                 "lastSeen": datetime.now(timezone.utc).isoformat()
             }}
         )
+        invalidate_principal(user["id"])
         
         return {
             "message": "Telegram login successful",
@@ -1850,20 +1669,18 @@ async def telegram_webhook(update: dict):
                         "telegramFirstName": user.get("first_name", ""),
                         "telegramLastName": user.get("last_name", ""),
                         "fullName": f"{user.get('first_name', '')} {user.get('last_name', '')}".strip(),
-                        "username": user.get("username") or f"tguser{telegram_id}",
+                        "username": await available_username(db, user.get("username") or f"tguser{telegram_id}"),
                         "authMethod": "telegram",
                         "createdAt": datetime.now(timezone.utc).isoformat(),
                         "age": 18,  # Default age
                         "gender": "Other",  # Default gender
                         "bio": "",
                         "profileImage": "",
-                        "followers": [],
-                        "following": [],
                         "posts": [],
                         "isPremium": False
                     }
                     
-                    await db.users.insert_one(new_user_data)
+                    await insert_user(db, new_user_data)
                     return {"status": "ok", "message": "User registered successfully"}
         
         return {"status": "ok"}
@@ -1913,7 +1730,7 @@ async def check_telegram_bot_auth(auth_request: dict):
                     "telegramFirstName": "",
                     "telegramLastName": "",  
                     "fullName": recent_user.get('display_name', '') or f"User {telegram_id}",
-                    "username": recent_user.get('username') or f"tguser{telegram_id}",
+                    "username": await available_username(db, recent_user.get('username') or f"tguser{telegram_id}"),
                     "email": f"tg{telegram_id}@luvhive.app",  # Valid email format
                     "authMethod": "telegram",
                     "createdAt": datetime.now(timezone.utc).isoformat(),
@@ -1921,8 +1738,6 @@ async def check_telegram_bot_auth(auth_request: dict):
                     "gender": "Other", 
                     "bio": "New LuvHive user from Telegram! 💬✨",  # Better default bio
                     "profileImage": "",
-                    "followers": [],
-                    "following": [],
                     "posts": [],
                     "isPremium": False,
                     "isOnline": True,
@@ -1945,7 +1760,7 @@ async def check_telegram_bot_auth(auth_request: dict):
                     "location": ""  # Initialize location
                 }
                 
-                await db.users.insert_one(user_data)
+                await insert_user(db, user_data)
                 user = user_data
             else:
                 user = existing_user
@@ -2013,7 +1828,7 @@ async def reset_password(request: ResetPasswordRequest):
             raise HTTPException(status_code=400, detail="Password must be at least 6 characters")
         
         # Hash new password
-        hashed_password = get_password_hash(request.new_password)
+        hashed_password = await get_password_hash(request.new_password)
         
         # Update password in database
         await db.users.update_one(
@@ -2029,7 +1844,10 @@ async def reset_password(request: ResetPasswordRequest):
 @api_router.get("/auth/me")
 async def get_me(current_user: User = Depends(get_current_user)):
     # Get fresh data from database for accurate counts
-    user_data = await db.users.find_one({"id": current_user.id})
+    user_data = await db.users.find_one({"id": current_user.id}, {
+        "_id": 0, "blockedUsers": 1, "mutedUsers": 1, "followersCount": 1, "followingCount": 1,
+        "profileImage": 1
+    })
     
     return {
         "id": current_user.id,
@@ -2039,21 +1857,19 @@ async def get_me(current_user: User = Depends(get_current_user)):
         "age": current_user.age,
         "gender": current_user.gender,
         "bio": current_user.bio,
-        "profileImage": current_user.profileImage,
+        "profileImage": user_data.get("profileImage") if user_data else None,
         "country": current_user.country if hasattr(current_user, 'country') else None,
         "isPremium": current_user.isPremium,
         "isPrivate": current_user.isPrivate,
         "isVerified": current_user.isVerified if hasattr(current_user, 'isVerified') else False,
         "isFounder": current_user.isFounder if hasattr(current_user, 'isFounder') else False,
         "telegramLinked": current_user.telegramId is not None,
-        "blockedUsers": user_data.get("blockedUsers", []) if user_data else current_user.blockedUsers,
-        "mutedUsers": user_data.get("mutedUsers", []) if user_data else current_user.mutedUsers,  # Added for 3-dot menu functionality
+        "blockedUsers": user_data.get("blockedUsers", []) if user_data else [],
+        "mutedUsers": user_data.get("mutedUsers", []) if user_data else [],  # Added for 3-dot menu functionality
         
-        # Followers/Following data - use fresh data from database
-        "followers": user_data.get("followers", []) if user_data else [],
-        "following": user_data.get("following", []) if user_data else [],
-        "followersCount": len(user_data.get("followers", [])) if user_data else 0,
-        "followingCount": len(user_data.get("following", [])) if user_data else 0,
+        # Follower counts - use fresh data from database (lists: /users/{id}/followers)
+        "followersCount": user_data.get("followersCount", 0) if user_data else 0,
+        "followingCount": user_data.get("followingCount", 0) if user_data else 0,
         
         # Privacy Controls
         "appearInSearch": current_user.appearInSearch,
@@ -2085,11 +1901,11 @@ async def check_verification_status(current_user: User = Depends(get_current_use
     posts_count = await db.posts.count_documents({"userId": current_user.id, "isArchived": {"$ne": True}})
     
     # Count followers
-    followers_count = len(user_data.get("followers", []))
+    followers_count = user_data.get("followersCount", 0)
     
     # Count total likes received across all posts
     posts = await db.posts.find({"userId": current_user.id}).to_list(1000)
-    total_likes = sum(len(post.get("likes", [])) for post in posts)
+    total_likes = sum(post.get("likeCount", 0) for post in posts)
     
     # Count profile views (assuming we track this)
     profile_views = user_data.get("profileViews", 0)
@@ -2160,6 +1976,7 @@ async def admin_verify_user(username: str):
             "verificationPathway": "Manually Verified"
         }}
     )
+    invalidate_principal()
     
     return {"message": f"User {username} has been manually verified", "success": True}
 
@@ -2168,7 +1985,7 @@ async def set_founder_account(username: str):
     """Set an account as official founder/company account"""
     
     # Find user by username
-    target_user = await db.users.find_one({"username": {"$regex": f"^{username}$", "$options": "i"}})
+    target_user = await find_user_by_username(db, username)
     
     if not target_user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -2185,12 +2002,17 @@ async def set_founder_account(username: str):
             }
         }
     )
+    invalidate_principal(target_user["id"])
     
     return {"message": f"User {username} has been set as founder/official account", "success": True}
 
 @api_router.get("/verification/status")
 async def get_verification_status(current_user: User = Depends(get_current_user)):
     """Get current user's verification status and progress"""
+    counters = await db.users.find_one(
+        {"id": current_user.id}, {"_id": 0, "followersCount": 1, "profileImage": 1}
+    ) or {}
+    followers_count = counters.get("followersCount", 0)
     
     # Debug logging
     print(f"🔍 Verification status check for user: {current_user.username}")
@@ -2211,8 +2033,8 @@ async def get_verification_status(current_user: User = Depends(get_current_user)
     
     # Get total likes on user's posts
     user_posts = await db.posts.find({"userId": current_user.id}).to_list(length=None)
-    # likes is a list of user IDs who liked, so count the length
-    total_likes = sum(len(post.get("likes", [])) for post in user_posts)
+    # likeCount is maintained by the likes subsystem
+    total_likes = sum(post.get("likeCount", 0) for post in user_posts)
     
     # Get story views (average)
     user_stories = await db.stories.find({"userId": current_user.id}).to_list(length=None)
@@ -2226,7 +2048,7 @@ async def get_verification_status(current_user: User = Depends(get_current_user)
     profile_complete = all([
         current_user.fullName,
         current_user.bio,
-        current_user.profileImage,
+        counters.get("profileImage"),
         current_user.gender,
         current_user.age
     ])
@@ -2238,7 +2060,7 @@ async def get_verification_status(current_user: User = Depends(get_current_user)
     # Pathway 1: High engagement (original pathway)
     high_engagement = (
         posts_count >= 20 and
-        len(current_user.followers) >= 100 and
+        followers_count >= 100 and
         total_likes >= 1000 and
         avg_story_views >= 70 and
         getattr(current_user, 'profileViews', 0) >= 1000
@@ -2247,7 +2069,7 @@ async def get_verification_status(current_user: User = Depends(get_current_user)
     # Pathway 2: Moderate engagement with longer tenure
     moderate_engagement = (
         posts_count >= 10 and
-        len(current_user.followers) >= 50 and
+        followers_count >= 50 and
         account_age_days >= 90 and
         (total_likes >= 500 or avg_story_views >= 40)
     )
@@ -2297,7 +2119,7 @@ async def get_verification_status(current_user: User = Depends(get_current_user)
         
         # Activity & Engagement (High pathway)
         "postsCount": posts_count >= 20,
-        "followersCount": len(current_user.followers) >= 100,
+        "followersCount": followers_count >= 100,
         "totalLikes": total_likes >= 1000,
         "avgStoryViews": avg_story_views >= 70,
         "profileViews": getattr(current_user, 'profileViews', 0) >= 1000,
@@ -2314,7 +2136,7 @@ async def get_verification_status(current_user: User = Depends(get_current_user)
         "emailVerified": bool(getattr(current_user, 'emailVerified', False)),
         "mobileVerified": bool(getattr(current_user, 'mobileVerified', False)),
         "postsCount": posts_count,
-        "followersCount": len(current_user.followers),
+        "followersCount": followers_count,
         "violationsCount": getattr(current_user, 'violationsCount', 0),
         "profileComplete": profile_complete,
         "personalityQuestions": True,
@@ -2322,7 +2144,7 @@ async def get_verification_status(current_user: User = Depends(get_current_user)
         "avgStoryViews": int(avg_story_views),
         "totalLikes": total_likes,
         "moderateEngagementPosts": posts_count >= 10,
-        "moderateEngagementFollowers": len(current_user.followers) >= 50,
+        "moderateEngagementFollowers": followers_count >= 50,
         "moderateEngagementTenure": account_age_days >= 90,
         "moderateEngagementLikes": total_likes >= 500 or avg_story_views >= 40
     }
@@ -2358,8 +2180,7 @@ async def update_profile(
     # Handle username change with 15-day restriction
     if username is not None and username != current_user.username:
         # Check if username is already taken
-        existing_user = await db.users.find_one({"username": username, "id": {"$ne": current_user.id}})
-        if existing_user:
+        if await username_taken(db, username, exclude_user_id=current_user.id):
             raise HTTPException(status_code=400, detail="Username already taken")
         
         # Check 15-day restriction
@@ -2373,6 +2194,7 @@ async def update_profile(
                 )
         
         update_data["username"] = username
+        update_data["usernameLower"] = normalize_username(username)
         update_data["lastUsernameChange"] = datetime.now(timezone.utc)
         
         # Update username in all posts and stories
@@ -2394,6 +2216,9 @@ async def update_profile(
         update_data["country"] = country
     if profileImage is not None:
         update_data["profileImage"] = profileImage
+        # Filled in again by the thumbnail job for the new image
+        update_data["profileImageThumbnails"] = []
+        update_data["profileImagePlaceholder"] = None
         
         # Update profile image in posts and stories
         await db.posts.update_many(
@@ -2406,10 +2231,15 @@ async def update_profile(
         )
     
     if update_data:
-        await db.users.update_one(
-            {"id": current_user.id},
-            {"$set": update_data}
-        )
+        try:
+            await db.users.update_one(
+                {"id": current_user.id},
+                {"$set": update_data}
+            )
+        except DuplicateKeyError:
+            raise HTTPException(status_code=400, detail="Username already taken")
+        invalidate_principal(current_user.id)
+        await schedule_profile_thumbnails(current_user.id, profileImage)
     
     # Fetch and return updated user data
     updated_user = await db.users.find_one({"id": current_user.id})
@@ -2434,28 +2264,9 @@ async def send_email_verification(
     if not email:
         raise HTTPException(status_code=400, detail="Email is required")
     
-    # Generate 6-digit OTP
-    import random
-    otp = str(random.randint(100000, 999999))
-    
-    # Store OTP in database with expiry (10 minutes)
-    from datetime import timedelta
-    expiry = datetime.now(timezone.utc) + timedelta(minutes=10)
-    
-    await db.verification_codes.update_one(
-        {"userId": current_user.id, "type": "email"},
-        {
-            "$set": {
-                "userId": current_user.id,
-                "type": "email",
-                "code": otp,
-                "email": email,
-                "expiresAt": expiry,
-                "createdAt": datetime.now(timezone.utc)
-            }
-        },
-        upsert=True
-    )
+    # Generate 6-digit OTP, valid for 10 minutes
+    otp = generate_otp()
+    await issue_code("email_verification", current_user.id, otp, data={"email": email})
     
     # TODO: Send actual email with OTP (for now, just log it)
     print(f"📧 Email Verification Code for {email}: {otp}")
@@ -2472,28 +2283,18 @@ async def verify_email_code(
     if not code:
         raise HTTPException(status_code=400, detail="Verification code is required")
     
-    # Find verification code
-    verification = await db.verification_codes.find_one({
-        "userId": current_user.id,
-        "type": "email",
-        "code": code
-    })
+    # Checks expiry and attempts, and consumes the code
+    verification = await code_store.verify("email_verification", current_user.id, str(code))
     
     if not verification:
-        raise HTTPException(status_code=400, detail="Invalid verification code")
-    
-    # Check if expired
-    if verification["expiresAt"] < datetime.now(timezone.utc):
-        raise HTTPException(status_code=400, detail="Verification code expired")
+        raise HTTPException(status_code=400, detail="Invalid or expired verification code")
     
     # Update user email and set as verified
     await db.users.update_one(
         {"id": current_user.id},
         {"$set": {"email": verification["email"], "emailVerified": True}}
     )
-    
-    # Delete used verification code
-    await db.verification_codes.delete_one({"_id": verification["_id"]})
+    invalidate_principal(current_user.id)
     
     return {"message": "Email verified successfully"}
 
@@ -2508,8 +2309,6 @@ async def send_phone_verification(
         raise HTTPException(status_code=400, detail="Phone number is required")
     
     try:
-        from twilio.rest import Client
-        
         account_sid = os.environ.get("TWILIO_ACCOUNT_SID")
         auth_token = os.environ.get("TWILIO_AUTH_TOKEN")
         verify_service_sid = os.environ.get("TWILIO_VERIFY_SERVICE_SID")
@@ -2517,44 +2316,21 @@ async def send_phone_verification(
         if not account_sid or not auth_token or not verify_service_sid:
             raise HTTPException(status_code=500, detail="SMS service not configured")
         
-        client = Client(account_sid, auth_token)
+        formatted_number = format_mobile_number(phone)
         
-        # Format mobile number (add +91 if not present)
-        formatted_number = phone.strip()
-        if not formatted_number.startswith('+'):
-            if formatted_number.startswith('91'):
-                formatted_number = '+' + formatted_number
-            else:
-                formatted_number = '+91' + formatted_number
-        
-        # Send OTP via Twilio Verify
-        verification = client.verify \
-            .v2 \
-            .services(verify_service_sid) \
-            .verifications \
-            .create(to=formatted_number, channel='sms')
-        
-        # Store phone number for verification
-        await db.verification_codes.update_one(
-            {"userId": current_user.id, "type": "phone"},
-            {
-                "$set": {
-                    "userId": current_user.id,
-                    "type": "phone",
-                    "phone": formatted_number,
-                    "createdAt": datetime.now(timezone.utc)
-                }
-            },
-            upsert=True
-        )
+        # Twilio generates and checks the code; we throttle sends and remember the number
+        await issue_code("phone_verification", current_user.id, None, data={"phone": formatted_number})
         
-        logger.info(f"Twilio SMS OTP sent: {verification.status} to {formatted_number}")
+        # Delivered by the outbound queue (Twilio Verify)
+        await outbound_queue.enqueue("sms", {"to": formatted_number})
         
         return {
             "message": "Verification code sent to your phone",
-            "status": verification.status
+            "status": "pending"
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error sending phone verification: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to send SMS: {str(e)}")
@@ -2580,10 +2356,7 @@ async def verify_phone_code(
             raise HTTPException(status_code=500, detail="SMS service not configured")
         
         # Get stored phone number
-        verification_record = await db.verification_codes.find_one({
-            "userId": current_user.id,
-            "type": "phone"
-        })
+        verification_record = await code_store.pending("phone_verification", current_user.id)
         
         if not verification_record or not verification_record.get("phone"):
             raise HTTPException(status_code=400, detail="No verification request found. Please send code first.")
@@ -2592,12 +2365,11 @@ async def verify_phone_code(
         
         client = Client(account_sid, auth_token)
         
-        # Verify OTP with Twilio
-        verification_check = client.verify \
-            .v2 \
-            .services(verify_service_sid) \
-            .verification_checks \
-            .create(to=phone_number, code=code)
+        # Verify OTP with Twilio (blocking SDK call, kept off the event loop)
+        verification_check = await asyncio.to_thread(
+            client.verify.v2.services(verify_service_sid).verification_checks.create,
+            to=phone_number, code=code
+        )
         
         if verification_check.status == 'approved':
             # Update user phone and set as verified
@@ -2605,9 +2377,10 @@ async def verify_phone_code(
                 {"id": current_user.id},
                 {"$set": {"mobile": phone_number, "mobileVerified": True}}
             )
+            invalidate_principal(current_user.id)
             
-            # Delete used verification record
-            await db.verification_codes.delete_one({"_id": verification_record["_id"]})
+            # Forget the pending number
+            await code_store.discard("phone_verification", current_user.id)
             
             logger.info(f"Phone verified successfully for user {current_user.id}")
             return {"message": "Phone verified successfully"}
@@ -2647,6 +2420,12 @@ async def update_user_settings(
         {"id": current_user.id},
         {"$set": setting_updates}
     )
+    invalidate_principal(current_user.id)
+    
+    # Privacy changes alter who can see this user's posts and stories
+    if "isPrivate" in setting_updates:
+        await sync_author_privacy(db, current_user.id, setting_updates["isPrivate"])
+        invalidate_stories_tray()
     
     return {"message": "Settings updated successfully", "updated": setting_updates}
 
@@ -2676,16 +2455,16 @@ async def download_user_data(current_user: User = Depends(get_current_user)):
             "bio": user_data.get("bio", ""),
             "isPremium": user_data.get("isPremium", False),
             "createdAt": user_data["createdAt"].isoformat(),
-            "followers": len(user_data.get("followers", [])),
-            "following": len(user_data.get("following", []))
+            "followers": user_data.get("followersCount", 0),
+            "following": user_data.get("followingCount", 0)
         },
         "posts": [
             {
                 "id": post["id"],
                 "caption": post.get("caption", ""),
                 "mediaType": post["mediaType"],
-                "likes": len(post.get("likes", [])),
-                "comments": len(post.get("comments", [])),
+                "likes": post.get("likeCount", 0),
+                "comments": post.get("commentCount", 0),
                 "createdAt": post["createdAt"].isoformat()
             } for post in posts
         ],
@@ -2869,6 +2648,9 @@ async def send_mobile_otp_endpoint(request: SendMobileOTPRequest):
                 detail="Invalid mobile number format"
             )
         
+        # Twilio Verify owns the code; only the send is throttled here
+        await issue_code("mobile_otp", mobile_digits, None)
+        
         # Send OTP
         otp_sent = await send_mobile_otp(clean_mobile)
         
@@ -2993,6 +2775,7 @@ async def verify_existing_otp(request: VerifyEmailOTPRequest):
             {"email": clean_email},
             {"$set": {"emailVerified": True}}
         )
+        invalidate_principal()
         
         if result.modified_count == 0:
             raise HTTPException(
@@ -3021,9 +2804,7 @@ async def cleanup_account_data(identifier: str):
         users_to_delete = []
         
         # Search by username (case insensitive)
-        user_by_username = await db.users.find_one({
-            "username": {"$regex": f"^{identifier}$", "$options": "i"}
-        })
+        user_by_username = await find_user_by_username(db, identifier)
         if user_by_username:
             users_to_delete.append(user_by_username)
         
@@ -3066,22 +2847,16 @@ async def cleanup_account_data(identifier: str):
             # Delete user comments
             comments_deleted = await db.comments.delete_many({"userId": user_id})
             
-            # Remove user from other users' followers/following lists
-            await db.users.update_many(
-                {"followers": user_id},
-                {"$pull": {"followers": user_id}}
-            )
-            await db.users.update_many(
-                {"following": user_id},
-                {"$pull": {"following": user_id}}
-            )
+            # Remove the user's follow edges and the counters they fed
+            await remove_user_follows(db, user_id)
             
             # Delete all notifications to and from this user
             await db.notifications.delete_many({"userId": user_id})  # Notifications TO this user
-            await db.notifications.delete_many({"fromUserId": user_id})  # Notifications FROM this user
+            await remove_actor_notifications(db, user_id)  # Notifications FROM this user
             
             # Delete the user account
             user_deleted = await db.users.delete_one({"id": user_id})
+            invalidate_principal(user_id)
             
             deleted_users.append({
                 "username": username,
@@ -3126,6 +2901,7 @@ async def forgot_password_mobile(request: ForgotPasswordMobileRequest):
             )
         
         # Use Twilio Verify service for password reset (same as registration)
+        await issue_code("mobile_otp", ''.join(filter(str.isdigit, clean_mobile)), None)
         otp_sent = await send_mobile_otp(clean_mobile)
         
         if not otp_sent:
@@ -3175,7 +2951,7 @@ async def reset_password_mobile(request: ResetPasswordMobileRequest):
             )
         
         # Hash new password
-        hashed_password = get_password_hash(request.new_password)
+        hashed_password = await get_password_hash(request.new_password)
         
         # Update password
         await db.users.update_one(
@@ -3201,6 +2977,7 @@ async def wipe_all_database():
     try:
         # Delete all users
         users_result = await db.users.delete_many({})
+        invalidate_principal()
         
         # Delete all posts  
         posts_result = await db.posts.delete_many({})
@@ -3243,6 +3020,7 @@ async def verify_email(token: str):
                 "emailVerificationToken": None
             }}
         )
+        invalidate_principal(user["id"])
         
         return {
             "message": "Email verified successfully! You can now sign in to your account.",
@@ -3330,12 +3108,7 @@ async def check_username_availability(username: str):
             }
         
         # Check if username is available (case-insensitive)
-        escaped_username = clean_username.replace('.', r'\.')
-        existing_user = await db.users.find_one({
-            "username": {"$regex": f"^{escaped_username}$", "$options": "i"}
-        })
-        
-        if not existing_user:
+        if not await username_taken(db, clean_username):
             return {
                 "available": True,
                 "message": "Username is available!",
@@ -3370,17 +3143,13 @@ async def check_username_availability(username: str):
                 f"{base_username[:3]}_{base_username[3:]}"
             ])
         
+        # One query for every candidate
+        suggestion_patterns = [p for p in suggestion_patterns if len(p) <= 20]
+        taken = await taken_usernames(db, suggestion_patterns)
         for suggestion in suggestion_patterns:
             if len(suggestions) >= 5:  # Limit to 5 suggestions
                 break
-                
-            # Check if suggestion is available
-            escaped_suggestion = suggestion.replace('.', r'\.')
-            suggestion_exists = await db.users.find_one({
-                "username": {"$regex": f"^{escaped_suggestion}$", "$options": "i"}
-            })
-            
-            if not suggestion_exists and len(suggestion) <= 20:
+            if suggestion not in taken:
                 suggestions.append(suggestion)
         
         return {
@@ -3412,6 +3181,7 @@ async def link_telegram(code: str, current_user: User = Depends(get_current_user
         {"id": current_user.id},
         {"$set": {"telegramUserId": telegram_link["telegramUserId"], "telegramCode": code}}
     )
+    invalidate_principal(current_user.id)
     
     return {"message": "Telegram linked successfully"}
 
@@ -3424,62 +3194,41 @@ async def create_story_with_file(
     current_user: User = Depends(get_current_user)
 ):
     """Create story with actual file upload (multipart/form-data)"""
-    file_id = None
-    file_path = None
-    telegram_url = None
+    if not media:
+        raise HTTPException(status_code=400, detail="Media file is required")
+    await load_user_fields(db, current_user, "profileImage")
     
+    # Type comes from the file's magic bytes, not the client's Content-Type
     try:
-        if media:
-            # Read the actual file
-            file_content = await media.read()
-            mime_type = media.content_type or "image/jpeg"
-            
-            # Convert to base64 data URL for send_media_to_telegram_channel
-            import base64
-            encoded = base64.b64encode(file_content).decode('utf-8')
-            media_url = f"data:{mime_type};base64,{encoded}"
-            
-            logger.info(f"Received story file: {media.filename}, size: {len(file_content)} bytes, type: {mime_type}")
-            
-            # Upload to Telegram
-            file_id, file_path, telegram_url = await send_media_to_telegram_channel(
-                media_url=media_url,
-                media_type=media_type,
-                caption=caption,
-                username=current_user.username
-            )
-            
-            if telegram_url:
-                logger.info(f"✅ Story uploaded to Telegram: {telegram_url}")
-            else:
-                logger.warning("⚠️ Failed to upload story to Telegram")
-                telegram_url = media_url
-        else:
-            logger.warning("No media file received for story")
-            telegram_url = "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+        spooled = await spool_upload(media)
+    except MediaRejected as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.info(f"Received story file: {media.filename}, size: {spooled.size} bytes, type: {spooled.content_type}")
     
+    try:
+        stored = await store_uploaded_media(spooled, "stories", caption, current_user.username, current_user.id)
     except Exception as e:
-        logger.error(f"Failed to process story file: {e}")
-        import traceback
-        traceback.print_exc()
-        telegram_url = "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+        logger.error(f"Failed to store story media: {e}")
+        raise HTTPException(status_code=500, detail="Failed to store media")
     
     # Create story
     story = Story(
         userId=current_user.id,
         username=current_user.username,
         userProfileImage=current_user.profileImage,
-        mediaType=media_type,
-        mediaUrl=telegram_url,
+        mediaType=spooled.kind,
+        mediaUrl=stored["mediaUrl"],
         caption=caption
     )
     
-    story_dict = story.dict()
-    if file_id:
-        story_dict["telegramFileId"] = file_id
-        story_dict["telegramFilePath"] = file_path
+    story_dict = {**story.dict(), **stored}
     
     await db.stories.insert_one(story_dict)
+    invalidate_stories_tray(current_user.id)
+    await thumbnail_renderer.schedule(
+        db.stories, {"id": story_dict["id"]}, spooled, story_dict["id"],
+        on_done=lambda: invalidate_stories_tray(current_user.id)
+    )
     
     if "_id" in story_dict:
         del story_dict["_id"]
@@ -3488,44 +3237,42 @@ async def create_story_with_file(
 
 @api_router.post("/stories/create")
 async def create_story(story_data: StoryCreate, current_user: User = Depends(get_current_user)):
-    # Send media to Telegram channel first to get file_id and file_path
-    file_id = None
-    file_path = None
-    telegram_url = None
-    
-    try:
-        file_id, file_path, telegram_url = await send_media_to_telegram_channel(
-            media_url=story_data.mediaUrl,
-            media_type=story_data.mediaType,
-            caption=story_data.caption or "",
-            username=current_user.username
-        )
-        
-        if telegram_url:
-            logger.info(f"Story media uploaded to Telegram: {telegram_url}")
-        else:
-            logger.warning("Failed to upload story media to Telegram, using base64 fallback")
-    except Exception as e:
-        logger.error(f"Failed to send story media to Telegram: {e}")
-        # Don't fail the story creation if Telegram upload fails
+    await load_user_fields(db, current_user, "profileImage")
+    # Data URLs go through the upload pipeline; plain URLs are stored as given
+    stored = {"mediaUrl": story_data.mediaUrl}
+    spooled = None
+    if story_data.mediaUrl.startswith('data:'):
+        try:
+            spooled = await asyncio.to_thread(spool_data_url, story_data.mediaUrl)
+        except MediaRejected as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        try:
+            stored = await store_uploaded_media(
+                spooled, "stories", story_data.caption or "", current_user.username, current_user.id
+            )
+        except Exception as e:
+            logger.error(f"Failed to store story media: {e}")
+            raise HTTPException(status_code=500, detail="Failed to store media")
     
-    # Create story with Telegram URL if available, otherwise use base64
     story = Story(
         userId=current_user.id,
         username=current_user.username,
         userProfileImage=current_user.profileImage,
         mediaType=story_data.mediaType,
-        mediaUrl=telegram_url if telegram_url else story_data.mediaUrl,  # Use Telegram URL if available
+        mediaUrl=stored["mediaUrl"],
         caption=story_data.caption
     )
     
     # Add Telegram metadata if available
-    story_dict = story.dict()
-    if file_id:
-        story_dict["telegramFileId"] = file_id
-        story_dict["telegramFilePath"] = file_path
+    story_dict = {**story.dict(), **stored}
     
     await db.stories.insert_one(story_dict)
+    invalidate_stories_tray(current_user.id)
+    if spooled is not None:
+        await thumbnail_renderer.schedule(
+            db.stories, {"id": story_dict["id"]}, spooled, story_dict["id"],
+            on_done=lambda: invalidate_stories_tray(current_user.id)
+        )
     
     # Remove MongoDB ObjectId from response
     if "_id" in story_dict:
@@ -3544,38 +3291,31 @@ async def delete_story(story_id: str, current_user: User = Depends(get_current_u
         raise HTTPException(status_code=403, detail="Not authorized to delete this story")
     
     await db.stories.delete_one({"id": story_id})
+    invalidate_stories_tray(current_user.id)
     
     # Delete all notifications related to this story
-    await db.notifications.delete_many({"storyId": story_id})
+    await delete_notifications(db, {"targetId": story_id})
     
     return {"message": "Story deleted successfully"}
 
 @api_router.post("/stories/{story_id}/like")
 async def like_story(story_id: str, current_user: User = Depends(get_current_user)):
     """Like a story and send notification to story owner"""
+    await load_user_fields(db, current_user, "profileImage")
     story = await db.stories.find_one({"id": story_id})
     if not story:
         raise HTTPException(status_code=404, detail="Story not found")
     
-    # Add like to story
-    await db.stories.update_one(
-        {"id": story_id},
-        {"$addToSet": {"likes": current_user.id}}
-    )
+    # Add like to story (None if it was already liked)
+    like_count = await add_like(db, "story", story_id, current_user.id)
     
     # Send notification to story owner if it's not their own story
-    if story["userId"] != current_user.id:
-        notification = Notification(
-            userId=story["userId"],
-            fromUserId=current_user.id,
-            fromUsername=current_user.username,
-            fromUserImage=current_user.profileImage,
-            type="story_like",
-            # reuse postId for downstream routing; include the story id here
-            postId=str(story_id),
-            postImage=story.get("imageUrl")  # Include story image for notification preview (stories use imageUrl field)
+    if like_count is not None:
+        # postId carries the story id for downstream routing; stories use the imageUrl field
+        await add_notification(
+            db, story["userId"], "story_like", notification_actor(current_user),
+            target_id=str(story_id), preview=story.get("imageUrl")
         )
-        await db.notifications.insert_one(notification.dict())
     
     return {"message": "Story liked successfully"}
 
@@ -3586,72 +3326,16 @@ async def unlike_story(story_id: str, current_user: User = Depends(get_current_u
     if not story:
         raise HTTPException(status_code=404, detail="Story not found")
     
-    # Remove like from story
-    await db.stories.update_one(
-        {"id": story_id},
-        {"$pull": {"likes": current_user.id}}
-    )
-    
-    # Delete story like notification when unliking
-    await db.notifications.delete_many({
-        "userId": story["userId"],
-        "fromUserId": current_user.id,
-        "type": "story_like",
-        "postId": story_id
-    })
+    # Remove like from story, and its notification when there was one
+    if await remove_like(db, "story", story_id, current_user.id) is not None:
+        await remove_notification(db, story["userId"], "story_like", current_user.id, story_id)
     
     return {"message": "Story unliked successfully"}
 
 @api_router.get("/stories/feed")
 async def get_stories_feed(current_user: User = Depends(get_current_user)):
-    # Get all stories that haven't expired
-    now = datetime.now(timezone.utc)
-    stories = await db.stories.find({"expiresAt": {"$gt": now}}).sort("createdAt", -1).to_list(1000)
-    
-    # Group stories by user
-    stories_by_user = {}
-    for story in stories:
-        user_id = story["userId"]
-        
-        # Get user's current profile picture, verification, founder status, and privacy info
-        story_author = await db.users.find_one(
-            {"id": user_id}, 
-            {"isVerified": 1, "isFounder": 1, "profileImage": 1, "isPrivate": 1, "followers": 1}
-        )
-        
-        # Skip private stories unless the viewer is a follower or the owner
-        if story_author:
-            is_private = story_author.get("isPrivate", False)
-            followers = story_author.get("followers") or []  # ensure list, not None
-            if (
-                is_private
-                and current_user.id not in followers
-                and user_id != current_user.id
-            ):
-                continue  # do not show this story
-        
-        if user_id not in stories_by_user:
-            is_verified = story_author.get("isVerified", False) if story_author else False
-            is_founder = story_author.get("isFounder", False) if story_author else False
-            current_profile_image = story_author.get("profileImage") if story_author else story.get("userProfileImage")
-            
-            stories_by_user[user_id] = {
-                "userId": user_id,
-                "username": story["username"],
-                "userProfileImage": current_profile_image,  # Use current profile picture
-                "isVerified": is_verified,
-                "isFounder": is_founder,
-                "stories": []
-            }
-        stories_by_user[user_id]["stories"].append({
-            "id": story["id"],
-            "mediaType": story.get("mediaType", "image"),
-            "mediaUrl": story.get("mediaUrl", ""),
-            "caption": story.get("caption", ""),
-            "createdAt": story["createdAt"].isoformat() if hasattr(story["createdAt"], 'isoformat') else story["createdAt"]
-        })
-    
-    return {"stories": list(stories_by_user.values())}
+    """Stories tray grouped by author (cached briefly per viewer)"""
+    return {"stories": await get_stories_tray(db, current_user.id)}
 
 # Posts Routes
 @api_router.post("/posts")
@@ -3662,63 +3346,40 @@ async def create_post_with_file(
     current_user: User = Depends(get_current_user)
 ):
     """Create post with actual file upload (multipart/form-data)"""
-    file_id = None
-    file_path = None
-    telegram_url = None
+    if not media:
+        raise HTTPException(status_code=400, detail="Media file is required")
+    await load_user_fields(db, current_user, "profileImage")
     
+    # Type comes from the file's magic bytes, not the client's Content-Type
     try:
-        if media:
-            # Read the actual file
-            file_content = await media.read()
-            mime_type = media.content_type or "image/jpeg"
-            
-            # Convert to base64 data URL for send_media_to_telegram_channel
-            import base64
-            encoded = base64.b64encode(file_content).decode('utf-8')
-            media_url = f"data:{mime_type};base64,{encoded}"
-            
-            logger.info(f"Received file upload: {media.filename}, size: {len(file_content)} bytes, type: {mime_type}")
-            
-            # Upload to Telegram
-            file_id, file_path, telegram_url = await send_media_to_telegram_channel(
-                media_url=media_url,
-                media_type=media_type,
-                caption=caption,
-                username=current_user.username
-            )
-            
-            if telegram_url:
-                logger.info(f"✅ File uploaded to Telegram: {telegram_url}")
-            else:
-                logger.warning("⚠️ Failed to upload to Telegram, using base64 fallback")
-                telegram_url = media_url
-        else:
-            # No media uploaded
-            logger.warning("No media file received")
-            telegram_url = "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+        spooled = await spool_upload(media)
+    except MediaRejected as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.info(f"Received file upload: {media.filename}, size: {spooled.size} bytes, type: {spooled.content_type}")
     
+    try:
+        stored = await store_uploaded_media(spooled, "posts", caption, current_user.username, current_user.id)
     except Exception as e:
-        logger.error(f"Failed to process file upload: {e}")
-        import traceback
-        traceback.print_exc()
-        telegram_url = "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+        logger.error(f"Failed to store post media: {e}")
+        raise HTTPException(status_code=500, detail="Failed to store media")
     
     # Create post
     post = Post(
         userId=current_user.id,
         username=current_user.username,
         userProfileImage=current_user.profileImage,
-        mediaType=media_type,
-        mediaUrl=telegram_url,
+        mediaType=spooled.kind,
+        mediaUrl=stored["mediaUrl"],
         caption=caption
     )
     
-    post_dict = post.dict()
-    if file_id:
-        post_dict["telegramFileId"] = file_id
-        post_dict["telegramFilePath"] = file_path
+    post_dict = {**post.dict(), **stored}
+    post_dict["authorIsPrivate"] = current_user.isPrivate
     
     await db.posts.insert_one(post_dict)
+    await record_post_hashtags(db, post_dict, 1)
+    await adjust_posts_count(db, current_user.id, 1)
+    await thumbnail_renderer.schedule(db.posts, {"id": post_dict["id"]}, spooled, post_dict["id"])
     
     if "_id" in post_dict:
         del post_dict["_id"]
@@ -3727,44 +3388,41 @@ async def create_post_with_file(
 
 @api_router.post("/posts/create")
 async def create_post(post_data: PostCreate, current_user: User = Depends(get_current_user)):
-    # Send media to Telegram channel first to get file_id and file_path
-    file_id = None
-    file_path = None
-    telegram_url = None
-    
-    try:
-        file_id, file_path, telegram_url = await send_media_to_telegram_channel(
-            media_url=post_data.mediaUrl,
-            media_type=post_data.mediaType,
-            caption=post_data.caption or "",
-            username=current_user.username
-        )
-        
-        if telegram_url:
-            logger.info(f"Media uploaded to Telegram: {telegram_url}")
-        else:
-            logger.warning("Failed to upload media to Telegram, using base64 fallback")
-    except Exception as e:
-        logger.error(f"Failed to send post media to Telegram: {e}")
-        # Don't fail the post creation if Telegram upload fails
+    await load_user_fields(db, current_user, "profileImage")
+    # Data URLs go through the upload pipeline; plain URLs are stored as given
+    stored = {"mediaUrl": post_data.mediaUrl}
+    spooled = None
+    if post_data.mediaUrl.startswith('data:'):
+        try:
+            spooled = await asyncio.to_thread(spool_data_url, post_data.mediaUrl)
+        except MediaRejected as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        try:
+            stored = await store_uploaded_media(
+                spooled, "posts", post_data.caption or "", current_user.username, current_user.id
+            )
+        except Exception as e:
+            logger.error(f"Failed to store post media: {e}")
+            raise HTTPException(status_code=500, detail="Failed to store media")
     
-    # Create post with Telegram URL if available, otherwise use base64
     post = Post(
         userId=current_user.id,
         username=current_user.username,
         userProfileImage=current_user.profileImage,
         mediaType=post_data.mediaType,
-        mediaUrl=telegram_url if telegram_url else post_data.mediaUrl,  # Use Telegram URL if available
+        mediaUrl=stored["mediaUrl"],
         caption=post_data.caption
     )
     
     # Add Telegram metadata if available
-    post_dict = post.dict()
-    if file_id:
-        post_dict["telegramFileId"] = file_id
-        post_dict["telegramFilePath"] = file_path
+    post_dict = {**post.dict(), **stored}
+    post_dict["authorIsPrivate"] = current_user.isPrivate
     
     await db.posts.insert_one(post_dict)
+    await record_post_hashtags(db, post_dict, 1)
+    await adjust_posts_count(db, current_user.id, 1)
+    if spooled is not None:
+        await thumbnail_renderer.schedule(db.posts, {"id": post_dict["id"]}, spooled, post_dict["id"])
     
     # Remove MongoDB ObjectId from response
     if "_id" in post_dict:
@@ -3773,10 +3431,11 @@ async def create_post(post_data: PostCreate, current_user: User = Depends(get_cu
     return {"message": "Post created successfully", "post": post_dict}
 
 @api_router.get("/media/{file_id}")
-async def get_media_proxy(file_id: str):
+async def get_media_proxy(file_id: str, request: Request):
     """
     Media proxy endpoint to avoid exposing bot token to frontend
-    Redirects to actual Telegram file URL
+    Serves from the local disk cache (Range/ETag aware) when the file is
+    there; otherwise starts caching it and redirects to Telegram
     """
     try:
         bot_token = os.environ.get("TELEGRAM_BOT_TOKEN")
@@ -3784,12 +3443,24 @@ async def get_media_proxy(file_id: str):
             raise HTTPException(status_code=500, detail="Bot token not configured")
         
         # Get file_path from Telegram
-        file_path = await get_telegram_file_path(file_id, bot_token)
-        if not file_path:
+        info = await get_telegram_file_info(file_id, bot_token)
+        if not info:
             raise HTTPException(status_code=404, detail="File not found")
         
         # Build Telegram file URL
-        telegram_url = f"https://api.telegram.org/file/bot{bot_token}/{file_path}"
+        client = get_telegram_client()
+        telegram_url = client.file_url(bot_token, info["file_path"])
+        
+        unique_id = info.get("file_unique_id")
+        if unique_id:
+            cached = media_cache.get(unique_id)
+            if cached:
+                path, size = cached
+                content_type = mimetypes.guess_type(info["file_path"])[0] or "application/octet-stream"
+                return media_cache.response(unique_id, path, size, content_type, request.headers)
+            media_cache.populate_in_background(
+                unique_id, telegram_url, size_hint=info.get("file_size"), session=await client.get_session()
+            )
         
         # Redirect to Telegram URL
         from fastapi.responses import RedirectResponse
@@ -3802,76 +3473,16 @@ async def get_media_proxy(file_id: str):
         raise HTTPException(status_code=500, detail="Failed to retrieve media")
 
 @api_router.get("/posts/feed")
-async def get_posts_feed(current_user: User = Depends(get_current_user)):
-    # Get current user's full data to access blockedUsers and mutedUsers
-    user = await db.users.find_one({"id": current_user.id})
-    blocked_users = user.get("blockedUsers", [])
-    muted_users = user.get("mutedUsers", [])
-    saved_posts = user.get("savedPosts", [])
-    
-    # Combine blocked and muted users to exclude from feed
-    excluded_users = list(set(blocked_users + muted_users))
-    
-    # Exclude archived posts and posts from blocked/muted users
-    query = {
-        "isArchived": {"$ne": True}
-    }
-    
-    # Add filter to exclude posts from blocked and muted users
-    if excluded_users:
-        query["userId"] = {"$nin": excluded_users}
-    
-    posts = await db.posts.find(query).sort("createdAt", -1).to_list(1000)
-    
-    posts_list = []
-    for post in posts:
-        # Get post author's current profile picture, verification status, founder status, and privacy info
-        post_author = await db.users.find_one(
-            {"id": post["userId"]}, 
-            {"isVerified": 1, "isFounder": 1, "profileImage": 1, "isPrivate": 1, "followers": 1}
-        )
-        
-        # Skip posts from private accounts unless the viewer is a follower or the owner
-        if post_author:
-            is_private = post_author.get("isPrivate", False)
-            followers = post_author.get("followers") or []  # ensure list, not None
-            if (
-                is_private
-                and current_user.id not in followers
-                and post["userId"] != current_user.id  # compare against post userId
-            ):
-                continue  # do not add this post to the feed
-        
-        is_verified = post_author.get("isVerified", False) if post_author else False
-        is_founder = post_author.get("isFounder", False) if post_author else False
-        current_profile_image = post_author.get("profileImage") if post_author else post.get("userProfileImage")
-        
-        post_data = {
-            "id": post["id"],
-            "userId": post["userId"],
-            "username": post["username"],
-            "userProfileImage": current_profile_image,  # Use current profile picture
-            "isVerified": is_verified,
-            "isFounder": is_founder,
-            "mediaType": post.get("mediaType", "image"),
-            "mediaUrl": post.get("mediaUrl", ""),
-            "caption": post.get("caption", ""),
-            "likes": post.get("likes", []),
-            "comments": post.get("comments", []),
-            "createdAt": post["createdAt"].isoformat() if hasattr(post["createdAt"], 'isoformat') else post["createdAt"],
-            "userLiked": current_user.id in post.get("likes", []),
-            "isSaved": post["id"] in saved_posts
-        }
-        
-        # Add Telegram fields if they exist
-        if post.get("telegramFileId"):
-            post_data["telegramFileId"] = post["telegramFileId"]
-        if post.get("telegramFilePath"):
-            post_data["telegramFilePath"] = post["telegramFilePath"]
-            
-        posts_list.append(post_data)
-    
-    return {"posts": posts_list}
+async def get_posts_feed(
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    current_user: User = Depends(get_current_user)
+):
+    """Cursor-paginated home feed; pass `nextCursor` back as `cursor` for the next page"""
+    try:
+        return await get_feed_page(db, current_user.id, cursor=cursor, limit=limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 @api_router.get("/posts/{post_id}")
 async def get_single_post(post_id: str, current_user: User = Depends(get_current_user)):
@@ -3883,6 +3494,7 @@ async def get_single_post(post_id: str, current_user: User = Depends(get_current
     # Get current user's saved posts
     user = await db.users.find_one({"id": current_user.id})
     saved_posts = user.get("savedPosts", [])
+    liked_ids = await get_liked_ids(db, "post", [post_id], current_user.id)
     
     return {
         "id": post["id"],
@@ -3893,9 +3505,9 @@ async def get_single_post(post_id: str, current_user: User = Depends(get_current
         "mediaType": post.get("mediaType", "image"),
         "mediaUrl": post.get("mediaUrl", ""),
         "caption": post.get("caption", ""),
-        "likesCount": len(post.get("likes", [])),
-        "commentsCount": len(post.get("comments", [])),
-        "userLiked": current_user.id in post.get("likes", []),
+        "likesCount": post.get("likeCount", 0),
+        "commentsCount": post.get("commentCount", 0),
+        "userLiked": post_id in liked_ids,
         "isSaved": post["id"] in saved_posts,
         "likesHidden": post.get("likesHidden", False),
         "commentsDisabled": post.get("commentsDisabled", False),
@@ -3904,48 +3516,28 @@ async def get_single_post(post_id: str, current_user: User = Depends(get_current
 
 @api_router.post("/posts/{post_id}/like")
 async def like_post(post_id: str, current_user: User = Depends(get_current_user)):
+    await load_user_fields(db, current_user, "profileImage")
     post = await db.posts.find_one({"id": post_id})
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     
-    likes = post.get("likes", [])
-    is_liking = current_user.id not in likes
+    user_liked, like_count = await toggle_like(db, "post", post_id, current_user.id)
     
-    if current_user.id in likes:
-        likes.remove(current_user.id)
-        # Delete like notification when unliking
-        await db.notifications.delete_many({
-            "userId": post["userId"],
-            "fromUserId": current_user.id,
-            "type": "like",
-            "postId": post_id
-        })
+    if not user_liked:
+        # Take the like off the post's notification when unliking
+        await remove_notification(db, post["userId"], "like", current_user.id, post_id)
     else:
-        likes.append(current_user.id)
-        
-        # Create notification if liking someone else's post
-        if post["userId"] != current_user.id:
-            notification = Notification(
-                userId=post["userId"],
-                fromUserId=current_user.id,
-                fromUsername=current_user.username,
-                fromUserImage=current_user.profileImage,
-                type="like",
-                postId=post_id,
-                postImage=post.get("mediaUrl")  # Include post image for notification preview
-            )
-            await db.notifications.insert_one(notification.dict())
-    
-    await db.posts.update_one(
-        {"id": post_id},
-        {"$set": {"likes": likes}}
-    )
+        # Folds into "X and N others liked your post"; skipped on your own post
+        await add_notification(
+            db, post["userId"], "like", notification_actor(current_user),
+            target_id=post_id, preview=post.get("mediaUrl")
+        )
     
     return {
         "success": True,
         "message": "Success",
-        "likeCount": len(likes),
-        "userLiked": current_user.id in likes
+        "likeCount": like_count,
+        "userLiked": user_liked
     }
 
 @api_router.post("/posts/{post_id}/unlike")
@@ -3954,135 +3546,100 @@ async def unlike_post(post_id: str, current_user: User = Depends(get_current_use
     return await like_post(post_id, current_user)
 
 @api_router.get("/posts/{post_id}/comments")
-async def get_post_comments(post_id: str, current_user: User = Depends(get_current_user)):
-    """Get all comments for a post"""
-    post = await db.posts.find_one({"id": post_id})
+async def get_post_comments(
+    post_id: str,
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    parentCommentId: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get a page of comments for a post, oldest first
+
+    Root comments are paged and returned together with their replies; pass
+    parentCommentId to page the replies of a single comment instead.
+    """
+    post = await db.posts.find_one({"id": post_id}, {"_id": 0, "id": 1})
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
-    
-    comments = post.get("comments", [])
-    return {"comments": comments}
+
+    try:
+        comments, next_cursor = await list_comments(db, post_id, cursor, limit, parentCommentId)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    liked_ids = await get_liked_ids(db, "comment", [c["id"] for c in comments], current_user.id)
+    result = []
+    for comment in comments:
+        comment = serialize_comment(comment)
+        comment["userLiked"] = comment["id"] in liked_ids
+        result.append(comment)
+    return {"comments": result, "nextCursor": next_cursor}
 
 @api_router.post("/posts/{post_id}/comment")
 async def add_comment_to_post(post_id: str, text: str = Form(...), parentCommentId: Optional[str] = Form(None), current_user: User = Depends(get_current_user)):
     """Add a comment to a post"""
-    post = await db.posts.find_one({"id": post_id})
+    await load_user_fields(db, current_user, "profileImage")
+    post = await db.posts.find_one({"id": post_id}, {"_id": 0, "userId": 1, "mediaUrl": 1})
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
-    
-    comment = {
-        "id": str(uuid4()),
+
+    if parentCommentId and not await find_comment(db, parentCommentId, post_id):
+        raise HTTPException(status_code=404, detail="Parent comment not found")
+
+    comment = await add_comment(db, post_id, {
         "userId": current_user.id,
         "username": current_user.username,
         "userProfileImage": current_user.profileImage,
         "text": text,
-        "likes": [],
-        "likesCount": 0,
-        "parentCommentId": parentCommentId,
-        "createdAt": datetime.now(timezone.utc).isoformat()
-    }
-    
-    comments = post.get("comments", [])
-    comments.append(comment)
+        "parentCommentId": parentCommentId
+    })
     
-    await db.posts.update_one(
-        {"id": post_id},
-        {"$set": {"comments": comments}}
+    # Notify the post owner (skipped when commenting on your own post)
+    await add_notification(
+        db, post["userId"], "comment", notification_actor(current_user),
+        target_id=post_id, preview=post.get("mediaUrl"), text=text
     )
     
-    # Create notification if commenting on someone else's post
-    if post["userId"] != current_user.id:
-        notification = Notification(
-            userId=post["userId"],
-            fromUserId=current_user.id,
-            fromUsername=current_user.username,
-            fromUserImage=current_user.profileImage,
-            type="comment",
-            postId=post_id,
-            postImage=post.get("mediaUrl")  # Include post image for notification preview
-        )
-        await db.notifications.insert_one(notification.dict())
-    
     return {
         "success": True,
         "message": "Comment added",
-        "comment": comment
+        "comment": serialize_comment(comment)
     }
 
 @api_router.post("/posts/{post_id}/comment/{comment_id}/like")
 async def like_comment(post_id: str, comment_id: str, current_user: User = Depends(get_current_user)):
     """Like/unlike a comment"""
-    post = await db.posts.find_one({"id": post_id})
-    if not post:
-        raise HTTPException(status_code=404, detail="Post not found")
-    
-    comments = post.get("comments", [])
-    comment_found = False
-    
-    for comment in comments:
-        if comment["id"] == comment_id:
-            comment_found = True
-            likes = comment.get("likes", [])
-            
-            if current_user.id in likes:
-                likes.remove(current_user.id)
-            else:
-                likes.append(current_user.id)
-            
-            comment["likes"] = likes
-            comment["likesCount"] = len(likes)
-            break
-    
-    if not comment_found:
+    if not await find_comment(db, comment_id, post_id):
         raise HTTPException(status_code=404, detail="Comment not found")
     
-    await db.posts.update_one(
-        {"id": post_id},
-        {"$set": {"comments": comments}}
-    )
+    user_liked, like_count = await toggle_like(db, "comment", comment_id, current_user.id)
     
     return {
         "success": True,
         "message": "Success",
-        "likeCount": len(likes),
-        "userLiked": current_user.id in likes
+        "likeCount": like_count,
+        "userLiked": user_liked
     }
 
 @api_router.delete("/posts/{post_id}/comment/{comment_id}")
 async def delete_comment(post_id: str, comment_id: str, current_user: User = Depends(get_current_user)):
     """Delete a comment (only by comment owner)"""
-    post = await db.posts.find_one({"id": post_id})
+    post = await db.posts.find_one({"id": post_id}, {"_id": 0, "userId": 1})
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
-    
-    comments = post.get("comments", [])
-    comment_to_delete = None
-    
-    for comment in comments:
-        if comment["id"] == comment_id:
-            if comment["userId"] != current_user.id:
-                raise HTTPException(status_code=403, detail="You can only delete your own comments")
-            comment_to_delete = comment
-            break
-    
+
+    comment_to_delete = await find_comment(db, comment_id, post_id)
     if not comment_to_delete:
         raise HTTPException(status_code=404, detail="Comment not found")
-    
+    if comment_to_delete["userId"] != current_user.id:
+        raise HTTPException(status_code=403, detail="You can only delete your own comments")
+
     # Remove comment and its replies
-    updated_comments = [c for c in comments if c["id"] != comment_id and c.get("parentCommentId") != comment_id]
-    
-    await db.posts.update_one(
-        {"id": post_id},
-        {"$set": {"comments": updated_comments}}
-    )
+    await delete_comment_thread(db, comment_to_delete)
     
-    # Delete associated notification
-    await db.notifications.delete_many({
-        "userId": post["userId"],
-        "fromUserId": current_user.id,
-        "type": "comment",
-        "postId": post_id
-    })
+    # Take the commenter off the post's notification once none of their comments are left
+    if not await db.comments.find_one({"postId": post_id, "userId": current_user.id}, {"_id": 1}):
+        await remove_notification(db, post["userId"], "comment", current_user.id, post_id)
     
     return {"message": "Comment deleted successfully"}
 
@@ -4148,7 +3705,8 @@ async def get_messages(userId: str, current_user: User = Depends(get_current_use
 
 @api_router.get("/users/list")
 async def get_users(current_user: User = Depends(get_current_user)):
-    users = await db.users.find({"id": {"$ne": current_user.id}}).to_list(1000)
+    users = await db.users.find({"id": {"$ne": current_user.id}}, USER_CARD_PROJECTION).to_list(1000)
+    statuses = await get_follow_statuses(db, current_user.id, [user["id"] for user in users])
     
     users_list = []
     for user in users:
@@ -4158,9 +3716,9 @@ async def get_users(current_user: User = Depends(get_current_user)):
             "fullName": user["fullName"],
             "profileImage": user.get("profileImage"),
             "bio": user.get("bio", ""),
-            "followersCount": len(user.get("followers", [])),
-            "followingCount": len(user.get("following", [])),
-            "isFollowing": user["id"] in current_user.following
+            "followersCount": user.get("followersCount", 0),
+            "followingCount": user.get("followingCount", 0),
+            "isFollowing": statuses.get(user["id"]) == FOLLOW_ACTIVE
         })
     
     return {"users": users_list}
@@ -4168,6 +3726,7 @@ async def get_users(current_user: User = Depends(get_current_user)):
 @api_router.get("/users/blocked")
 async def get_blocked_users(current_user: User = Depends(get_current_user)):
     """Get list of blocked users with their profile information"""
+    await load_user_fields(db, current_user, "blockedUsers")
     blocked_user_ids = current_user.blockedUsers
     
     if not blocked_user_ids:
@@ -4202,11 +3761,8 @@ async def get_user_profile(userId: str, current_user: User = Depends(get_current
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Get user's posts
-    posts = await db.posts.find({"userId": userId}).sort("createdAt", -1).to_list(1000)
-    
-    # Check if current user has requested to follow (for private accounts)
-    has_requested = current_user.id in user.get("followRequests", [])
+    # Following, or requested to follow (for private accounts)
+    status = await follow_status(db, current_user.id, user["id"])
     
     return {
         "id": user["id"],
@@ -4215,16 +3771,17 @@ async def get_user_profile(userId: str, current_user: User = Depends(get_current
         "profileImage": user.get("profileImage"),
         "bio": user.get("bio", ""),
         "isPrivate": user.get("isPrivate", False),
-        "followersCount": len(user.get("followers", [])),
-        "followingCount": len(user.get("following", [])),
-        "isFollowing": current_user.id in user.get("followers", []),
-        "hasRequested": has_requested,
-        "postsCount": len(posts)
+        "followersCount": user.get("followersCount", 0),
+        "followingCount": user.get("followingCount", 0),
+        "isFollowing": status == FOLLOW_ACTIVE,
+        "hasRequested": status == FOLLOW_PENDING,
+        "postsCount": user.get("postsCount", 0)
     }
 
 # Follow/Unfollow Routes
 @api_router.post("/users/{userId}/follow")
 async def follow_user(userId: str, current_user: User = Depends(get_current_user)):
+    await load_user_fields(db, current_user, "profileImage")
     if userId == current_user.id:
         raise HTTPException(status_code=400, detail="Cannot follow yourself")
     
@@ -4232,255 +3789,167 @@ async def follow_user(userId: str, current_user: User = Depends(get_current_user
     if not target_user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Check if account is private
+    # Private accounts get a pending request instead of a follower
     is_private = target_user.get("isPrivate", False)
+    status, created = await follow(db, current_user.id, userId, pending=is_private)
     
-    if is_private:
-        # Check if already requested
-        follow_requests = target_user.get("followRequests", [])
-        if current_user.id in follow_requests:
+    if status == FOLLOW_PENDING:
+        if not created:
             # Already requested - do nothing, return success
             return {"message": "Follow request already sent", "requested": True}
         
-        # Add to follow requests instead of followers
-        await db.users.update_one(
-            {"id": userId},
-            {"$addToSet": {"followRequests": current_user.id}}
-        )
-        
-        # Delete any existing follow request notifications first
-        await db.notifications.delete_many({
-            "userId": userId,
-            "fromUserId": current_user.id,
-            "type": "follow_request"
-        })
-        
-        # Create NEW follow request notification
-        notification = Notification(
-            userId=userId,
-            fromUserId=current_user.id,
-            fromUsername=current_user.username,
-            fromUserImage=current_user.profileImage,
-            type="follow_request"
-        )
-        await db.notifications.insert_one(notification.dict())
+        # One follow request notification per requester
+        await add_notification(db, userId, "follow_request", notification_actor(current_user))
         
         return {"message": "Follow request sent", "requested": True}
+    elif not created:
+        # Already following - nothing to notify
+        return {"message": "User followed successfully", "requested": False}
     else:
-        # Public account - follow immediately
-        # Add to following list
-        await db.users.update_one(
-            {"id": current_user.id},
-            {"$addToSet": {"following": userId}}
-        )
-        
-        # Add to followers list
-        await db.users.update_one(
-            {"id": userId},
-            {"$addToSet": {"followers": current_user.id}}
-        )
+        # Public account - followed immediately, both counters bumped
+        invalidate_stories_tray(current_user.id)
+        invalidate_principal(current_user.id, userId)
         
-        # Create notification
-        notification = Notification(
-            userId=userId,
-            fromUserId=current_user.id,
-            fromUsername=current_user.username,
-            fromUserImage=current_user.profileImage,
-            type="follow"
-        )
-        await db.notifications.insert_one(notification.dict())
+        # Folds into "X and N others started following you"
+        await add_notification(db, userId, "follow", notification_actor(current_user))
         
-        # Delete any "follow" or "started_following" notifications from the user we just followed
+        # Take the user we just followed off our "follow" and "started_following" notifications
         # This removes the notification prompting us to follow them back
-        await db.notifications.delete_many({
-            "userId": current_user.id,
-            "fromUserId": userId,
-            "type": {"$in": ["started_following", "follow"]}
-        })
+        await remove_notification(db, current_user.id, "follow", userId)
+        await remove_notification(db, current_user.id, "started_following", userId)
         
         return {"message": "User followed successfully", "requested": False}
 
 @api_router.post("/users/{userId}/unfollow")
 async def unfollow_user(userId: str, current_user: User = Depends(get_current_user)):
-    # Remove from following list
-    await db.users.update_one(
-        {"id": current_user.id},
-        {"$pull": {"following": userId}}
-    )
-    
-    # Remove from followers list
-    await db.users.update_one(
-        {"id": userId},
-        {"$pull": {"followers": current_user.id}}
-    )
+    # Remove the edge (or pending request) and decrement both counters
+    await unfollow(db, current_user.id, userId)
+    invalidate_stories_tray(current_user.id)
+    invalidate_principal(current_user.id, userId)
     
     return {"message": "User unfollowed successfully"}
 
 @api_router.post("/users/{userId}/accept-follow-request")
 async def accept_follow_request(userId: str, current_user: User = Depends(get_current_user)):
     """Accept a follow request from another user"""
-    # Remove from follow requests
-    await db.users.update_one(
-        {"id": current_user.id},
-        {"$pull": {"followRequests": userId}}
-    )
-    
-    # Add to followers
-    await db.users.update_one(
-        {"id": current_user.id},
-        {"$addToSet": {"followers": userId}}
-    )
-    
-    # Add to their following list
-    await db.users.update_one(
-        {"id": userId},
-        {"$addToSet": {"following": current_user.id}}
-    )
+    await load_user_fields(db, current_user, "profileImage")
+    # Turn the pending request into a follow
+    if not await approve_follow_request(db, userId, current_user.id):
+        raise HTTPException(status_code=404, detail="Follow request not found")
+    invalidate_stories_tray(userId)
+    invalidate_principal(userId, current_user.id)
     
     # DELETE the follow request notification
-    await db.notifications.delete_many({
-        "userId": current_user.id,
-        "fromUserId": userId,
-        "type": "follow_request"
-    })
+    await remove_notification(db, current_user.id, "follow_request", userId)
     
     # Create notification for REQUESTER: "User accepted your follow request"
-    requester = await db.users.find_one({"id": userId})
+    requester = await db.users.find_one({"id": userId}, {"_id": 0, "username": 1, "profileImage": 1})
     if requester:
-        notification_for_requester = Notification(
-            userId=userId,  # Notification goes to requester
-            fromUserId=current_user.id,  # From the person who accepted
-            fromUsername=current_user.username,
-            fromUserImage=current_user.profileImage,
-            type="follow_request_accepted"
-        )
-        await db.notifications.insert_one(notification_for_requester.dict())
+        await add_notification(db, userId, "follow_request_accepted", notification_actor(current_user))
     
     # Create notification for ACCEPTER: "User started following you" with Follow back option
     # ONLY if accepter is NOT already following the requester
     # (If they already follow each other, no need for "follow back" notification)
-    accepter_already_follows_requester = userId in current_user.following
+    accepter_already_follows_requester = await follows_user(db, current_user.id, userId)
     
     if not accepter_already_follows_requester:
-        notification_for_accepter = Notification(
-            userId=current_user.id,  # Notification goes to accepter (person who accepted)
-            fromUserId=userId,  # From the requester who is now following
-            fromUsername=requester.get("username", "Unknown") if requester else "Unknown",
-            fromUserImage=requester.get("profileImage") if requester else None,
-            type="started_following"
-        )
-        await db.notifications.insert_one(notification_for_accepter.dict())
+        # Notification goes to the accepter, from the requester who is now following
+        await add_notification(db, current_user.id, "started_following", {
+            "id": userId,
+            "username": requester.get("username", "Unknown") if requester else "Unknown",
+            "image": requester.get("profileImage") if requester else None
+        })
     
     return {"message": "Follow request accepted"}
 
 @api_router.post("/users/{userId}/reject-follow-request")
 async def reject_follow_request(userId: str, current_user: User = Depends(get_current_user)):
     """Reject/delete a follow request from another user"""
-    # Remove from follow requests
-    await db.users.update_one(
-        {"id": current_user.id},
-        {"$pull": {"followRequests": userId}}
-    )
+    await unfollow(db, userId, current_user.id, status=FOLLOW_PENDING)
+    await remove_notification(db, current_user.id, "follow_request", userId)
     
     return {"message": "Follow request rejected"}
 
 @api_router.post("/users/{userId}/cancel-follow-request")
 async def cancel_follow_request(userId: str, current_user: User = Depends(get_current_user)):
     """Cancel a follow request that was sent to another user"""
-    # Remove from the target user's follow requests
-    await db.users.update_one(
-        {"id": userId},
-        {"$pull": {"followRequests": current_user.id}}
-    )
+    await unfollow(db, current_user.id, userId, status=FOLLOW_PENDING)
     
     # Delete the follow request notification
-    await db.notifications.delete_many({
-        "userId": userId,
-        "fromUserId": current_user.id,
-        "type": "follow_request"
-    })
+    await remove_notification(db, userId, "follow_request", current_user.id)
     
     return {"message": "Follow request cancelled"}
 
-@api_router.get("/users/{userId}/followers")
-async def get_followers_list(userId: str, current_user: User = Depends(get_current_user)):
-    """Get list of followers for a user"""
-    user = await db.users.find_one({"id": userId})
+async def _follow_list_page(userId: str, direction: str, cursor: Optional[str], limit: int, current_user: User) -> dict:
+    """One page of followers/following as user cards, with the viewer's own follow state"""
+    user = await db.users.find_one({"id": userId}, {"_id": 0, "id": 1, "isPrivate": 1})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Check privacy
-    is_private = user.get("isPrivate", False)
-    is_following = current_user.id in user.get("followers", [])
-    
     # Can only view if: own profile, public account, or following private account
-    if is_private and userId != current_user.id and not is_following:
+    if user.get("isPrivate", False) and userId != current_user.id and not await follows_user(db, current_user.id, userId):
         raise HTTPException(status_code=403, detail="This account is private")
     
-    follower_ids = user.get("followers", [])
-    followers = []
-    
-    for fid in follower_ids:
-        follower = await db.users.find_one({"id": fid})
-        if follower:
-            # Check if current user has requested to follow this follower
-            has_requested = current_user.id in follower.get("followRequests", [])
-            
-            followers.append({
-                "id": follower["id"],
-                "username": follower["username"],
-                "fullName": follower["fullName"],
-                "profileImage": follower.get("profileImage"),
-                "isFollowing": fid in current_user.following,
-                "hasRequested": has_requested
+    try:
+        user_ids, next_cursor = await list_follow_edges(db, userId, direction, cursor, limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    # One $in for the cards and one for the viewer's follow state, in edge order
+    cards = {
+        card["id"]: card
+        for card in await db.users.find(
+            {"id": {"$in": user_ids}},
+            {"_id": 0, "id": 1, "username": 1, "fullName": 1, "profileImage": 1}
+        ).to_list(len(user_ids))
+    }
+    statuses = await get_follow_statuses(db, current_user.id, user_ids)
+    items = []
+    for uid in user_ids:
+        card = cards.get(uid)
+        if card:
+            items.append({
+                "id": card["id"],
+                "username": card["username"],
+                "fullName": card["fullName"],
+                "profileImage": card.get("profileImage"),
+                "isFollowing": statuses.get(uid) == FOLLOW_ACTIVE,
+                "hasRequested": statuses.get(uid) == FOLLOW_PENDING
             })
-    
-    return {"followers": followers}
+    return {direction: items, "nextCursor": next_cursor}
+
+@api_router.get("/users/{userId}/followers")
+async def get_followers_list(
+    userId: str,
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    current_user: User = Depends(get_current_user)
+):
+    """Get a page of a user's followers, newest first; pass nextCursor back as `cursor`"""
+    return await _follow_list_page(userId, "followers", cursor, limit, current_user)
 
 @api_router.get("/users/{userId}/following")
-async def get_following_list(userId: str, current_user: User = Depends(get_current_user)):
-    """Get list of users that this user is following"""
-    user = await db.users.find_one({"id": userId})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    # Check privacy
-    is_private = user.get("isPrivate", False)
-    is_following = current_user.id in user.get("followers", [])
-    
-    # Can only view if: own profile, public account, or following private account
-    if is_private and userId != current_user.id and not is_following:
-        raise HTTPException(status_code=403, detail="This account is private")
-    
-    following_ids = user.get("following", [])
-    following = []
-    
-    for fid in following_ids:
-        followed_user = await db.users.find_one({"id": fid})
-        if followed_user:
-            # Check if current user has requested to follow this user
-            has_requested = current_user.id in followed_user.get("followRequests", [])
-            
-            following.append({
-                "id": followed_user["id"],
-                "username": followed_user["username"],
-                "fullName": followed_user["fullName"],
-                "profileImage": followed_user.get("profileImage"),
-                "isFollowing": fid in current_user.following,
-                "hasRequested": has_requested
-            })
-    
-    return {"following": following}
+async def get_following_list(
+    userId: str,
+    cursor: Optional[str] = None,
+    limit: int = 20,
+    current_user: User = Depends(get_current_user)
+):
+    """Get a page of the users this user follows, newest first; pass nextCursor back as `cursor`"""
+    return await _follow_list_page(userId, "following", cursor, limit, current_user)
 
 # My Profile Routes
 @api_router.get("/profile/posts")
 async def get_my_posts(current_user: User = Depends(get_current_user)):
+    await load_user_fields(db, current_user, "savedPosts")
     # Get all non-archived posts
     posts = await db.posts.find({"userId": current_user.id, "isArchived": {"$ne": True}}).to_list(1000)
     
     # Sort: pinned first, then by date
     posts.sort(key=lambda x: (not x.get("isPinned", False), -x["createdAt"].timestamp()))
     
+    liked_ids = await get_liked_ids(db, "post", [post["id"] for post in posts], current_user.id)
+    
     posts_list = []
     for post in posts:
         posts_list.append({
@@ -4489,12 +3958,10 @@ async def get_my_posts(current_user: User = Depends(get_current_user)):
             "mediaUrl": post.get("mediaUrl"),
             "imageUrl": post.get("imageUrl"),  # Add imageUrl support
             "caption": post.get("caption", ""),
-            "likes": post.get("likes", []),
-            "comments": post.get("comments", []),
             "createdAt": post["createdAt"].isoformat(),
-            "likesCount": len(post.get("likes", [])),
-            "commentsCount": len(post.get("comments", [])),
-            "userLiked": current_user.id in post.get("likes", []),
+            "likesCount": post.get("likeCount", 0),
+            "commentsCount": post.get("commentCount", 0),
+            "userLiked": post["id"] in liked_ids,
             "isSaved": post["id"] in current_user.savedPosts
         })
     
@@ -4502,11 +3969,13 @@ async def get_my_posts(current_user: User = Depends(get_current_user)):
 
 @api_router.get("/profile/saved")
 async def get_saved_posts(current_user: User = Depends(get_current_user)):
+    await load_user_fields(db, current_user, "savedPosts")
     if not current_user.savedPosts:
         return {"posts": []}
     
     # Get all saved posts
     posts = await db.posts.find({"id": {"$in": current_user.savedPosts}}).sort("createdAt", -1).to_list(1000)
+    liked_ids = await get_liked_ids(db, "post", [post["id"] for post in posts], current_user.id)
     
     posts_list = []
     for post in posts:
@@ -4519,12 +3988,10 @@ async def get_saved_posts(current_user: User = Depends(get_current_user)):
             "mediaUrl": post.get("mediaUrl"),
             "imageUrl": post.get("imageUrl"),
             "caption": post.get("caption", ""),
-            "likes": post.get("likes", []),
-            "comments": post.get("comments", []),
-            "likesCount": len(post.get("likes", [])),
-            "commentsCount": len(post.get("comments", [])),
+            "likesCount": post.get("likeCount", 0),
+            "commentsCount": post.get("commentCount", 0),
             "createdAt": post["createdAt"].isoformat(),
-            "userLiked": current_user.id in post.get("likes", []),
+            "userLiked": post["id"] in liked_ids,
             "isSaved": True
         })
     
@@ -4594,9 +4061,14 @@ async def delete_post(post_id: str, current_user: User = Depends(get_current_use
         raise HTTPException(status_code=403, detail="You can only delete your own posts")
     
     await db.posts.delete_one({"id": post_id})
+    await delete_target_likes(db, "post", [post_id])
+    await delete_post_comments(db, post_id)
+    if not post.get("isArchived"):
+        await record_post_hashtags(db, post, -1)
+        await adjust_posts_count(db, current_user.id, -1)
     
     # Delete all notifications related to this post (likes and comments)
-    await db.notifications.delete_many({"postId": post_id})
+    await delete_notifications(db, {"targetId": post_id})
     
     return {"message": "Post deleted successfully"}
 
@@ -4614,6 +4086,9 @@ async def archive_post(post_id: str, current_user: User = Depends(get_current_us
         {"id": post_id},
         {"$set": {"isArchived": not is_archived}}
     )
+    # Archived posts don't count towards trending or the visible post count
+    await record_post_hashtags(db, post, 1 if is_archived else -1)
+    await adjust_posts_count(db, current_user.id, 1 if is_archived else -1)
     return {"message": "Post archived" if not is_archived else "Post unarchived", "isArchived": not is_archived}
 
 @api_router.post("/posts/{post_id}/hide-likes")
@@ -4660,6 +4135,8 @@ async def edit_post_caption(post_id: str, caption: str = Form(...), current_user
         {"id": post_id},
         {"$set": {"caption": caption}}
     )
+    if not post.get("isArchived"):
+        await update_post_hashtags(db, post, caption)
     
     return {"message": "Caption updated successfully", "caption": caption}
 
@@ -4675,6 +4152,8 @@ async def edit_caption(post_id: str, caption: str = Form(...), current_user: Use
         {"id": post_id},
         {"$set": {"caption": caption}}
     )
+    if not post.get("isArchived"):
+        await update_post_hashtags(db, post, caption)
     return {"message": "Caption updated successfully"}
 
 @api_router.post("/posts/{post_id}/pin")
@@ -4715,8 +4194,8 @@ async def get_archived(current_user: User = Depends(get_current_user)):
             "mediaUrl": post.get("mediaUrl"),
             "imageUrl": post.get("imageUrl"),
             "caption": post.get("caption", ""),
-            "likesCount": len(post.get("likes", [])),
-            "commentsCount": len(post.get("comments", [])),
+            "likesCount": post.get("likeCount", 0),
+            "commentsCount": post.get("commentCount", 0),
             "createdAt": post["createdAt"].isoformat()
         })
     
@@ -4761,20 +4240,13 @@ async def get_user_profile(userId: str, current_user: User = Depends(get_current
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Fetch fresh current user data from database to get latest following/followers state
-    fresh_current_user = await db.users.find_one({"id": current_user.id})
-    if not fresh_current_user:
-        raise HTTPException(status_code=401, detail="Current user not found")
-    
-    # Check if current user is following this user
-    is_following = current_user.id in user.get("followers", [])
+    # Check if current user is following (or has requested to follow) this user
+    status = await follow_status(db, current_user.id, user["id"])
+    is_following = status == FOLLOW_ACTIVE
+    has_requested = status == FOLLOW_PENDING
     
     # Check if this user is following the current user (for "Follow back" button)
-    # This should check if the current user's ID is in the viewed user's following list
-    is_following_me = current_user.id in user.get("following", [])
-    
-    # Check if current user has requested to follow (for private accounts)
-    has_requested = current_user.id in user.get("followRequests", [])
+    is_following_me = await follows_user(db, user["id"], current_user.id)
     
     # Check if account is private
     is_private = user.get("isPrivate", False)
@@ -4782,13 +4254,10 @@ async def get_user_profile(userId: str, current_user: User = Depends(get_current
     # Always show the post count. We restrict actual post content in the
     # /users/{userId}/posts endpoint, but the number of posts should be
     # visible even for private accounts (similar to Instagram and other social apps).
-    posts_count = await db.posts.count_documents({
-        "userId": userId,
-        "isArchived": {"$ne": True}
-    })
+    posts_count = user.get("postsCount", 0)
     
-    followers_count = len(user.get("followers", []))
-    following_count = len(user.get("following", []))
+    followers_count = user.get("followersCount", 0)
+    following_count = user.get("followingCount", 0)
     
     logger.info(f"Profile API called for user {user.get('username')} - Followers: {followers_count}, Following: {following_count}")
     
@@ -4872,6 +4341,7 @@ async def get_user_account_info(
 @api_router.get("/users/{userId}/posts")
 async def get_user_posts(userId: str, current_user: User = Depends(get_current_user)):
     """Get posts by a specific user (accepts UUID or username)"""
+    await load_user_fields(db, current_user, "savedPosts")
     # Find the user by id or by username
     user = await db.users.find_one({"$or": [{"id": userId}, {"username": userId}]})
     if not user:
@@ -4879,8 +4349,7 @@ async def get_user_posts(userId: str, current_user: User = Depends(get_current_u
     
     # If the account is private and the requester isn't following and isn't the owner, hide posts
     is_private = user.get("isPrivate", False)
-    is_following = current_user.id in user.get("followers", [])
-    if is_private and not is_following and current_user.id != user["id"]:
+    if is_private and current_user.id != user["id"] and not await follows_user(db, current_user.id, user["id"]):
         return {"posts": []}
     
     # Get user's non-archived posts by either userId or username
@@ -4891,11 +4360,12 @@ async def get_user_posts(userId: str, current_user: User = Depends(get_current_u
             {"$or": [{"userId": user["id"]}, {"username": user["username"]}]}
         ]
     }).sort("createdAt", -1).to_list(50)
+    liked_ids = await get_liked_ids(db, "post", [post.get("id") for post in posts], current_user.id)
     
     posts_list = []
     for post in posts:
         # Check if current user liked this post
-        is_liked = current_user.id in post.get("likes", [])
+        is_liked = post.get("id") in liked_ids
         # Check if current user saved this post
         is_saved = post["id"] in current_user.savedPosts
         
@@ -4926,8 +4396,8 @@ async def get_user_posts(userId: str, current_user: User = Depends(get_current_u
             "imageUrl": image_url,  # Legacy field for backward compatibility
             "telegramFileId": telegram_id,  # Include for frontend fallback
             "caption": post.get("caption", ""),
-            "likes": post.get("likes", []),
-            "comments": post.get("comments", []),
+            "likesCount": post.get("likeCount", 0),
+            "commentsCount": post.get("commentCount", 0),
             "userLiked": is_liked,
             "isSaved": is_saved,
             "likesHidden": post.get("likesHidden", False),
@@ -5060,20 +4530,15 @@ async def block_user(userId: str, current_user: User = Depends(get_current_user)
         raise HTTPException(status_code=404, detail="User not found")
     
     # Add to blocked users list (add this field to User model if needed)
-    # For now, we'll remove from following/followers and add to a blocked list
+    # For now, we'll unfollow and add to a blocked list
     await db.users.update_one(
         {"id": current_user.id},
-        {
-            "$addToSet": {"blockedUsers": userId},
-            "$pull": {"following": userId}
-        }
+        {"$addToSet": {"blockedUsers": userId}}
     )
+    invalidate_principal(current_user.id)
     
-    # Remove current user from target's followers
-    await db.users.update_one(
-        {"id": userId},
-        {"$pull": {"followers": current_user.id}}
-    )
+    # Unfollow the target (keeps both follow counters in step)
+    await unfollow(db, current_user.id, userId)
     
     return {"message": "User blocked successfully"}
 
@@ -5112,6 +4577,7 @@ async def unblock_user(userId: str, current_user: User = Depends(get_current_use
         {"id": current_user.id},
         {"$pull": {"blockedUsers": userId}}
     )
+    invalidate_principal(current_user.id)
     
     return {"message": "User unblocked successfully"}
 
@@ -5166,6 +4632,7 @@ async def search_content(search_request: SearchRequest, current_user: User = Dep
     """
     Search for users, posts, and hashtags
     """
+    await load_user_fields(db, current_user, "blockedUsers", "savedPosts")
     query = search_request.query.strip()
     search_type = search_request.type
     page = max(1, search_request.page)
@@ -5218,10 +4685,10 @@ async def search_content(search_request: SearchRequest, current_user: User = Dep
         
         # Try text search first, fallback to regex
         try:
-            exact_users = await db.users.find(text_search_filter).skip(skip).limit(limit).to_list(limit)
+            exact_users = await db.users.find(text_search_filter, USER_CARD_PROJECTION).skip(skip).limit(limit).to_list(limit)
             logger.info(f"🔍 Search: Text search for '{query}' found {len(exact_users)} exact matches")
         except:
-            exact_users = await db.users.find(regex_filter).skip(skip).limit(limit).to_list(limit)
+            exact_users = await db.users.find(regex_filter, USER_CARD_PROJECTION).skip(skip).limit(limit).to_list(limit)
             logger.info(f"🔍 Search: Regex search for '{query}' found {len(exact_users)} exact matches")
         user_ids_found = {user["id"] for user in exact_users}
         
@@ -5238,11 +4705,12 @@ async def search_content(search_request: SearchRequest, current_user: User = Dep
             }
         ])
         
-        partial_users = await db.users.find(partial_filter).limit(10).to_list(10)
+        partial_users = await db.users.find(partial_filter, USER_CARD_PROJECTION).limit(10).to_list(10)
         logger.info(f"🔍 Search: Partial search for '{query}' found {len(partial_users)} additional matches")
         
         # Combine results with exact matches first
         all_users = exact_users + partial_users
+        statuses = await get_follow_statuses(db, current_user.id, [user["id"] for user in all_users[:20]])
         
         for user in all_users[:20]:  # Limit to 20 total results
             results["users"].append({
@@ -5251,8 +4719,8 @@ async def search_content(search_request: SearchRequest, current_user: User = Dep
                 "username": user["username"],
                 "profileImage": user.get("profileImage"),
                 "bio": user.get("bio", "")[:100],  # Limit bio length for performance
-                "followersCount": len(user.get("followers", [])),
-                "isFollowing": user["id"] in current_user.following,
+                "followersCount": user.get("followersCount", 0),
+                "isFollowing": statuses.get(user["id"]) == FOLLOW_ACTIVE,
                 "isPremium": user.get("isPremium", False)
             })
         
@@ -5262,19 +4730,12 @@ async def search_content(search_request: SearchRequest, current_user: User = Dep
     
     # Search posts (if type is "posts" or "all")
     if search_type in ["posts", "all"]:
-        # Find posts from non-blocked users and non-private accounts (unless following)
-        blocked_users = current_user.blockedUsers
-        
-        # Get all users to check privacy settings
-        all_users = await db.users.find({}).to_list(10000)
-        user_privacy_map = {u["id"]: (u.get("isPrivate", False), u["id"] in current_user.following or u.get("followers", []) and current_user.id in u.get("followers", [])) for u in all_users}
-        
-        # Get user IDs of private accounts that current user is NOT following
-        private_non_following_users = [uid for uid, (is_private, is_following) in user_privacy_map.items() if is_private and not is_following]
-        
+        # Find posts from non-blocked users and non-private accounts (unless following),
+        # using the denormalized authorIsPrivate flag instead of loading every user
         post_filter = {
             "$and": [
-                {"userId": {"$nin": blocked_users + private_non_following_users}},  # Exclude blocked + private non-following
+                {"userId": {"$nin": current_user.blockedUsers}},
+                post_visibility_filter(current_user.id, await get_following_ids(db, current_user.id)),
                 {"isArchived": {"$ne": True}},
                 {
                     "$or": [
@@ -5286,6 +4747,7 @@ async def search_content(search_request: SearchRequest, current_user: User = Dep
         }
         
         posts = await db.posts.find(post_filter).sort("createdAt", -1).limit(20).to_list(20)
+        liked_ids = await get_liked_ids(db, "post", [post["id"] for post in posts], current_user.id)
         for post in posts:
             results["posts"].append({
                 "id": post["id"],
@@ -5295,10 +4757,10 @@ async def search_content(search_request: SearchRequest, current_user: User = Dep
                 "postType": post.get("postType", "text"),
                 "imageUrl": post.get("imageUrl"),
                 "content": post.get("content", ""),
-                "likes": len(post.get("likes", [])),
-                "comments": len(post.get("comments", [])),
+                "likes": post.get("likeCount", 0),
+                "comments": post.get("commentCount", 0),
                 "createdAt": post["createdAt"].isoformat() if "createdAt" in post else None,
-                "userLiked": current_user.id in post.get("likes", []),
+                "userLiked": post["id"] in liked_ids,
                 "isSaved": post["id"] in current_user.savedPosts
             })
     
@@ -5334,39 +4796,19 @@ async def get_trending_content(current_user: User = Depends(get_current_user)):
     """
     Get trending hashtags and users from recent posts
     """
-    # Get trending hashtags from recent posts (last 7 days)
-    recent_posts = await db.posts.find({
-        "$and": [
-            {"userId": {"$nin": current_user.blockedUsers}},
-            {"isArchived": {"$ne": True}},
-            {"createdAt": {"$gte": datetime.now(timezone.utc) - timedelta(days=7)}}
-        ]
-    }).to_list(1000)
-    
-    hashtag_count = {}
-    import re
-    for post in recent_posts:
-        caption = post.get("caption", "")
-        hashtags = re.findall(r'#\w+', caption, re.IGNORECASE)
-        for hashtag in hashtags:
-            hashtag = hashtag.lower()
-            hashtag_count[hashtag] = hashtag_count.get(hashtag, 0) + 1
-    
-    # Sort hashtags by frequency and return top 20
-    trending_hashtags = sorted(hashtag_count.items(), key=lambda x: x[1], reverse=True)[:20]
+    await load_user_fields(db, current_user, "blockedUsers")
+    # Rolling 7-day hashtag counts, maintained at post write time and served from memory
+    trending_hashtags = await get_trending_hashtags(db, limit=20)
     
     # Get trending users (users with most followers)
-    trending_users_cursor = await db.users.find({
+    trending_users = await db.users.find({
         "$and": [
             {"id": {"$ne": current_user.id}},
             {"id": {"$nin": current_user.blockedUsers}},
             {"appearInSearch": True}
         ]
-    }).to_list(100)
-    
-    # Sort by follower count and take top 10
-    trending_users_cursor.sort(key=lambda x: len(x.get("followers", [])), reverse=True)
-    trending_users = trending_users_cursor[:10]
+    }, USER_CARD_PROJECTION).sort("followersCount", -1).limit(10).to_list(10)
+    statuses = await get_follow_statuses(db, current_user.id, [user["id"] for user in trending_users])
     
     trending_users_list = []
     for user in trending_users:
@@ -5376,8 +4818,8 @@ async def get_trending_content(current_user: User = Depends(get_current_user)):
             "username": user["username"],
             "profileImage": user.get("profileImage"),
             "bio": user.get("bio", ""),
-            "followersCount": len(user.get("followers", [])),
-            "isFollowing": user["id"] in current_user.following,
+            "followersCount": user.get("followersCount", 0),
+            "isFollowing": statuses.get(user["id"]) == FOLLOW_ACTIVE,
             "isPremium": user.get("isPremium", False)
         })
     
@@ -5392,10 +4834,11 @@ async def get_explore_posts(current_user: User = Depends(get_current_user), limi
     Get explore posts for the search page (Instagram-style)
     Returns posts from public accounts, excluding blocked and muted users
     """
+    await load_user_fields(db, current_user, "blockedUsers", "mutedUsers")
     try:
         # Get blocked and muted users to exclude
         blocked_users = current_user.blockedUsers or []
-        muted_users = getattr(current_user, 'mutedUsers', []) or []
+        muted_users = current_user.mutedUsers or []
         excluded_users = list(set(blocked_users + muted_users))
         
         # Find users who are not private, not blocked, and not muted
@@ -5416,6 +4859,8 @@ async def get_explore_posts(current_user: User = Depends(get_current_user), limi
             ]
         }).sort("createdAt", -1).limit(limit).to_list(limit)
         
+        liked_ids = await get_liked_ids(db, "post", [post["id"] for post in posts], current_user.id)
+        
         explore_posts = []
         for post in posts:
             explore_posts.append({
@@ -5427,9 +4872,9 @@ async def get_explore_posts(current_user: User = Depends(get_current_user), limi
                 "imageUrl": post.get("imageUrl"),
                 "mediaUrl": post.get("mediaUrl"),
                 "mediaType": post.get("mediaType", "image"),
-                "likesCount": len(post.get("likes", [])),
-                "commentsCount": len(post.get("comments", [])),
-                "userLiked": current_user.id in post.get("likes", []),
+                "likesCount": post.get("likeCount", 0),
+                "commentsCount": post.get("commentCount", 0),
+                "userLiked": post["id"] in liked_ids,
                 "createdAt": post["createdAt"].isoformat() if isinstance(post.get("createdAt"), datetime) else post.get("createdAt")
             })
         
@@ -5440,61 +4885,56 @@ async def get_explore_posts(current_user: User = Depends(get_current_user), limi
         logger.error(f"Error fetching explore posts: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.post("/admin/reconcile-counters", dependencies=[Depends(require_admin_key)])
+async def reconcile_counters():
+    """
+    Admin endpoint to repair followersCount/followingCount/postsCount
+    from the follows and posts collections, and
+    unreadMessagesCount from the conversations' unread counters, and
+    unreadNotificationsCount from the unread notification rows
+    """
+    try:
+        modified = await reconcile_user_counters(db)
+        modified += await reconcile_unread_counters(db)
+        modified += await reconcile_notification_counters(db)
+        return {"message": f"Reconciled counters on {modified} users", "modified_count": modified}
+    except Exception as e:
+        logger.error(f"Error reconciling counters: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error reconciling counters: {str(e)}")
+
+@api_router.get("/admin/outbound/dead-letters")
+async def list_outbound_dead_letters(limit: int = 50):
+    """Admin endpoint listing email/SMS/Whereby jobs that exhausted their retries"""
+    jobs = await outbound_queue.dead_letters(min(max(limit, 1), 200))
+    return {"jobs": jobs, "count": len(jobs)}
+
+@api_router.post("/admin/outbound/dead-letters/{job_id}/retry")
+async def retry_outbound_dead_letter(job_id: str):
+    """Admin endpoint putting a dead-lettered job back on the queue"""
+    if not await outbound_queue.requeue(job_id):
+        raise HTTPException(status_code=404, detail="Dead-lettered job not found or its payload was redacted")
+    return {"message": "Job requeued", "jobId": job_id}
+
+async def migrate_follows():
+    """Startup hook: embedded follow arrays -> follows collection (see utils.follows)"""
+    if await migrate_follow_arrays(db):
+        invalidate_principal()
+
+async def migrate_usernames():
+    """Startup hook: usernameLower backfill and unique index (see utils.usernames)"""
+    if await migrate_username_lower(db):
+        invalidate_principal()
+
 @api_router.post("/admin/fix-duplicate-usernames")
 async def fix_duplicate_usernames():
     """
     Admin endpoint to fix duplicate usernames caused by whitespace
     """
     try:
-        # Find users with whitespace in usernames
-        users_with_whitespace = await db.users.find({
-            "$or": [
-                {"username": {"$regex": "^\\s+|\\s+$"}},  # Leading or trailing spaces
-                {"fullName": {"$regex": "^\\s+|\\s+$"}}   # Leading or trailing spaces in fullName
-            ]
-        }).to_list(1000)
-        
-        fixed_count = 0
-        for user in users_with_whitespace:
-            clean_username = user["username"].strip()
-            clean_fullname = user["fullName"].strip()
-            
-            # Check if cleaned username already exists
-            existing_clean = await db.users.find_one({
-                "username": clean_username,
-                "id": {"$ne": user["id"]}
-            })
-            
-            if existing_clean:
-                # If clean version exists, we need to handle the duplicate
-                # Option 1: Delete the whitespace version if it has no activity
-                user_posts = await db.posts.count_documents({"userId": user["id"]})
-                user_followers = len(user.get("followers", []))
-                
-                if user_posts == 0 and user_followers == 0:
-                    # Delete the inactive duplicate
-                    await db.users.delete_one({"id": user["id"]})
-                    fixed_count += 1
-                else:
-                    # Rename the duplicate by adding a number
-                    counter = 1
-                    new_username = f"{clean_username}{counter}"
-                    while await db.users.find_one({"username": new_username}):
-                        counter += 1
-                        new_username = f"{clean_username}{counter}"
-                    
-                    await db.users.update_one(
-                        {"id": user["id"]},
-                        {"$set": {"username": new_username, "fullName": clean_fullname}}
-                    )
-                    fixed_count += 1
-            else:
-                # Just clean the whitespace
-                await db.users.update_one(
-                    {"id": user["id"]},
-                    {"$set": {"username": clean_username, "fullName": clean_fullname}}
-                )
-                fixed_count += 1
+        changed = await fix_whitespace_usernames(db, delete_inactive=True)
+        fixed_count = len(changed)
+        if changed:
+            invalidate_principal()
         
         return {
             "message": f"Fixed {fixed_count} duplicate usernames",
@@ -5512,6 +4952,7 @@ async def get_search_suggestions(q: str = "", current_user: User = Depends(get_c
     """
     if not q or len(q) < 2:
         return {"suggestions": []}
+    await load_user_fields(db, current_user, "blockedUsers")
     
     suggestions = []
     
@@ -5684,15 +5125,16 @@ async def calculate_compatibility(
 
 # ==================== NOTIFICATION ENDPOINTS ====================
 
+def notification_actor(user: User) -> dict:
+    """The actor fields a notification row shows for an event by user"""
+    return {"id": user.id, "username": user.username, "image": user.profileImage}
+
 # Get unread notification count
 @api_router.get("/notifications/unread-count")
 async def get_unread_notification_count(current_user: User = Depends(get_current_user)):
+    """Badge count, maintained on the user document"""
     try:
-        count = await db.notifications.count_documents({
-            "userId": current_user.id,
-            "isRead": False
-        })
-        return {"count": count}
+        return {"count": await unread_notification_count(db, current_user.id)}
     except Exception as e:
         logger.error(f"Error fetching notification count: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -5700,46 +5142,19 @@ async def get_unread_notification_count(current_user: User = Depends(get_current
 # Get all notifications for current user
 @api_router.get("/notifications")
 async def get_notifications(
-    skip: int = 0,
+    cursor: Optional[str] = None,
     limit: int = 50,
     current_user: User = Depends(get_current_user)
 ):
+    """Most recently active notification rows first; pass nextCursor back as `cursor`"""
     try:
-        notifications = await db.notifications.find({
-            "userId": current_user.id
-        }).sort("createdAt", -1).skip(skip).limit(limit).to_list(length=limit)
-        
-        # Normalize each notification
-        notifications_list = []
-        for notif in notifications:
-            created_at = notif.get("createdAt")
-
-            # Normalize createdAt -> string
-            if hasattr(created_at, "isoformat"):
-                created_at_str = created_at.isoformat()
-            else:
-                # already a string or missing; keep or default to now
-                created_at_str = created_at if isinstance(created_at, str) \
-                    else datetime.now(timezone.utc).isoformat()
-
-            notifications_list.append({
-                "id": notif.get("id") or str(uuid4()),
-                "fromUserId": notif.get("fromUserId"),
-                "fromUsername": notif.get("fromUsername"),
-                "fromUserImage": notif.get("fromUserImage"),
-                "type": notif.get("type"),
-                # support both post notifications and story notifications:
-                "postId": notif.get("postId") or notif.get("storyId"),
-                "postImage": notif.get("postImage"),
-                # some old docs used "read" instead of "isRead"
-                "isRead": notif.get("isRead", notif.get("read", False)),
-                "createdAt": created_at_str,
-            })
-        
-        return {"notifications": notifications_list}
+        rows, next_cursor = await list_notifications(db, current_user.id, cursor, limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
     except Exception as e:
         logger.error(f"Error fetching notifications: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+    return {"notifications": [serialize_notification(row) for row in rows], "nextCursor": next_cursor}
 
 # Mark notification as read
 @api_router.put("/notifications/{notification_id}/read")
@@ -5748,12 +5163,7 @@ async def mark_notification_read(
     current_user: User = Depends(get_current_user)
 ):
     try:
-        result = await db.notifications.update_one(
-            {"id": notification_id, "userId": current_user.id},
-            {"$set": {"isRead": True}}
-        )
-        
-        if result.modified_count == 0:
+        if not await read_notification(db, current_user.id, notification_id):
             raise HTTPException(status_code=404, detail="Notification not found")
         
         return {"success": True, "message": "Notification marked as read"}
@@ -5763,57 +5173,23 @@ async def mark_notification_read(
         logger.error(f"Error marking notification as read: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+class ReadNotificationsRequest(BaseModel):
+    ids: Optional[List[str]] = None  # Only these rows (the pages the client has shown)
+
 # Mark all notifications as read
 @api_router.put("/notifications/read-all")
-async def mark_all_notifications_read(current_user: User = Depends(get_current_user)):
+async def mark_all_notifications_read(
+    request: Optional[ReadNotificationsRequest] = None,
+    current_user: User = Depends(get_current_user)
+):
     try:
-        await db.notifications.update_many(
-            {"userId": current_user.id, "isRead": False},
-            {"$set": {"isRead": True}}
-        )
+        await read_all_notifications(db, current_user.id, request.ids if request else None)
         
         return {"success": True, "message": "All notifications marked as read"}
     except Exception as e:
         logger.error(f"Error marking all notifications as read: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-# Helper function to create notification
-async def create_notification(
-    user_id: str,
-    from_user_id: str,
-    notification_type: str,
-    post_id: Optional[str] = None,
-    comment_text: Optional[str] = None
-):
-    """Helper function to create a notification"""
-    try:
-        # Get from_user details
-        from_user = await db.users.find_one({"id": from_user_id})
-        if not from_user:
-            return
-        
-        # Don't notify if user is notifying themselves
-        if user_id == from_user_id:
-            return
-        
-        notification = {
-            "id": str(uuid.uuid4()),
-            "userId": user_id,
-            "fromUserId": from_user_id,
-            "fromUsername": from_user.get("username", "Unknown"),
-            "fromUserImage": from_user.get("profileImage"),
-            "type": notification_type,
-            "postId": post_id,
-            "commentText": comment_text,
-            "isRead": False,
-            "createdAt": datetime.now(timezone.utc)
-        }
-        
-        await db.notifications.insert_one(notification)
-        logger.info(f"Created {notification_type} notification for user {user_id}")
-    except Exception as e:
-        logger.error(f"Error creating notification: {e}")
-
 # Health check endpoint
 @api_router.get("/health")
 async def health_check():
@@ -5824,6 +5200,16 @@ async def health_check():
             "status": "healthy",
             "database": db_name,
             "user_count": user_count,
+            "principal_cache": get_principal_cache_stats(),
+            "password_hashing": password_hasher.stats(),
+            "call_events": call_event_broker.stats(),
+            "signaling": signaling_manager.backplane.stats(),
+            "telegram_client": get_telegram_client().stats(),
+            "telegram_file_paths": telegram_file_path_cache.stats(),
+            "media_cache": media_cache.stats(),
+            "thumbnails": thumbnail_renderer.stats(),
+            "verification_codes": code_store.stats(),
+            "outbound": outbound_queue.stats(),
             "mongo_url": mongo_url.replace(mongo_url.split('@')[-1] if '@' in mongo_url else '', '***') if mongo_url else None
         }
     except Exception as e:
@@ -5837,10 +5223,10 @@ async def health_check():
 # Serve uploaded files endpoint
 @api_router.get("/uploads/{file_type}/{filename}")
 async def serve_upload(file_type: str, filename: str):
-    """Serve uploaded files (posts, profiles, stories)"""
+    """Serve uploaded files (posts, profiles, stories, thumbnails)"""
     try:
         # Validate file type
-        if file_type not in ["posts", "profiles", "stories"]:
+        if file_type not in ["posts", "profiles", "stories", "thumbnails"]:
             raise HTTPException(status_code=400, detail="Invalid file type")
         
         # Build file path
@@ -5901,30 +5287,12 @@ async def mark_messages_read(
         user_id = current_user.id
         conversation_id = request.conversationId
         
-        # Mark messages as read (exclude call_notification messages)
-        result = await db.messages.update_many(
-            {
-                "conversation_id": conversation_id,
-                "receiver_id": user_id,
-                "status.read": False,
-                "type": {"$ne": "call_notification"}
-            },
-            {
-                "$set": {
-                    "status.read": True,
-                    "read_at": datetime.now(timezone.utc)
-                }
-            }
-        )
-        
-        # Reset unread count for this user in conversation
-        await db.conversations.update_one(
-            {"_id": conversation_id},
-            {"$set": {f"unread_count.{user_id}": 0}}
-        )
+        # Advance this user's read watermark (call_notification messages are
+        # marked individually) and reset their unread count
+        marked_count = await mark_conversation_read(db, conversation_id, user_id)
         
-        logger.info(f"Marked {result.modified_count} messages as read in conversation {conversation_id}")
-        return {"status": "success", "markedCount": result.modified_count}
+        logger.info(f"Marked {marked_count} messages as read in conversation {conversation_id}")
+        return {"status": "success", "markedCount": marked_count}
         
     except HTTPException:
         raise
@@ -6001,18 +5369,18 @@ async def send_message(
         
         # Create conversation ID (sorted to ensure same ID regardless of who starts)
         participants = sorted([sender_id, receiver_id])
-        conversation_id = f"{participants[0]}_{participants[1]}"
+        conversation_id = conversation_id_for(sender_id, receiver_id)
         
         # Check if conversation exists, if not create it
         conversation = await db.conversations.find_one({"_id": conversation_id})
         
         if not conversation:
             # Check if sender follows receiver (for request logic)
-            sender_follows_receiver = receiver.get("followers", [])
-            is_following = sender_id in sender_follows_receiver
+            is_following = await follows_user(db, sender_id, receiver_id)
             
             # Message goes to requests if sender doesn't follow receiver
             is_request = not is_following
+            await load_user_fields(db, current_user, "profileImage")
             
             # Create new conversation
             conversation = {
@@ -6063,7 +5431,9 @@ async def send_message(
         
         await db.messages.insert_one(message)
         
-        # Update conversation and clear any deletion flags (resurrection scenario)
+        # Update conversation and bring it back to both inboxes (resurrection scenario).
+        # Cleared history stays hidden via the per-user clearedAt epochs, so the
+        # message collection is never rewritten here.
         await db.conversations.update_one(
             {"_id": conversation_id},
             {
@@ -6072,27 +5442,10 @@ async def send_message(
                     "last_message_at": datetime.now(timezone.utc)
                 },
                 "$inc": {f"unread_count.{receiver_id}": 1},
-                "$unset": {
-                    "deletedForEveryone": "",
-                    "deletedForEveryoneAt": "",
-                    f"deletedBy.{sender_id}": "",
-                    f"deletedBy.{receiver_id}": ""
-                }
-            }
-        )
-        
-        # Clear deletion flags from all messages in this conversation (resurrection)
-        await db.messages.update_many(
-            {"conversation_id": conversation_id},
-            {
-                "$unset": {
-                    "deletedForEveryone": "",
-                    "deletedForEveryoneAt": "",
-                    f"deletedBy.{sender_id}": "",
-                    f"deletedBy.{receiver_id}": ""
-                }
+                "$unset": resurrect_update(sender_id, receiver_id)
             }
         )
+        await increment_inbox_unread(db, receiver_id)
         
         return {
             "success": True,
@@ -6109,9 +5462,16 @@ async def send_message(
 
 @api_router.get("/messages/conversations")
 async def get_conversations(
+    cursor: Optional[str] = None,
+    limit: int = 20,
     authorization: str = Header(None)
 ):
-    """Get all conversations for current user (inbox)"""
+    """
+    Get a page of the current user's conversations (inbox)
+    
+    Pinned conversations come first on the first page; pass nextCursor back
+    as `cursor` for older conversations.
+    """
     try:
         # Get current user
         current_user = await get_current_user(authorization)
@@ -6120,19 +5480,13 @@ async def get_conversations(
         
         user_id = current_user.id
         
-        # Get all conversations where user is a participant
-        # Exclude conversations deleted by this user or deleted for everyone
-        conversations = await db.conversations.find({
-            "participants": user_id,
-            "$or": [
-                {f"deletedBy.{user_id}": {"$exists": False}},
-                {f"deletedBy.{user_id}": None}
-            ],
-            "$or": [
-                {"deletedForEveryone": {"$exists": False}},
-                {"deletedForEveryone": False}
-            ]
-        }).sort("last_message_at", -1).to_list(length=None)
+        # One indexed page of conversations where user is a participant,
+        # excluding those deleted by this user or deleted for everyone
+        try:
+            pinned, page, next_cursor = await get_inbox_page(db, user_id, cursor, limit)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        conversations = pinned + page
         
         # Format conversations for frontend
         formatted_conversations = []
@@ -6167,10 +5521,7 @@ async def get_conversations(
                 "callsMuted": calls_muted
             })
         
-        # Sort conversations: pinned first, then by last_message_at
-        formatted_conversations.sort(key=lambda x: (not x["isPinned"], x["lastMessageAt"] or ""), reverse=True)
-        
-        return {"conversations": formatted_conversations}
+        return {"conversations": formatted_conversations, "nextCursor": next_cursor}
         
     except HTTPException:
         raise
@@ -6181,9 +5532,16 @@ async def get_conversations(
 @api_router.get("/messages/conversation/{other_user_id}")
 async def get_conversation_messages(
     other_user_id: str,
+    before: Optional[str] = None,
+    limit: int = 50,
     authorization: str = Header(None)
 ):
-    """Get all messages in a conversation with a specific user"""
+    """
+    Get a page of messages in a conversation with a specific user
+    
+    Returns the newest messages (oldest first within the page); pass the
+    returned nextCursor as `before` to load the previous page.
+    """
     try:
         # Get current user
         current_user = await get_current_user(authorization)
@@ -6193,31 +5551,21 @@ async def get_conversation_messages(
         user_id = current_user.id
         
         # Create conversation ID
-        participants = sorted([user_id, other_user_id])
-        conversation_id = f"{participants[0]}_{participants[1]}"
+        conversation_id = conversation_id_for(user_id, other_user_id)
+        conversation = await db.conversations.find_one(
+            {"_id": conversation_id}, {"clearedAt": 1, "readUpTo": 1}
+        )
         
-        # Get messages - exclude messages deleted for this user or deleted for everyone
-        messages = await db.messages.find({
-            "conversation_id": conversation_id,
-            "$and": [
-                {
-                    "$or": [
-                        {f"deletedBy.{user_id}": {"$exists": False}},
-                        {f"deletedBy.{user_id}": None}
-                    ]
-                },
-                {
-                    "$or": [
-                        {"deletedForEveryone": {"$exists": False}},
-                        {"deletedForEveryone": False}
-                    ]
-                }
-            ]
-        }).sort("created_at", 1).to_list(length=None)
+        # One page of messages after this user's clearedAt epoch
+        try:
+            messages, next_cursor = await get_message_page(db, conversation_id, conversation, user_id, before, limit)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
         
         # Format messages
         formatted_messages = []
-        for msg in messages:
+        for msg in reversed(messages):
+            is_read, read_at = message_read_state(msg, conversation)
             formatted_messages.append({
                 "id": msg["_id"],
                 "senderId": msg["sender_id"],
@@ -6225,41 +5573,27 @@ async def get_conversation_messages(
                 "type": msg["type"],
                 "content": msg.get("content"),
                 "mediaUrl": msg.get("media_url"),
-                "status": msg.get("status", {}),
-                "readAt": serialize_datetime(msg.get("read_at")),
+                "status": {**msg.get("status", {}), "read": is_read},
+                "readAt": serialize_datetime(read_at),
                 "createdAt": serialize_datetime(msg.get("created_at")),
                 "isMine": msg["sender_id"] == user_id
             })
         
-        # Mark messages as read (from other user to current user)
-        # BUT don't auto-mark call_notification messages - they should be marked manually when accepted/rejected
-        await db.messages.update_many(
-            {
-                "conversation_id": conversation_id,
-                "receiver_id": user_id,
-                "status.read": False,
-                "type": {"$ne": "call_notification"}  # Exclude call notifications
-            },
-            {
-                "$set": {
-                    "status.read": True,
-                    "read_at": datetime.now(timezone.utc)
-                }
-            }
-        )
-        
-        # Reset unread count for this user in conversation
-        await db.conversations.update_one(
-            {"_id": conversation_id},
-            {"$set": {f"unread_count.{user_id}": 0}}
-        )
+        # Opening the latest page reads the chat: advance this user's watermark
+        # (call_notification messages are marked manually when accepted/rejected)
+        if not before and conversation:
+            await mark_conversation_read(db, conversation_id, user_id)
         
         # Get other user details
-        other_user = await db.users.find_one({"id": other_user_id})
+        other_user = await db.users.find_one(
+            {"id": other_user_id}, {"_id": 0, "username": 1, "fullName": 1, "profileImage": 1}
+        )
         
         return {
             "conversationId": conversation_id,
             "messages": formatted_messages,
+            "nextCursor": next_cursor,
+            "hasMore": next_cursor is not None,
             "otherUser": {
                 "id": other_user_id,
                 "username": other_user.get("username", "Unknown") if other_user else "Unknown",
@@ -6287,18 +5621,8 @@ async def get_unread_count(
         
         user_id = current_user.id
         
-        # Get all conversations
-        conversations = await db.conversations.find(
-            {"participants": user_id}
-        ).to_list(length=None)
-        
-        # Sum up unread counts
-        total_unread = sum(
-            conv.get("unread_count", {}).get(user_id, 0)
-            for conv in conversations
-        )
-        
-        return {"count": total_unread}
+        # Inbox total, kept in step with the per-conversation counters
+        return {"count": await get_total_unread(db, user_id)}
         
     except HTTPException:
         raise
@@ -6359,8 +5683,7 @@ async def decline_message_request(
         conversation_id = request.conversationId
         
         # Delete the conversation and all its messages
-        await db.conversations.delete_one({"_id": conversation_id})
-        await db.messages.delete_many({"conversation_id": conversation_id})
+        await delete_conversation(db, conversation_id)
         
         return {
             "success": True,
@@ -6445,39 +5768,12 @@ async def conversation_action(
         elif action == "delete":
             # Telegram-style delete: delete for me or delete for both
             if body.deleteForBoth:
-                # Delete for both: Mark conversation as deleted for everyone
-                await db.conversations.update_one(
-                    {"_id": conversation_id},
-                    {
-                        "$set": {
-                            f"deletedBy.{user_id}": datetime.now(timezone.utc),
-                            "deletedForEveryone": True,
-                            "deletedForEveryoneAt": datetime.now(timezone.utc)
-                        }
-                    }
-                )
-                # Mark all messages as deleted for everyone
-                await db.messages.update_many(
-                    {"conversation_id": conversation_id},
-                    {
-                        "$set": {
-                            "deletedForEveryone": True,
-                            "deletedForEveryoneAt": datetime.now(timezone.utc)
-                        }
-                    }
-                )
+                # Delete for both: move every participant's clearedAt epoch to now
+                await clear_conversation(db, conversation_id, conversation.get("participants", []), for_everyone=True)
                 return {"success": True, "message": "Conversation deleted for everyone"}
             else:
-                # Delete for me only: Soft delete
-                await db.conversations.update_one(
-                    {"_id": conversation_id},
-                    {"$set": {f"deletedBy.{user_id}": datetime.now(timezone.utc)}}
-                )
-                # Mark all messages as deleted for this user only
-                await db.messages.update_many(
-                    {"conversation_id": conversation_id},
-                    {"$set": {f"deletedBy.{user_id}": datetime.now(timezone.utc)}}
-                )
+                # Delete for me only: move just this user's clearedAt epoch
+                await clear_conversation(db, conversation_id, [user_id])
                 return {"success": True, "message": "Conversation deleted for you"}
             
         else:
@@ -6522,12 +5818,6 @@ async def create_whereby_room(
         user_hash = hashlib.md5(f"{current_user.id}-{request.participantUserId}".encode()).hexdigest()[:8]
         room_name_prefix = f"luvhive-{user_hash}"
         
-        # Prepare Whereby API request
-        headers = {
-            "Authorization": f"Bearer {WHEREBY_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        
         payload = {
             "endDate": end_date,
             "roomNamePrefix": room_name_prefix,
@@ -6538,21 +5828,15 @@ async def create_whereby_room(
         
         # Make request to Whereby API
         logger.info(f"Creating Whereby room for users {current_user.id} and {request.participantUserId}")
-        response = requests.post(
-            WHEREBY_API_URL,
-            headers=headers,
-            json=payload,
-            timeout=10
-        )
+        status, room_data, response_text = await whereby_client.create_room(payload)
         
-        if response.status_code != 201:
-            logger.error(f"Whereby API error: {response.status_code} - {response.text}")
+        if status != 201 or room_data is None:
+            logger.error(f"Whereby API error: {status} - {response_text}")
             raise HTTPException(
                 status_code=500,
-                detail=f"Failed to create video room: {response.text}"
+                detail=f"Failed to create video room: {response_text}"
             )
-        
-        room_data = response.json()
+
         logger.info(f"✅ Whereby room created: {room_data.get('meetingId')}")
         
         # Store call record in database
@@ -6571,13 +5855,22 @@ async def create_whereby_room(
         await db.video_calls.insert_one(call_record)
         logger.info(f"Call record saved to database")
         
+        # Ring the participant right away (WebSocket and SSE); the chat
+        # call_notification message remains the durable record
+        await signaling_manager.send_signal(request.participantUserId, {
+            "type": "incoming_call",
+            "fromUserId": current_user.id,
+            "callType": request.callType,
+            "data": {"roomUrl": room_data.get("roomUrl"), "meetingId": room_data.get("meetingId")}
+        })
+        
         return VideoRoomResponse(
             roomUrl=room_data.get("roomUrl"),
             meetingId=room_data.get("meetingId"),
             hostRoomUrl=room_data.get("hostRoomUrl")
         )
         
-    except requests.RequestException as e:
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         logger.error(f"Whereby API request failed: {e}")
         raise HTTPException(
             status_code=500,
@@ -6611,23 +5904,8 @@ async def delete_whereby_room(
                 detail="Whereby API key not configured"
             )
         
-        # Make request to delete the room
-        headers = {
-            "Authorization": f"Bearer {WHEREBY_API_KEY}"
-        }
-        
-        response = requests.delete(
-            f"{WHEREBY_API_URL}/{meeting_id}",
-            headers=headers,
-            timeout=10
-        )
-        
-        if response.status_code not in [200, 204]:
-            logger.error(f"Failed to delete Whereby room: {response.status_code}")
-            raise HTTPException(
-                status_code=500,
-                detail="Failed to delete video room"
-            )
+        # The room is deleted by the outbound queue (retried if Whereby is down)
+        await outbound_queue.enqueue("whereby", {"meetingId": meeting_id})
         
         # Update call record in database
         await db.video_calls.update_one(
@@ -6638,15 +5916,9 @@ async def delete_whereby_room(
             }}
         )
         
-        logger.info(f"✅ Whereby room deleted: {meeting_id}")
+        logger.info(f"Whereby room deletion queued: {meeting_id}")
         return {"status": "success", "message": "Room deleted"}
         
-    except requests.RequestException as e:
-        logger.error(f"Error deleting room: {e}")
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error deleting room: {str(e)}"
-        )
     except HTTPException:
         raise
     except Exception as e:
@@ -6770,18 +6042,50 @@ logger = logging.getLogger(__name__)
 @app.on_event("shutdown")
 async def shutdown_db_client():
     """Close MongoDB client connection on shutdown"""
+    try:
+        await signaling_manager.stop()
+    except Exception as e:
+        logger.error(f"Error stopping signaling backplane: {e}")
+    try:
+        await outbound_queue.stop()
+        await whereby_client.close()
+    except Exception as e:
+        logger.error(f"Error stopping outbound queue: {e}")
     try:
         client.close()
         logger.info("MongoDB client closed successfully")
     except Exception as e:
         logger.error(f"Error closing MongoDB client: {e}")
+    try:
+        password_hasher.shutdown()
+    except Exception as e:
+        logger.error(f"Error shutting down password hashing pool: {e}")
+    try:
+        thumbnail_renderer.shutdown()
+    except Exception as e:
+        logger.error(f"Error shutting down thumbnail pool: {e}")
+    try:
+        await media_cache.close()
+    except Exception as e:
+        logger.error(f"Error stopping media cache downloads: {e}")
+    try:
+        await get_telegram_client().close()
+    except Exception as e:
+        logger.error(f"Error closing Telegram HTTP client: {e}")
 
 # ==================== WebRTC Signaling Server ====================
-# In-memory storage for active WebSocket connections and SSE queues
+# This worker's WebSocket connections; SSE streams are fed by call_event_broker and
+# signals for users connected to other workers travel over the backplane
 class SignalingManager:
-    def __init__(self):
+    def __init__(self, backplane):
         self.active_connections: dict[str, list[WebSocket]] = {}  # Support multiple connections per user
-        self.sse_queues: dict[str, list] = {}  # SSE event queues for each user
+        self.backplane = backplane
+    
+    async def start(self):
+        await self.backplane.start(self.deliver_local)
+    
+    async def stop(self):
+        await self.backplane.stop()
     
     async def connect(self, user_id: str, websocket: WebSocket):
         await websocket.accept()
@@ -6807,11 +6111,21 @@ class SignalingManager:
                 logger.warning(f"WebSocket not found in active connections for user: {user_id}")
     
     async def send_signal(self, user_id: str, message: dict):
-        sent = False
+        """Deliver to this worker's connections and forward to the other workers"""
+        delivered = await self.deliver_local(user_id, message)
+        try:
+            forwarded = await self.backplane.publish(user_id, message)
+        except Exception as e:
+            logger.error(f"Error forwarding signal for {user_id} over the backplane: {e}")
+            forwarded = False
+        return delivered > 0 or forwarded
+    
+    async def deliver_local(self, user_id: str, message: dict) -> int:
+        """Send to the user's WebSocket and SSE connections held by this worker"""
+        sent_count = 0
         
         # Try WebSocket first
         if user_id in self.active_connections:
-            sent_count = 0
             dead_connections = []
             
             # Broadcast to ALL connections for this user
@@ -6828,60 +6142,27 @@ class SignalingManager:
                 self.disconnect(user_id, ws)
             
             logger.info(f"Signal sent via WebSocket to {user_id}: {sent_count} connection(s)")
-            sent = sent_count > 0
         
-        # Also add to SSE queue as fallback
-        if user_id not in self.sse_queues:
-            self.sse_queues[user_id] = []
+        # Also push to any open SSE streams (fallback when WebSocket fails)
+        streams = call_event_broker.publish(user_id, message)
+        if streams:
+            logger.info(f"Signal queued on {streams} SSE stream(s) for {user_id}")
         
-        self.sse_queues[user_id].append(message)
-        logger.info(f"Signal added to SSE queue for {user_id}")
-        
-        # Keep only last 10 events per user (prevent memory leak)
-        if len(self.sse_queues[user_id]) > 10:
-            self.sse_queues[user_id] = self.sse_queues[user_id][-10:]
-        
-        return sent
-    
-    def get_pending_events(self, user_id: str):
-        """Get and clear pending SSE events for user"""
-        if user_id in self.sse_queues:
-            events = self.sse_queues[user_id].copy()
-            self.sse_queues[user_id] = []
-            return events
-        return []
+        return sent_count + streams
 
-signaling_manager = SignalingManager()
+signaling_manager = SignalingManager(build_backplane(db))
 
 # SSE endpoint for call notifications (fallback when WebSocket fails)
 @api_router.get("/calls/events/{user_id}")
-async def call_events_sse(user_id: str, request: Request):
-    """Server-Sent Events endpoint for call notifications"""
-    async def event_generator():
-        try:
-            while True:
-                # Check if client disconnected
-                if await request.is_disconnected():
-                    logger.info(f"SSE client disconnected: {user_id}")
-                    break
-                
-                # Get pending events from queue
-                events = signaling_manager.get_pending_events(user_id)
-                
-                for event in events:
-                    logger.info(f"📤 SSE sending event to {user_id}: {event.get('type')}")
-                    yield {
-                        "event": event.get("type", "message"),
-                        "data": json.dumps(event)
-                    }
-                
-                # Wait before checking again (prevents CPU spinning)
-                await asyncio.sleep(0.5)
-                
-        except Exception as e:
-            logger.error(f"SSE error for user {user_id}: {e}")
+async def call_events_sse(user_id: str):
+    """
+    Server-Sent Events endpoint for call notifications
     
-    return EventSourceResponse(event_generator())
+    Events are awaited on a per-stream queue (no polling); sse-starlette
+    sends heartbeat pings and closes the generator on disconnect, which
+    releases the queue.
+    """
+    return EventSourceResponse(call_event_broker.stream(user_id), ping=CALL_EVENT_HEARTBEAT_SECONDS)
 
 @app.websocket("/api/ws/signaling/{user_id}")
 async def websocket_signaling(websocket: WebSocket, user_id: str):
@@ -15,6 +15,16 @@ import os
 import logging
 from uuid import uuid4
 
+from utils.likes import toggle_like, get_liked_ids
+from utils.comments import add_comment as store_comment, find_comment, list_comments
+from utils.counters import adjust_posts_count
+from utils.notifications import add_notification, remove_notification
+from utils.follows import FOLLOW_ACTIVE, FOLLOW_PENDING, follow, get_following_ids, list_follow_edges, unfollow
+from utils.pagination import DEFAULT_PAGE_SIZE
+from utils.principal_cache import invalidate_principal
+from utils.stories_tray import invalidate_stories_tray
+from utils.trending import record_post_hashtags
+
 # Setup logger
 logger = logging.getLogger(__name__)
 
@@ -112,8 +122,9 @@ async def create_post(
             "mediaType": media_type,
             "imageUrl": image_url,
             "isAnonymous": isAnonymous,
-            "likes": [],
-            "comments": [],
+            "authorIsPrivate": user.get("isPrivate", False),
+            "likeCount": 0,
+            "commentCount": 0,
             "shares": 0,
             "views": 0,
             "createdAt": datetime.now(timezone.utc),
@@ -123,6 +134,10 @@ async def create_post(
         }
 
         await db.posts.insert_one(post)
+        if not isAnonymous:
+            # Anonymous posts aren't attributed, so they don't count towards postsCount
+            await adjust_posts_count(db, userId, 1)
+        await record_post_hashtags(db, post, 1)
 
         return {
             "success": True,
@@ -191,6 +206,8 @@ async def get_feed(
         import random
         all_posts = recent_posts + older_posts
         random.shuffle(all_posts)
+        liked_ids = await get_liked_ids(db, "post", [post["id"] for post in all_posts], userId)
+        following_ids = set(await get_following_ids(db, userId))
         
         # Format posts
         formatted_posts = []
@@ -198,16 +215,15 @@ async def get_feed(
             # Get post author's current profile picture, verification, founder status, and privacy info
             post_author = await db.users.find_one(
                 {"id": post.get("userId")}, 
-                {"isVerified": 1, "isFounder": 1, "profileImage": 1, "isPrivate": 1, "followers": 1}
+                {"isVerified": 1, "isFounder": 1, "profileImage": 1, "isPrivate": 1}
             )
             
             # Skip posts from private accounts unless the viewer is a follower or the owner
             if post_author:
                 is_private = post_author.get("isPrivate", False)
-                followers = post_author.get("followers") or []  # ensure list, not None
                 if (
                     is_private
-                    and userId not in followers
+                    and post.get("userId") not in following_ids
                     and post.get("userId") != userId  # viewer is not the owner
                 ):
                     continue  # do not add this post to the feed
@@ -217,11 +233,11 @@ async def get_feed(
             current_profile_image = post_author.get("profileImage") if post_author else post.get("userAvatar")
             
             # Get like count
-            like_count = len(post.get("likes", []))
-            comment_count = len(post.get("comments", []))
+            like_count = post.get("likeCount", 0)
+            comment_count = post.get("commentCount", 0)
             
             # Check if current user liked
-            user_liked = userId in post.get("likes", [])
+            user_liked = post["id"] in liked_ids
             
             formatted_posts.append({
                 "id": post["id"],
@@ -265,50 +281,25 @@ async def like_post(postId: str, userId: str = Form(...), reactionType: str = Fo
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
         
-        likes = post.get("likes", [])
+        user_liked, like_count = await toggle_like(db, "post", postId, userId)
         
-        if userId in likes:
-            # Unlike
-            likes.remove(userId)
+        if not user_liked:
             action = "unliked"
-            # Delete like notification when unliking
-            await db.notifications.delete_many({
-                "userId": post.get("userId"),
-                "fromUserId": userId,
-                "type": "like",
-                "postId": postId
-            })
+            # Take the like off the post's notification when unliking
+            await remove_notification(db, post.get("userId"), "like", userId, postId)
         else:
-            # Like
-            likes.append(userId)
             action = "liked"
             
-            # Create notification if liking someone else's post
-            if post.get("userId") != userId:
-                notification = {
-                    "id": str(uuid4()),
-                    "userId": post.get("userId"),  # Post owner receives notification
-                    "fromUserId": userId,
-                    "fromUsername": user.get("username", "Unknown"),
-                    "fromUserImage": user.get("profileImage"),
-                    "type": "like",
-                    "postId": postId,
-                    "postImage": post.get("imageUrl") or post.get("mediaUrl"),  # Include post image for notification preview
-                    "isRead": False,
-                    "createdAt": datetime.now(timezone.utc)
-                }
-                await db.notifications.insert_one(notification)
-        
-        # Update post
-        await db.posts.update_one(
-            {"id": postId},
-            {"$set": {"likes": likes}}
-        )
+            # Folds into "X and N others liked your post"; skipped on your own post
+            await add_notification(
+                db, post.get("userId"), "like", notification_actor(user),
+                target_id=postId, preview=post.get("imageUrl") or post.get("mediaUrl")
+            )
         
         return {
             "success": True,
             "action": action,
-            "likeCount": len(likes)
+            "likeCount": like_count
         }
         
     except Exception as e:
@@ -334,45 +325,26 @@ async def add_comment(
         
         # If it's a reply, validate parent comment exists
         if parentCommentId:
-            parent_exists = any(c.get("id") == parentCommentId for c in post.get("comments", []))
-            if not parent_exists:
+            if not await find_comment(db, parentCommentId, postId):
                 raise HTTPException(status_code=404, detail="Parent comment not found")
         
         # UNIFIED COMMENT FORMAT - matches /api/posts endpoint
-        comment = {
-            "id": str(uuid4()),
+        comment = await store_comment(db, postId, {
             "userId": userId if not isAnonymous else "anonymous",
             "username": user.get("username") if not isAnonymous else "Anonymous",
             "userProfileImage": user.get("profileImage") if not isAnonymous else None,  # Changed from userAvatar
             "text": content,  # Changed from content to text
-            "createdAt": datetime.now(timezone.utc).isoformat(),  # Changed to isoformat string
             "isAnonymous": isAnonymous,
-            "parentCommentId": parentCommentId,
-            "likes": [],
-            "likesCount": 0  # Added likesCount
-        }
-        
-        # Add comment to post
-        await db.posts.update_one(
-            {"id": postId},
-            {"$push": {"comments": comment}}
-        )
+            "parentCommentId": parentCommentId
+        })
+        comment["createdAt"] = comment["createdAt"].isoformat()
         
         # Create notification for post owner (if not commenting on own post and not anonymous)
-        if not isAnonymous and post.get("userId") != userId:
-            notification = {
-                "id": str(uuid4()),
-                "userId": post.get("userId"),
-                "fromUserId": userId,
-                "fromUsername": user.get("username", "Unknown"),
-                "fromUserImage": user.get("profileImage"),
-                "type": "comment",
-                "postId": postId,
-                "commentText": content[:50],  # Store first 50 chars
-                "isRead": False,
-                "createdAt": datetime.now(timezone.utc)
-            }
-            await db.notifications.insert_one(notification)
+        if not isAnonymous:
+            await add_notification(
+                db, post.get("userId"), "comment", notification_actor(user),
+                target_id=postId, preview=post.get("imageUrl") or post.get("mediaUrl"), text=content[:50]
+            )
         
         return {
             "success": True,
@@ -384,14 +356,18 @@ async def add_comment(
 
 # Get comments for a post
 @social_router.get("/posts/{postId}/comments")
-async def get_post_comments(postId: str, userId: Optional[str] = None):
-    """Get all comments for a post with nested replies"""
+async def get_post_comments(postId: str, userId: Optional[str] = None, cursor: Optional[str] = None, limit: int = 20):
+    """Get a page of root comments for a post with nested replies"""
     try:
-        post = await db.posts.find_one({"id": postId})
+        post = await db.posts.find_one({"id": postId}, {"_id": 0, "id": 1})
         if not post:
             raise HTTPException(status_code=404, detail="Post not found")
         
-        comments = post.get("comments", [])
+        try:
+            comments, next_cursor = await list_comments(db, postId, cursor, limit)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        liked_ids = await get_liked_ids(db, "comment", [c.get("id") for c in comments], userId) if userId else set()
         
         # Organize comments and replies
         comment_map = {}
@@ -399,8 +375,7 @@ async def get_post_comments(postId: str, userId: Optional[str] = None):
         
         for comment in comments:
             comment_id = comment.get("id")
-            likes = comment.get("likes", [])
-            user_liked = userId in likes if userId else False
+            user_liked = comment_id in liked_ids
             
             # UNIFIED FORMAT - use same fields as /api/posts endpoint
             comment_data = {
@@ -409,10 +384,9 @@ async def get_post_comments(postId: str, userId: Optional[str] = None):
                 "username": comment.get("username"),
                 "userProfileImage": comment.get("userProfileImage", comment.get("userAvatar")),  # Support both
                 "text": comment.get("text", comment.get("content")),  # Support both
-                "createdAt": comment.get("createdAt"),
-                "timeAgo": get_time_ago(comment.get("createdAt")),
-                "likesCount": len(likes),
-                "likes": likes,
+                "createdAt": comment["createdAt"].isoformat(),
+                "timeAgo": get_time_ago(comment["createdAt"]),
+                "likesCount": comment.get("likesCount", 0),
                 "userLiked": user_liked,
                 "parentCommentId": comment.get("parentCommentId"),
                 "replies": []
@@ -428,7 +402,9 @@ async def get_post_comments(postId: str, userId: Optional[str] = None):
                 # It's a root comment
                 root_comments.append(comment_data)
         
-        return {"success": True, "comments": root_comments}
+        return {"success": True, "comments": root_comments, "nextCursor": next_cursor}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching comments: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -438,41 +414,12 @@ async def get_post_comments(postId: str, userId: Optional[str] = None):
 async def like_comment(commentId: str, userId: str = Form(...)):
     """Like or unlike a comment"""
     try:
-        # Find the post containing this comment
-        post = await db.posts.find_one({"comments.id": commentId})
-        if not post:
+        if not await find_comment(db, commentId):
             raise HTTPException(status_code=404, detail="Comment not found")
         
-        comments = post.get("comments", [])
-        comment_index = None
-        
-        for idx, comment in enumerate(comments):
-            if comment.get("id") == commentId:
-                comment_index = idx
-                break
-        
-        if comment_index is None:
-            raise HTTPException(status_code=404, detail="Comment not found")
+        user_liked, like_count = await toggle_like(db, "comment", commentId, userId)
         
-        comment = comments[comment_index]
-        likes = comment.get("likes", [])
-        
-        if userId in likes:
-            # Unlike
-            likes.remove(userId)
-        else:
-            # Like
-            likes.append(userId)
-        
-        comment["likes"] = likes
-        comments[comment_index] = comment
-        
-        await db.posts.update_one(
-            {"id": post["id"]},
-            {"$set": {"comments": comments}}
-        )
-        
-        return {"success": True, "likesCount": len(likes)}
+        return {"success": True, "likesCount": like_count, "userLiked": user_liked}
     except HTTPException:
         raise
     except Exception as e:
@@ -559,6 +506,8 @@ async def get_stories(userId: str, skip: int = 0, limit: int = 50):
         stories = await db.stories.find({
             "expiresAt": {"$gt": now}
         }).sort("createdAt", -1).skip(skip).limit(limit).to_list(limit)
+        liked_story_ids = await get_liked_ids(db, "story", [story["id"] for story in stories], userId)
+        following_ids = set(await get_following_ids(db, userId))
         
         # Format stories
         formatted_stories = []
@@ -566,16 +515,15 @@ async def get_stories(userId: str, skip: int = 0, limit: int = 50):
             # Get story author's current profile picture, verification, founder status, and privacy info
             story_author = await db.users.find_one(
                 {"id": story.get("userId")}, 
-                {"isVerified": 1, "isFounder": 1, "profileImage": 1, "isPrivate": 1, "followers": 1}
+                {"isVerified": 1, "isFounder": 1, "profileImage": 1, "isPrivate": 1}
             )
             
             # Skip private stories unless the viewer is a follower or the owner
             if story_author:
                 is_private = story_author.get("isPrivate", False)
-                followers = story_author.get("followers") or []  # ensure list, not None
                 if (
                     is_private
-                    and userId not in followers
+                    and story.get("userId") not in following_ids
                     and story.get("userId") != userId  # viewer is not the owner
                 ):
                     continue  # do not show this story
@@ -588,8 +536,7 @@ async def get_stories(userId: str, skip: int = 0, limit: int = 50):
             user_viewed = userId in story.get("views", [])
             
             # Check if user liked
-            likes = story.get("likes", [])
-            user_liked = userId in likes
+            user_liked = story["id"] in liked_story_ids
             
             formatted_stories.append({
                 "id": story["id"],
@@ -605,7 +552,7 @@ async def get_stories(userId: str, skip: int = 0, limit: int = 50):
                 "isAnonymous": story.get("isAnonymous", False),
                 "views": len(story.get("views", [])),
                 "userViewed": user_viewed,
-                "likes": len(likes),  # Return like count
+                "likes": story.get("likeCount", 0),  # Return like count
                 "userLiked": user_liked,  # Return if current user liked this story
                 "createdAt": story["createdAt"].isoformat(),
                 "expiresAt": story["expiresAt"].isoformat(),
@@ -649,71 +596,42 @@ async def view_story(storyId: str, userId: str = Form(...)):
 
 @social_router.post("/follow")
 async def follow_user(userId: str = Form(...), targetUserId: str = Form(...)):
-    """Follow a user"""
+    """Follow a user (a request, for private accounts)"""
     try:
         if userId == targetUserId:
             raise HTTPException(status_code=400, detail="Cannot follow yourself")
         
-        user = await db.users.find_one({"id": userId})
-        target = await db.users.find_one({"id": targetUserId})
+        user = await db.users.find_one({"id": userId}, {"_id": 0, "id": 1})
+        target = await db.users.find_one({"id": targetUserId}, {"_id": 0, "id": 1, "isPrivate": 1})
         
         if not user or not target:
             raise HTTPException(status_code=404, detail="User not found")
         
-        # Add to following list
-        following = user.get("following", [])
-        if targetUserId not in following:
-            following.append(targetUserId)
-            await db.users.update_one(
-                {"id": userId},
-                {"$set": {"following": following}}
-            )
-        
-        # Add to followers list
-        followers = target.get("followers", [])
-        if userId not in followers:
-            followers.append(userId)
-            await db.users.update_one(
-                {"id": targetUserId},
-                {"$set": {"followers": followers}}
-            )
+        # One edge in follows; counters only move when it is created active
+        status, created = await follow(db, userId, targetUserId, pending=target.get("isPrivate", False))
+        if created and status == FOLLOW_ACTIVE:
+            invalidate_stories_tray(userId)
+            invalidate_principal(userId, targetUserId)
         
         return {
             "success": True,
-            "message": "Followed successfully",
-            "following": True
+            "message": "Follow request sent" if status == FOLLOW_PENDING else "Followed successfully",
+            "following": status == FOLLOW_ACTIVE,
+            "requested": status == FOLLOW_PENDING
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @social_router.post("/unfollow")
 async def unfollow_user(userId: str = Form(...), targetUserId: str = Form(...)):
-    """Unfollow a user"""
+    """Unfollow a user (or cancel a pending request)"""
     try:
-        user = await db.users.find_one({"id": userId})
-        target = await db.users.find_one({"id": targetUserId})
-        
-        if not user or not target:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        # Remove from following list
-        following = user.get("following", [])
-        if targetUserId in following:
-            following.remove(targetUserId)
-            await db.users.update_one(
-                {"id": userId},
-                {"$set": {"following": following}}
-            )
-        
-        # Remove from followers list
-        followers = target.get("followers", [])
-        if userId in followers:
-            followers.remove(userId)
-            await db.users.update_one(
-                {"id": targetUserId},
-                {"$set": {"followers": followers}}
-            )
+        if await unfollow(db, userId, targetUserId) == FOLLOW_ACTIVE:
+            invalidate_stories_tray(userId)
+            invalidate_principal(userId, targetUserId)
         
         return {
             "success": True,
@@ -724,72 +642,69 @@ async def unfollow_user(userId: str = Form(...), targetUserId: str = Form(...)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def _follow_list(userId: str, direction: str, cursor: Optional[str], limit: int) -> dict:
+    """One newest-first page of followers/following, with the total from the user's counter"""
+    user = await db.users.find_one({"id": userId}, {"_id": 0, "followersCount": 1, "followingCount": 1})
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    try:
+        user_ids, next_cursor = await list_follow_edges(db, userId, direction, cursor, limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    # One $in for the page's cards, kept in edge order
+    cards = {
+        card["id"]: card
+        for card in await db.users.find(
+            {"id": {"$in": user_ids}},
+            {"_id": 0, "id": 1, "username": 1, "fullName": 1, "profileImage": 1, "bio": 1}
+        ).to_list(len(user_ids))
+    }
+    items = [
+        {
+            "id": cards[uid]["id"],
+            "username": cards[uid].get("username"),
+            "fullName": cards[uid].get("fullName"),
+            "profileImage": cards[uid].get("profileImage"),
+            "bio": cards[uid].get("bio", "")
+        }
+        for uid in user_ids if uid in cards
+    ]
+    count_field = "followersCount" if direction == "followers" else "followingCount"
+    return {
+        "success": True,
+        direction: items,
+        "count": user.get(count_field, 0),
+        "nextCursor": next_cursor
+    }
+
 @social_router.get("/users/{userId}/followers")
-async def get_followers(userId: str):
+async def get_followers(userId: str, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE):
     """Get user's followers"""
     try:
-        user = await db.users.find_one({"id": userId})
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        follower_ids = user.get("followers", [])
-        
-        # Get follower details
-        followers = []
-        for fid in follower_ids:
-            follower = await db.users.find_one({"id": fid})
-            if follower:
-                followers.append({
-                    "id": follower["id"],
-                    "username": follower.get("username"),
-                    "fullName": follower.get("fullName"),
-                    "profileImage": follower.get("profileImage"),
-                    "bio": follower.get("bio", "")
-                })
-        
-        return {
-            "success": True,
-            "followers": followers,
-            "count": len(followers)
-        }
-        
+        return await _follow_list(userId, "followers", cursor, limit)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @social_router.get("/users/{userId}/following")
-async def get_following(userId: str):
+async def get_following(userId: str, cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE):
     """Get users that this user follows"""
     try:
-        user = await db.users.find_one({"id": userId})
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        following_ids = user.get("following", [])
-        
-        # Get following details
-        following = []
-        for fid in following_ids:
-            followed_user = await db.users.find_one({"id": fid})
-            if followed_user:
-                following.append({
-                    "id": followed_user["id"],
-                    "username": followed_user.get("username"),
-                    "fullName": followed_user.get("fullName"),
-                    "profileImage": followed_user.get("profileImage"),
-                    "bio": followed_user.get("bio", "")
-                })
-        
-        return {
-            "success": True,
-            "following": following,
-            "count": len(following)
-        }
-        
+        return await _follow_list(userId, "following", cursor, limit)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # UTILITY FUNCTIONS
 
+def notification_actor(user: dict) -> dict:
+    """The actor fields a notification row shows for an event by user"""
+    return {"id": user["id"], "username": user.get("username", "Unknown"), "image": user.get("profileImage")}
+
 def get_time_ago(dt):
     """Convert datetime to 'time ago' format"""
     # Ensure dt is timezone-aware
@@ -0,0 +1,71 @@
+"""
+Benchmark - Event Loop Latency Under Concurrent Logins
+Compares bcrypt verification inline on the event loop against the
+process-pool PasswordHasher, measuring how late a 10ms ticker fires
+while N logins are in progress.
+
+Usage:
+    cd backend && python tests/benchmark_password_hashing.py [concurrent_logins]
+"""
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.password_hashing import PasswordHasher, hash_password_sync, verify_and_update_sync  # noqa: E402
+
+TICK_SECONDS = 0.01
+
+
+async def _ticker(stop: asyncio.Event, lags: list):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        lags.append((time.perf_counter() - started - TICK_SECONDS) * 1000)
+
+
+async def _run(label: str, login, concurrency: int):
+    stop = asyncio.Event()
+    lags = []
+    ticker = asyncio.create_task(_ticker(stop, lags))
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await ticker
+
+    lags.sort()
+    p99 = lags[int(len(lags) * 0.99) - 1] if len(lags) >= 100 else lags[-1]
+    print(
+        f"{label:<8} {concurrency} logins in {elapsed:.2f}s | loop lag ms: "
+        f"median {statistics.median(lags):.1f}, p99 {p99:.1f}, max {lags[-1]:.1f}"
+    )
+
+
+async def main(concurrency: int):
+    password = "correct horse battery staple"
+    stored = hash_password_sync(password)
+
+    async def inline_login():
+        # What the handlers used to do: bcrypt directly on the event loop
+        assert verify_and_update_sync(password, stored)[0]
+        await asyncio.sleep(0)
+
+    hasher = PasswordHasher()
+    hasher.start()
+
+    async def pooled_login():
+        assert (await hasher.verify_and_update(password, stored))[0]
+
+    await pooled_login()  # warm the worker processes
+    await _run("inline", inline_login, concurrency)
+    await _run("pooled", pooled_login, concurrency)
+    print(f"pool stats: {hasher.stats()}")
+    hasher.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20))
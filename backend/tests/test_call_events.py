@@ -0,0 +1,67 @@
+"""
+Unit Tests - Call Event Broker
+No server imports, just the per-user queues
+"""
+import asyncio
+import json
+import sys
+
+# Add paths
+sys.path.insert(0, '/app/backend')
+
+
+class TestCallEventBroker:
+    """Test push delivery, bounds and cleanup"""
+
+    def test_publish_wakes_subscriber(self):
+        from utils.call_events import CallEventBroker
+
+        async def run():
+            broker = CallEventBroker()
+            stream = broker.stream("u1")
+            receive = asyncio.ensure_future(stream.__anext__())
+            await asyncio.sleep(0)
+            assert broker.publish("u1", {"type": "incoming_call"}) == 1
+            frame = await asyncio.wait_for(receive, 1)
+            await stream.aclose()
+            return broker, frame
+
+        broker, frame = asyncio.run(run())
+        assert frame["event"] == "incoming_call"
+        assert json.loads(frame["data"]) == {"type": "incoming_call"}
+        assert broker.stats()["streams"] == 0
+
+    def test_bounded_queue_drops_oldest(self):
+        from utils.call_events import CallEventBroker
+
+        async def run():
+            broker = CallEventBroker(queue_size=2)
+            queue = broker.subscribe("u1")
+            for i in range(3):
+                broker.publish("u1", {"type": "signal", "n": i})
+            return broker, [queue.get_nowait()["n"] for _ in range(queue.qsize())]
+
+        broker, received = asyncio.run(run())
+        assert received == [1, 2]
+        assert broker.dropped == 1
+
+    def test_offline_events_replayed_on_connect(self):
+        from utils.call_events import CallEventBroker
+
+        async def run():
+            broker = CallEventBroker()
+            assert broker.publish("u1", {"type": "incoming_call"}) == 0
+            queue = broker.subscribe("u1")
+            return queue.get_nowait()
+
+        assert asyncio.run(run()) == {"type": "incoming_call"}
+
+    def test_expired_offline_events_are_dropped(self):
+        from utils.call_events import CallEventBroker
+
+        async def run():
+            broker = CallEventBroker(pending_ttl=-1)
+            broker.publish("u1", {"type": "incoming_call"})
+            return broker.subscribe("u1").qsize()
+
+        assert asyncio.run(run()) == 0
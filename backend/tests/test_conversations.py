@@ -0,0 +1,201 @@
+"""
+Unit Tests - Conversation Helpers
+No server imports, just utility functions
+"""
+import asyncio
+import copy
+import sys
+from datetime import datetime, timedelta
+
+# Add paths
+sys.path.insert(0, '/app/backend')
+
+
+def _set_path(doc, path, value):
+    *parents, leaf = path.split(".")
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[leaf] = value
+
+
+class _Conversations:
+    """Dotted $set/$unset updates on documents keyed by _id"""
+
+    def __init__(self, docs):
+        self.docs = {doc["_id"]: doc for doc in docs}
+
+    async def _iter(self, docs):
+        for doc in docs:
+            yield doc
+
+    def find(self, query, projection=None):
+        return self._iter([
+            copy.deepcopy(d) for d in self.docs.values() if d.get("deletedBy") or d.get("deletedForEveryone")
+        ])
+
+    async def find_one_and_update(self, query, update, projection=None, return_document=None):
+        doc = self.docs.get(query["_id"])
+        if doc is None:
+            return None
+        before = copy.deepcopy(doc)
+        for path, value in update["$set"].items():
+            _set_path(doc, path, value)
+        return before
+
+    async def update_one(self, query, update):
+        for path, value in update["$set"].items():
+            _set_path(self.docs[query["_id"]], path, value)
+
+
+class _UpdateResult:
+    def __init__(self, count):
+        self.modified_count = count
+
+
+class _Messages:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def update_many(self, query, update):
+        flags = set(update["$unset"])
+        hits = [d for d in self.docs if flags & set(d)]
+        for doc in hits:
+            for flag in flags:
+                doc.pop(flag, None)
+        return _UpdateResult(len(hits))
+
+
+class _Users:
+    def __init__(self, unread):
+        self.unread = unread
+
+    async def bulk_write(self, ops, ordered=True):
+        for op in ops:
+            user_id = op._filter["id"]
+            self.unread[user_id] = self.unread.get(user_id, 0) + op._doc["$inc"]["unreadMessagesCount"]
+
+
+class _DB:
+    def __init__(self, conversations=(), messages=(), unread=None):
+        self.conversations = _Conversations(list(conversations))
+        self.messages = _Messages(list(messages))
+        self.users = _Users(unread or {})
+
+
+class TestConversationHelpers:
+    """Test clearedAt epochs and read watermarks"""
+
+    def test_conversation_id_is_order_independent(self):
+        from utils.conversations import conversation_id_for
+
+        assert conversation_id_for("b", "a") == conversation_id_for("a", "b") == "a_b"
+
+    def test_visible_messages_filter(self):
+        from utils.conversations import visible_messages_filter
+
+        cleared = datetime(2025, 1, 1)
+        conversation = {"_id": "a_b", "clearedAt": {"a": cleared}}
+
+        assert visible_messages_filter("a_b", conversation, "a") == {
+            "conversation_id": "a_b", "created_at": {"$gt": cleared}
+        }
+        assert visible_messages_filter("a_b", conversation, "b") == {"conversation_id": "a_b"}
+        assert visible_messages_filter("a_b", None, "a") == {"conversation_id": "a_b"}
+
+    def test_message_read_state_from_watermark(self):
+        from utils.conversations import message_read_state
+
+        now = datetime(2025, 1, 1, 12)
+        conversation = {"readUpTo": {"b": now}}
+        older = {"receiver_id": "b", "type": "text", "status": {"read": False}, "created_at": now - timedelta(minutes=1)}
+        newer = {"receiver_id": "b", "type": "text", "status": {"read": False}, "created_at": now + timedelta(minutes=1)}
+
+        assert message_read_state(older, conversation) == (True, now)
+        assert message_read_state(newer, conversation) == (False, None)
+
+    def test_call_notifications_keep_their_own_status(self):
+        from utils.conversations import message_read_state
+
+        now = datetime(2025, 1, 1, 12)
+        call = {"receiver_id": "b", "type": "call_notification", "status": {"read": False},
+                "created_at": now - timedelta(minutes=1)}
+
+        assert message_read_state(call, {"readUpTo": {"b": now}}) == (False, None)
+
+    def test_inbox_filter_hides_deleted_conversations(self):
+        from utils.conversations import inbox_filter
+
+        assert inbox_filter("a") == {
+            "participants": "a", "deletedBy.a": None, "deletedForEveryone": {"$ne": True}
+        }
+
+
+class TestDeletionEpochs:
+    """Test clearing chats via clearedAt epochs and the legacy-flag migration"""
+
+    def test_clear_for_me(self):
+        from utils.conversations import clear_conversation, visible_messages_filter
+
+        db = _DB(
+            conversations=[{"_id": "a_b", "participants": ["a", "b"], "unread_count": {"a": 2, "b": 1}}],
+            unread={"a": 5, "b": 1},
+        )
+        asyncio.run(clear_conversation(db, "a_b", ["a"]))
+
+        conversation = db.conversations.docs["a_b"]
+        assert set(conversation["clearedAt"]) == {"a"}
+        assert conversation["unread_count"] == {"a": 0, "b": 1}
+        assert "deletedForEveryone" not in conversation
+        assert db.users.unread == {"a": 3, "b": 1}
+        assert "created_at" in visible_messages_filter("a_b", conversation, "a")
+        assert "created_at" not in visible_messages_filter("a_b", conversation, "b")
+
+    def test_clear_for_everyone(self):
+        from utils.conversations import clear_conversation
+
+        db = _DB(
+            conversations=[{"_id": "a_b", "participants": ["a", "b"], "unread_count": {"b": 4}}],
+            unread={"b": 4},
+        )
+        asyncio.run(clear_conversation(db, "a_b", ["a", "b"], for_everyone=True))
+
+        conversation = db.conversations.docs["a_b"]
+        assert set(conversation["clearedAt"]) == {"a", "b"}
+        assert conversation["deletedForEveryone"] is True
+        assert db.users.unread == {"b": 0}
+
+    def test_resurrect_update_unhides_both_inboxes(self):
+        from utils.conversations import resurrect_update
+
+        assert resurrect_update("a", "b") == {
+            "deletedForEveryone": "", "deletedForEveryoneAt": "", "deletedBy.a": "", "deletedBy.b": "",
+        }
+
+    def test_migrate_deletion_epochs(self):
+        from utils.conversations import migrate_deletion_epochs
+
+        t1, t2, t3 = datetime(2025, 1, 1), datetime(2025, 2, 1), datetime(2025, 3, 1)
+        db = _DB(
+            conversations=[
+                {"_id": "a_b", "participants": ["a", "b"], "deletedBy": {"a": t1}},
+                {"_id": "a_c", "participants": ["a", "c"], "deletedForEveryone": True,
+                 "deletedForEveryoneAt": t2, "clearedAt": {"c": t3}},
+                {"_id": "b_c", "participants": ["b", "c"]},
+            ],
+            messages=[
+                {"_id": "m1", "deletedBy": {"a": t1}},
+                {"_id": "m2", "deletedForEveryone": True},
+                {"_id": "m3"},
+            ],
+        )
+        asyncio.run(migrate_deletion_epochs(db))
+
+        assert db.conversations.docs["a_b"]["clearedAt"] == {"a": t1}
+        # An existing (newer) epoch is kept
+        assert db.conversations.docs["a_c"]["clearedAt"] == {"a": t2, "c": t3}
+        assert "clearedAt" not in db.conversations.docs["b_c"]
+        assert db.messages.docs == [{"_id": "m1"}, {"_id": "m2"}, {"_id": "m3"}]
+
+        # Idempotent
+        asyncio.run(migrate_deletion_epochs(db))
+        assert db.conversations.docs["a_b"]["clearedAt"] == {"a": t1}
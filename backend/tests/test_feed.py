@@ -0,0 +1,207 @@
+"""
+Unit Tests - Posts Feed
+get_feed_page against in-memory collections that evaluate its filters
+"""
+import asyncio
+import sys
+from datetime import datetime, timedelta, timezone
+
+# Add paths
+sys.path.insert(0, '/app/backend')
+
+
+def _get(doc, key):
+    """Dotted lookup; a joined array (the author $lookup) resolves through its first element"""
+    value = doc
+    for part in key.split("."):
+        if isinstance(value, list):
+            value = value[0] if value else None
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def _matches(doc, query):
+    """The subset of Mongo query operators the feed and visibility filters use"""
+    for key, cond in query.items():
+        if key == "$and":
+            if not all(_matches(doc, q) for q in cond):
+                return False
+        elif key == "$or":
+            if not any(_matches(doc, q) for q in cond):
+                return False
+        elif isinstance(cond, dict):
+            value = _get(doc, key)
+            for op, arg in cond.items():
+                if op == "$ne" and value == arg:
+                    return False
+                if op == "$in" and value not in arg:
+                    return False
+                if op == "$nin" and value in arg:
+                    return False
+                if op == "$lt" and not (value is not None and value < arg):
+                    return False
+                if op == "$gt" and not (value is not None and value > arg):
+                    return False
+                if op == "$exists" and (value is not None) != arg:
+                    return False
+        elif _get(doc, key) != cond:
+            return False
+    return True
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def __aiter__(self):
+        self._it = iter(self.docs)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._it)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def to_list(self, length):
+        return self.docs if length is None else self.docs[:length]
+
+
+class _UpdateResult:
+    def __init__(self, count):
+        self.modified_count = count
+
+
+class _Collection:
+    """find/find_one/update_many/distinct plus the feed's aggregation shape"""
+
+    def __init__(self, docs, db=None):
+        self.docs = docs
+        self.db = db
+        self.pipelines = []
+
+    def find(self, query, projection=None):
+        return _Cursor([dict(d) for d in self.docs if _matches(d, query)])
+
+    async def find_one(self, query, projection=None):
+        return next((dict(d) for d in self.docs if _matches(d, query)), None)
+
+    async def update_many(self, query, update):
+        hits = [d for d in self.docs if _matches(d, query)]
+        for doc in hits:
+            doc.update(update["$set"])
+        return _UpdateResult(len(hits))
+
+    async def distinct(self, field, query):
+        return list({d[field] for d in self.docs if _matches(d, query)})
+
+    def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        docs = [dict(d) for d in self.docs]
+        for stage in pipeline:
+            if "$match" in stage:
+                docs = [d for d in docs if _matches(d, stage["$match"])]
+            elif "$sort" in stage:
+                for field, direction in reversed(list(stage["$sort"].items())):
+                    docs.sort(key=lambda d: d[field], reverse=direction < 0)
+            elif "$limit" in stage:
+                docs = docs[:stage["$limit"]]
+            elif "$lookup" in stage:
+                for doc in docs:
+                    doc["author"] = [
+                        {k: u[k] for k in ("isPrivate", "profileImage") if k in u}
+                        for u in self.db.users.docs if u["id"] == doc["userId"]
+                    ]
+        return _Cursor(docs)
+
+
+class _DB:
+    def __init__(self, users=(), posts=(), follows=(), likes=()):
+        self.users = _Collection(list(users), self)
+        self.posts = _Collection(list(posts), self)
+        self.follows = _Collection(list(follows), self)
+        self.likes = _Collection(list(likes), self)
+
+
+_NOW = datetime(2025, 6, 1, tzinfo=timezone.utc)
+
+
+def _post(post_id, user_id, minutes_ago, **extra):
+    return {
+        "id": post_id, "userId": user_id, "username": user_id,
+        "createdAt": _NOW - timedelta(minutes=minutes_ago), **extra
+    }
+
+
+class TestFeedPage:
+    """Test visibility, muting and keyset paging of the home feed"""
+
+    def setup_method(self):
+        self.db = _DB(
+            users=[
+                {"id": "me", "mutedUsers": ["muted"], "blockedUsers": ["blocked"], "savedPosts": ["p1"]},
+                {"id": "pub"}, {"id": "muted"}, {"id": "blocked"},
+                {"id": "friend", "isPrivate": True}, {"id": "stranger", "isPrivate": True},
+            ],
+            posts=[
+                _post("p1", "pub", 1),
+                _post("p2", "friend", 2, authorIsPrivate=True),
+                _post("p3", "stranger", 3, authorIsPrivate=True),
+                _post("p4", "muted", 4),
+                _post("p5", "blocked", 5),
+                _post("p6", "me", 6, authorIsPrivate=True),
+                _post("p7", "pub", 7, isArchived=True),
+                _post("p8", "pub", 8),
+            ],
+            follows=[{"followerId": "me", "followeeId": "friend", "status": "active"}],
+            likes=[{"targetType": "post", "targetId": "p8", "userId": "me"}],
+        )
+
+    def test_visibility_and_muting(self):
+        from utils.feed import get_feed_page
+
+        page = asyncio.run(get_feed_page(self.db, "me"))
+
+        assert [p["id"] for p in page["posts"]] == ["p1", "p2", "p6", "p8"]
+        assert page["nextCursor"] is None
+        assert page["posts"][0]["isSaved"] is True
+        assert page["posts"][3]["userLiked"] is True
+        assert not any(p["userLiked"] for p in page["posts"][:3])
+
+    def test_pending_follow_does_not_reveal_private_posts(self):
+        from utils.feed import get_feed_page
+
+        self.db.follows.docs.append({"followerId": "me", "followeeId": "stranger", "status": "pending"})
+        page = asyncio.run(get_feed_page(self.db, "me"))
+        assert "p3" not in [p["id"] for p in page["posts"]]
+
+    def test_keyset_pages(self):
+        from utils.feed import get_feed_page
+
+        first = asyncio.run(get_feed_page(self.db, "me", limit=3))
+        second = asyncio.run(get_feed_page(self.db, "me", cursor=first["nextCursor"], limit=3))
+
+        assert [p["id"] for p in first["posts"]] == ["p1", "p2", "p6"]
+        assert [p["id"] for p in second["posts"]] == ["p8"]
+        assert second["nextCursor"] is None
+
+    def test_same_timestamp_tie_break(self):
+        from utils.feed import get_feed_page
+
+        db = _DB(users=[{"id": "me"}], posts=[_post(f"t{i}", "pub", 0) for i in range(5)])
+        ids = []
+        cursor = None
+        while True:
+            page = asyncio.run(get_feed_page(db, "me", cursor=cursor, limit=2))
+            ids += [p["id"] for p in page["posts"]]
+            cursor = page["nextCursor"]
+            if not cursor:
+                break
+        assert ids == ["t4", "t3", "t2", "t1", "t0"]
+
+    def test_author_joined_after_limit(self):
+        from utils.feed import get_feed_page
+
+        asyncio.run(get_feed_page(self.db, "me", limit=2))
+        stages = [next(iter(stage)) for stage in self.db.posts.pipelines[0]]
+        assert stages.index("$lookup") > stages.index("$limit")
@@ -0,0 +1,101 @@
+"""
+Unit Tests - Local Disk Media Cache
+Temp directory cache, local aiohttp stub server as the upstream
+"""
+import asyncio
+import sys
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+# Add paths
+sys.path.insert(0, '/app/backend')
+
+BODY = bytes(range(256)) * 40
+
+
+async def _populate(cache, key, body=BODY):
+    async def handler(request):
+        return web.Response(body=body, content_type="image/jpeg")
+
+    app = web.Application()
+    app.router.add_get("/file", handler)
+    server = TestServer(app)
+    await server.start_server()
+    await cache.start()
+    try:
+        cache.populate_in_background(key, str(server.make_url("/file")))
+        await asyncio.gather(*cache._populating.values())
+    finally:
+        await cache.close()
+        await server.close()
+
+
+async def _read_body(response):
+    return b"".join([chunk async for chunk in response.body_iterator])
+
+
+class TestMediaCache:
+    """Test ranges, validators, population and eviction"""
+
+    def test_parse_range(self):
+        from utils.media_cache import parse_range
+
+        assert parse_range(None, 100) is None
+        assert parse_range("bytes=0-9", 100) == (0, 9)
+        assert parse_range("bytes=90-", 100) == (90, 99)
+        assert parse_range("bytes=-10", 100) == (90, 99)
+        assert parse_range("bytes=50-500", 100) == (50, 99)
+        assert parse_range("bytes=0-1,5-6", 100) is None
+        with pytest.raises(ValueError):
+            parse_range("bytes=100-", 100)
+
+    def test_populate_then_serve_range(self, tmp_path):
+        from utils.media_cache import MediaDiskCache
+
+        cache = MediaDiskCache(root=str(tmp_path))
+        asyncio.run(_populate(cache, "AgADxyz"))
+        path, size = cache.get("AgADxyz")
+
+        response = cache.response("AgADxyz", path, size, "image/jpeg", {"range": "bytes=10-19"})
+        body = asyncio.run(_read_body(response))
+        assert response.status_code == 206
+        assert response.headers["content-range"] == f"bytes 10-19/{len(BODY)}"
+        assert response.headers["etag"] == '"AgADxyz"'
+        assert "immutable" in response.headers["cache-control"]
+        assert body == BODY[10:20]
+        assert cache.stats()["populated"] == 1
+
+    def test_not_modified_and_unsatisfiable(self, tmp_path):
+        from utils.media_cache import MediaDiskCache
+
+        cache = MediaDiskCache(root=str(tmp_path))
+        asyncio.run(_populate(cache, "AgADxyz"))
+        path, size = cache.get("AgADxyz")
+
+        assert cache.response("AgADxyz", path, size, "image/jpeg", {"if-none-match": '"AgADxyz"'}).status_code == 304
+        assert cache.response("AgADxyz", path, size, "image/jpeg", {"range": f"bytes={size}-"}).status_code == 416
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        from utils.media_cache import MediaDiskCache
+
+        cache = MediaDiskCache(root=str(tmp_path), max_bytes=len(BODY) * 2)
+        asyncio.run(_populate(cache, "first"))
+        asyncio.run(_populate(cache, "second"))
+        cache.get("first")
+        asyncio.run(_populate(cache, "third"))
+
+        assert cache.get("second") is None
+        assert cache.get("first") is not None
+        assert cache.stats()["evicted"] == 1
+
+    def test_index_survives_restart(self, tmp_path):
+        from utils.media_cache import MediaDiskCache
+
+        asyncio.run(_populate(MediaDiskCache(root=str(tmp_path)), "AgADxyz"))
+        restarted = MediaDiskCache(root=str(tmp_path))
+        # Nothing is served before the startup scan has finished
+        assert restarted.get("AgADxyz") is None
+        asyncio.run(restarted.start())
+        assert restarted.get("AgADxyz")[1] == len(BODY)
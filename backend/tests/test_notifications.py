@@ -0,0 +1,304 @@
+"""
+Unit Tests - Notifications Store
+Grouping keys, update pipelines and the API shape, without a database
+"""
+import asyncio
+import sys
+from datetime import datetime
+
+# Add paths
+sys.path.insert(0, '/app/backend')
+
+
+def _get(doc, path):
+    """Field path lookup; a path through an array maps over it like Mongo does"""
+    value = doc
+    for part in path.split("."):
+        if isinstance(value, list):
+            value = [item.get(part) for item in value if isinstance(item, dict)]
+        elif isinstance(value, dict):
+            value = value.get(part)
+        else:
+            return None
+    return value
+
+
+def _eval(expr, doc, this=None):
+    """The aggregation expressions the notification pipelines use"""
+    if isinstance(expr, str) and expr.startswith("$$this"):
+        return this if expr == "$$this" else _get(this, expr[len("$$this."):])
+    if isinstance(expr, str) and expr.startswith("$"):
+        return _get(doc, expr[1:])
+    if isinstance(expr, list):
+        return [_eval(e, doc, this) for e in expr]
+    if not isinstance(expr, dict):
+        return expr
+    (op, args), = expr.items()
+    if op == "$literal":
+        return args
+    if op == "$filter":
+        items = _eval(args["input"], doc, this) or []
+        return [item for item in items if _eval(args["cond"], doc, item)]
+    values = _eval(args, doc, this) if isinstance(args, list) else [_eval(args, doc, this)]
+    if op == "$ifNull":
+        return next((v for v in values if v is not None), None)
+    if op == "$cond":
+        return values[1] if values[0] else values[2]
+    if op == "$in":
+        return values[0] in (values[1] or [])
+    if op == "$ne":
+        return values[0] != values[1]
+    if op == "$add":
+        return sum(values)
+    if op == "$subtract":
+        return values[0] - values[1]
+    if op == "$size":
+        return len(values[0])
+    if op == "$max":
+        return max(v for v in values if v is not None)
+    if op == "$concatArrays":
+        return [item for value in values for item in value]
+    if op == "$slice":
+        return values[0][:values[1]]
+    if op == "$arrayElemAt":
+        return values[0][values[1]] if len(values[0]) > values[1] else None
+    if op == "$setUnion":
+        return list(dict.fromkeys(item for value in values for item in value))
+    if op == "$setDifference":
+        return [item for item in dict.fromkeys(values[0]) if item not in values[1]]
+    raise NotImplementedError(op)
+
+
+def _matches(doc, query):
+    for field, cond in query.items():
+        if field == "$or":
+            if not any(_matches(doc, q) for q in cond):
+                return False
+            continue
+        value = _get(doc, field)
+        if isinstance(cond, dict):
+            if "$lte" in cond and not (value is not None and value <= cond["$lte"]):
+                return False
+            if "$type" in cond and not isinstance(value, str):
+                return False
+            if "$exists" in cond and (field in doc) != cond["$exists"]:
+                return False
+            if "$nin" in cond and value in cond["$nin"]:
+                return False
+            if "$in" in cond and value not in cond["$in"]:
+                return False
+        elif isinstance(value, list) and not isinstance(cond, list):
+            if cond not in value:
+                return False
+        elif value != cond:
+            return False
+    return True
+
+
+class _Result:
+    def __init__(self, count):
+        self.modified_count = self.deleted_count = count
+
+
+class _Notifications:
+    """In-memory collection running update pipelines"""
+
+    def __init__(self):
+        self.rows = []
+
+    def _apply(self, row, pipeline):
+        for stage in pipeline:
+            row.update({field: _eval(expr, row) for field, expr in stage["$set"].items()})
+
+    async def find_one_and_update(self, query, pipeline, projection=None, upsert=False, return_document=None):
+        from pymongo import ReturnDocument
+        row = next((r for r in self.rows if _matches(r, query)), None)
+        before = dict(row) if row is not None else None
+        if row is None:
+            if not upsert:
+                return None
+            row = {k: v for k, v in query.items() if not isinstance(v, dict)}
+            self.rows.append(row)
+        self._apply(row, pipeline)
+        return dict(row) if return_document == ReturnDocument.AFTER else before
+
+    async def update_many(self, query, update):
+        rows = [r for r in self.rows if _matches(r, query)]
+        for row in rows:
+            if isinstance(update, list):
+                self._apply(row, update)
+            else:
+                row.update(update["$set"])
+        return _Result(len(rows))
+
+    async def _iter(self, rows):
+        for row in rows:
+            yield dict(row)
+
+    def find(self, query, projection=None):
+        return self._iter([r for r in self.rows if _matches(r, query)])
+
+    async def delete_many(self, query):
+        kept = [r for r in self.rows if not _matches(r, query)]
+        deleted, self.rows = len(self.rows) - len(kept), kept
+        return _Result(deleted)
+
+
+class _Users:
+    def __init__(self):
+        self.unread = {}
+
+    async def update_one(self, query, update):
+        for field, delta in update["$inc"].items():
+            self.unread[query["id"]] = self.unread.get(query["id"], 0) + delta
+
+    async def bulk_write(self, ops, ordered=True):
+        for op in ops:
+            await self.update_one(op._filter, op._doc)
+
+
+class _DB:
+    def __init__(self):
+        self.notifications = _Notifications()
+        self.users = _Users()
+
+
+def _actor(actor_id):
+    return {"id": actor_id, "username": actor_id, "image": None}
+
+
+class TestNotifications:
+    """Test how events fold into rows and how rows are served"""
+
+    def test_group_keys(self):
+        from utils.notifications import notification_group_key
+
+        # Likes from different people on one post share a row
+        assert notification_group_key("like", "a", "p1") == notification_group_key("like", "b", "p1")
+        assert notification_group_key("like", "a", "p1") != notification_group_key("like", "a", "p2")
+        assert notification_group_key("follow", "a") == notification_group_key("follow", "b")
+        # Follow requests stay one row per requester
+        assert notification_group_key("follow_request", "a") != notification_group_key("follow_request", "b")
+
+    def test_fold_pipeline_caps_actors_and_literals_user_input(self):
+        from utils.notifications import MAX_ACTORS_PER_ROW, _fold_event_pipeline
+
+        actor = {"id": "u1", "username": "$where", "image": None}
+        stage = _fold_event_pipeline(actor, "p1", "/img.jpg", None)[0]["$set"]
+
+        assert stage["actors"]["$slice"][1] == MAX_ACTORS_PER_ROW
+        assert stage["actors"]["$slice"][0]["$concatArrays"][0] == [{"$literal": actor}]
+        assert stage["fromUsername"] == {"$literal": "$where"}
+        assert stage["isRead"] is False
+        assert "commentText" not in stage
+
+    def test_serialize_coalesced_row(self):
+        from utils.notifications import serialize_notification
+
+        updated = datetime(2025, 1, 2)
+        row = {
+            "id": "n1", "userId": "owner", "type": "like", "postId": "p1", "count": 43,
+            "actors": [{"id": "u1", "username": "amy", "image": None}],
+            "fromUserId": "u1", "fromUsername": "amy", "isRead": False,
+            "createdAt": datetime(2025, 1, 1), "updatedAt": updated,
+        }
+        data = serialize_notification(row)
+
+        assert data["fromUsername"] == "amy"
+        assert data["actorCount"] == 43 and data["othersCount"] == 42
+        assert data["createdAt"] == updated.isoformat()
+        assert serialize_notification({**row, "count": 1})["othersCount"] == 0
+
+    def test_fold_counts_distinct_actors_past_the_shown_ones(self):
+        from utils.notifications import add_notification
+
+        db = _DB()
+
+        async def run():
+            for actor_id in ["a", "b", "c", "d", "e", "a", "b"]:
+                await add_notification(db, "owner", "like", _actor(actor_id), "p1")
+
+        asyncio.run(run())
+        row, = db.notifications.rows
+        # "a" and "b" repeat after dropping off the shown actors, yet count once
+        assert row["count"] == 5
+        assert [a["id"] for a in row["actors"]] == ["b", "a", "e"]
+        assert row["fromUserId"] == "b"
+
+    def test_unfold_only_removes_counted_actors(self):
+        from utils.notifications import add_notification, remove_notification
+
+        db = _DB()
+
+        async def run():
+            for actor_id in ["a", "b", "c", "d"]:
+                await add_notification(db, "owner", "follow", _actor(actor_id))
+            # Following back someone who never followed leaves the row as is
+            await remove_notification(db, "owner", "follow", "x")
+            after_stranger = db.notifications.rows[0]["count"]
+            # "a" is counted but no longer shown
+            await remove_notification(db, "owner", "follow", "a")
+            await remove_notification(db, "owner", "follow", "a")
+            after_a = db.notifications.rows[0]["count"]
+            await remove_notification(db, "owner", "follow", "d")
+            return after_stranger, after_a
+
+        after_stranger, after_a = asyncio.run(run())
+        assert after_stranger == 4
+        assert after_a == 3
+        row, = db.notifications.rows
+        assert row["count"] == 2 and sorted(row["actorIds"]) == ["b", "c"]
+        assert row["fromUserId"] == "c"
+
+    def test_unread_counter_moves_once_per_row(self):
+        from utils.notifications import add_notification, read_all_notifications, remove_notification
+
+        db = _DB()
+
+        async def run():
+            await add_notification(db, "owner", "like", _actor("a"), "p1")
+            await add_notification(db, "owner", "like", _actor("b"), "p1")  # Same unread row
+            await add_notification(db, "owner", "comment", _actor("a"), "p1")
+            unread = db.users.unread["owner"]
+            await read_all_notifications(db, "owner")
+            read = db.users.unread["owner"]
+            await add_notification(db, "owner", "like", _actor("c"), "p1")  # Row turns unread again
+            await add_notification(db, "owner", "like", _actor("owner"), "p1")  # Self-like isn't recorded
+            again = db.users.unread["owner"]
+            await add_notification(db, "owner", "comment", _actor("b"), "p1")
+            await remove_notification(db, "owner", "comment", "a", "p1")
+            await remove_notification(db, "owner", "comment", "b", "p1")  # Row emptied and deleted
+            return unread, read, again
+
+        unread, read, again = asyncio.run(run())
+        assert (unread, read, again) == (2, 0, 1)
+        assert db.users.unread["owner"] == 1
+        assert [r["type"] for r in db.notifications.rows] == ["like"]
+
+    def test_legacy_fold_adds_only_missing_actors(self):
+        from utils.notifications import _fold_legacy_pipeline
+
+        row = {"count": 1, "actorIds": ["a"], "actors": [_actor("a")], "fromUserId": "a",
+               "isRead": True, "updatedAt": datetime(2025, 1, 3)}
+        group = {"unread": 1, "updatedAt": datetime(2025, 1, 2), "createdAt": datetime(2025, 1, 1)}
+        _Notifications()._apply(row, _fold_legacy_pipeline(group, [_actor("b"), _actor("a")], "p1"))
+
+        assert row["count"] == 2 and sorted(row["actorIds"]) == ["a", "b"]
+        assert row["fromUserId"] == "a"   # Newer headline kept
+        assert row["updatedAt"] == datetime(2025, 1, 3)
+        assert row["isRead"] is False
+
+    def test_read_all_can_be_limited_to_shown_rows(self):
+        from utils.notifications import add_notification, read_all_notifications
+
+        db = _DB()
+
+        async def run():
+            await add_notification(db, "owner", "like", _actor("a"), "p1")
+            await add_notification(db, "owner", "like", _actor("a"), "p2")
+            shown = db.notifications.rows[0]["id"]
+            return await read_all_notifications(db, "owner", [shown])
+
+        assert asyncio.run(run()) == 1
+        assert [r["isRead"] for r in db.notifications.rows] == [True, False]
+        assert db.users.unread["owner"] == 1
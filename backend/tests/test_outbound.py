@@ -0,0 +1,146 @@
+"""
+Unit Tests - Outbound Delivery Queue
+In-memory queue with fake providers; nothing is sent
+"""
+import asyncio
+import sys
+from datetime import timedelta
+
+import pytest
+
+# Add paths
+sys.path.insert(0, '/app/backend')
+
+
+class TestOutboundQueue:
+    """Test delivery, retries with backoff, dead letters and concurrency caps"""
+
+    def test_enqueue_returns_before_delivery(self):
+        from utils.outbound import FakeProvider, OutboundQueue
+
+        email = FakeProvider()
+        queue = OutboundQueue({"email": email})
+
+        async def run():
+            await queue.enqueue("email", {"to": "a@b.c", "subject": "Hi"})
+            before = list(email.sent)
+            await queue.run_once()
+            await queue.drain()
+            return before
+
+        before = asyncio.run(run())
+        assert before == []
+        assert email.sent == [{"to": "a@b.c", "subject": "Hi"}]
+        assert queue.stats()["delivered"] == 1
+        assert queue._jobs == {}
+
+    def test_transient_failure_is_retried_after_backoff(self):
+        from utils.outbound import FakeProvider, OutboundQueue
+
+        sms = FakeProvider(failures=1)
+        queue = OutboundQueue({"sms": sms})
+        clock = [queue._now()]
+        queue._now = lambda: clock[0]
+
+        async def run():
+            job_id = await queue.enqueue("sms", {"to": "+911234567890"})
+            await queue.run_once()
+            await queue.drain()
+            job = dict(queue._jobs[job_id])
+            # Not due yet
+            assert await queue.run_once() == 0
+            clock[0] = job["runAt"] + timedelta(seconds=1)
+            await queue.run_once()
+            await queue.drain()
+            return job
+
+        job = asyncio.run(run())
+        assert job["status"] == "pending" and job["attempts"] == 1
+        assert "transient" in job["lastError"]
+        assert sms.sent == [{"to": "+911234567890"}]
+        assert queue.stats()["retried"] == 1
+
+    def test_dead_letters_and_requeue(self):
+        from utils.outbound import FakeProvider, OutboundQueue
+
+        rejected = FakeProvider(failures=1, permanent=True)
+        flaky = FakeProvider(failures=10)
+        queue = OutboundQueue({"email": rejected, "whereby": flaky}, max_attempts=2)
+        clock = [queue._now()]
+        queue._now = lambda: clock[0]
+
+        async def run():
+            bad_address = await queue.enqueue("email", {"to": "nobody"})
+            await queue.enqueue("whereby", {"meetingId": "m1"})
+            for _ in range(3):
+                await queue.run_once()
+                await queue.drain()
+                clock[0] += timedelta(hours=1)
+            dead = await queue.dead_letters()
+            requeued = await queue.requeue(bad_address)
+            await queue.run_once()
+            await queue.drain()
+            return dead, requeued
+
+        dead, requeued = asyncio.run(run())
+        assert sorted(job["channel"] for job in dead) == ["email", "whereby"]
+        assert all("payload" not in job for job in dead)
+        assert rejected.calls == 2 and flaky.calls == 2
+        assert requeued and rejected.sent == [{"to": "nobody"}]
+        assert queue.stats()["deadLettered"] == 2
+
+    def test_sensitive_payload_is_not_kept_on_dead_letters(self):
+        from utils.outbound import FakeProvider, OutboundQueue
+
+        email = FakeProvider(failures=1, permanent=True)
+        queue = OutboundQueue({"email": email})
+
+        async def run():
+            job_id = await queue.enqueue("email", {"to": "a@b.c", "text": "Your code is 123456"}, sensitive=True)
+            await queue.run_once()
+            await queue.drain()
+            return job_id, await queue.requeue(job_id)
+
+        job_id, requeued = asyncio.run(run())
+        assert queue._jobs[job_id]["status"] == "dead"
+        assert "payload" not in queue._jobs[job_id]
+        assert not requeued
+
+    def test_concurrency_cap_per_channel(self):
+        from utils.outbound import OutboundQueue
+
+        peak = {"now": 0, "max": 0}
+        release = None
+
+        async def slow(payload):
+            peak["now"] += 1
+            peak["max"] = max(peak["max"], peak["now"])
+            await release.wait()
+            peak["now"] -= 1
+
+        queue = OutboundQueue({"email": slow}, concurrency={"email": 2})
+
+        async def run():
+            nonlocal release
+            release = asyncio.Event()
+            for i in range(5):
+                await queue.enqueue("email", {"n": i})
+            started = await queue.run_once()
+            # Let the started deliveries block on the event
+            await asyncio.sleep(0)
+            release.set()
+            await queue.drain()
+            while await queue.run_once():
+                await queue.drain()
+            return started
+
+        assert asyncio.run(run()) == 2
+        assert peak["max"] == 2
+        assert queue.stats()["delivered"] == 5
+
+    def test_unknown_channel_is_rejected(self):
+        from utils.outbound import OutboundQueue
+
+        queue = OutboundQueue({})
+        with pytest.raises(ValueError):
+            asyncio.run(queue.enqueue("fax", {}))
@@ -0,0 +1,73 @@
+"""
+Unit Tests - Cursor Pagination
+No server imports, just utility functions
+"""
+import pytest
+import sys
+from datetime import datetime, timezone
+
+# Add paths
+sys.path.insert(0, '/app/backend')
+
+
+class TestCursorPagination:
+    """Test keyset cursor helpers"""
+
+    def test_cursor_round_trip(self):
+        from utils.pagination import encode_cursor, decode_cursor
+
+        created_at = datetime(2025, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+        cursor = encode_cursor(created_at, "post-1")
+
+        assert "=" not in cursor
+        assert decode_cursor(cursor) == (created_at, "post-1")
+
+    def test_invalid_cursor_rejected(self):
+        from utils.pagination import decode_cursor
+
+        with pytest.raises(ValueError):
+            decode_cursor("not-a-cursor")
+
+    def test_keyset_filter(self):
+        from utils.pagination import encode_cursor, keyset_filter
+
+        assert keyset_filter(None) == {}
+
+        created_at = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        query = keyset_filter(encode_cursor(created_at, "b"))
+        assert query == {
+            "$or": [
+                {"createdAt": {"$lt": created_at}},
+                {"createdAt": created_at, "id": {"$lt": "b"}},
+            ]
+        }
+
+    def test_keyset_filter_ascending(self):
+        from utils.pagination import encode_cursor, keyset_filter
+
+        created_at = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        query = keyset_filter(encode_cursor(created_at, "b"), ascending=True)
+        assert query["$or"][0] == {"createdAt": {"$gt": created_at}}
+        assert query["$or"][1] == {"createdAt": created_at, "id": {"$gt": "b"}}
+
+    def test_split_page(self):
+        from utils.pagination import split_page, decode_cursor
+
+        now = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        items = [{"id": str(i), "createdAt": now} for i in range(3)]
+
+        page, next_cursor = split_page(items, 2)
+        assert [i["id"] for i in page] == ["0", "1"]
+        assert decode_cursor(next_cursor) == (now, "1")
+
+        page, next_cursor = split_page(items, 5)
+        assert len(page) == 3
+        assert next_cursor is None
+
+    def test_clamp_limit(self):
+        from utils.pagination import clamp_limit
+
+        assert clamp_limit(None) == 20
+        assert clamp_limit(0) == 20
+        assert clamp_limit(500) == 50
+        assert clamp_limit(10) == 10
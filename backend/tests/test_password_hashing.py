@@ -0,0 +1,68 @@
+"""
+Unit Tests - Password Hashing Service
+hash/verify through the process pool, including rehash on a cost change
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+# Add paths
+sys.path.insert(0, '/app/backend')
+
+# Cheap cost for the tests; set before the module (and the spawned workers) read it
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+pytest.importorskip("passlib")
+
+
+class TestPasswordHasher:
+    """Test the pooled hasher"""
+
+    def setup_method(self):
+        from utils.password_hashing import PasswordHasher
+        self.hasher = PasswordHasher(workers=1, max_concurrency=2)
+
+    def teardown_method(self):
+        self.hasher.shutdown()
+
+    def test_hash_and_verify(self):
+        from utils.password_hashing import BCRYPT_ROUNDS
+
+        async def run():
+            hashed = await self.hasher.hash("s3cret")
+            return hashed, await self.hasher.verify_and_update("s3cret", hashed), \
+                await self.hasher.verify_and_update("wrong", hashed)
+
+        hashed, valid, invalid = asyncio.run(run())
+
+        assert hashed.startswith(f"$2b${BCRYPT_ROUNDS:02d}$")
+        assert valid == (True, None)
+        assert invalid == (False, None)
+        assert self.hasher.stats()["completed"] == 3
+        assert self.hasher.stats()["inFlight"] == 0
+
+    def test_rehash_when_rounds_differ(self):
+        from utils.password_hashing import BCRYPT_ROUNDS, build_context
+
+        old_hash = build_context(BCRYPT_ROUNDS + 1).hash("s3cret")
+
+        valid, new_hash = asyncio.run(self.hasher.verify_and_update("s3cret", old_hash))
+
+        assert valid is True
+        assert new_hash is not None and new_hash != old_hash
+        assert new_hash.startswith(f"$2b${BCRYPT_ROUNDS:02d}$")
+        assert asyncio.run(self.hasher.verify_and_update("s3cret", new_hash)) == (True, None)
+
+    def test_wrong_password_with_old_rounds_is_not_rehashed(self):
+        from utils.password_hashing import BCRYPT_ROUNDS, build_context
+
+        old_hash = build_context(BCRYPT_ROUNDS + 1).hash("s3cret")
+        assert asyncio.run(self.hasher.verify_and_update("wrong", old_hash)) == (False, None)
+
+    def test_missing_or_malformed_hash(self):
+        from utils.password_hashing import verify_and_update_sync
+
+        assert verify_and_update_sync("s3cret", None) == (False, None)
+        assert verify_and_update_sync("s3cret", "not-a-bcrypt-hash") == (False, None)
@@ -0,0 +1,84 @@
+"""
+Unit Tests - Post Visibility Index
+The denormalized authorIsPrivate filter and its backfill
+"""
+import asyncio
+import sys
+
+# Add paths
+sys.path.insert(0, '/app/backend')
+
+from test_feed import _Collection, _matches  # noqa: E402
+
+
+class _DB:
+    def __init__(self, users, posts):
+        self.users = _Collection(users, self)
+        self.posts = _Collection(posts, self)
+
+
+class TestPostVisibility:
+    """Test the visibility filter and the authorIsPrivate backfill"""
+
+    def test_filter(self):
+        from utils.post_visibility import post_visibility_filter
+
+        query = post_visibility_filter("me", ["friend"])
+        visible = lambda post: _matches(post, query)  # noqa: E731
+
+        assert visible({"userId": "pub"})
+        assert visible({"userId": "pub", "authorIsPrivate": False})
+        assert visible({"userId": "friend", "authorIsPrivate": True})
+        assert visible({"userId": "me", "authorIsPrivate": True})
+        assert not visible({"userId": "stranger", "authorIsPrivate": True})
+
+    def test_filter_does_not_mutate_following(self):
+        from utils.post_visibility import post_visibility_filter
+
+        following = ["friend"]
+        post_visibility_filter("me", following)
+        assert following == ["friend"]
+
+    def test_backfill(self):
+        from utils.post_visibility import backfill_author_privacy
+
+        posts = [
+            {"id": "p1", "userId": "priv"},
+            {"id": "p2", "userId": "priv", "authorIsPrivate": False},
+            {"id": "p3", "userId": "pub"},
+            {"id": "p4", "userId": "pub", "authorIsPrivate": True},
+            {"id": "p5", "userId": "priv", "authorIsPrivate": True},
+        ]
+        db = _DB([{"id": "priv", "isPrivate": True}, {"id": "pub", "isPrivate": False}], posts)
+
+        asyncio.run(backfill_author_privacy(db))
+        assert [p["authorIsPrivate"] for p in posts] == [True, True, False, False, True]
+
+    def test_backfill_is_idempotent(self):
+        from utils.post_visibility import backfill_author_privacy
+
+        posts = [{"id": "p1", "userId": "priv"}, {"id": "p2", "userId": "pub"}]
+        db = _DB([{"id": "priv", "isPrivate": True}, {"id": "pub"}], posts)
+
+        asyncio.run(backfill_author_privacy(db))
+        touched = []
+        original = db.posts.update_many
+
+        async def counting_update_many(query, update):
+            result = await original(query, update)
+            touched.append(result.modified_count)
+            return result
+
+        db.posts.update_many = counting_update_many
+        asyncio.run(backfill_author_privacy(db))
+        assert touched == [0, 0]
+
+    def test_sync_author_privacy(self):
+        from utils.post_visibility import sync_author_privacy
+
+        posts = [{"id": "p1", "userId": "u1", "authorIsPrivate": False}, {"id": "p2", "userId": "u2"}]
+        db = _DB([], posts)
+
+        asyncio.run(sync_author_privacy(db, "u1", True))
+        assert posts[0]["authorIsPrivate"] is True
+        assert "authorIsPrivate" not in posts[1]
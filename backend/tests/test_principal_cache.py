@@ -0,0 +1,88 @@
+"""
+Unit Tests - Principal Cache
+No server imports, just the cache against an in-memory users collection
+"""
+import asyncio
+import sys
+
+# Add paths
+sys.path.insert(0, '/app/backend')
+
+
+class _Users:
+    def __init__(self, docs):
+        self.docs = docs
+        self.reads = 0
+
+    async def find_one(self, query, projection=None):
+        self.reads += 1
+        doc = self.docs.get(query["id"])
+        if doc is None:
+            return None
+        if projection and any(v == 1 for k, v in projection.items() if k != "_id"):
+            return {k: v for k, v in doc.items() if projection.get(k) == 1}
+        return {k: v for k, v in doc.items() if projection is None or projection.get(k, 1) != 0}
+
+
+class _DB:
+    def __init__(self, docs):
+        self.users = _Users(docs)
+
+
+class TestPrincipalCache:
+    """Test the slim cached principal"""
+
+    def setup_method(self):
+        from utils.principal_cache import invalidate_principal
+        invalidate_principal()
+        self.db = _DB({"u1": {
+            "id": "u1", "username": "alice", "password_hash": "x",
+            "followers": ["u2"], "following": ["u3"], "profileImage": "data:image/jpeg;base64,AAAA",
+        }})
+
+    def test_slim_projection_and_hit(self):
+        from utils.principal_cache import get_principal
+
+        first = asyncio.run(get_principal(self.db, "u1"))
+        second = asyncio.run(get_principal(self.db, "u1"))
+
+        assert first == {"id": "u1", "username": "alice"}
+        assert second == first
+        assert self.db.users.reads == 1
+
+    def test_invalidate(self):
+        from utils.principal_cache import get_principal, invalidate_principal
+
+        asyncio.run(get_principal(self.db, "u1"))
+        self.db.users.docs["u1"]["username"] = "alice2"
+        invalidate_principal("u1")
+
+        assert asyncio.run(get_principal(self.db, "u1"))["username"] == "alice2"
+        assert self.db.users.reads == 2
+
+    def test_missing_user(self):
+        from utils.principal_cache import get_principal
+
+        assert asyncio.run(get_principal(self.db, "nobody")) is None
+
+    def test_load_user_fields(self):
+        from types import SimpleNamespace
+        from utils.principal_cache import load_user_fields
+
+        user = SimpleNamespace(id="u1", following=[])
+        asyncio.run(load_user_fields(self.db, user, "following", "savedPosts"))
+
+        assert user.following == ["u3"]
+        assert user.savedPosts == []
+
+    def test_load_profile_image(self):
+        from types import SimpleNamespace
+        from utils.principal_cache import load_user_fields
+
+        user = SimpleNamespace(id="u1", profileImage=None)
+        asyncio.run(load_user_fields(self.db, user, "profileImage"))
+        assert user.profileImage == "data:image/jpeg;base64,AAAA"
+
+        del self.db.users.docs["u1"]["profileImage"]
+        asyncio.run(load_user_fields(self.db, user, "profileImage"))
+        assert user.profileImage is None
@@ -0,0 +1,49 @@
+"""
+Unit Tests - Signaling Backplane
+No server imports, no database: change events are fed in directly
+"""
+import asyncio
+import sys
+
+# Add paths
+sys.path.insert(0, '/app/backend')
+
+
+class TestSignalingBackplane:
+    """Test backend selection and cross-worker delivery"""
+
+    def test_build_backplane(self):
+        from utils.signaling_backplane import build_backplane, MongoSignalingBackplane, SignalingBackplane
+
+        assert type(build_backplane(None, "memory")) is SignalingBackplane
+        assert type(build_backplane(None, "bogus")) is SignalingBackplane
+        assert isinstance(build_backplane(None, "mongo"), MongoSignalingBackplane)
+
+    def test_memory_backplane_forwards_nothing(self):
+        from utils.signaling_backplane import SignalingBackplane
+
+        assert asyncio.run(SignalingBackplane().publish("u1", {"type": "offer"})) is False
+
+    def test_mongo_backplane_delivers_other_workers_signals(self):
+        from utils.signaling_backplane import MongoSignalingBackplane
+
+        delivered = []
+
+        async def deliver(user_id, message):
+            delivered.append((user_id, message))
+            return 1
+
+        async def run():
+            backplane = MongoSignalingBackplane(db=None)
+            backplane._deliver = deliver
+            await backplane.handle_change({"fullDocument": {
+                "target": "u1", "origin": backplane.worker_id, "message": {"type": "offer"}
+            }})
+            await backplane.handle_change({"fullDocument": {
+                "target": "u2", "origin": "other-worker", "message": {"type": "answer"}
+            }})
+            return backplane
+
+        backplane = asyncio.run(run())
+        assert delivered == [("u2", {"type": "answer"})]
+        assert backplane.received == 1
@@ -0,0 +1,101 @@
+"""
+Unit Tests - Social Router
+/api/social handlers called directly against in-memory collections
+"""
+import asyncio
+import sys
+
+import pytest
+
+# Add paths
+sys.path.insert(0, '/app/backend')
+
+from test_notifications import _Notifications, _Result  # noqa: E402
+
+
+class _Docs:
+    """find_one by equality and $inc updates, keyed on id"""
+
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def find_one(self, query, projection=None):
+        doc = next((d for d in self.docs if all(d.get(k) == v for k, v in query.items())), None)
+        return dict(doc) if doc else None
+
+    async def update_one(self, query, update):
+        doc = next((d for d in self.docs if d["id"] == query["id"]), None)
+        if doc is not None:
+            for field, delta in update.get("$inc", {}).items():
+                doc[field] = doc.get(field, 0) + delta
+        return _Result(int(doc is not None))
+
+    async def bulk_write(self, ops, ordered=True):
+        for op in ops:
+            await self.update_one(op._filter, op._doc)
+
+    async def find_one_and_update(self, query, update, projection=None, return_document=None):
+        await self.update_one(query, update)
+        return await self.find_one(query)
+
+
+class _Likes:
+    def __init__(self):
+        self.edges = set()
+
+    async def insert_one(self, doc):
+        from pymongo.errors import DuplicateKeyError
+
+        key = (doc["targetType"], doc["targetId"], doc["userId"])
+        if key in self.edges:
+            raise DuplicateKeyError("like_edge_unique")
+        self.edges.add(key)
+
+    async def delete_one(self, query):
+        key = (query["targetType"], query["targetId"], query["userId"])
+        removed = key in self.edges
+        self.edges.discard(key)
+        return _Result(int(removed))
+
+
+class _DB:
+    def __init__(self):
+        self.posts = _Docs([{"id": "p1", "userId": "owner", "mediaUrl": "/p1.jpg", "likeCount": 0}])
+        self.users = _Docs([
+            {"id": "owner", "username": "owner"},
+            {"id": "amy", "username": "amy"},
+            {"id": "bob", "username": "bob"},
+        ])
+        self.likes = _Likes()
+        self.notifications = _Notifications()
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+
+class TestSocialLikes:
+    """Test that likes through /api/social fold into the notification store"""
+
+    def test_like_unlike_round_trip(self, monkeypatch):
+        pytest.importorskip("motor")
+        import social_features
+
+        db = _DB()
+        monkeypatch.setattr(social_features, "db", db)
+
+        async def run():
+            await social_features.like_post("p1", userId="amy")
+            await social_features.like_post("p1", userId="bob")
+            # amy unlikes while bob is the headline actor, then bob unlikes too
+            amy_unliked = await social_features.like_post("p1", userId="amy")
+            row = dict(db.notifications.rows[0])
+            await social_features.like_post("p1", userId="bob")
+            return amy_unliked, row
+
+        amy_unliked, row = asyncio.run(run())
+        assert amy_unliked["action"] == "unliked" and amy_unliked["likeCount"] == 1
+        assert row["groupKey"] == "like:p1" and row["updatedAt"]
+        assert row["count"] == 1 and row["fromUserId"] == "bob"
+        # Both likes were one unread row; the emptied row took the badge back down
+        assert db.notifications.rows == []
+        assert db.users.docs[0]["unreadNotificationsCount"] == 0
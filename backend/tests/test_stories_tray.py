@@ -0,0 +1,114 @@
+"""
+Unit Tests - Stories Tray
+Per-viewer tray caching and the invalidations follows and privacy toggles rely on
+"""
+import asyncio
+import sys
+from datetime import datetime, timedelta, timezone
+
+# Add paths
+sys.path.insert(0, '/app/backend')
+
+from test_feed import _Collection, _Cursor, _matches  # noqa: E402
+
+
+class _Stories:
+    """Groups unexpired stories per author, then applies the pipeline's visibility $match"""
+
+    def __init__(self, docs, db):
+        self.docs = docs
+        self.db = db
+        self.aggregations = 0
+
+    def aggregate(self, pipeline):
+        self.aggregations += 1
+        now = datetime.now(timezone.utc)
+        groups = {}
+        for story in sorted(self.docs, key=lambda s: s["createdAt"], reverse=True):
+            if story["expiresAt"] <= now:
+                continue
+            group = groups.setdefault(story["userId"], {
+                "_id": story["userId"], "username": story["userId"], "latestAt": story["createdAt"], "stories": [],
+                "author": [u for u in self.db.users.docs if u["id"] == story["userId"]],
+            })
+            group["stories"].append(story)
+        visibility = next(s["$match"] for s in pipeline if "$match" in s and "$or" in s["$match"])
+        return _Cursor([g for g in groups.values() if _matches(g, visibility)])
+
+
+class _DB:
+    def __init__(self, users, stories, follows):
+        self.users = _Collection(users, self)
+        self.follows = _Collection(follows, self)
+        self.stories = _Stories(stories, self)
+
+
+def _story(story_id, user_id):
+    now = datetime.now(timezone.utc)
+    return {"id": story_id, "userId": user_id, "createdAt": now, "expiresAt": now + timedelta(hours=24)}
+
+
+class TestStoriesTray:
+    """Test the cached tray"""
+
+    def setup_method(self):
+        from utils.stories_tray import invalidate_stories_tray
+        invalidate_stories_tray()
+        self.db = _DB(
+            users=[{"id": "me"}, {"id": "pub"}, {"id": "priv", "isPrivate": True}],
+            stories=[_story("s1", "pub"), _story("s2", "priv")],
+            follows=[],
+        )
+
+    def tray_authors(self):
+        from utils.stories_tray import get_stories_tray
+        return [group["userId"] for group in asyncio.run(get_stories_tray(self.db, "me"))]
+
+    def test_cached_until_invalidated(self):
+        assert self.tray_authors() == ["pub"]
+        assert self.tray_authors() == ["pub"]
+        assert self.db.stories.aggregations == 1
+
+    def test_cache_expires(self, monkeypatch):
+        import utils.stories_tray as stories_tray
+
+        now = [1000.0]
+        monkeypatch.setattr(stories_tray.time, "monotonic", lambda: now[0])
+        self.tray_authors()
+        now[0] += stories_tray.TRAY_CACHE_TTL_SECONDS + 1
+        self.tray_authors()
+        assert self.db.stories.aggregations == 2
+
+    def test_follow_and_unfollow_invalidate_viewer(self):
+        from utils.stories_tray import invalidate_stories_tray
+
+        assert self.tray_authors() == ["pub"]
+
+        # follow_user / accept_follow_request: write the edge, then drop the follower's tray
+        self.db.follows.docs.append({"followerId": "me", "followeeId": "priv", "status": "active"})
+        assert self.tray_authors() == ["pub"]  # still cached
+        invalidate_stories_tray("me")
+        assert sorted(self.tray_authors()) == ["priv", "pub"]
+
+        # unfollow_user
+        self.db.follows.docs.clear()
+        invalidate_stories_tray("me")
+        assert self.tray_authors() == ["pub"]
+
+    def test_privacy_toggle_clears_every_viewer(self):
+        from utils.stories_tray import get_stories_tray, invalidate_stories_tray
+
+        asyncio.run(get_stories_tray(self.db, "other"))
+        assert self.tray_authors() == ["pub"]
+
+        # update_privacy affects every viewer, so it clears the whole cache
+        self.db.users.docs[1]["isPrivate"] = True
+        invalidate_stories_tray()
+        assert self.tray_authors() == []
+        assert asyncio.run(get_stories_tray(self.db, "other")) == []
+        assert self.db.stories.aggregations == 4
+
+    def test_own_private_stories_visible(self):
+        self.db.stories.docs.append(_story("s3", "me"))
+        self.db.users.docs[0]["isPrivate"] = True
+        assert sorted(self.tray_authors()) == ["me", "pub"]
@@ -0,0 +1,74 @@
+"""
+Unit Tests - Telegram Bot API Client
+Runs against a local aiohttp stub server instead of api.telegram.org
+"""
+import asyncio
+import sys
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+# Add paths
+sys.path.insert(0, '/app/backend')
+
+
+async def _with_stub(handler, check):
+    from utils.telegram_client import TelegramClient
+
+    app = web.Application()
+    app.router.add_route("*", "/bot{token}/{method}", handler)
+    server = TestServer(app)
+    await server.start_server()
+    client = TelegramClient(base_url=str(server.make_url("")))
+    try:
+        return await check(client)
+    finally:
+        await client.close()
+        await server.close()
+
+
+class TestTelegramClient:
+    """Test pooled calls and 429 handling"""
+
+    def test_call_and_file_url(self):
+        async def handler(request):
+            return web.json_response({"ok": True, "result": {"file_path": f"photos/{request.query['file_id']}.jpg"}})
+
+        async def check(client):
+            status, data = await client.call("TOKEN", "getFile", http_method="GET", params={"file_id": "abc"})
+            return status, data, client.file_url("TOKEN", data["result"]["file_path"])
+
+        status, data, url = asyncio.run(_with_stub(handler, check))
+        assert status == 200
+        assert data["result"]["file_path"] == "photos/abc.jpg"
+        assert url.endswith("/file/botTOKEN/photos/abc.jpg")
+
+    def test_retries_after_429(self):
+        attempts = []
+
+        async def handler(request):
+            attempts.append(request.match_info["method"])
+            if len(attempts) == 1:
+                return web.json_response(
+                    {"ok": False, "error_code": 429, "parameters": {"retry_after": 0}}, status=429
+                )
+            return web.json_response({"ok": True, "result": {}})
+
+        async def check(client):
+            return await client.call("TOKEN", "sendMessage", data={"chat_id": 1, "text": "hi"}), client.stats()
+
+        (status, _), stats = asyncio.run(_with_stub(handler, check))
+        assert status == 200
+        assert attempts == ["sendMessage", "sendMessage"]
+        assert stats == {"requests": 2, "rateLimited": 1}
+
+    def test_long_retry_after_is_returned(self):
+        async def handler(request):
+            return web.json_response({"ok": False, "parameters": {"retry_after": 3600}}, status=429)
+
+        async def check(client):
+            return await client.call("TOKEN", "sendMessage")
+
+        status, data = asyncio.run(_with_stub(handler, check))
+        assert status == 429
+        assert data["parameters"]["retry_after"] == 3600
@@ -0,0 +1,82 @@
+"""
+Unit Tests - Telegram File Path Cache
+No server imports, fetches are local coroutines
+"""
+import asyncio
+import sys
+
+# Add paths
+sys.path.insert(0, '/app/backend')
+
+
+class TestTelegramFilePathCache:
+    """Test TTL caching and in-flight coalescing"""
+
+    def test_hit_after_miss(self):
+        from utils.telegram_file_cache import TelegramFilePathCache
+
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            return "photos/file_1.jpg"
+
+        async def run():
+            cache = TelegramFilePathCache()
+            first = await cache.resolve("abc", fetch)
+            second = await cache.resolve("abc", fetch)
+            return cache, first, second
+
+        cache, first, second = asyncio.run(run())
+        assert first == second == "photos/file_1.jpg"
+        assert len(calls) == 1
+        assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+    def test_concurrent_lookups_share_one_fetch(self):
+        from utils.telegram_file_cache import TelegramFilePathCache
+
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "photos/file_1.jpg"
+
+        async def run():
+            cache = TelegramFilePathCache()
+            results = await asyncio.gather(*(cache.resolve("abc", fetch) for _ in range(20)))
+            return cache, results
+
+        cache, results = asyncio.run(run())
+        assert set(results) == {"photos/file_1.jpg"}
+        assert len(calls) == 1
+        assert cache.stats()["coalesced"] == 19
+
+    def test_expired_and_failed_lookups_are_refetched(self):
+        from utils.telegram_file_cache import TelegramFilePathCache
+
+        results = iter([None, "a.jpg", "b.jpg"])
+
+        async def fetch():
+            return next(results)
+
+        async def run():
+            cache = TelegramFilePathCache(ttl=-1)
+            return [await cache.resolve("abc", fetch) for _ in range(3)]
+
+        assert asyncio.run(run()) == [None, "a.jpg", "b.jpg"]
+
+    def test_fetch_error_reaches_every_waiter(self):
+        from utils.telegram_file_cache import TelegramFilePathCache
+
+        async def fetch():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream down")
+
+        async def run():
+            cache = TelegramFilePathCache()
+            return await asyncio.gather(
+                cache.resolve("abc", fetch), cache.resolve("abc", fetch), return_exceptions=True
+            )
+
+        assert all(isinstance(r, RuntimeError) for r in asyncio.run(run()))
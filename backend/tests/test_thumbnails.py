@@ -0,0 +1,113 @@
+"""
+Unit Tests - Thumbnail Pipeline
+Renders generated images into a temp directory; the pool runs in-process
+"""
+import asyncio
+import base64
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# Add paths
+sys.path.insert(0, '/app/backend')
+
+
+def _image_bytes(size, mode="RGB", fmt="PNG"):
+    from PIL import Image
+
+    color = (200, 30, 30, 128) if mode == "RGBA" else (200, 30, 30)
+    buffer = io.BytesIO()
+    Image.new(mode, size, color).save(buffer, fmt)
+    return buffer.getvalue()
+
+
+class _Collection:
+    def __init__(self):
+        self.updates = []
+
+    async def update_one(self, query, update):
+        self.updates.append((query, update))
+
+
+class TestThumbnails:
+    """Test variant widths, placeholders and the background job"""
+
+    def test_renders_widths_without_upscaling(self, tmp_path):
+        from PIL import Image
+        from utils.thumbnails import render_thumbnails_sync
+
+        source = tmp_path / "source.png"
+        source.write_bytes(_image_bytes((400, 200), mode="RGBA"))
+
+        result = render_thumbnails_sync(str(source), str(tmp_path / "out"), "post1")
+
+        assert [(v["width"], v["height"]) for v in result["variants"]] == [(150, 75), (320, 160)]
+        with Image.open(tmp_path / "out" / "post1_150.jpg") as thumb:
+            assert thumb.format == "JPEG" and thumb.mode == "RGB"
+
+        header, encoded = result["placeholder"].split(",", 1)
+        assert header == "data:image/jpeg;base64"
+        assert len(base64.b64decode(encoded)) < 2048
+
+    def test_small_source_gets_one_variant(self, tmp_path):
+        from utils.thumbnails import render_thumbnails_sync
+
+        source = tmp_path / "tiny.jpg"
+        source.write_bytes(_image_bytes((100, 100), fmt="JPEG"))
+
+        result = render_thumbnails_sync(str(source), str(tmp_path), "tiny")
+
+        assert result["variants"] == [{"width": 100, "height": 100, "filename": "tiny_100.jpg"}]
+
+    def test_schedule_records_variants_and_skips_video(self, tmp_path):
+        from utils.media_upload import SpooledMedia
+        from utils.thumbnails import ThumbnailRenderer
+
+        renderer = ThumbnailRenderer(out_dir=str(tmp_path), url_prefix="/thumbs")
+        # A thread pool keeps the test in-process; production uses spawned workers
+        renderer._executor = ThreadPoolExecutor(max_workers=1)
+        collection = _Collection()
+
+        async def run():
+            image = SpooledMedia(io.BytesIO(_image_bytes((700, 350))), "image/png", 0)
+            video = SpooledMedia(io.BytesIO(b"\x00" * 10), "video/mp4", 10)
+            assert await renderer.schedule(collection, {"id": "p1"}, image, "p1")
+            assert not await renderer.schedule(collection, {"id": "p2"}, video, "p2")
+            await asyncio.gather(*renderer._tasks)
+
+        asyncio.run(run())
+        renderer.shutdown()
+
+        query, update = collection.updates[0]
+        assert query == {"id": "p1"}
+        assert [t["width"] for t in update["$set"]["thumbnails"]] == [150, 320, 640]
+        assert update["$set"]["thumbnails"][0]["url"] == "/thumbs/p1_150.jpg"
+        assert update["$set"]["placeholder"].startswith("data:image/jpeg;base64,")
+        # Staging copy removed once rendered
+        assert os.listdir(tmp_path / "tmp") == []
+        assert renderer.stats()["rendered"] == 1
+
+    def test_on_done_runs_after_update(self, tmp_path):
+        from utils.media_upload import SpooledMedia
+        from utils.thumbnails import ThumbnailRenderer
+
+        renderer = ThumbnailRenderer(out_dir=str(tmp_path), url_prefix="/thumbs")
+        renderer._executor = ThreadPoolExecutor(max_workers=1)
+        collection = _Collection()
+        seen = []
+
+        async def run():
+            image = SpooledMedia(io.BytesIO(_image_bytes((400, 400))), "image/png", 0)
+            broken = SpooledMedia(io.BytesIO(b"not an image"), "image/png", 0)
+            on_done = lambda: seen.append(len(collection.updates))  # noqa: E731
+            assert await renderer.schedule(collection, {"id": "s1"}, image, "s1", on_done=on_done)
+            assert await renderer.schedule(collection, {"id": "s2"}, broken, "s2", on_done=on_done)
+            await asyncio.gather(*renderer._tasks)
+
+        asyncio.run(run())
+        renderer.shutdown()
+
+        # Called once, for the job that wrote its thumbnails
+        assert seen == [1]
+        assert renderer.stats()["failed"] == 1
@@ -0,0 +1,149 @@
+"""
+Unit Tests - Trending Hashtags
+Hour-bucket counters and the in-memory top-N against an in-memory collection
+"""
+import asyncio
+import sys
+from datetime import datetime, timedelta, timezone
+
+# Add paths
+sys.path.insert(0, '/app/backend')
+
+
+class _Cursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def to_list(self, length):
+        return self.rows[:length]
+
+
+class _Buckets:
+    """{(tag, bucket): count}, with just enough of bulk_write/aggregate"""
+
+    def __init__(self):
+        self.counts = {}
+        self.aggregations = 0
+
+    async def bulk_write(self, ops, ordered=True):
+        for op in ops:
+            key = (op._filter["tag"], op._filter["bucket"])
+            self.counts[key] = self.counts.get(key, 0) + op._doc["$inc"]["count"]
+
+    def aggregate(self, pipeline):
+        self.aggregations += 1
+        totals = {}
+        for (tag, _), count in self.counts.items():
+            totals[tag] = totals.get(tag, 0) + count
+        rows = sorted(
+            ({"_id": tag, "count": count} for tag, count in totals.items() if count > 0),
+            key=lambda row: (-row["count"], row["_id"])
+        )
+        return _Cursor(rows)
+
+    def tag_total(self, tag):
+        return sum(count for (t, _), count in self.counts.items() if t == tag)
+
+
+class _DB:
+    def __init__(self):
+        self.hashtag_buckets = _Buckets()
+
+
+def _post(caption, **extra):
+    return {"caption": caption, "createdAt": datetime.now(timezone.utc), **extra}
+
+
+class TestHashtagBuckets:
+    """Test the write-time counters"""
+
+    def setup_method(self):
+        self.db = _DB()
+
+    def test_extract_hashtags(self):
+        from utils.trending import extract_hashtags
+
+        assert extract_hashtags("Hi #Sun and #sun, #beach!") == {"#sun", "#beach"}
+        assert extract_hashtags(None) == set()
+
+    def test_create_then_delete(self):
+        from utils.trending import record_post_hashtags
+
+        post = _post("#sun #beach")
+        asyncio.run(record_post_hashtags(self.db, post, 1))
+        assert self.db.hashtag_buckets.tag_total("#sun") == 1
+        assert self.db.hashtag_buckets.tag_total("#beach") == 1
+
+        asyncio.run(record_post_hashtags(self.db, post, -1))
+        assert self.db.hashtag_buckets.tag_total("#sun") == 0
+        assert self.db.hashtag_buckets.tag_total("#beach") == 0
+
+    def test_archive_and_unarchive(self):
+        from utils.trending import record_post_hashtags
+
+        post = _post("#sun")
+        asyncio.run(record_post_hashtags(self.db, post, 1))
+        asyncio.run(record_post_hashtags(self.db, post, -1))  # archived
+        assert self.db.hashtag_buckets.tag_total("#sun") == 0
+        asyncio.run(record_post_hashtags(self.db, post, 1))  # unarchived
+        assert self.db.hashtag_buckets.tag_total("#sun") == 1
+
+    def test_edit_moves_only_changed_tags(self):
+        from utils.trending import record_post_hashtags, update_post_hashtags
+
+        post = _post("#sun #beach")
+        asyncio.run(record_post_hashtags(self.db, post, 1))
+        asyncio.run(update_post_hashtags(self.db, post, "#sun #surf"))
+
+        assert self.db.hashtag_buckets.tag_total("#sun") == 1
+        assert self.db.hashtag_buckets.tag_total("#beach") == 0
+        assert self.db.hashtag_buckets.tag_total("#surf") == 1
+        # #sun was in both captions, so its bucket was never written again
+        assert len([key for key in self.db.hashtag_buckets.counts if key[0] == "#sun"]) == 1
+
+    def test_social_post_content(self):
+        from utils.trending import record_post_hashtags
+
+        post = {"content": "Morning #run", "createdAt": datetime.now(timezone.utc)}
+        asyncio.run(record_post_hashtags(self.db, post, 1))
+        assert self.db.hashtag_buckets.tag_total("#run") == 1
+
+    def test_outside_window_ignored(self):
+        from utils.trending import TRENDING_WINDOW, record_post_hashtags
+
+        old = {"caption": "#sun", "createdAt": datetime.now(timezone.utc) - TRENDING_WINDOW - timedelta(hours=2)}
+        asyncio.run(record_post_hashtags(self.db, old, -1))
+        assert self.db.hashtag_buckets.counts == {}
+
+
+class TestTrendingSnapshot:
+    """Test the in-memory top-N"""
+
+    def setup_method(self):
+        from utils.trending import invalidate_trending_snapshot
+        invalidate_trending_snapshot()
+        self.db = _DB()
+
+    def test_snapshot_expires_after_ttl(self, monkeypatch):
+        import utils.trending as trending
+
+        now = [1000.0]
+        monkeypatch.setattr(trending.time, "monotonic", lambda: now[0])
+
+        asyncio.run(trending.record_post_hashtags(self.db, _post("#sun #sun2"), 1))
+        assert asyncio.run(trending.get_trending_hashtags(self.db)) == [("#sun", 1), ("#sun2", 1)]
+
+        asyncio.run(trending.record_post_hashtags(self.db, _post("#sun2"), 1))
+        now[0] += trending.SNAPSHOT_TTL_SECONDS - 1
+        assert asyncio.run(trending.get_trending_hashtags(self.db)) == [("#sun", 1), ("#sun2", 1)]
+        assert self.db.hashtag_buckets.aggregations == 1
+
+        now[0] += 1
+        assert asyncio.run(trending.get_trending_hashtags(self.db)) == [("#sun2", 2), ("#sun", 1)]
+        assert self.db.hashtag_buckets.aggregations == 2
+
+    def test_limit(self):
+        from utils.trending import get_trending_hashtags, record_post_hashtags
+
+        asyncio.run(record_post_hashtags(self.db, _post("#a #b #c"), 1))
+        assert len(asyncio.run(get_trending_hashtags(self.db, limit=2))) == 2
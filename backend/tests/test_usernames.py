@@ -0,0 +1,152 @@
+"""
+Unit Tests - Username Uniqueness
+Availability checks against a minimal stand-in for the users collection
+"""
+import asyncio
+import sys
+
+# Add paths
+sys.path.insert(0, '/app/backend')
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length):
+        return self.docs[:length]
+
+
+class _Users:
+    """Answers {"usernameLower": {"$in": [...]}} finds and counts them"""
+
+    def __init__(self, names):
+        self.names = {name.lower() for name in names}
+        self.finds = 0
+
+    def find(self, query, projection=None):
+        self.finds += 1
+        wanted = query["usernameLower"]["$in"]
+        return _Cursor([{"usernameLower": n} for n in wanted if n in self.names])
+
+
+class _DB:
+    def __init__(self, names):
+        self.users = _Users(names)
+
+
+class _Result:
+    def __init__(self, count):
+        self.modified_count = count
+
+
+class _LegacyUsers:
+    """Iterates users missing usernameLower and applies bulk $set writes"""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.batches = []
+
+    async def _iter(self, docs):
+        for doc in docs:
+            yield doc
+
+    def find(self, query, projection=None):
+        return self._iter([d for d in self.docs if "usernameLower" not in d and isinstance(d.get("username"), str)])
+
+    async def bulk_write(self, ops, ordered=True):
+        self.batches.append(len(ops))
+        for op in ops:
+            doc = next(d for d in self.docs if d["_id"] == op._filter["_id"])
+            doc.update(op._doc["$set"])
+        return _Result(len(ops))
+
+
+class _WhitespaceUsers:
+    """Whitespace-name scan, usernameLower lookups and $set updates over full documents"""
+
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, query, projection=None):
+        if "$or" in query:
+            return _Cursor([d for d in self.docs if d["username"] != d["username"].strip()])
+        wanted = query["usernameLower"]["$in"]
+        return _Cursor([{"usernameLower": d["usernameLower"]} for d in self.docs if d["usernameLower"] in wanted])
+
+    async def find_one(self, query, projection=None):
+        excluded = query.get("id", {}).get("$ne")
+        return next(
+            (d for d in self.docs if d["usernameLower"] == query["usernameLower"] and d["id"] != excluded), None
+        )
+
+    async def update_one(self, query, update):
+        doc = next(d for d in self.docs if d["id"] == query["id"])
+        doc.update(update["$set"])
+
+
+class TestUsernames:
+    """Test normalisation and batched availability lookups"""
+
+    def test_normalize_and_with_username_lower(self):
+        from utils.usernames import normalize_username, with_username_lower
+
+        assert normalize_username("  Alice.B ") == "alice.b"
+        assert normalize_username(None) == ""
+        user = with_username_lower({"username": " Bob "})
+        assert user["usernameLower"] == "bob"
+        assert user["username"] == " Bob "
+
+    def test_taken_usernames_is_one_query(self):
+        from utils.usernames import taken_usernames
+
+        db = _DB(["alice", "Alice_1"])
+        taken = asyncio.run(taken_usernames(db, ["ALICE", "alice_1", "alice_2", "alice"]))
+        assert taken == {"alice", "alice_1"}
+        assert db.users.finds == 1
+        assert asyncio.run(taken_usernames(db, [])) == set()
+        assert db.users.finds == 1
+
+    def test_available_username_numbers_in_batches(self):
+        from utils.usernames import available_username
+
+        taken = ["sam"] + [f"sam{n}" for n in range(1, 12)]
+        db = _DB(taken)
+        assert asyncio.run(available_username(db, "Sam")) == "Sam12"
+        assert db.users.finds == 2
+        assert asyncio.run(available_username(_DB([]), "sam")) == "sam"
+
+    def test_backfill_normalises_unicode_in_batches(self, monkeypatch):
+        from utils import usernames
+
+        monkeypatch.setattr(usernames, "BACKFILL_BATCH_SIZE", 2)
+        docs = [
+            {"_id": 1, "username": " ÉLODIE "},
+            {"_id": 2, "username": "ΣOFIA"},
+            {"_id": 3, "username": "sam", "usernameLower": "sam"},
+            {"_id": 4, "username": "Ärni"},
+            {"_id": 5, "username": None},
+        ]
+        db = _DB([])
+        db.users = _LegacyUsers(docs)
+
+        assert asyncio.run(usernames.backfill_username_lower(db)) == 3
+        assert db.users.batches == [2, 1]
+        assert [d.get("usernameLower") for d in docs] == ["élodie", "σofia", "sam", "ärni", None]
+
+    def test_whitespace_fix_renames_case_only_collision(self):
+        from utils.usernames import fix_whitespace_usernames
+
+        docs = [
+            {"id": "u1", "username": "Alice", "usernameLower": "alice", "fullName": "Alice"},
+            {"id": "u2", "username": " alice ", "usernameLower": "alice", "fullName": " Al "},
+            {"id": "u3", "username": " bob", "usernameLower": "bob", "fullName": "Bob"},
+        ]
+        db = _DB([])
+        db.users = _WhitespaceUsers(docs)
+
+        assert asyncio.run(fix_whitespace_usernames(db)) == ["u2", "u3"]
+        assert [(d["username"], d["usernameLower"]) for d in docs] == [
+            ("Alice", "alice"), ("alice1", "alice1"), ("bob", "bob")
+        ]
+        assert docs[1]["fullName"] == "Al"
@@ -0,0 +1,106 @@
+"""
+Unit Tests - Verification Code Store
+Exercises the in-memory backend; the Mongo backend applies the same rules
+in its queries
+"""
+import asyncio
+import sys
+from datetime import timedelta
+
+import pytest
+
+# Add paths
+sys.path.insert(0, '/app/backend')
+
+
+class TestVerificationCodes:
+    """Test expiry, attempt limits and send throttling"""
+
+    def test_code_is_single_use_and_case_insensitive_identity(self):
+        from utils.verification_codes import VerificationCodeStore
+
+        store = VerificationCodeStore()
+
+        async def run():
+            await store.issue("email_otp", "User@Example.com", "123456", data={"email": "user@example.com"})
+            first = await store.verify("email_otp", "user@example.com", "123456")
+            second = await store.verify("email_otp", "user@example.com", "123456")
+            return first, second
+
+        first, second = asyncio.run(run())
+        assert first == {"email": "user@example.com"}
+        assert second is None
+
+    def test_attempts_are_limited(self):
+        from utils.verification_codes import VerificationCodeStore
+
+        store = VerificationCodeStore(max_attempts=3)
+
+        async def run():
+            await store.issue("telegram_otp", 42, "111111")
+            wrong = [await store.verify("telegram_otp", 42, "000000") for _ in range(3)]
+            return wrong, await store.verify("telegram_otp", 42, "111111")
+
+        wrong, right_too_late = asyncio.run(run())
+        assert wrong == [None, None, None]
+        assert right_too_late is None
+        assert store.stats()["failedAttempts"] == 3
+
+    def test_expired_code_and_swept_entry(self):
+        from utils.verification_codes import VerificationCodeStore
+
+        store = VerificationCodeStore(ttl_seconds=60, send_window=60)
+        clock = [store._now()]
+        store._now = lambda: clock[0]
+
+        async def run():
+            await store.issue("email_otp", "a@b.c", "123456")
+            clock[0] += timedelta(seconds=61)
+            result = await store.verify("email_otp", "a@b.c", "123456")
+            return result
+
+        assert asyncio.run(run()) is None
+        assert store._entries == {}
+
+    def test_send_throttling(self):
+        from utils.verification_codes import CodeThrottled, VerificationCodeStore
+
+        store = VerificationCodeStore(resend_interval=60, max_sends=2, send_window=3600)
+        clock = [store._now()]
+        store._now = lambda: clock[0]
+
+        async def run():
+            await store.issue("email_otp", "a@b.c", "111111")
+            with pytest.raises(CodeThrottled) as too_soon:
+                await store.issue("email_otp", "a@b.c", "222222")
+            clock[0] += timedelta(seconds=61)
+            await store.issue("email_otp", "a@b.c", "333333")
+            clock[0] += timedelta(seconds=61)
+            with pytest.raises(CodeThrottled) as too_many:
+                await store.issue("email_otp", "a@b.c", "444444")
+            # Other identities are unaffected
+            await store.issue("email_otp", "other@b.c", "555555")
+            return too_soon.value, too_many.value
+
+        too_soon, too_many = asyncio.run(run())
+        assert too_soon.retry_after == 60
+        assert too_many.retry_after == 3600 - 122
+        assert store.stats()["throttled"] == 2
+
+    def test_provider_checked_code_keeps_pending_data(self):
+        from utils.verification_codes import VerificationCodeStore
+
+        store = VerificationCodeStore()
+
+        async def run():
+            await store.issue("phone_verification", "u1", None, data={"phone": "+911234567890"})
+            pending = await store.pending("phone_verification", "u1")
+            # Nothing to guess against a provider-generated code
+            verified = await store.verify("phone_verification", "u1", "")
+            await store.discard("phone_verification", "u1")
+            return pending, verified, await store.pending("phone_verification", "u1")
+
+        pending, verified, after_discard = asyncio.run(run())
+        assert pending == {"phone": "+911234567890"}
+        assert verified is None
+        assert after_discard is None
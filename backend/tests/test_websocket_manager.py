@@ -0,0 +1,79 @@
+"""
+Unit Tests - Match Chat Connection Manager
+Fake sockets; checks queued fan-out and slow consumer eviction
+"""
+import asyncio
+import sys
+
+# Add paths
+sys.path.insert(0, '/app/backend')
+
+
+class _Socket:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.sent = []
+        self.closed_with = None
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, message):
+        await asyncio.sleep(self.delay)
+        self.sent.append(message)
+
+    async def close(self, code=1000):
+        self.closed_with = code
+
+
+class TestConnectionManager:
+    """Test per-connection outbound queues"""
+
+    def test_slow_client_does_not_delay_others(self):
+        from websocket_manager import ConnectionManager
+
+        async def run():
+            manager = ConnectionManager()
+            slow, fast, sender = _Socket(delay=5), _Socket(), _Socket()
+            await manager.connect(slow, 1, 10)
+            await manager.connect(fast, 1, 11)
+            await manager.connect(sender, 1, 12)
+            await manager.broadcast_to_match(1, {"type": "new_message"}, exclude_user=12)
+            await asyncio.sleep(0.05)
+            return fast, slow
+
+        fast, slow = asyncio.run(run())
+        assert {"type": "new_message"} in fast.sent
+        assert slow.sent == []
+
+    def test_full_queue_disconnects_slow_consumer(self):
+        from websocket_manager import ConnectionManager, SLOW_CONSUMER_CLOSE_CODE
+
+        async def run():
+            manager = ConnectionManager(queue_size=2)
+            slow = _Socket(delay=5)
+            await manager.connect(slow, 1, 10)
+            for i in range(4):
+                await manager.send_personal_message({"n": i}, 1, 10)
+            await asyncio.sleep(0.01)
+            return manager, slow
+
+        manager, slow = asyncio.run(run())
+        assert not manager.is_user_online(1, 10)
+        assert slow.closed_with == SLOW_CONSUMER_CLOSE_CODE
+        assert manager.stats()["slowConsumersDisconnected"] == 1
+
+    def test_stats_report_latency(self):
+        from websocket_manager import ConnectionManager
+
+        async def run():
+            manager = ConnectionManager()
+            await manager.connect(_Socket(), 1, 10)
+            await manager.send_personal_message({"type": "pong"}, 1, 10)
+            await asyncio.sleep(0.01)
+            return manager.stats()
+
+        stats = asyncio.run(run())
+        assert stats["connections"] == 1
+        assert stats["sent"] == 1
+        assert stats["queueDepthTotal"] == 0
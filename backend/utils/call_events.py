@@ -0,0 +1,119 @@
+"""
+Call Event Broker
+Per-user asyncio queues for the /calls/events SSE stream: publishers push,
+subscribers await, so an idle stream costs nothing and a ring is delivered
+as soon as it is sent
+"""
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, Set, Tuple
+import asyncio
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Events buffered per stream before the oldest are dropped (slow/stalled client)
+CALL_EVENT_QUEUE_SIZE = 32
+# Comment frames keep proxies from closing idle streams
+CALL_EVENT_HEARTBEAT_SECONDS = 15
+# Events sent while the user has no open stream are replayed on connect for
+# this long (covers EventSource reconnects; a ring times out well before)
+CALL_EVENT_PENDING_TTL_SECONDS = 30
+CALL_EVENT_PENDING_MAX = 10
+
+
+class CallEventBroker:
+    """Fan-out of call events to every open SSE stream of a user"""
+
+    def __init__(
+        self,
+        queue_size: int = CALL_EVENT_QUEUE_SIZE,
+        pending_ttl: float = CALL_EVENT_PENDING_TTL_SECONDS,
+        pending_max: int = CALL_EVENT_PENDING_MAX
+    ):
+        self.queue_size = queue_size
+        self.pending_ttl = pending_ttl
+        self.pending_max = pending_max
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        # {user_id: deque[(published_at_monotonic, event)]}
+        self._pending: Dict[str, Deque[Tuple[float, dict]]] = {}
+        self.published = 0
+        self.dropped = 0
+
+    def subscribe(self, user_id: str) -> asyncio.Queue:
+        """Open a stream; events buffered while the user was offline are queued first"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        now = time.monotonic()
+        for published_at, event in self._pending.pop(user_id, ()):
+            if now - published_at <= self.pending_ttl:
+                self._put(queue, event)
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(user_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._subscribers[user_id]
+
+    def publish(self, user_id: str, event: dict) -> int:
+        """
+        Push an event to all of the user's streams
+
+        Returns:
+            Number of open streams it was queued on (0 means it was buffered
+            for a stream opened within CALL_EVENT_PENDING_TTL_SECONDS)
+        """
+        self.published += 1
+        queues = self._subscribers.get(user_id)
+        if not queues:
+            pending = self._pending.setdefault(user_id, deque(maxlen=self.pending_max))
+            pending.append((time.monotonic(), event))
+            self._prune_pending()
+            return 0
+        for queue in queues:
+            self._put(queue, event)
+        return len(queues)
+
+    async def stream(self, user_id: str) -> AsyncIterator[dict]:
+        """
+        Yield SSE frames for a user until the consumer stops iterating
+
+        The subscription is released when the generator is closed or
+        cancelled, which sse-starlette does on client disconnect.
+        """
+        queue = self.subscribe(user_id)
+        try:
+            while True:
+                event = await queue.get()
+                yield {"event": event.get("type", "message"), "data": json.dumps(event)}
+        finally:
+            self.unsubscribe(user_id, queue)
+
+    def stats(self) -> dict:
+        """Stream and drop counters, reported by the health endpoint"""
+        return {
+            "users": len(self._subscribers),
+            "streams": sum(len(queues) for queues in self._subscribers.values()),
+            "pendingUsers": len(self._pending),
+            "published": self.published,
+            "dropped": self.dropped,
+        }
+
+    def _put(self, queue: asyncio.Queue, event: dict):
+        # Drop the oldest event rather than block the publisher on a stalled client
+        if queue.full():
+            queue.get_nowait()
+            self.dropped += 1
+        queue.put_nowait(event)
+
+    def _prune_pending(self):
+        cutoff = time.monotonic() - self.pending_ttl
+        for user_id in [uid for uid, events in self._pending.items() if events[-1][0] < cutoff]:
+            del self._pending[user_id]
+
+
+call_event_broker = CallEventBroker()
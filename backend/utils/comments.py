@@ -0,0 +1,192 @@
+"""
+Comments Store
+One document per comment in `comments`, threaded via parentCommentId,
+with a commentCount counter on the post updated via $inc
+"""
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+import logging
+from uuid import uuid4
+
+from pymongo import InsertOne
+from pymongo.errors import BulkWriteError
+
+from utils.likes import delete_target_likes, import_like_edges
+from utils.pagination import DEFAULT_PAGE_SIZE, clamp_limit, keyset_filter, split_page
+
+logger = logging.getLogger(__name__)
+
+# Replies loaded alongside one page of root comments
+MAX_REPLIES_PER_PAGE = 500
+
+
+async def create_comment_indexes(db):
+    """Oldest-first thread reads per post, plus lookups by id and author"""
+    await db.comments.create_index("id", unique=True)
+    await db.comments.create_index([("postId", 1), ("createdAt", 1)])
+    await db.comments.create_index([("postId", 1), ("parentCommentId", 1), ("createdAt", 1), ("id", 1)])
+    await db.comments.create_index("userId")
+
+
+def serialize_comment(comment: dict) -> dict:
+    """API shape: same fields as the legacy embedded comment, createdAt as ISO string"""
+    data = {k: v for k, v in comment.items() if k != "_id"}
+    if hasattr(data.get("createdAt"), "isoformat"):
+        data["createdAt"] = data["createdAt"].isoformat()
+    return data
+
+
+async def add_comment(db, post_id: str, comment: dict) -> dict:
+    """
+    Store a comment and bump the post's counter
+
+    Args:
+        db: Motor database
+        post_id: Post being commented on
+        comment: Comment fields (id, userId, username, text, parentCommentId, ...)
+
+    Returns:
+        The stored comment document
+    """
+    doc = {
+        "id": str(uuid4()),
+        "parentCommentId": None,
+        "likesCount": 0,
+        "createdAt": datetime.now(timezone.utc),
+        **comment,
+        "postId": post_id,
+    }
+    await db.comments.insert_one(doc)
+    await db.posts.update_one({"id": post_id}, {"$inc": {"commentCount": 1}})
+    doc.pop("_id", None)
+    return doc
+
+
+async def find_comment(db, comment_id: str, post_id: Optional[str] = None) -> Optional[dict]:
+    """Fetch one comment, optionally requiring it to belong to post_id"""
+    query = {"id": comment_id}
+    if post_id:
+        query["postId"] = post_id
+    return await db.comments.find_one(query, {"_id": 0})
+
+
+async def delete_comment_thread(db, comment: dict) -> List[str]:
+    """
+    Delete a comment and its direct replies, keeping the post counter in step
+
+    Returns:
+        Ids of the removed comments
+    """
+    removed_ids = [comment["id"]]
+    async for reply in db.comments.find({"parentCommentId": comment["id"]}, {"_id": 0, "id": 1}):
+        removed_ids.append(reply["id"])
+    result = await db.comments.delete_many({"id": {"$in": removed_ids}})
+    if result.deleted_count:
+        await db.posts.update_one({"id": comment["postId"]}, {"$inc": {"commentCount": -result.deleted_count}})
+    await delete_target_likes(db, "comment", removed_ids)
+    return removed_ids
+
+
+async def delete_post_comments(db, post_id: str):
+    """Drop every comment of a deleted post together with their likes"""
+    comment_ids = await db.comments.distinct("id", {"postId": post_id})
+    await db.comments.delete_many({"postId": post_id})
+    await delete_target_likes(db, "comment", comment_ids)
+
+
+async def list_comments(
+    db,
+    post_id: str,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = DEFAULT_PAGE_SIZE,
+    parent_id: Optional[str] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    One page of a post's comments, oldest first
+
+    Without parent_id, pages root comments and includes their replies in the
+    same flat list (one extra $in query). With parent_id, pages just the
+    replies of that comment.
+
+    Returns:
+        Tuple of (comments, next_cursor); next_cursor is None on the last page
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    limit = clamp_limit(limit)
+    query = {"postId": post_id, "parentCommentId": parent_id}
+    page_filter = keyset_filter(cursor, ascending=True)
+    if page_filter:
+        query = {"$and": [query, page_filter]}
+
+    items = await db.comments.find(query, {"_id": 0}).sort(
+        [("createdAt", 1), ("id", 1)]
+    ).limit(limit + 1).to_list(limit + 1)
+    page, next_cursor = split_page(items, limit)
+
+    if parent_id is None and page:
+        replies = await db.comments.find(
+            {"postId": post_id, "parentCommentId": {"$in": [c["id"] for c in page]}},
+            {"_id": 0}
+        ).sort([("createdAt", 1), ("id", 1)]).to_list(MAX_REPLIES_PER_PAGE)
+        page = page + replies
+
+    return page, next_cursor
+
+
+def _parse_created_at(value, fallback: datetime) -> datetime:
+    if isinstance(value, datetime):
+        return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+    except (TypeError, ValueError):
+        return fallback
+
+
+async def migrate_embedded_comments(db):
+    """
+    Move legacy `comments` arrays on posts into the comments collection,
+    including any embedded comment likers, and replace them with commentCount.
+    Idempotent.
+    """
+    try:
+        migrated = 0
+        cursor = db.posts.find(
+            {"comments": {"$exists": True}},
+            {"_id": 0, "id": 1, "comments": 1, "createdAt": 1}
+        )
+        async for post in cursor:
+            fallback = _parse_created_at(post.get("createdAt"), datetime.now(timezone.utc))
+            ops = []
+            for comment in post.get("comments") or []:
+                doc = {k: v for k, v in comment.items() if k != "likes"}
+                doc.setdefault("id", str(uuid4()))
+                doc.setdefault("parentCommentId", None)
+                doc["postId"] = post["id"]
+                doc["createdAt"] = _parse_created_at(comment.get("createdAt"), fallback)
+                if "likes" in comment:
+                    likers = set(comment.get("likes") or [])
+                    await import_like_edges(db, "comment", doc["id"], likers)
+                    doc["likesCount"] = len(likers)
+                else:
+                    doc.setdefault("likesCount", 0)
+                ops.append(InsertOne(doc))
+            if ops:
+                try:
+                    await db.comments.bulk_write(ops, ordered=False)
+                except BulkWriteError:
+                    pass  # Duplicates from a previous partial run
+
+            count = await db.comments.count_documents({"postId": post["id"]})
+            await db.posts.update_one(
+                {"id": post["id"]},
+                {"$set": {"commentCount": count}, "$unset": {"comments": ""}}
+            )
+            migrated += 1
+
+        if migrated:
+            logger.info(f"Migrated embedded comments on {migrated} posts")
+    except Exception as e:
+        logger.error(f"Error migrating embedded comments: {e}")
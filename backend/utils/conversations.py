@@ -0,0 +1,299 @@
+"""
+Direct Message Conversations
+Per-user "cleared before" epochs, read watermarks and unread counters on
+the conversation document, so deleting, reading or resurrecting a chat never
+rewrites its message history; plus the paginated inbox
+"""
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Tuple
+import logging
+
+from pymongo import ReturnDocument, UpdateOne
+
+from utils.pagination import DEFAULT_PAGE_SIZE, clamp_limit, keyset_filter, split_page
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MESSAGE_PAGE_SIZE = 50
+MAX_MESSAGE_PAGE_SIZE = 100
+
+
+async def create_messaging_indexes(db):
+    """Newest-first history pages per conversation and inbox pages per user"""
+    await db.messages.create_index([("conversation_id", 1), ("created_at", -1), ("_id", -1)])
+    await db.conversations.create_index([("participants", 1), ("last_message_at", -1), ("_id", -1)])
+
+
+def inbox_filter(user_id: str) -> dict:
+    """Conversations in the user's inbox: not hidden by them or deleted for everyone"""
+    return {
+        "participants": user_id,
+        f"deletedBy.{user_id}": None,
+        "deletedForEveryone": {"$ne": True},
+    }
+
+
+async def get_inbox_page(
+    db,
+    user_id: str,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = DEFAULT_PAGE_SIZE
+) -> Tuple[List[dict], List[dict], Optional[str]]:
+    """
+    One page of the inbox, most recent activity first
+
+    Pinned conversations are returned separately with the first page and
+    excluded from the paged listing.
+
+    Returns:
+        Tuple of (pinned, page, next_cursor)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    limit = clamp_limit(limit)
+    base = inbox_filter(user_id)
+    sort = [("last_message_at", -1), ("_id", -1)]
+
+    pinned = []
+    if not cursor:
+        pinned = await db.conversations.find({**base, "pinnedBy": user_id}).sort(sort).to_list(None)
+
+    query = {**base, "pinnedBy": {"$ne": user_id}}
+    page_filter = keyset_filter(cursor, time_field="last_message_at", id_field="_id")
+    if page_filter:
+        query = {"$and": [query, page_filter]}
+    items = await db.conversations.find(query).sort(sort).limit(limit + 1).to_list(limit + 1)
+    page, next_cursor = split_page(items, limit, time_field="last_message_at", id_field="_id")
+    return pinned, page, next_cursor
+
+
+async def increment_inbox_unread(db, receiver_id: str):
+    """
+    Count one new message against the receiver's inbox total (the
+    per-conversation unread_count is $inc'ed with the conversation update)
+    """
+    await db.users.update_one({"id": receiver_id}, {"$inc": {"unreadMessagesCount": 1}})
+
+
+async def _release_unread(db, user_unread: dict):
+    """Subtract cleared per-conversation unread counts from users' inbox totals"""
+    ops = [
+        UpdateOne({"id": user_id}, {"$inc": {"unreadMessagesCount": -count}})
+        for user_id, count in user_unread.items() if count
+    ]
+    if ops:
+        await db.users.bulk_write(ops, ordered=False)
+
+
+async def get_total_unread(db, user_id: str) -> int:
+    """Unread messages across all conversations: one counter read"""
+    user = await db.users.find_one({"id": user_id}, {"_id": 0, "unreadMessagesCount": 1})
+    return max((user or {}).get("unreadMessagesCount", 0), 0)
+
+
+async def reconcile_unread_counters(db, missing_only: bool = False) -> int:
+    """
+    Recompute users' unreadMessagesCount from the per-conversation counters
+
+    Args:
+        missing_only: Only users that don't have the counter yet (startup backfill)
+
+    Returns:
+        Number of user documents modified
+    """
+    totals = {
+        row["_id"]: row["count"]
+        for row in await db.conversations.aggregate([
+            {"$project": {"counts": {"$objectToArray": {"$ifNull": ["$unread_count", {}]}}}},
+            {"$unwind": "$counts"},
+            {"$group": {"_id": "$counts.k", "count": {"$sum": "$counts.v"}}},
+        ]).to_list(None)
+    }
+    query = {"unreadMessagesCount": {"$exists": False}} if missing_only else {}
+    ops = []
+    async for user in db.users.find(query, {"_id": 0, "id": 1, "unreadMessagesCount": 1}):
+        count = max(totals.get(user["id"], 0), 0)
+        if user.get("unreadMessagesCount") != count:
+            ops.append(UpdateOne({"id": user["id"]}, {"$set": {"unreadMessagesCount": count}}))
+    if not ops:
+        return 0
+    return (await db.users.bulk_write(ops, ordered=False)).modified_count
+
+
+async def backfill_unread_counters(db):
+    """Startup hook: give inbox totals to users created before they existed"""
+    try:
+        await reconcile_unread_counters(db, missing_only=True)
+    except Exception as e:
+        logger.error(f"Error backfilling unread counters: {e}")
+
+
+def conversation_id_for(user_a: str, user_b: str) -> str:
+    """Stable conversation id regardless of who starts the chat"""
+    first, second = sorted([user_a, user_b])
+    return f"{first}_{second}"
+
+
+def visible_messages_filter(conversation_id: str, conversation: Optional[dict], user_id: str) -> dict:
+    """
+    Messages of a conversation the user hasn't cleared
+
+    Args:
+        conversation_id: Conversation the messages belong to
+        conversation: Its document (may be None for a chat that doesn't exist yet)
+        user_id: Viewer
+
+    Returns:
+        Filter on `messages`
+    """
+    query = {"conversation_id": conversation_id}
+    cleared_at = ((conversation or {}).get("clearedAt") or {}).get(user_id)
+    if cleared_at:
+        query["created_at"] = {"$gt": cleared_at}
+    return query
+
+
+async def clear_conversation(db, conversation_id: str, user_ids: Iterable[str], for_everyone: bool = False):
+    """
+    Hide a conversation's history for the given participants
+
+    Moves each user's clearedAt epoch to now and hides the conversation from
+    their inbox until the next message; the messages themselves are untouched.
+    """
+    now = datetime.now(timezone.utc)
+    update = {}
+    for user_id in user_ids:
+        update[f"clearedAt.{user_id}"] = now
+        update[f"deletedBy.{user_id}"] = now
+        update[f"unread_count.{user_id}"] = 0
+    if for_everyone:
+        update["deletedForEveryone"] = True
+        update["deletedForEveryoneAt"] = now
+    before = await db.conversations.find_one_and_update(
+        {"_id": conversation_id}, {"$set": update},
+        projection={"unread_count": 1}, return_document=ReturnDocument.BEFORE
+    )
+    unread = (before or {}).get("unread_count") or {}
+    await _release_unread(db, {user_id: unread.get(user_id, 0) for user_id in user_ids})
+
+
+async def delete_conversation(db, conversation_id: str):
+    """Remove a conversation and its messages, releasing any unread counts"""
+    conversation = await db.conversations.find_one_and_delete({"_id": conversation_id}, projection={"unread_count": 1})
+    await db.messages.delete_many({"conversation_id": conversation_id})
+    if conversation:
+        await _release_unread(db, conversation.get("unread_count") or {})
+
+
+async def get_message_page(
+    db,
+    conversation_id: str,
+    conversation: Optional[dict],
+    user_id: str,
+    before: Optional[str] = None,
+    limit: Optional[int] = DEFAULT_MESSAGE_PAGE_SIZE
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    One page of visible history, newest first
+
+    Args:
+        before: Cursor from the previous (newer) page, None for the latest messages
+
+    Returns:
+        Tuple of (messages newest-first, cursor for the next older page or None)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    limit = clamp_limit(limit, DEFAULT_MESSAGE_PAGE_SIZE, MAX_MESSAGE_PAGE_SIZE)
+    query = visible_messages_filter(conversation_id, conversation, user_id)
+    page_filter = keyset_filter(before, time_field="created_at", id_field="_id")
+    if page_filter:
+        query = {"$and": [query, page_filter]}
+    items = await db.messages.find(query).sort(
+        [("created_at", -1), ("_id", -1)]
+    ).limit(limit + 1).to_list(limit + 1)
+    return split_page(items, limit, time_field="created_at", id_field="_id")
+
+
+async def mark_conversation_read(db, conversation_id: str, user_id: str) -> int:
+    """
+    Advance the user's read watermark to now and zero their unread counter
+
+    Returns:
+        How many messages were unread
+    """
+    before = await db.conversations.find_one_and_update(
+        {"_id": conversation_id},
+        {"$max": {f"readUpTo.{user_id}": datetime.now(timezone.utc)}, "$set": {f"unread_count.{user_id}": 0}},
+        projection={f"unread_count.{user_id}": 1},
+        return_document=ReturnDocument.BEFORE
+    )
+    unread = ((before or {}).get("unread_count") or {}).get(user_id, 0)
+    await _release_unread(db, {user_id: unread})
+    return unread
+
+
+def message_read_state(message: dict, conversation: Optional[dict]) -> Tuple[bool, Optional[datetime]]:
+    """
+    (read, read_at) for a message from its receiver's watermark
+
+    Call notifications keep their own per-message status (they are marked
+    read individually when answered or declined); older messages may still
+    carry a per-message read flag from before watermarks existed.
+    """
+    status = message.get("status") or {}
+    if message.get("type") == "call_notification" or status.get("read"):
+        return bool(status.get("read")), message.get("read_at")
+    watermark = ((conversation or {}).get("readUpTo") or {}).get(message.get("receiver_id"))
+    if watermark and message.get("created_at") and message["created_at"] <= watermark:
+        return True, watermark
+    return False, None
+
+
+def resurrect_update(sender_id: str, receiver_id: str) -> dict:
+    """$unset clause that brings a hidden conversation back to both inboxes"""
+    return {
+        "deletedForEveryone": "",
+        "deletedForEveryoneAt": "",
+        f"deletedBy.{sender_id}": "",
+        f"deletedBy.{receiver_id}": "",
+    }
+
+
+async def migrate_deletion_epochs(db):
+    """
+    Convert legacy per-message deletedBy/deletedForEveryone flags into
+    clearedAt epochs on the conversation. Idempotent.
+    """
+    try:
+        migrated = 0
+        cursor = db.conversations.find(
+            {"$or": [{"deletedBy": {"$exists": True}}, {"deletedForEveryone": True}]},
+            {"participants": 1, "deletedBy": 1, "deletedForEveryone": 1, "deletedForEveryoneAt": 1, "clearedAt": 1}
+        )
+        async for conv in cursor:
+            cleared = dict(conv.get("clearedAt") or {})
+            for user_id, deleted_at in (conv.get("deletedBy") or {}).items():
+                if deleted_at and not cleared.get(user_id):
+                    cleared[user_id] = deleted_at
+            if conv.get("deletedForEveryone") and conv.get("deletedForEveryoneAt"):
+                for user_id in conv.get("participants", []):
+                    cleared.setdefault(user_id, conv["deletedForEveryoneAt"])
+            if cleared != (conv.get("clearedAt") or {}):
+                await db.conversations.update_one({"_id": conv["_id"]}, {"$set": {"clearedAt": cleared}})
+                migrated += 1
+
+        # The per-message copies are no longer read
+        result = await db.messages.update_many(
+            {"$or": [{"deletedBy": {"$exists": True}}, {"deletedForEveryone": {"$exists": True}}]},
+            {"$unset": {"deletedBy": "", "deletedForEveryone": "", "deletedForEveryoneAt": ""}}
+        )
+        if migrated or result.modified_count:
+            logger.info(
+                f"Migrated deletion epochs on {migrated} conversations, "
+                f"cleared flags on {result.modified_count} messages"
+            )
+    except Exception as e:
+        logger.error(f"Error migrating conversation deletion epochs: {e}")
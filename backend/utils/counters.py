@@ -0,0 +1,95 @@
+"""
+Materialized User Counters
+followersCount / followingCount / postsCount kept in step with the
+underlying data via atomic $inc (follow edges in utils.follows), plus a
+repair job
+"""
+from typing import Dict, List, Optional
+import logging
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+COUNTER_FIELDS = ("followersCount", "followingCount", "postsCount")
+
+# Projection for list endpoints: counters instead of the raw arrays
+USER_CARD_PROJECTION = {
+    "_id": 0, "id": 1, "username": 1, "fullName": 1, "profileImage": 1, "bio": 1,
+    "isPremium": 1, "isVerified": 1, "isFounder": 1,
+    "followersCount": 1, "followingCount": 1, "postsCount": 1,
+}
+
+
+async def create_counter_indexes(db):
+    """Index used by "top users" listings"""
+    await db.users.create_index([("followersCount", -1)])
+
+
+async def adjust_posts_count(db, user_id: str, delta: int):
+    """Apply +/- delta to a user's visible (non-archived) post count"""
+    await db.users.update_one({"id": user_id}, {"$inc": {"postsCount": delta}})
+
+
+async def _grouped_counts(collection, field: str, match: dict) -> Dict[str, int]:
+    return {
+        row["_id"]: row["count"]
+        for row in await collection.aggregate([
+            {"$match": match},
+            {"$group": {"_id": f"${field}", "count": {"$sum": 1}}},
+        ]).to_list(None)
+    }
+
+
+async def reconcile_user_counters(db, user_ids: Optional[List[str]] = None, missing_only: bool = False) -> int:
+    """
+    Recompute counters from the source of truth
+
+    Args:
+        db: Motor database
+        user_ids: Restrict to these users (default: everyone)
+        missing_only: Only users that don't have counters yet (startup backfill)
+
+    Returns:
+        Number of user documents modified
+    """
+    query = {}
+    if user_ids is not None:
+        query["id"] = {"$in": user_ids}
+    if missing_only:
+        query["$or"] = [{field: {"$exists": False}} for field in COUNTER_FIELDS]
+
+    # Every counter from a grouped scan of its source collection
+    following_match = {"status": "active"}
+    followers_match = {"status": "active"}
+    post_query = {"isArchived": {"$ne": True}}
+    if user_ids is not None:
+        following_match["followerId"] = {"$in": user_ids}
+        followers_match["followeeId"] = {"$in": user_ids}
+        post_query["userId"] = {"$in": user_ids}
+    sources = {
+        "followingCount": await _grouped_counts(db.follows, "followerId", following_match),
+        "followersCount": await _grouped_counts(db.follows, "followeeId", followers_match),
+        "postsCount": await _grouped_counts(db.posts, "userId", post_query),
+    }
+
+    updates = []
+    async for user in db.users.find(query, {"_id": 0, "id": 1, **{field: 1 for field in COUNTER_FIELDS}}):
+        fresh = {field: counts.get(user["id"], 0) for field, counts in sources.items()}
+        changed = {field: value for field, value in fresh.items() if user.get(field) != value}
+        if changed:
+            updates.append(UpdateOne({"id": user["id"]}, {"$set": changed}))
+    modified = 0
+    if updates:
+        modified = (await db.users.bulk_write(updates, ordered=False)).modified_count
+
+    logger.info(f"Reconciled counters on {modified} users")
+    return modified
+
+
+async def backfill_user_counters(db):
+    """Startup hook: give counters to users created before they existed"""
+    try:
+        await reconcile_user_counters(db, missing_only=True)
+    except Exception as e:
+        logger.error(f"Error backfilling user counters: {e}")
@@ -0,0 +1,135 @@
+"""
+Posts Feed Engine
+Builds cursor-paginated feed pages with authors joined in a single query
+"""
+from typing import List, Optional, Set
+import logging
+
+from utils.pagination import clamp_limit, keyset_filter, split_page
+from utils.post_visibility import post_visibility_filter
+from utils.likes import get_liked_ids
+from utils.follows import get_following_ids
+
+logger = logging.getLogger(__name__)
+
+# Only the author fields the feed renders; never followers/avatars arrays of others
+AUTHOR_PROJECTION = {"_id": 0, "isVerified": 1, "isFounder": 1, "profileImage": 1, "isPrivate": 1}
+
+
+def author_lookup_stage(local_field: str = "userId") -> dict:
+    """$lookup stage joining the slim author projection onto each document as `author`"""
+    return {
+        "$lookup": {
+            "from": "users",
+            "let": {"authorId": f"${local_field}"},
+            "pipeline": [
+                {"$match": {"$expr": {"$eq": ["$id", "$$authorId"]}}},
+                {"$project": AUTHOR_PROJECTION},
+            ],
+            "as": "author",
+        }
+    }
+
+
+def visibility_match_stage(visible_private_ids: List[str], local_field: str = "userId") -> dict:
+    """Keep documents whose author is public, or private but followed by (or equal to) the viewer"""
+    return {
+        "$match": {
+            "$or": [
+                {"author.isPrivate": {"$ne": True}},
+                {local_field: {"$in": visible_private_ids}},
+            ]
+        }
+    }
+
+
+def serialize_feed_post(post: dict, liked_ids: Set[str], saved_posts: List[str]) -> dict:
+    """Shape a joined post document into the feed response format"""
+    author = post["author"][0] if post.get("author") else None
+
+    post_data = {
+        "id": post["id"],
+        "userId": post["userId"],
+        "username": post["username"],
+        "userProfileImage": author.get("profileImage") if author else post.get("userProfileImage"),
+        "isVerified": author.get("isVerified", False) if author else False,
+        "isFounder": author.get("isFounder", False) if author else False,
+        "mediaType": post.get("mediaType", "image"),
+        "mediaUrl": post.get("mediaUrl", ""),
+        "caption": post.get("caption", ""),
+        "likesCount": post.get("likeCount", 0),
+        "commentsCount": post.get("commentCount", 0),
+        "createdAt": post["createdAt"].isoformat() if hasattr(post["createdAt"], 'isoformat') else post["createdAt"],
+        "userLiked": post["id"] in liked_ids,
+        "isSaved": post["id"] in saved_posts
+    }
+
+    # Add Telegram fields if they exist
+    if post.get("telegramFileId"):
+        post_data["telegramFileId"] = post["telegramFileId"]
+    if post.get("telegramFilePath"):
+        post_data["telegramFilePath"] = post["telegramFilePath"]
+
+    # Small variants and blurred placeholder, once the thumbnail job has run
+    if post.get("thumbnails"):
+        post_data["thumbnails"] = post["thumbnails"]
+    if post.get("placeholder"):
+        post_data["placeholder"] = post["placeholder"]
+
+    return post_data
+
+
+async def get_feed_page(db, viewer_id: str, cursor: Optional[str] = None, limit: Optional[int] = None) -> dict:
+    """
+    Build one page of the home feed
+
+    Costs three queries regardless of page size: one slim read of the viewer,
+    one aggregation that filters on the denormalized `authorIsPrivate` flag
+    and joins authors for the page only, and one batched liked-by-viewer lookup.
+
+    Args:
+        db: Motor database
+        viewer_id: Current user id
+        cursor: Cursor returned by the previous page
+        limit: Page size (clamped)
+
+    Returns:
+        Dict with `posts` and `nextCursor`
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    limit = clamp_limit(limit)
+
+    viewer = await db.users.find_one(
+        {"id": viewer_id},
+        {"_id": 0, "blockedUsers": 1, "mutedUsers": 1, "savedPosts": 1}
+    ) or {}
+    excluded_users = list(set(viewer.get("blockedUsers", []) + viewer.get("mutedUsers", [])))
+    saved_posts = viewer.get("savedPosts", [])
+
+    conditions = [
+        {"isArchived": {"$ne": True}},
+        post_visibility_filter(viewer_id, await get_following_ids(db, viewer_id)),
+    ]
+    if excluded_users:
+        conditions.append({"userId": {"$nin": excluded_users}})
+    page_filter = keyset_filter(cursor)
+    if page_filter:
+        conditions.append(page_filter)
+
+    pipeline = [
+        {"$match": {"$and": conditions}},
+        {"$sort": {"createdAt": -1, "id": -1}},
+        {"$limit": limit + 1},
+        author_lookup_stage(),
+        {"$project": {"_id": 0}},
+    ]
+    posts = await db.posts.aggregate(pipeline).to_list(limit + 1)
+    page, next_cursor = split_page(posts, limit)
+    liked_ids = await get_liked_ids(db, "post", [post["id"] for post in page], viewer_id)
+
+    return {
+        "posts": [serialize_feed_post(post, liked_ids, saved_posts) for post in page],
+        "nextCursor": next_cursor
+    }
@@ -18,6 +18,20 @@ ALLOWED_MIME_TYPES = {
 MAX_IMAGE_SIZE = 10 * 1024 * 1024  # 10MB
 MAX_VIDEO_SIZE = 50 * 1024 * 1024  # 50MB
 
+# Extension stored for each sniffed media type
+MEDIA_TYPE_EXTENSIONS = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+    'video/mp4': '.mp4',
+    'video/quicktime': '.mov',
+    'video/webm': '.webm',
+}
+
+# Bytes needed by sniff_media_type
+SNIFF_BYTES = 32
+
 
 def generate_secure_filename(original_filename: str, user_id: str) -> str:
     """
@@ -66,23 +80,52 @@ def validate_image_file(file_content: bytes, filename: str) -> Tuple[bool, Optio
     if not file_content:
         return False, "Empty file"
     
-    # JPEG magic bytes
-    if file_content[:2] == b'\xff\xd8':
+    if (sniff_media_type(file_content[:SNIFF_BYTES]) or '').startswith('image/'):
         return True, None
     
+    return False, "File content does not match expected image format"
+
+
+def sniff_media_type(head: bytes) -> Optional[str]:
+    """
+    Identify an upload from its magic bytes, ignoring the client's Content-Type
+    
+    Args:
+        head: First SNIFF_BYTES bytes of the file
+        
+    Returns:
+        MIME type from MEDIA_TYPE_EXTENSIONS, or None if not an accepted format
+    """
+    # JPEG magic bytes
+    if head[:2] == b'\xff\xd8':
+        return 'image/jpeg'
+    
     # PNG magic bytes
-    if file_content[:8] == b'\x89PNG\r\n\x1a\n':
-        return True, None
+    if head[:8] == b'\x89PNG\r\n\x1a\n':
+        return 'image/png'
     
     # GIF magic bytes
-    if file_content[:6] in (b'GIF87a', b'GIF89a'):
-        return True, None
+    if head[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image/gif'
     
     # WEBP magic bytes
-    if file_content[:4] == b'RIFF' and file_content[8:12] == b'WEBP':
-        return True, None
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
     
-    return False, "File content does not match expected image format"
+    # ISO base media (MP4/MOV): size, then 'ftyp' and the major brand
+    if head[4:8] == b'ftyp':
+        return 'video/quicktime' if head[8:10] == b'qt' else 'video/mp4'
+    
+    # WebM (EBML header)
+    if head[:4] == b'\x1a\x45\xdf\xa3':
+        return 'video/webm'
+    
+    return None
+
+
+def max_upload_size(mime_type: str) -> int:
+    """Size cap for a sniffed media type"""
+    return MAX_VIDEO_SIZE if mime_type.startswith('video/') else MAX_IMAGE_SIZE
 
 
 def sanitize_path(path: str, base_dir: str) -> str:
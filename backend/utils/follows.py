@@ -0,0 +1,243 @@
+"""
+Follow Graph
+One document per (followerId, followeeId) in `follows`; pending requests to
+private accounts are edges with status "pending". followersCount and
+followingCount on users move with $inc only when an edge actually changes.
+"""
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from utils.pagination import DEFAULT_PAGE_SIZE, clamp_limit, keyset_filter, split_page
+
+logger = logging.getLogger(__name__)
+
+FOLLOW_ACTIVE = "active"
+FOLLOW_PENDING = "pending"
+
+# Edge upserts per bulk_write while migrating the embedded arrays
+MIGRATION_BATCH_SIZE = 1000
+
+
+async def create_follow_indexes(db):
+    """Unique edge, plus newest-first listings from either side"""
+    await db.follows.create_index([("followerId", 1), ("followeeId", 1)], unique=True, name="follow_edge_unique")
+    await db.follows.create_index([("followerId", 1), ("createdAt", -1), ("followeeId", -1)])
+    await db.follows.create_index([("followeeId", 1), ("createdAt", -1), ("followerId", -1)])
+
+
+async def _apply_follow_delta(db, follower_id: str, followee_id: str, delta: int):
+    await db.users.update_one({"id": follower_id}, {"$inc": {"followingCount": delta}})
+    await db.users.update_one({"id": followee_id}, {"$inc": {"followersCount": delta}})
+
+
+async def follow(db, follower_id: str, followee_id: str, pending: bool = False) -> Tuple[str, bool]:
+    """
+    Follow someone, or request to when pending (private account)
+
+    The edge is one upsert, so repeated or concurrent requests create it
+    once and counters only move for the request that created it.
+
+    Returns:
+        Tuple of (edge status, whether this call created the edge)
+    """
+    status = FOLLOW_PENDING if pending else FOLLOW_ACTIVE
+    try:
+        existing = await db.follows.find_one_and_update(
+            {"followerId": follower_id, "followeeId": followee_id},
+            {"$setOnInsert": {"status": status, "createdAt": datetime.now(timezone.utc)}},
+            projection={"_id": 0, "status": 1},
+            upsert=True,
+            return_document=ReturnDocument.BEFORE
+        )
+    except DuplicateKeyError:
+        # Lost the insert race; the other request created the edge
+        existing = await db.follows.find_one(
+            {"followerId": follower_id, "followeeId": followee_id}, {"_id": 0, "status": 1}
+        ) or {"status": status}
+    if existing is not None:
+        return existing["status"], False
+    if status == FOLLOW_ACTIVE:
+        await _apply_follow_delta(db, follower_id, followee_id, 1)
+    return status, True
+
+
+async def unfollow(db, follower_id: str, followee_id: str, status: Optional[str] = None) -> Optional[str]:
+    """
+    Remove follower -> followee (status=FOLLOW_PENDING cancels/rejects only a request)
+
+    Returns:
+        Status of the removed edge, or None if there was none
+    """
+    query = {"followerId": follower_id, "followeeId": followee_id}
+    if status:
+        query["status"] = status
+    removed = await db.follows.find_one_and_delete(query, projection={"_id": 0, "status": 1})
+    if removed is None:
+        return None
+    if removed["status"] == FOLLOW_ACTIVE:
+        await _apply_follow_delta(db, follower_id, followee_id, -1)
+    return removed["status"]
+
+
+async def approve_follow_request(db, follower_id: str, followee_id: str) -> bool:
+    """
+    Turn a pending request into a follow; the listing time becomes the accept time
+
+    Returns:
+        True if a pending request was accepted
+    """
+    result = await db.follows.update_one(
+        {"followerId": follower_id, "followeeId": followee_id, "status": FOLLOW_PENDING},
+        {"$set": {"status": FOLLOW_ACTIVE, "createdAt": datetime.now(timezone.utc)}}
+    )
+    if result.modified_count == 0:
+        return False
+    await _apply_follow_delta(db, follower_id, followee_id, 1)
+    return True
+
+
+async def follow_status(db, follower_id: str, followee_id: str) -> Optional[str]:
+    """FOLLOW_ACTIVE, FOLLOW_PENDING or None"""
+    edge = await db.follows.find_one(
+        {"followerId": follower_id, "followeeId": followee_id}, {"_id": 0, "status": 1}
+    )
+    return edge["status"] if edge else None
+
+
+async def follows_user(db, follower_id: str, followee_id: str) -> bool:
+    return await follow_status(db, follower_id, followee_id) == FOLLOW_ACTIVE
+
+
+async def get_follow_statuses(db, follower_id: str, followee_ids: Iterable[str]) -> Dict[str, str]:
+    """
+    follower_id's edge status towards each of followee_ids, in one $in query
+
+    Returns:
+        {followee_id: status} for the ids with an edge
+    """
+    followee_ids = [fid for fid in followee_ids if fid]
+    if not followee_ids:
+        return {}
+    cursor = db.follows.find(
+        {"followerId": follower_id, "followeeId": {"$in": followee_ids}},
+        {"_id": 0, "followeeId": 1, "status": 1}
+    )
+    return {edge["followeeId"]: edge["status"] async for edge in cursor}
+
+
+async def get_following_ids(db, user_id: str) -> List[str]:
+    """Everyone user_id actively follows (feed and visibility filters)"""
+    cursor = db.follows.find({"followerId": user_id, "status": FOLLOW_ACTIVE}, {"_id": 0, "followeeId": 1})
+    return [edge["followeeId"] async for edge in cursor]
+
+
+async def list_follow_edges(
+    db,
+    user_id: str,
+    direction: str,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = DEFAULT_PAGE_SIZE
+) -> Tuple[List[str], Optional[str]]:
+    """
+    One page of a user's followers or following, newest first
+
+    Args:
+        direction: "followers" (edges into user_id) or "following" (edges out)
+
+    Returns:
+        Tuple of (user ids, next_cursor); next_cursor is None on the last page
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    limit = clamp_limit(limit)
+    if direction == "followers":
+        own_field, other_field = "followeeId", "followerId"
+    else:
+        own_field, other_field = "followerId", "followeeId"
+    query = {own_field: user_id, "status": FOLLOW_ACTIVE}
+    page_filter = keyset_filter(cursor, id_field=other_field)
+    if page_filter:
+        query = {"$and": [query, page_filter]}
+
+    edges = await db.follows.find(query, {"_id": 0, other_field: 1, "createdAt": 1}).sort(
+        [("createdAt", -1), (other_field, -1)]
+    ).limit(limit + 1).to_list(limit + 1)
+    page, next_cursor = split_page(edges, limit, id_field=other_field)
+    return [edge[other_field] for edge in page], next_cursor
+
+
+async def remove_user_follows(db, user_id: str):
+    """Detach a deleted account from the graph, decrementing the other side's counters"""
+    followee_ids = await db.follows.distinct("followeeId", {"followerId": user_id, "status": FOLLOW_ACTIVE})
+    follower_ids = await db.follows.distinct("followerId", {"followeeId": user_id, "status": FOLLOW_ACTIVE})
+    await db.follows.delete_many({"$or": [{"followerId": user_id}, {"followeeId": user_id}]})
+    if followee_ids:
+        await db.users.update_many({"id": {"$in": followee_ids}}, {"$inc": {"followersCount": -1}})
+    if follower_ids:
+        await db.users.update_many({"id": {"$in": follower_ids}}, {"$inc": {"followingCount": -1}})
+
+
+def _legacy_edges(user: dict) -> Dict[Tuple[str, str], str]:
+    """{(followerId, followeeId): status} implied by one user's embedded arrays"""
+    edges = {}
+    for other in user.get("followRequests") or []:
+        edges[(other, user["id"])] = FOLLOW_PENDING
+    # An accepted follow outranks a stale request for the same pair
+    for other in user.get("followers") or []:
+        edges[(other, user["id"])] = FOLLOW_ACTIVE
+    for other in user.get("following") or []:
+        edges[(user["id"], other)] = FOLLOW_ACTIVE
+    return {
+        pair: status for pair, status in edges.items()
+        if pair[0] and pair[1] and pair[0] != pair[1]
+    }
+
+
+def _edge_upsert(follower_id: str, followee_id: str, status: str, now: datetime) -> UpdateOne:
+    """Active edges overwrite pending ones; a pending edge never downgrades an active one"""
+    if status == FOLLOW_ACTIVE:
+        update = {"$setOnInsert": {"createdAt": now}, "$set": {"status": FOLLOW_ACTIVE}}
+    else:
+        update = {"$setOnInsert": {"createdAt": now, "status": FOLLOW_PENDING}}
+    return UpdateOne({"followerId": follower_id, "followeeId": followee_id}, update, upsert=True)
+
+
+async def migrate_follow_arrays(db) -> List[str]:
+    """
+    Move legacy followers/following/followRequests arrays on users into the
+    follows collection, then recompute the touched users' counters. Idempotent.
+
+    Returns:
+        Ids of the users migrated (callers drop them from caches)
+    """
+    from utils.counters import reconcile_user_counters
+
+    migrated = []
+    try:
+        now = datetime.now(timezone.utc)
+        legacy = {"$or": [{field: {"$exists": True}} for field in ("followers", "following", "followRequests")]}
+        cursor = db.users.find(legacy, {"_id": 0, "id": 1, "followers": 1, "following": 1, "followRequests": 1})
+        async for user in cursor:
+            edges = _legacy_edges(user)
+            ops = [_edge_upsert(follower_id, followee_id, status, now) for (follower_id, followee_id), status in edges.items()]
+            for start in range(0, len(ops), MIGRATION_BATCH_SIZE):
+                await db.follows.bulk_write(ops[start:start + MIGRATION_BATCH_SIZE], ordered=False)
+            # Both ends of every pair get their counters recomputed below
+            migrated.append(user["id"])
+            for pair in edges:
+                migrated.extend(pair)
+        if not migrated:
+            return []
+        migrated = list(set(migrated))
+        await reconcile_user_counters(db, user_ids=migrated)
+        await db.users.update_many(legacy, {"$unset": {"followers": "", "following": "", "followRequests": ""}})
+        logger.info(f"Migrated embedded follow arrays touching {len(migrated)} users")
+        return migrated
+    except Exception as e:
+        logger.error(f"Error migrating follow arrays: {e}")
+        return []
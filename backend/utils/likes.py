@@ -0,0 +1,171 @@
+"""
+Likes Subsystem
+One document per (targetType, targetId, userId) in `likes`, with a counter
+on the target updated via $inc. Writes are idempotent and reads stay O(page).
+"""
+from typing import Iterable, List, Optional, Set, Tuple
+from datetime import datetime, timezone
+import logging
+
+from pymongo import ReturnDocument, InsertOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# targetType -> (collection, counter field)
+LIKE_COUNTER_TARGETS = {
+    "post": ("posts", "likeCount"),
+    "story": ("stories", "likeCount"),
+    "comment": ("comments", "likesCount"),
+}
+
+
+async def create_like_indexes(db):
+    """Unique edge per user/target; also serves the batched "did I like" lookup"""
+    await db.likes.create_index(
+        [("targetType", 1), ("targetId", 1), ("userId", 1)],
+        unique=True, name="like_edge_unique"
+    )
+    await db.likes.create_index([("userId", 1), ("createdAt", -1)])
+
+
+async def _apply_like_delta(db, target_type: str, target_id: str, delta: int) -> int:
+    """$inc the target's counter and return the new value"""
+    collection, field = LIKE_COUNTER_TARGETS[target_type]
+    doc = await db[collection].find_one_and_update(
+        {"id": target_id},
+        {"$inc": {field: delta}},
+        projection={"_id": 0, field: 1},
+        return_document=ReturnDocument.AFTER
+    )
+    return doc.get(field, 0) if doc else 0
+
+
+async def get_like_count(db, target_type: str, target_id: str) -> int:
+    """Read a target's like counter"""
+    collection, field = LIKE_COUNTER_TARGETS[target_type]
+    doc = await db[collection].find_one({"id": target_id}, {"_id": 0, field: 1})
+    return doc.get(field, 0) if doc else 0
+
+
+async def add_like(db, target_type: str, target_id: str, user_id: str) -> Optional[int]:
+    """
+    Like a target
+
+    Returns:
+        New like count, or None if the user had already liked it
+    """
+    try:
+        await db.likes.insert_one({
+            "targetType": target_type,
+            "targetId": target_id,
+            "userId": user_id,
+            "createdAt": datetime.now(timezone.utc)
+        })
+    except DuplicateKeyError:
+        return None
+    return await _apply_like_delta(db, target_type, target_id, 1)
+
+
+async def remove_like(db, target_type: str, target_id: str, user_id: str) -> Optional[int]:
+    """
+    Unlike a target
+
+    Returns:
+        New like count, or None if the user hadn't liked it
+    """
+    result = await db.likes.delete_one({"targetType": target_type, "targetId": target_id, "userId": user_id})
+    if result.deleted_count == 0:
+        return None
+    return await _apply_like_delta(db, target_type, target_id, -1)
+
+
+async def toggle_like(db, target_type: str, target_id: str, user_id: str) -> Tuple[bool, int]:
+    """
+    Flip the user's like on a target
+
+    Returns:
+        Tuple of (user_liked_now, like_count)
+    """
+    count = await remove_like(db, target_type, target_id, user_id)
+    if count is not None:
+        return False, count
+    count = await add_like(db, target_type, target_id, user_id)
+    if count is None:
+        # A concurrent request liked it between our delete and insert
+        count = await get_like_count(db, target_type, target_id)
+    return True, count
+
+
+async def get_liked_ids(db, target_type: str, target_ids: Iterable[str], user_id: str) -> Set[str]:
+    """
+    Which of these targets has the user liked? One indexed query per page.
+    """
+    target_ids = [tid for tid in target_ids if tid]
+    if not target_ids:
+        return set()
+    cursor = db.likes.find(
+        {"targetType": target_type, "targetId": {"$in": target_ids}, "userId": user_id},
+        {"_id": 0, "targetId": 1}
+    )
+    return {doc["targetId"] async for doc in cursor}
+
+
+async def delete_target_likes(db, target_type: str, target_ids: List[str]):
+    """Drop like edges of deleted targets"""
+    if target_ids:
+        await db.likes.delete_many({"targetType": target_type, "targetId": {"$in": target_ids}})
+
+
+async def remove_user_likes(db, user_id: str):
+    """Drop a deleted account's likes, decrementing each liked target's counter"""
+    liked = {}
+    async for like in db.likes.find({"userId": user_id}, {"_id": 0, "targetType": 1, "targetId": 1}):
+        liked.setdefault(like["targetType"], []).append(like["targetId"])
+    await db.likes.delete_many({"userId": user_id})
+    for target_type, target_ids in liked.items():
+        if target_type in LIKE_COUNTER_TARGETS:
+            collection, field = LIKE_COUNTER_TARGETS[target_type]
+            await db[collection].update_many({"id": {"$in": target_ids}}, {"$inc": {field: -1}})
+
+
+async def import_like_edges(db, target_type: str, target_id: str, user_ids: Iterable[str]):
+    """Bulk-insert legacy likers of one target, skipping edges that already exist"""
+    now = datetime.now(timezone.utc)
+    docs = [
+        {"targetType": target_type, "targetId": target_id, "userId": uid, "createdAt": now}
+        for uid in user_ids
+    ]
+    if not docs:
+        return
+    try:
+        await db.likes.bulk_write([InsertOne(doc) for doc in docs], ordered=False)
+    except BulkWriteError:
+        pass  # Duplicates from a previous partial run
+
+
+async def migrate_embedded_likes(db):
+    """
+    Move legacy `likes` arrays on posts and stories into the likes collection
+    and replace them with counters. Idempotent. (Legacy comment likes are
+    moved by the comments migration.)
+    """
+    try:
+        migrated = 0
+        for target_type, (collection, field) in LIKE_COUNTER_TARGETS.items():
+            if target_type == "comment":
+                continue
+            cursor = db[collection].find({"likes": {"$exists": True}}, {"_id": 0, "id": 1, "likes": 1})
+            async for doc in cursor:
+                user_ids = set(doc.get("likes") or [])
+                await import_like_edges(db, target_type, doc["id"], user_ids)
+                await db[collection].update_one(
+                    {"id": doc["id"]},
+                    {"$set": {field: len(user_ids)}, "$unset": {"likes": ""}}
+                )
+                migrated += 1
+
+        if migrated:
+            logger.info(f"Migrated embedded likes on {migrated} documents")
+    except Exception as e:
+        logger.error(f"Error migrating embedded likes: {e}")
@@ -0,0 +1,126 @@
+"""
+Media Upload Pipeline
+Post/story uploads stay in a spooled temp file from the multipart parser to
+the media sink: no full read into memory, no base64, nothing but a URL or
+file id in Mongo
+"""
+from tempfile import SpooledTemporaryFile
+from typing import IO, Optional
+import asyncio
+import base64
+import binascii
+import logging
+import os
+import secrets
+import shutil
+
+from utils.file_security import MEDIA_TYPE_EXTENSIONS, SNIFF_BYTES, max_upload_size, sniff_media_type
+
+logger = logging.getLogger(__name__)
+
+# "telegram": media sink channel, falling back to local disk; "local": disk only
+MEDIA_SINK = os.environ.get("MEDIA_SINK", "telegram").lower()
+# Same tree as the /uploads mount and /api/uploads route in server.py
+UPLOAD_DIR = "/app/uploads"
+# Served by the /api/uploads/{file_type}/{filename} route
+UPLOAD_URL_PREFIX = "/api/uploads"
+# Decoded data URLs larger than this spill from memory to disk
+SPOOL_MAX_MEMORY = 1024 * 1024
+COPY_CHUNK_SIZE = 64 * 1024
+
+
+class MediaRejected(ValueError):
+    """Upload is empty, too large or not an accepted image/video format"""
+
+
+class SpooledMedia:
+    """A validated upload: seekable file object plus its sniffed type and size"""
+
+    def __init__(self, file: IO[bytes], content_type: str, size: int):
+        self.file = file
+        self.content_type = content_type
+        self.size = size
+
+    @property
+    def kind(self) -> str:
+        """'image' or 'video', as stored in mediaType"""
+        return "video" if self.content_type.startswith("video/") else "image"
+
+    @property
+    def extension(self) -> str:
+        return MEDIA_TYPE_EXTENSIONS[self.content_type]
+
+    def rewind(self):
+        self.file.seek(0)
+
+
+def _validate(file: IO[bytes], max_bytes: Optional[int] = None) -> SpooledMedia:
+    """Sniff the type from magic bytes and enforce the size cap (blocking I/O)"""
+    file.seek(0)
+    head = file.read(SNIFF_BYTES)
+    if not head:
+        raise MediaRejected("Empty file")
+    content_type = sniff_media_type(head)
+    if content_type is None:
+        raise MediaRejected("Unsupported media format")
+
+    file.seek(0, os.SEEK_END)
+    size = file.tell()
+    file.seek(0)
+    limit = max_bytes or max_upload_size(content_type)
+    if size > limit:
+        raise MediaRejected(f"File size exceeds {limit // (1024 * 1024)}MB limit")
+    return SpooledMedia(file, content_type, size)
+
+
+async def spool_upload(upload, max_bytes: Optional[int] = None) -> SpooledMedia:
+    """
+    Validate a multipart UploadFile in place
+
+    Starlette's parser already streamed the part into a SpooledTemporaryFile
+    (memory up to 1MB, then disk); this only reads its first bytes.
+
+    Raises:
+        MediaRejected: Empty, oversized or unrecognised content
+    """
+    return await asyncio.to_thread(_validate, upload.file, max_bytes)
+
+
+def spool_data_url(data_url: str, max_bytes: Optional[int] = None) -> SpooledMedia:
+    """
+    Decode a legacy `data:<mime>;base64,...` body into a spooled file
+
+    Raises:
+        MediaRejected: Malformed data URL or invalid content
+    """
+    try:
+        _, encoded = data_url.split(",", 1)
+        raw = base64.b64decode(encoded, validate=False)
+    except (ValueError, binascii.Error):
+        raise MediaRejected("Malformed data URL")
+    spooled = SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    spooled.write(raw)
+    return _validate(spooled, max_bytes)
+
+
+class LocalDiskMediaSink:
+    """Writes media under UPLOAD_DIR/<folder>/ and returns its /api/uploads URL"""
+
+    def __init__(self, base_dir: str = UPLOAD_DIR, url_prefix: str = UPLOAD_URL_PREFIX):
+        self.base_dir = base_dir
+        self.url_prefix = url_prefix
+
+    async def store(self, media: SpooledMedia, folder: str, user_id: str) -> str:
+        filename = f"{user_id}_{secrets.token_urlsafe(16)}{media.extension}"
+        await asyncio.to_thread(self._write, media, os.path.join(self.base_dir, folder), filename)
+        return f"{self.url_prefix}/{folder}/{filename}"
+
+    def _write(self, media: SpooledMedia, directory: str, filename: str):
+        os.makedirs(directory, exist_ok=True)
+        media.rewind()
+        with open(os.path.join(directory, filename), "wb") as out:
+            shutil.copyfileobj(media.file, out, COPY_CHUNK_SIZE)
+        media.rewind()
+
+
+local_media_sink = LocalDiskMediaSink()
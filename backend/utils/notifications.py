@@ -0,0 +1,414 @@
+"""
+Notifications Store
+One row per (recipient, type, target) in `notifications`: repeat events fold
+into it ("X and 42 others liked your post"), and unreadNotificationsCount on
+the recipient moves with $inc whenever a row turns unread or read. A row keeps
+every actor's id in actorIds, so count is the number of distinct actors.
+"""
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Tuple
+import logging
+from uuid import uuid4
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from utils.pagination import DEFAULT_PAGE_SIZE, clamp_limit, keyset_filter, split_page
+
+logger = logging.getLogger(__name__)
+
+# Types whose events from different people share one row per target.
+# Everything else (follow requests, accepted requests, ...) gets a row per
+# sender because the client acts on each one separately.
+COALESCED_TYPES = frozenset({"like", "story_like", "comment", "follow"})
+
+# Most recent actors kept on a row for avatars and "X and N others"
+MAX_ACTORS_PER_ROW = 3
+
+
+def notification_group_key(notification_type: str, actor_id: str, target_id: Optional[str] = None) -> str:
+    """The row an event folds into, below its recipient"""
+    if notification_type in COALESCED_TYPES:
+        return f"{notification_type}:{target_id or ''}"
+    return f"{notification_type}:{target_id or ''}:{actor_id}"
+
+
+async def create_notification_indexes(db):
+    """Unique group row per recipient (legacy rows have no groupKey), plus the newest-first page"""
+    await db.notifications.create_index(
+        [("userId", 1), ("groupKey", 1)], unique=True, name="notification_group_unique",
+        partialFilterExpression={"groupKey": {"$type": "string"}}
+    )
+    await db.notifications.create_index([("userId", 1), ("updatedAt", -1), ("id", -1)])
+    await db.notifications.create_index("targetId", sparse=True)
+
+
+async def _apply_unread_delta(db, user_id: str, delta: int):
+    if delta:
+        await db.users.update_one({"id": user_id}, {"$inc": {"unreadNotificationsCount": delta}})
+
+
+# Everyone counted on a row; rows folded before actorIds existed only know their shown actors
+_COUNTED_ACTOR_IDS = {"$ifNull": ["$actorIds", {"$ifNull": ["$actors.id", []]}]}
+
+
+def _fold_event_pipeline(actor: dict, target_id: Optional[str], preview: Optional[str], text: Optional[str]) -> list:
+    """Aggregation-pipeline update adding one event to a (possibly new) row"""
+    now = datetime.now(timezone.utc)
+    existing_actors = {"$ifNull": ["$actors", []]}
+    # A repeat by someone already counted on the row doesn't add to "others"
+    repeat = {"$in": [actor["id"], _COUNTED_ACTOR_IDS]}
+    fields = {
+        "id": {"$ifNull": ["$id", str(uuid4())]},
+        "targetId": {"$literal": target_id},
+        "postId": {"$literal": target_id},
+        "count": {"$add": [{"$ifNull": ["$count", 0]}, {"$cond": [repeat, 0, 1]}]},
+        "actorIds": {"$setUnion": [_COUNTED_ACTOR_IDS, [{"$literal": actor["id"]}]]},
+        "actors": {"$slice": [
+            {"$concatArrays": [
+                [{"$literal": actor}],
+                {"$filter": {"input": existing_actors, "cond": {"$ne": ["$$this.id", actor["id"]]}}},
+            ]},
+            MAX_ACTORS_PER_ROW
+        ]},
+        # Latest actor, in the shape clients of the flat rows already read
+        "fromUserId": {"$literal": actor["id"]},
+        "fromUsername": {"$literal": actor.get("username")},
+        "fromUserImage": {"$literal": actor.get("image")},
+        "isRead": False,
+        "createdAt": {"$ifNull": ["$createdAt", now]},
+        "updatedAt": now,
+    }
+    if preview is not None:
+        fields["postImage"] = {"$literal": preview}
+    if text is not None:
+        fields["commentText"] = {"$literal": text}
+    return [{"$set": fields}]
+
+
+async def add_notification(
+    db,
+    recipient_id: str,
+    notification_type: str,
+    actor: dict,
+    target_id: Optional[str] = None,
+    preview: Optional[str] = None,
+    text: Optional[str] = None
+) -> bool:
+    """
+    Record an event, folding it into the recipient's row for (type, target)
+
+    Args:
+        db: Motor database
+        recipient_id: Who is notified
+        notification_type: "like", "comment", "follow_request", ...
+        actor: {"id", "username", "image"} of who caused it
+        target_id: Post/story the event is about, if any
+        preview: Image shown next to the row
+        text: Comment text, for comment notifications
+
+    Returns:
+        True if the row was recorded (False for self-notifications)
+    """
+    if not recipient_id or recipient_id == actor["id"]:
+        return False
+    query = {"userId": recipient_id, "type": notification_type,
+             "groupKey": notification_group_key(notification_type, actor["id"], target_id)}
+    pipeline = _fold_event_pipeline(actor, target_id, preview, text)
+    for attempt in range(2):
+        try:
+            before = await db.notifications.find_one_and_update(
+                query, pipeline, projection={"_id": 0, "isRead": 1},
+                upsert=True, return_document=ReturnDocument.BEFORE
+            )
+            break
+        except DuplicateKeyError:
+            # Two first events for the same row raced; the retry folds into the winner
+            if attempt:
+                raise
+    if before is None or before.get("isRead"):
+        await _apply_unread_delta(db, recipient_id, 1)
+    return True
+
+
+async def delete_notifications(db, query: dict) -> int:
+    """
+    Delete rows matching query, releasing their recipients' unread counts
+
+    Returns:
+        Number of rows deleted
+    """
+    unread = Counter()
+    async for row in db.notifications.find({**query, "isRead": False}, {"_id": 0, "userId": 1}):
+        unread[row["userId"]] += 1
+    result = await db.notifications.delete_many(query)
+    if unread:
+        await db.users.bulk_write([
+            UpdateOne({"id": user_id}, {"$inc": {"unreadNotificationsCount": -count}})
+            for user_id, count in unread.items()
+        ], ordered=False)
+    return result.deleted_count
+
+
+def _drop_actor_pipeline(actor_id: str) -> list:
+    """Take actor_id's event off a row; the next shown actor becomes the headline"""
+    remaining = {"$filter": {"input": {"$ifNull": ["$actors", []]}, "cond": {"$ne": ["$$this.id", actor_id]}}}
+    # Rows the actor isn't counted on (e.g. following back someone who never followed) are left alone
+    counted = {"$in": [actor_id, _COUNTED_ACTOR_IDS]}
+    return [
+        {"$set": {
+            "count": {"$subtract": [{"$ifNull": ["$count", 1]}, {"$cond": [counted, 1, 0]}]},
+            "actorIds": {"$filter": {"input": _COUNTED_ACTOR_IDS, "cond": {"$ne": ["$$this", actor_id]}}},
+            "actors": remaining,
+        }},
+        {"$set": {
+            "fromUserId": {"$ifNull": [{"$arrayElemAt": ["$actors.id", 0]}, "$fromUserId"]},
+            "fromUsername": {"$ifNull": [{"$arrayElemAt": ["$actors.username", 0]}, "$fromUsername"]},
+            "fromUserImage": {"$ifNull": [{"$arrayElemAt": ["$actors.image", 0]}, "$fromUserImage"]},
+        }},
+    ]
+
+
+async def remove_notification(
+    db,
+    recipient_id: str,
+    notification_type: str,
+    actor_id: str,
+    target_id: Optional[str] = None
+):
+    """Undo one event (unlike, deleted comment, cancelled request); empty rows are deleted"""
+    if recipient_id == actor_id:
+        return  # Self-events were never recorded
+    group_key = notification_group_key(notification_type, actor_id, target_id)
+    query = {"userId": recipient_id, "groupKey": group_key}
+    if notification_type not in COALESCED_TYPES:
+        await delete_notifications(db, query)
+        return
+    row = await db.notifications.find_one_and_update(
+        query, _drop_actor_pipeline(actor_id),
+        projection={"_id": 0, "count": 1}, return_document=ReturnDocument.AFTER
+    )
+    if row is not None and row.get("count", 0) <= 0:
+        await delete_notifications(db, {**query, "count": {"$lte": 0}})
+
+
+async def remove_actor_notifications(db, actor_id: str):
+    """Take a deleted account out of everyone's rows"""
+    await db.notifications.update_many(
+        {"$or": [{"actorIds": actor_id}, {"actors.id": actor_id}], "groupKey": {"$type": "string"}},
+        _drop_actor_pipeline(actor_id)
+    )
+    # Shared rows only go once nobody is left on them
+    await delete_notifications(db, {"$or": [
+        {"groupKey": {"$type": "string"}, "count": {"$lte": 0}},
+        {"fromUserId": actor_id, "type": {"$nin": list(COALESCED_TYPES)}},
+        {"fromUserId": actor_id, "groupKey": {"$exists": False}},
+    ]})
+
+
+async def read_notification(db, user_id: str, notification_id: str) -> bool:
+    """
+    Returns:
+        True if an unread row was marked read
+    """
+    result = await db.notifications.update_one(
+        {"id": notification_id, "userId": user_id, "isRead": False},
+        {"$set": {"isRead": True}}
+    )
+    if result.modified_count == 0:
+        return False
+    await _apply_unread_delta(db, user_id, -1)
+    return True
+
+
+async def read_all_notifications(db, user_id: str, notification_ids: Optional[Iterable[str]] = None) -> int:
+    """
+    Args:
+        notification_ids: Only mark these rows (what the client has shown); default all
+
+    Returns:
+        How many rows were unread
+    """
+    query = {"userId": user_id, "isRead": False}
+    if notification_ids is not None:
+        query["id"] = {"$in": list(notification_ids)}
+    result = await db.notifications.update_many(query, {"$set": {"isRead": True}})
+    await _apply_unread_delta(db, user_id, -result.modified_count)
+    return result.modified_count
+
+
+async def unread_notification_count(db, user_id: str) -> int:
+    """Badge count: one field of the user document"""
+    user = await db.users.find_one({"id": user_id}, {"_id": 0, "unreadNotificationsCount": 1})
+    return max((user or {}).get("unreadNotificationsCount", 0), 0)
+
+
+async def list_notifications(
+    db,
+    user_id: str,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = DEFAULT_PAGE_SIZE
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    One page of a user's rows, most recently active first
+
+    Returns:
+        Tuple of (rows, next_cursor); next_cursor is None on the last page
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    limit = clamp_limit(limit)
+    # Legacy flat rows show up once the startup migration has folded them
+    query = {"userId": user_id, "groupKey": {"$type": "string"}}
+    page_filter = keyset_filter(cursor, time_field="updatedAt")
+    if page_filter:
+        query = {"$and": [query, page_filter]}
+    rows = await db.notifications.find(query, {"_id": 0, "actorIds": 0}).sort(
+        [("updatedAt", -1), ("id", -1)]
+    ).limit(limit + 1).to_list(limit + 1)
+    return split_page(rows, limit, time_field="updatedAt")
+
+
+def serialize_notification(row: dict) -> dict:
+    """API shape: the flat row fields plus the folded actors"""
+    updated_at = row.get("updatedAt") or row.get("createdAt")
+    count = row.get("count", 1)
+    return {
+        "id": row["id"],
+        "fromUserId": row.get("fromUserId"),
+        "fromUsername": row.get("fromUsername"),
+        "fromUserImage": row.get("fromUserImage"),
+        "type": row.get("type"),
+        "postId": row.get("postId"),
+        "postImage": row.get("postImage"),
+        "commentText": row.get("commentText"),
+        "actors": row.get("actors", []),
+        "actorCount": count,
+        "othersCount": max(count - 1, 0),
+        "isRead": row.get("isRead", False),
+        "createdAt": updated_at.isoformat() if hasattr(updated_at, "isoformat") else updated_at,
+    }
+
+
+async def reconcile_notification_counters(db, user_ids: Optional[Iterable[str]] = None, missing_only: bool = False) -> int:
+    """
+    Recompute users' unreadNotificationsCount from their unread rows
+
+    Args:
+        user_ids: Restrict to these users (default: everyone)
+        missing_only: Only users that don't have the counter yet (startup backfill)
+
+    Returns:
+        Number of user documents modified
+    """
+    match = {"isRead": False}
+    query = {}
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        match["userId"] = {"$in": user_ids}
+        query["id"] = {"$in": user_ids}
+    if missing_only:
+        query["unreadNotificationsCount"] = {"$exists": False}
+    totals = {
+        row["_id"]: row["count"]
+        for row in await db.notifications.aggregate([
+            {"$match": match},
+            {"$group": {"_id": "$userId", "count": {"$sum": 1}}},
+        ]).to_list(None)
+    }
+    ops = []
+    async for user in db.users.find(query, {"_id": 0, "id": 1, "unreadNotificationsCount": 1}):
+        count = totals.get(user["id"], 0)
+        if user.get("unreadNotificationsCount") != count:
+            ops.append(UpdateOne({"id": user["id"]}, {"$set": {"unreadNotificationsCount": count}}))
+    if not ops:
+        return 0
+    return (await db.users.bulk_write(ops, ordered=False)).modified_count
+
+
+def _fold_legacy_pipeline(group: dict, actors: List[dict], target: Optional[str]) -> list:
+    """
+    Pipeline upsert merging one legacy group into its row; a row that new
+    events already created keeps its headline and only gains the missing actors
+    """
+    now = datetime.now(timezone.utc)
+    ids = [{"$literal": actor["id"]} for actor in actors]
+    on_insert = {
+        "id": str(uuid4()), "targetId": target, "postId": target,
+        "actors": actors[:MAX_ACTORS_PER_ROW],
+        "fromUserId": actors[0]["id"], "fromUsername": actors[0].get("username"),
+        "fromUserImage": actors[0].get("image"),
+        "postImage": group.get("postImage"), "commentText": group.get("commentText"),
+        "createdAt": group.get("createdAt") or now,
+    }
+    fields = {field: {"$ifNull": [f"${field}", {"$literal": value}]} for field, value in on_insert.items()}
+    fields.update({
+        "count": {"$add": [
+            {"$ifNull": ["$count", 0]}, {"$size": {"$setDifference": [ids, _COUNTED_ACTOR_IDS]}}
+        ]},
+        "actorIds": {"$setUnion": [_COUNTED_ACTOR_IDS, ids]},
+        "updatedAt": {"$max": ["$updatedAt", {"$literal": group.get("updatedAt") or now}]},
+        "isRead": False if group["unread"] else {"$ifNull": ["$isRead", True]},
+    })
+    return [{"$set": fields}]
+
+
+async def _fold_legacy_rows(db) -> int:
+    """Fold flat rows written before groupKey existed into group rows"""
+    folded = 0
+    groups = db.notifications.aggregate([
+        {"$match": {"groupKey": {"$exists": False}}},
+        {"$sort": {"createdAt": -1}},
+        {"$group": {
+            "_id": {
+                "userId": "$userId",
+                "type": "$type",
+                # Story likes stored the story id in postId; some old rows used storyId
+                "target": {"$ifNull": ["$postId", "$storyId"]},
+                "actor": {"$cond": [{"$in": ["$type", list(COALESCED_TYPES)]}, None, "$fromUserId"]},
+            },
+            "ids": {"$push": "$_id"},
+            "actors": {"$push": {"id": "$fromUserId", "username": "$fromUsername", "image": "$fromUserImage"}},
+            "count": {"$sum": 1},
+            "unread": {"$max": {"$cond": [{"$ifNull": ["$isRead", "$read"]}, 0, 1]}},
+            "postImage": {"$first": "$postImage"},
+            "commentText": {"$first": "$commentText"},
+            "createdAt": {"$min": "$createdAt"},
+            "updatedAt": {"$max": "$createdAt"},
+        }},
+    ], allowDiskUse=True)
+    async for group in groups:
+        key = group["_id"]
+        if not key.get("userId") or not key.get("type"):
+            continue
+        actors = []
+        for actor in group["actors"]:
+            if actor.get("id") and actor["id"] not in [a["id"] for a in actors]:
+                actors.append(actor)
+        if not actors:
+            continue
+        target = key.get("target")
+        group_key = notification_group_key(key["type"], key.get("actor") or actors[0]["id"], target)
+        await db.notifications.update_one(
+            {"userId": key["userId"], "type": key["type"], "groupKey": group_key},
+            _fold_legacy_pipeline(group, actors, target), upsert=True
+        )
+        await db.notifications.delete_many({"_id": {"$in": group["ids"]}})
+        folded += len(group["ids"])
+    return folded
+
+
+async def migrate_notifications(db):
+    """
+    Startup hook: fold legacy flat rows into group rows, then give users
+    their unread counter (all users if anything was folded). Idempotent.
+    """
+    try:
+        folded = await _fold_legacy_rows(db)
+        if folded:
+            logger.info(f"Folded {folded} legacy notifications into group rows")
+        await reconcile_notification_counters(db, missing_only=not folded)
+    except Exception as e:
+        logger.error(f"Error migrating notifications: {e}")
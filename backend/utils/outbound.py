@@ -0,0 +1,388 @@
+"""
+Outbound Delivery Queue
+Email, SMS and Whereby calls as persistent jobs run by async workers with
+per-channel concurrency caps, exponential backoff and a dead-letter status,
+so request handlers enqueue and return instead of waiting on a provider
+
+Selected with OUTBOUND_QUEUE:
+    mongo   Jobs in `outbound_jobs`, claimed with a lease so any worker can
+            run them and a crashed worker's jobs are picked up again (default)
+    memory  Single process, lost on restart (tests, local scripts)
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+import asyncio
+import logging
+import os
+import random
+import socket
+import uuid
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+OUTBOUND_QUEUE = os.environ.get("OUTBOUND_QUEUE", "mongo").lower()
+OUTBOUND_POLL_SECONDS = 2.0
+# A claimed job whose worker hasn't finished it by then is claimed again
+OUTBOUND_LEASE_SECONDS = 120
+OUTBOUND_MAX_ATTEMPTS = 5
+OUTBOUND_BACKOFF_BASE_SECONDS = 5
+OUTBOUND_BACKOFF_MAX_SECONDS = 15 * 60
+# Delivered jobs are kept briefly for debugging; dead letters for a month
+OUTBOUND_DONE_RETENTION = timedelta(days=1)
+OUTBOUND_DEAD_RETENTION = timedelta(days=30)
+# Concurrent deliveries per channel per worker
+OUTBOUND_CONCURRENCY = {"email": 8, "sms": 4, "whereby": 4}
+OUTBOUND_DEFAULT_CONCURRENCY = 4
+
+# provider(payload) delivers one job; raise to retry, PermanentDeliveryError to give up
+Provider = Callable[[dict], Awaitable[None]]
+
+
+class PermanentDeliveryError(Exception):
+    """The provider rejected the job for good (bad address, 4xx); don't retry"""
+
+
+def backoff_delay(attempt: int) -> float:
+    """Seconds before retry number `attempt` (1-based): exponential with full jitter"""
+    ceiling = min(OUTBOUND_BACKOFF_BASE_SECONDS * 2 ** (attempt - 1), OUTBOUND_BACKOFF_MAX_SECONDS)
+    return random.uniform(ceiling / 2, ceiling)
+
+
+class FakeProvider:
+    """Records payloads instead of delivering; fails the first `failures` calls"""
+
+    def __init__(self, failures: int = 0, permanent: bool = False):
+        self.failures = failures
+        self.permanent = permanent
+        self.calls = 0
+        self.sent: List[dict] = []
+
+    async def __call__(self, payload: dict):
+        self.calls += 1
+        if self.calls <= self.failures:
+            if self.permanent:
+                raise PermanentDeliveryError("fake permanent failure")
+            raise RuntimeError("fake transient failure")
+        self.sent.append(payload)
+
+
+class OutboundQueue:
+    """
+    Base/in-memory queue: worker loop, concurrency caps and retry policy
+
+    Job fields: _id, channel, payload, sensitive, status (pending, running,
+    done, dead), attempts, maxAttempts, runAt, lockedBy, lockedUntil,
+    lastError. Payloads are dropped once delivered, and a sensitive job's
+    (one-time codes) also when it is dead-lettered, so it can't be requeued.
+    """
+
+    name = "memory"
+
+    def __init__(
+        self,
+        providers: Dict[str, Provider],
+        concurrency: Optional[Dict[str, int]] = None,
+        max_attempts: int = OUTBOUND_MAX_ATTEMPTS,
+        poll_interval: float = OUTBOUND_POLL_SECONDS
+    ):
+        self.providers = providers
+        self.concurrency = {**OUTBOUND_CONCURRENCY, **(concurrency or {})}
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._jobs: Dict[str, dict] = {}
+        self._running: Dict[str, int] = {channel: 0 for channel in providers}
+        self._tasks: Set[asyncio.Task] = set()
+        self._loop_task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.enqueued = 0
+        self.delivered = 0
+        self.retried = 0
+        self.dead = 0
+
+    def _now(self) -> datetime:
+        return datetime.now(timezone.utc)
+
+    async def create_indexes(self):
+        pass
+
+    async def start(self):
+        if self._loop_task is None:
+            self._wakeup = asyncio.Event()
+            self._loop_task = asyncio.create_task(self._loop())
+            logger.info(f"Outbound queue ({self.name}) started on worker {self.worker_id}")
+
+    async def stop(self):
+        """Stop claiming; in-flight deliveries get cancelled and are retried after their lease"""
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            try:
+                await self._loop_task
+            except asyncio.CancelledError:
+                pass
+            self._loop_task = None
+        for task in list(self._tasks):
+            task.cancel()
+
+    async def enqueue(
+        self,
+        channel: str,
+        payload: dict,
+        max_attempts: Optional[int] = None,
+        delay: float = 0,
+        sensitive: bool = False
+    ) -> str:
+        """
+        Persist a job and nudge this worker's loop
+
+        Args:
+            sensitive: The payload holds a secret (OTP email); it isn't kept on a dead letter
+
+        Returns:
+            The job id
+        """
+        if channel not in self.providers:
+            raise ValueError(f"No outbound provider for channel '{channel}'")
+        now = self._now()
+        job = {
+            "_id": uuid.uuid4().hex,
+            "channel": channel,
+            "payload": payload,
+            "sensitive": sensitive,
+            "status": "pending",
+            "attempts": 0,
+            "maxAttempts": max_attempts or self.max_attempts,
+            "runAt": now + timedelta(seconds=delay),
+            "createdAt": now,
+        }
+        await self._insert(job)
+        self.enqueued += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job["_id"]
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbound queue poll failed: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def run_once(self) -> int:
+        """Claim due jobs up to each channel's free slots and start them; returns how many"""
+        started = 0
+        for channel in self.providers:
+            limit = self.concurrency.get(channel, OUTBOUND_DEFAULT_CONCURRENCY)
+            while self._running[channel] < limit:
+                job = await self._claim(channel, self._now())
+                if job is None:
+                    break
+                self._running[channel] += 1
+                task = asyncio.create_task(self._execute(job))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+                started += 1
+        return started
+
+    async def drain(self):
+        """Wait for the deliveries started so far (tests)"""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    async def _execute(self, job: dict):
+        channel = job["channel"]
+        try:
+            await self.providers[channel](job["payload"])
+        except asyncio.CancelledError:
+            raise
+        except PermanentDeliveryError as e:
+            await self._bury(job, str(e))
+        except Exception as e:
+            if job["attempts"] >= job["maxAttempts"]:
+                await self._bury(job, str(e))
+            else:
+                delay = backoff_delay(job["attempts"])
+                self.retried += 1
+                logger.warning(
+                    f"Outbound {channel} job {job['_id']} failed (attempt {job['attempts']}), "
+                    f"retrying in {delay:.0f}s: {e}"
+                )
+                await self._reschedule(job, str(e), self._now() + timedelta(seconds=delay))
+        else:
+            self.delivered += 1
+            await self._complete(job)
+        finally:
+            self._running[channel] -= 1
+            if self._wakeup is not None:
+                self._wakeup.set()
+
+    async def _bury(self, job: dict, error: str):
+        self.dead += 1
+        logger.error(f"Outbound {job['channel']} job {job['_id']} dead-lettered after {job['attempts']} attempts: {error}")
+        await self._dead_letter(job, error)
+
+    # Storage; the Mongo queue overrides these
+
+    async def _insert(self, job: dict):
+        self._jobs[job["_id"]] = job
+
+    async def _claim(self, channel: str, now: datetime) -> Optional[dict]:
+        due = [
+            job for job in self._jobs.values()
+            if job["channel"] == channel and (
+                (job["status"] == "pending" and job["runAt"] <= now)
+                or (job["status"] == "running" and job["lockedUntil"] <= now)
+            )
+        ]
+        if not due:
+            return None
+        job = min(due, key=lambda j: j["runAt"])
+        job.update({
+            "status": "running",
+            "attempts": job["attempts"] + 1,
+            "lockedBy": self.worker_id,
+            "lockedUntil": now + timedelta(seconds=OUTBOUND_LEASE_SECONDS),
+        })
+        return dict(job)
+
+    async def _complete(self, job: dict):
+        self._jobs.pop(job["_id"], None)
+
+    async def _reschedule(self, job: dict, error: str, run_at: datetime):
+        stored = self._jobs.get(job["_id"])
+        if stored is not None:
+            stored.update({"status": "pending", "runAt": run_at, "lastError": error, "lockedBy": None})
+
+    async def _dead_letter(self, job: dict, error: str):
+        stored = self._jobs.get(job["_id"])
+        if stored is not None:
+            stored.update({"status": "dead", "lastError": error, "lockedBy": None, "failedAt": self._now()})
+            if stored.get("sensitive"):
+                stored.pop("payload", None)
+
+    async def dead_letters(self, limit: int = 50) -> List[dict]:
+        """Jobs that ran out of attempts or were rejected, newest first"""
+        # Payloads can hold codes and addresses; list metadata only
+        dead = [
+            {k: v for k, v in job.items() if k != "payload"}
+            for job in self._jobs.values() if job["status"] == "dead"
+        ]
+        return sorted(dead, key=lambda j: j["failedAt"], reverse=True)[:limit]
+
+    async def requeue(self, job_id: str) -> bool:
+        """Give a dead-lettered job a fresh set of attempts (not if its payload was redacted)"""
+        job = self._jobs.get(job_id)
+        if job is None or job["status"] != "dead" or "payload" not in job:
+            return False
+        job.update({"status": "pending", "attempts": 0, "runAt": self._now()})
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return True
+
+    def stats(self) -> dict:
+        """Delivery counters for this worker, reported by the health endpoint"""
+        return {
+            "backend": self.name,
+            "running": dict(self._running),
+            "enqueued": self.enqueued,
+            "delivered": self.delivered,
+            "retried": self.retried,
+            "deadLettered": self.dead,
+        }
+
+
+class MongoOutboundQueue(OutboundQueue):
+    """Jobs in `outbound_jobs`, claimed atomically with find_one_and_update"""
+
+    name = "mongo"
+
+    def __init__(self, db, providers: Dict[str, Provider], **kwargs):
+        super().__init__(providers, **kwargs)
+        self.collection = db.outbound_jobs
+
+    async def create_indexes(self):
+        await self.collection.create_index([("channel", 1), ("status", 1), ("runAt", 1)])
+        await self.collection.create_index([("status", 1), ("failedAt", -1)])
+        # Only finished jobs carry purgeAt; pending ones never expire
+        await self.collection.create_index("purgeAt", expireAfterSeconds=0)
+
+    async def _insert(self, job: dict):
+        await self.collection.insert_one(job)
+
+    async def _claim(self, channel: str, now: datetime) -> Optional[dict]:
+        return await self.collection.find_one_and_update(
+            {"channel": channel, "$or": [
+                {"status": "pending", "runAt": {"$lte": now}},
+                {"status": "running", "lockedUntil": {"$lte": now}},
+            ]},
+            {
+                "$set": {
+                    "status": "running",
+                    "lockedBy": self.worker_id,
+                    "lockedUntil": now + timedelta(seconds=OUTBOUND_LEASE_SECONDS),
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("runAt", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def _complete(self, job: dict):
+        now = self._now()
+        await self.collection.update_one(
+            {"_id": job["_id"], "lockedBy": self.worker_id},
+            {"$set": {"status": "done", "finishedAt": now, "purgeAt": now + OUTBOUND_DONE_RETENTION},
+             "$unset": {"payload": "", "lockedBy": "", "lockedUntil": ""}}
+        )
+
+    async def _reschedule(self, job: dict, error: str, run_at: datetime):
+        await self.collection.update_one(
+            {"_id": job["_id"], "lockedBy": self.worker_id},
+            {"$set": {"status": "pending", "runAt": run_at, "lastError": error},
+             "$unset": {"lockedBy": "", "lockedUntil": ""}}
+        )
+
+    async def _dead_letter(self, job: dict, error: str):
+        now = self._now()
+        unset = {"lockedBy": "", "lockedUntil": ""}
+        if job.get("sensitive"):
+            unset["payload"] = ""
+        await self.collection.update_one(
+            {"_id": job["_id"], "lockedBy": self.worker_id},
+            {"$set": {"status": "dead", "lastError": error, "failedAt": now,
+                      "purgeAt": now + OUTBOUND_DEAD_RETENTION},
+             "$unset": unset}
+        )
+
+    async def dead_letters(self, limit: int = 50) -> List[dict]:
+        return await self.collection.find(
+            {"status": "dead"}, {"payload": 0}
+        ).sort("failedAt", -1).limit(limit).to_list(limit)
+
+    async def requeue(self, job_id: str) -> bool:
+        result = await self.collection.update_one(
+            {"_id": job_id, "status": "dead", "payload": {"$exists": True}},
+            {"$set": {"status": "pending", "attempts": 0, "runAt": self._now()},
+             "$unset": {"purgeAt": "", "failedAt": ""}}
+        )
+        if result.modified_count and self._wakeup is not None:
+            self._wakeup.set()
+        return bool(result.modified_count)
+
+
+def build_outbound_queue(db, providers: Dict[str, Provider], backend: str = OUTBOUND_QUEUE) -> OutboundQueue:
+    """Queue for the configured backend; unknown values fall back to Mongo"""
+    if backend == "memory":
+        return OutboundQueue(providers)
+    if backend != "mongo":
+        logger.warning(f"Unknown OUTBOUND_QUEUE '{backend}', using Mongo")
+    return MongoOutboundQueue(db, providers)
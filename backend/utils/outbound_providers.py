@@ -0,0 +1,151 @@
+"""
+Outbound Providers
+Delivery functions behind the outbound queue: SendGrid email, Twilio Verify
+SMS and Whereby room cleanup, plus the pooled Whereby client the call
+endpoints use directly. The blocking SendGrid/Twilio SDKs run in a thread.
+"""
+from typing import Dict, Optional, Tuple
+import asyncio
+import logging
+import os
+
+import aiohttp
+
+from utils.outbound import PermanentDeliveryError, Provider
+
+logger = logging.getLogger(__name__)
+
+EMAIL_FROM_ADDRESS = "no-reply@luvhive.net"
+WHEREBY_API_URL = "https://api.whereby.dev/v1/meetings"
+WHEREBY_TIMEOUT_SECONDS = 10
+
+
+def _status_error(service: str, status: int, detail: str = "") -> Exception:
+    """Client errors other than timeouts and rate limits will fail the same way on retry"""
+    message = f"{service} returned {status} {detail}".strip()
+    if 400 <= status < 500 and status not in (408, 429):
+        return PermanentDeliveryError(message)
+    return RuntimeError(message)
+
+
+async def send_email(payload: dict):
+    """Deliver {"to", "subject", "html", "text"} through SendGrid"""
+    api_key = os.environ.get("SENDGRID_API_KEY")
+    if not api_key:
+        logger.info(f"MOCK EMAIL: '{payload['subject']}' to {payload['to']}")
+        return
+
+    def _send() -> int:
+        from sendgrid import SendGridAPIClient
+        from sendgrid.helpers.mail import Mail
+
+        message = Mail(
+            from_email=EMAIL_FROM_ADDRESS,
+            to_emails=payload["to"],
+            subject=payload["subject"],
+            html_content=payload["html"],
+            plain_text_content=payload.get("text")
+        )
+        return SendGridAPIClient(api_key).send(message).status_code
+
+    try:
+        status = await asyncio.to_thread(_send)
+    except Exception as e:
+        # python_http_client raises HTTPError subclasses carrying the status
+        status = getattr(e, "status_code", None)
+        if status is None:
+            raise
+    if status not in (200, 202):
+        raise _status_error("SendGrid", status)
+    logger.info(f"Email '{payload['subject']}' sent to {payload['to']}")
+
+
+async def send_sms_verification(payload: dict):
+    """Start a Twilio Verify SMS verification for {"to"} (an E.164 number)"""
+    account_sid = os.environ.get("TWILIO_ACCOUNT_SID")
+    auth_token = os.environ.get("TWILIO_AUTH_TOKEN")
+    verify_service_sid = os.environ.get("TWILIO_VERIFY_SERVICE_SID")
+    if not account_sid or not auth_token or not verify_service_sid:
+        raise PermanentDeliveryError("Twilio Verify not configured")
+
+    def _send() -> str:
+        from twilio.rest import Client
+
+        client = Client(account_sid, auth_token)
+        return client.verify.v2.services(verify_service_sid).verifications.create(
+            to=payload["to"], channel="sms"
+        ).status
+
+    try:
+        status = await asyncio.to_thread(_send)
+    except Exception as e:
+        # TwilioRestException carries the HTTP status as .status
+        status_code = getattr(e, "status", None)
+        if isinstance(status_code, int):
+            raise _status_error("Twilio Verify", status_code, str(e))
+        raise
+    logger.info(f"Twilio SMS verification {status} for {payload['to']}")
+
+
+class WherebyClient:
+    """Pooled aiohttp session for the Whereby REST API"""
+
+    def __init__(self, base_url: str = WHEREBY_API_URL):
+        self.base_url = base_url
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _headers(self) -> dict:
+        return {"Authorization": f"Bearer {os.environ.get('WHEREBY_API_KEY', '')}"}
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=WHEREBY_TIMEOUT_SECONDS)
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def create_room(self, body: dict) -> Tuple[int, Optional[dict], str]:
+        """
+        Create a meeting
+
+        Returns:
+            Tuple of (HTTP status, decoded JSON or None, raw text)
+        """
+        session = await self.get_session()
+        async with session.post(self.base_url, json=body, headers=self._headers()) as response:
+            text = await response.text()
+            try:
+                data = await response.json(content_type=None)
+            except ValueError:
+                data = None
+            return response.status, data, text
+
+    async def delete_room(self, meeting_id: str) -> int:
+        session = await self.get_session()
+        async with session.delete(f"{self.base_url}/{meeting_id}", headers=self._headers()) as response:
+            return response.status
+
+
+whereby_client = WherebyClient()
+
+
+async def delete_whereby_room(payload: dict):
+    """Delete the meeting {"meetingId"}; one that is already gone counts as done"""
+    status = await whereby_client.delete_room(payload["meetingId"])
+    if status not in (200, 204, 404):
+        raise _status_error("Whereby", status)
+    logger.info(f"Whereby room deleted: {payload['meetingId']}")
+
+
+def default_providers() -> Dict[str, Provider]:
+    """Channel -> provider used by the server's outbound queue"""
+    return {
+        "email": send_email,
+        "sms": send_sms_verification,
+        "whereby": delete_whereby_room,
+    }
@@ -0,0 +1,102 @@
+"""
+Cursor Pagination Utilities
+Opaque keyset cursors for newest-first listings
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 50
+
+
+def encode_cursor(created_at, item_id: str) -> str:
+    """
+    Encode the sort key of the last item on a page into an opaque cursor
+
+    Args:
+        created_at: Timestamp the listing is sorted by
+        item_id: Item id used as the tie-breaker
+
+    Returns:
+        URL-safe cursor string
+    """
+    if hasattr(created_at, 'isoformat'):
+        created_at = created_at.isoformat()
+    raw = json.dumps({"t": created_at, "id": item_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """
+    Decode a cursor produced by encode_cursor
+
+    Args:
+        cursor: Opaque cursor string from a previous page
+
+    Returns:
+        Tuple of (created_at, item_id)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(data["t"]), str(data["id"])
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def clamp_limit(limit: Optional[int], default: int = DEFAULT_PAGE_SIZE, maximum: int = MAX_PAGE_SIZE) -> int:
+    """Clamp a client supplied page size into [1, maximum]"""
+    if not limit or limit < 1:
+        return default
+    return min(limit, maximum)
+
+
+def keyset_filter(cursor: Optional[str], time_field: str = "createdAt", id_field: str = "id", ascending: bool = False) -> dict:
+    """
+    Build the Mongo filter selecting items strictly after the cursor
+
+    Sorting must be (time_field, id_field) both descending (or both ascending
+    with ascending=True) for the filter to be stable.
+
+    Args:
+        cursor: Cursor from a previous page, or None for the first page
+        time_field: Timestamp field the listing is sorted by
+        id_field: Tie-breaker field
+        ascending: Oldest-first listing instead of newest-first
+
+    Returns:
+        Filter dict (empty for the first page)
+    """
+    if not cursor:
+        return {}
+    created_at, item_id = decode_cursor(cursor)
+    op = "$gt" if ascending else "$lt"
+    return {
+        "$or": [
+            {time_field: {op: created_at}},
+            {time_field: created_at, id_field: {op: item_id}},
+        ]
+    }
+
+
+def split_page(items: list, limit: int, time_field: str = "createdAt", id_field: str = "id") -> Tuple[list, Optional[str]]:
+    """
+    Trim a limit+1 fetch to one page and compute the next cursor
+
+    Args:
+        items: Items fetched with limit + 1
+        limit: Requested page size
+
+    Returns:
+        Tuple of (page_items, next_cursor); next_cursor is None on the last page
+    """
+    if len(items) <= limit:
+        return items, None
+    page = items[:limit]
+    last = page[-1]
+    return page, encode_cursor(last[time_field], last[id_field])
@@ -0,0 +1,134 @@
+"""
+Password Hashing Service
+bcrypt hashing/verification in a bounded process pool so a burst of logins
+doesn't block the event loop, with transparent rehash on cost changes
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+
+from passlib.context import CryptContext
+
+logger = logging.getLogger(__name__)
+
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Hash jobs admitted to the pool at once; the rest wait on the semaphore
+PASSWORD_HASH_MAX_CONCURRENCY = int(os.environ.get("PASSWORD_HASH_MAX_CONCURRENCY", str(PASSWORD_HASH_WORKERS * 2)))
+
+
+def build_context(rounds: int = BCRYPT_ROUNDS) -> CryptContext:
+    """
+    bcrypt context pinned to one cost; hashes with any other cost report
+    needs_update, which drives rehash-on-login
+    """
+    return CryptContext(
+        schemes=["bcrypt"], deprecated="auto",
+        bcrypt__rounds=rounds, bcrypt__min_rounds=rounds, bcrypt__max_rounds=rounds
+    )
+
+
+# Module-level so it is built once per worker process
+pwd_context = build_context()
+
+
+def hash_password_sync(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_and_update_sync(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Returns (valid, new_hash); new_hash is set only when the stored cost is outdated"""
+    if not hashed_password:
+        return False, None
+    try:
+        return pwd_context.verify_and_update(password, hashed_password)
+    except ValueError:
+        # Malformed/unknown hash format
+        return False, None
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a ProcessPoolExecutor behind a concurrency cap
+
+    The pool is created lazily (or by start()) so importing this module
+    never forks.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_concurrency: int = PASSWORD_HASH_MAX_CONCURRENCY):
+        self.workers = workers
+        self.max_concurrency = max_concurrency
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.waiting = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.max_waiting = 0
+        self.total_wait_seconds = 0.0
+
+    def start(self):
+        if self._executor is None:
+            # spawn, not fork: the server process already runs threads and sockets
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            logger.info(f"Password hashing pool started with {self.workers} workers")
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _run(self, fn, *args):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.start()
+
+        queued_at = time.monotonic()
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.total_wait_seconds += time.monotonic() - queued_at
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self._semaphore.release()
+
+    async def hash(self, password: str) -> str:
+        """Hash a new password"""
+        return await self._run(hash_password_sync, password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """
+        Check a password against a stored hash
+
+        Returns:
+            Tuple of (valid, new_hash); persist new_hash when it is not None
+        """
+        return await self._run(verify_and_update_sync, password, hashed_password)
+
+    def stats(self) -> dict:
+        """Queue depth and throughput counters, reported by the health endpoint"""
+        return {
+            "workers": self.workers,
+            "maxConcurrency": self.max_concurrency,
+            "inFlight": self.in_flight,
+            "queueDepth": self.waiting,
+            "maxQueueDepth": self.max_waiting,
+            "completed": self.completed,
+            "avgWaitMs": round(self.total_wait_seconds * 1000 / self.completed, 2) if self.completed else 0.0,
+        }
+
+
+password_hasher = PasswordHasher()
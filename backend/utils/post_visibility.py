@@ -0,0 +1,68 @@
+"""
+Post Visibility Index
+Denormalized author privacy on posts so visibility is a single indexed filter
+"""
+from typing import List
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def post_visibility_filter(viewer_id: str, following: List[str]) -> dict:
+    """
+    Filter matching posts the viewer may see: public authors, or private
+    authors the viewer follows (and the viewer's own posts)
+
+    Args:
+        viewer_id: Current user id
+        following: Ids the viewer follows
+
+    Returns:
+        Mongo filter dict, to be combined with `$and`
+    """
+    return {
+        "$or": [
+            {"authorIsPrivate": {"$ne": True}},
+            {"userId": {"$in": list(following) + [viewer_id]}},
+        ]
+    }
+
+
+async def sync_author_privacy(db, user_id: str, is_private: bool):
+    """
+    Propagate an account's privacy toggle to its posts
+
+    Args:
+        db: Motor database
+        user_id: Author whose privacy changed
+        is_private: New isPrivate value
+    """
+    result = await db.posts.update_many(
+        {"userId": user_id, "authorIsPrivate": {"$ne": is_private}},
+        {"$set": {"authorIsPrivate": is_private}}
+    )
+    logger.info(f"Synced authorIsPrivate={is_private} on {result.modified_count} posts of {user_id}")
+
+
+async def backfill_author_privacy(db):
+    """
+    Set authorIsPrivate on posts that predate the field or drifted
+
+    Idempotent; only touches posts whose flag disagrees with the author.
+    """
+    try:
+        private_ids = await db.users.distinct("id", {"isPrivate": True})
+        marked = await db.posts.update_many(
+            {"userId": {"$in": private_ids}, "authorIsPrivate": {"$ne": True}},
+            {"$set": {"authorIsPrivate": True}}
+        )
+        cleared = await db.posts.update_many(
+            {"userId": {"$nin": private_ids}, "authorIsPrivate": {"$ne": False}},
+            {"$set": {"authorIsPrivate": False}}
+        )
+        logger.info(
+            f"authorIsPrivate backfill: {marked.modified_count} marked private, "
+            f"{cleared.modified_count} marked public"
+        )
+    except Exception as e:
+        logger.error(f"Error backfilling authorIsPrivate: {e}")
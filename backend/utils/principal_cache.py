@@ -0,0 +1,100 @@
+"""
+Authenticated Principal Cache
+Short-lived per-process LRU of slim user documents for get_current_user;
+list fields (savedPosts, blockedUsers, ...) and profileImage are loaded on demand
+"""
+from collections import OrderedDict
+from typing import Optional, Tuple
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+PRINCIPAL_CACHE_TTL_SECONDS = 30
+PRINCIPAL_CACHE_MAX_USERS = 10000
+
+# Unbounded per-user arrays; never cached, fetched by routes that need them.
+# followers/following/followRequests only exist on documents the follows
+# migration hasn't reached yet.
+HEAVY_USER_FIELDS = (
+    "followers", "following", "savedPosts", "blockedUsers", "mutedUsers", "hiddenStoryUsers",
+    "followRequests",
+)
+
+# Scalars too large to keep per cached user (profileImage may be an inline
+# base64 data URL of several hundred KB).
+LARGE_USER_FIELDS = ("profileImage",)
+
+PRINCIPAL_PROJECTION = {
+    "_id": 0, "password_hash": 0, **{field: 0 for field in HEAVY_USER_FIELDS + LARGE_USER_FIELDS}
+}
+
+# {user_id: (expires_at_monotonic, slim_user_doc)}
+_principal_cache: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+_stats = {"hits": 0, "misses": 0}
+
+
+def invalidate_principal(*user_ids: str):
+    """
+    Drop cached principals after a write to their user documents
+
+    Args:
+        user_ids: Users whose documents changed; none clears everyone
+            (bulk/admin updates matched by something other than id)
+
+    Other worker processes keep their copy for at most
+    PRINCIPAL_CACHE_TTL_SECONDS.
+    """
+    if not user_ids:
+        _principal_cache.clear()
+        return
+    for user_id in user_ids:
+        _principal_cache.pop(user_id, None)
+
+
+def get_principal_cache_stats() -> dict:
+    """Hit/miss counters and current size, reported by the health endpoint"""
+    return {**_stats, "size": len(_principal_cache)}
+
+
+async def get_principal(db, user_id: str) -> Optional[dict]:
+    """
+    Slim user document for an authenticated request
+
+    Returns:
+        A fresh dict (safe to mutate) or None if the user doesn't exist
+    """
+    entry = _principal_cache.get(user_id)
+    if entry is not None and entry[0] >= time.monotonic():
+        _principal_cache.move_to_end(user_id)
+        _stats["hits"] += 1
+        return dict(entry[1])
+
+    _stats["misses"] += 1
+    user = await db.users.find_one({"id": user_id}, PRINCIPAL_PROJECTION)
+    if user is None:
+        _principal_cache.pop(user_id, None)
+        return None
+    _principal_cache[user_id] = (time.monotonic() + PRINCIPAL_CACHE_TTL_SECONDS, user)
+    _principal_cache.move_to_end(user_id)
+    while len(_principal_cache) > PRINCIPAL_CACHE_MAX_USERS:
+        _principal_cache.popitem(last=False)
+    return dict(user)
+
+
+async def load_user_fields(db, user, *fields: str):
+    """
+    Fill heavy or large fields on a cached principal with one projected read
+
+    Args:
+        db: Motor database
+        user: User model returned by get_current_user
+        fields: Names from HEAVY_USER_FIELDS or LARGE_USER_FIELDS
+
+    Returns:
+        The same user, with the requested fields populated
+    """
+    doc = await db.users.find_one({"id": user.id}, {"_id": 0, **{field: 1 for field in fields}}) or {}
+    for field in fields:
+        setattr(user, field, doc.get(field) or ([] if field in HEAVY_USER_FIELDS else None))
+    return user
@@ -0,0 +1,154 @@
+"""
+Signaling Backplane
+Carries WebRTC/call signals between uvicorn worker processes so a signal
+reaches the callee whichever worker holds their WebSocket or SSE stream
+
+Selected with SIGNALING_BACKPLANE:
+    memory  Single process (default); nothing leaves the worker
+    mongo   Every worker inserts into `signaling_events` and tails it with a
+            change stream, delivering to its own local connections.
+            Change streams need a replica set; locally:
+                mongod --replSet rs0  and  rs.initiate()  in mongosh
+                SIGNALING_BACKPLANE=mongo uvicorn server:app --workers 2
+"""
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Optional
+import asyncio
+import logging
+import os
+import random
+import socket
+import uuid
+
+from pymongo.errors import PyMongoError
+
+logger = logging.getLogger(__name__)
+
+SIGNALING_BACKPLANE = os.environ.get("SIGNALING_BACKPLANE", "memory").lower()
+# Signals are only useful for seconds; the TTL monitor sweeps about once a minute
+SIGNALING_EVENT_TTL_SECONDS = 60
+SIGNALING_RECONNECT_MAX_SECONDS = 30
+
+# deliver(user_id, message) -> number of local connections it reached
+Deliver = Callable[[str, dict], Awaitable[int]]
+
+
+class SignalingBackplane:
+    """
+    Base/in-memory backplane: the publishing worker already delivered
+    locally, so there is nobody else to tell
+    """
+
+    name = "memory"
+
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._deliver: Optional[Deliver] = None
+        self.published = 0
+        self.received = 0
+
+    async def start(self, deliver: Deliver):
+        self._deliver = deliver
+
+    async def stop(self):
+        self._deliver = None
+
+    async def publish(self, user_id: str, message: dict) -> bool:
+        """
+        Forward a signal to the other workers
+
+        Returns:
+            True if it may reach connections on other workers
+        """
+        return False
+
+    def stats(self) -> dict:
+        """Backplane counters, reported by the health endpoint"""
+        return {
+            "backend": self.name,
+            "workerId": self.worker_id,
+            "published": self.published,
+            "received": self.received,
+        }
+
+
+class MongoSignalingBackplane(SignalingBackplane):
+    """Signals as short-lived documents, fanned out with a change stream"""
+
+    name = "mongo"
+
+    def __init__(self, db):
+        super().__init__()
+        self.db = db
+        self._task: Optional[asyncio.Task] = None
+        self._resume_token = None
+
+    async def start(self, deliver: Deliver):
+        await super().start(deliver)
+        try:
+            await self.db.signaling_events.create_index("createdAt", expireAfterSeconds=SIGNALING_EVENT_TTL_SECONDS)
+        except PyMongoError as e:
+            logger.error(f"Error creating signaling_events TTL index: {e}")
+        if self._task is None:
+            self._task = asyncio.create_task(self._watch())
+        logger.info(f"Mongo signaling backplane started on worker {self.worker_id}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await super().stop()
+
+    async def publish(self, user_id: str, message: dict) -> bool:
+        await self.db.signaling_events.insert_one({
+            "target": user_id,
+            "origin": self.worker_id,
+            "message": message,
+            "createdAt": datetime.now(timezone.utc),
+        })
+        self.published += 1
+        return True
+
+    async def handle_change(self, change: dict):
+        """Deliver an inserted signal to this worker's connections, skipping our own"""
+        event = change.get("fullDocument") or {}
+        if event.get("origin") == self.worker_id or not event.get("target") or self._deliver is None:
+            return
+        self.received += 1
+        await self._deliver(event["target"], event.get("message") or {})
+
+    async def _watch(self):
+        pipeline = [{"$match": {"operationType": "insert"}}]
+        delay = 1
+        while True:
+            try:
+                async with self.db.signaling_events.watch(pipeline, resume_after=self._resume_token) as stream:
+                    delay = 1
+                    async for change in stream:
+                        self._resume_token = stream.resume_token
+                        try:
+                            await self.handle_change(change)
+                        except Exception as e:
+                            logger.error(f"Error delivering backplane signal: {e}")
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError as e:
+                # Resume token too old (or the stream never started): start from now
+                if self._resume_token is not None and "resume" in str(e).lower():
+                    self._resume_token = None
+                logger.error(f"Signaling change stream interrupted, retrying in {delay}s: {e}")
+                await asyncio.sleep(delay + random.uniform(0, delay / 2))
+                delay = min(delay * 2, SIGNALING_RECONNECT_MAX_SECONDS)
+
+
+def build_backplane(db, backend: str = SIGNALING_BACKPLANE) -> SignalingBackplane:
+    """Backplane for the configured backend; unknown values fall back to memory"""
+    if backend == "mongo":
+        return MongoSignalingBackplane(db)
+    if backend != "memory":
+        logger.warning(f"Unknown SIGNALING_BACKPLANE '{backend}', using in-memory signaling")
+    return SignalingBackplane()
@@ -0,0 +1,137 @@
+"""
+Stories Tray Builder
+Groups unexpired stories per author in one aggregation, with a short-lived per-viewer cache
+"""
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+import logging
+import time
+
+from utils.feed import author_lookup_stage, visibility_match_stage
+from utils.follows import get_following_ids
+
+logger = logging.getLogger(__name__)
+
+MAX_STORIES_PER_AUTHOR = 30
+TRAY_CACHE_TTL_SECONDS = 30
+TRAY_CACHE_MAX_VIEWERS = 5000
+
+# {viewer_id: (expires_at_monotonic, tray)}
+_tray_cache: "OrderedDict[str, Tuple[float, List[dict]]]" = OrderedDict()
+
+
+def invalidate_stories_tray(viewer_id: Optional[str] = None):
+    """
+    Drop cached trays
+
+    Args:
+        viewer_id: Viewer whose tray changed; None clears every viewer
+            (e.g. an author toggled privacy, which affects everyone)
+    """
+    if viewer_id is None:
+        _tray_cache.clear()
+    else:
+        _tray_cache.pop(viewer_id, None)
+
+
+def _cache_get(viewer_id: str) -> Optional[List[dict]]:
+    entry = _tray_cache.get(viewer_id)
+    if entry is None:
+        return None
+    expires_at, tray = entry
+    if expires_at < time.monotonic():
+        _tray_cache.pop(viewer_id, None)
+        return None
+    _tray_cache.move_to_end(viewer_id)
+    return tray
+
+
+def _cache_put(viewer_id: str, tray: List[dict]):
+    _tray_cache[viewer_id] = (time.monotonic() + TRAY_CACHE_TTL_SECONDS, tray)
+    _tray_cache.move_to_end(viewer_id)
+    while len(_tray_cache) > TRAY_CACHE_MAX_VIEWERS:
+        _tray_cache.popitem(last=False)
+
+
+def _serialize_group(group: dict) -> dict:
+    author = group["author"][0] if group.get("author") else None
+    return {
+        "userId": group["_id"],
+        "username": group["username"],
+        "userProfileImage": author.get("profileImage") if author else group.get("userProfileImage"),
+        "isVerified": author.get("isVerified", False) if author else False,
+        "isFounder": author.get("isFounder", False) if author else False,
+        "stories": [
+            {
+                "id": story["id"],
+                "mediaType": story.get("mediaType") or "image",
+                "mediaUrl": story.get("mediaUrl") or "",
+                "thumbnails": story.get("thumbnails") or [],
+                "placeholder": story.get("placeholder"),
+                "caption": story.get("caption") or "",
+                "createdAt": story["createdAt"].isoformat() if hasattr(story["createdAt"], 'isoformat') else story["createdAt"]
+            }
+            for story in group["stories"]
+        ]
+    }
+
+
+async def get_stories_tray(db, viewer_id: str, use_cache: bool = True) -> List[dict]:
+    """
+    Build the stories tray for a viewer
+
+    One slim read of the viewer plus one aggregation that groups unexpired
+    stories by author, caps them per author, joins the author once and drops
+    private authors the viewer doesn't follow.
+
+    Args:
+        db: Motor database
+        viewer_id: Current user id
+        use_cache: Serve from the per-viewer cache when fresh
+
+    Returns:
+        List of author groups, newest author activity first
+    """
+    if use_cache:
+        cached = _cache_get(viewer_id)
+        if cached is not None:
+            return cached
+
+    visible_private_ids = await get_following_ids(db, viewer_id) + [viewer_id]
+
+    now = datetime.now(timezone.utc)
+    pipeline = [
+        {"$match": {"expiresAt": {"$gt": now}}},
+        {"$sort": {"createdAt": -1}},
+        {"$group": {
+            "_id": "$userId",
+            "username": {"$first": "$username"},
+            "userProfileImage": {"$first": "$userProfileImage"},
+            "latestAt": {"$first": "$createdAt"},
+            "stories": {"$push": {
+                "id": "$id",
+                "mediaType": "$mediaType",
+                "mediaUrl": "$mediaUrl",
+                "thumbnails": "$thumbnails",
+                "placeholder": "$placeholder",
+                "caption": "$caption",
+                "createdAt": "$createdAt"
+            }}
+        }},
+        {"$project": {
+            "username": 1,
+            "userProfileImage": 1,
+            "latestAt": 1,
+            "stories": {"$slice": ["$stories", MAX_STORIES_PER_AUTHOR]}
+        }},
+        author_lookup_stage(local_field="_id"),
+        visibility_match_stage(visible_private_ids, local_field="_id"),
+        {"$sort": {"latestAt": -1}},
+    ]
+    groups = await db.stories.aggregate(pipeline).to_list(None)
+    tray = [_serialize_group(group) for group in groups]
+
+    if use_cache:
+        _cache_put(viewer_id, tray)
+    return tray
@@ -0,0 +1,155 @@
+"""
+Telegram Bot API Client
+One pooled aiohttp session per process for every Bot API call (keep-alive,
+bounded connector, timeouts), retrying 429s after the server's retry_after
+"""
+from typing import Any, Callable, Optional, Tuple, Union
+import asyncio
+import logging
+import os
+import random
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# Overridable so tests (or a local Bot API server) can stand in for api.telegram.org
+TELEGRAM_API_BASE = os.environ.get("TELEGRAM_API_BASE", "https://api.telegram.org").rstrip("/")
+TELEGRAM_CONNECTION_LIMIT = int(os.environ.get("TELEGRAM_CONNECTION_LIMIT", "20"))
+TELEGRAM_KEEPALIVE_SECONDS = 60
+TELEGRAM_CONNECT_TIMEOUT_SECONDS = 5
+# Uploads of up to 50MB videos need a generous total
+TELEGRAM_TOTAL_TIMEOUT_SECONDS = 120
+TELEGRAM_MAX_RETRIES = 3
+# Longer retry_after values are returned to the caller instead of holding the request
+TELEGRAM_MAX_RETRY_AFTER_SECONDS = 30
+TELEGRAM_RETRY_JITTER_SECONDS = 1.0
+
+# A request body, or a factory building a fresh one per attempt (FormData
+# and file streams can only be sent once)
+Body = Union[None, dict, Callable[[], Any]]
+
+
+def _retry_after(payload: dict, headers) -> Optional[float]:
+    """Seconds Telegram asked us to wait, from the body or the Retry-After header"""
+    value = (payload.get("parameters") or {}).get("retry_after")
+    if value is None:
+        value = headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class TelegramClient:
+    """Application-scoped Bot API client; start() in startup, close() on shutdown"""
+
+    def __init__(
+        self,
+        base_url: str = TELEGRAM_API_BASE,
+        connection_limit: int = TELEGRAM_CONNECTION_LIMIT,
+        max_retries: int = TELEGRAM_MAX_RETRIES,
+        max_retry_after: float = TELEGRAM_MAX_RETRY_AFTER_SECONDS
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.connection_limit = connection_limit
+        self.max_retries = max_retries
+        self.max_retry_after = max_retry_after
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.requests = 0
+        self.rate_limited = 0
+
+    async def start(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.connection_limit,
+                keepalive_timeout=TELEGRAM_KEEPALIVE_SECONDS,
+                ttl_dns_cache=300
+            )
+            timeout = aiohttp.ClientTimeout(
+                total=TELEGRAM_TOTAL_TIMEOUT_SECONDS, connect=TELEGRAM_CONNECT_TIMEOUT_SECONDS
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        # Lazily started for scripts and tests that skip the app lifecycle
+        await self.start()
+        return self._session
+
+    def file_url(self, bot_token: str, file_path: str) -> str:
+        """Download URL for a file_path returned by getFile"""
+        return f"{self.base_url}/file/bot{bot_token}/{file_path}"
+
+    async def call(
+        self,
+        bot_token: str,
+        method: str,
+        *,
+        http_method: str = "POST",
+        params: Optional[dict] = None,
+        data: Body = None
+    ) -> Tuple[int, dict]:
+        """
+        Call a Bot API method
+
+        Args:
+            method: Bot API method name, e.g. "sendMessage"
+            data: Form fields, or a zero-argument factory for bodies that can
+                only be sent once (multipart uploads)
+
+        Returns:
+            Tuple of (HTTP status, decoded JSON body); non-JSON bodies come back
+            as {"ok": False, "description": <text>}
+
+        Raises:
+            aiohttp.ClientError / asyncio.TimeoutError on transport failures
+        """
+        session = await self.get_session()
+        url = f"{self.base_url}/bot{bot_token}/{method}"
+        attempt = 0
+        while True:
+            attempt += 1
+            self.requests += 1
+            body = data() if callable(data) else data
+            async with session.request(http_method, url, params=params, data=body) as response:
+                try:
+                    payload = await response.json(content_type=None)
+                except ValueError:
+                    payload = {"ok": False, "description": await response.text()}
+                status = response.status
+                headers = response.headers
+
+            if status != 429:
+                return status, payload
+
+            self.rate_limited += 1
+            wait = _retry_after(payload, headers)
+            if attempt > self.max_retries or wait is None or wait > self.max_retry_after:
+                logger.warning(f"Telegram {method} rate limited (retry_after={wait}), giving up")
+                return status, payload
+            delay = wait + random.uniform(0, TELEGRAM_RETRY_JITTER_SECONDS)
+            logger.info(f"Telegram {method} rate limited, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        """Request counters, reported by the health endpoint"""
+        return {"requests": self.requests, "rateLimited": self.rate_limited}
+
+
+telegram_client = TelegramClient()
+
+
+def get_telegram_client() -> TelegramClient:
+    return telegram_client
+
+
+def set_telegram_client(client: TelegramClient) -> TelegramClient:
+    """Swap the process-wide client (tests point it at a stub server); returns the previous one"""
+    global telegram_client
+    previous, telegram_client = telegram_client, client
+    return previous
@@ -0,0 +1,249 @@
+"""
+Thumbnail Pipeline
+Fixed-width JPEG variants plus a tiny blurred placeholder for uploaded
+images, rendered with Pillow in a bounded process pool after the upload
+request has returned and recorded on the post/story/user document
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Optional, Set
+import asyncio
+import base64
+import io
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+from PIL import Image, ImageFilter, ImageOps
+
+from utils.media_upload import COPY_CHUNK_SIZE, UPLOAD_DIR, UPLOAD_URL_PREFIX, SpooledMedia
+
+logger = logging.getLogger(__name__)
+
+# Widths list endpoints pick from: grid tiles, stories tray / small feed, full feed
+THUMBNAIL_WIDTHS = (150, 320, 640)
+# Blurred and inlined as a data URI, so it renders before any request is made
+PLACEHOLDER_WIDTH = 16
+PLACEHOLDER_BLUR_RADIUS = 1
+THUMBNAIL_JPEG_QUALITY = 80
+PLACEHOLDER_JPEG_QUALITY = 40
+THUMBNAIL_DIR = os.path.join(UPLOAD_DIR, "thumbnails")
+THUMBNAIL_URL_PREFIX = f"{UPLOAD_URL_PREFIX}/thumbnails"
+THUMBNAIL_WORKERS = int(os.environ.get("THUMBNAIL_WORKERS", str(min(2, os.cpu_count() or 1))))
+# Renders admitted to the pool at once; the rest wait on the semaphore
+THUMBNAIL_MAX_CONCURRENCY = int(os.environ.get("THUMBNAIL_MAX_CONCURRENCY", str(THUMBNAIL_WORKERS * 2)))
+# Beyond this many staged jobs new uploads simply get no thumbnails
+THUMBNAIL_MAX_PENDING = int(os.environ.get("THUMBNAIL_MAX_PENDING", "200"))
+# Decompression bomb guard, enforced in the worker by Pillow
+THUMBNAIL_MAX_SOURCE_PIXELS = 50_000_000
+
+
+def _to_rgb(image: Image.Image) -> Image.Image:
+    """Flatten transparency onto white; JPEG has no alpha channel"""
+    if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+        rgba = image.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def _resize_to_width(image: Image.Image, width: int) -> Image.Image:
+    height = max(1, round(image.height * width / image.width))
+    return image.resize((width, height), Image.LANCZOS)
+
+
+def render_thumbnails_sync(
+    source_path: str, out_dir: str, basename: str, widths: Iterable[int] = THUMBNAIL_WIDTHS
+) -> dict:
+    """
+    Render the variants of one image (runs in a pool worker)
+
+    Widths at or above the source width are skipped rather than upscaled;
+    a source narrower than the smallest width gets one variant at its own
+    width so there is always something small to serve.
+
+    Returns:
+        {"variants": [{"width", "height", "filename"}], "placeholder": data URI}
+    """
+    Image.MAX_IMAGE_PIXELS = THUMBNAIL_MAX_SOURCE_PIXELS
+    with Image.open(source_path) as opened:
+        # First frame only for animated GIF/WebP; honour the camera orientation
+        image = _to_rgb(ImageOps.exif_transpose(opened))
+
+    os.makedirs(out_dir, exist_ok=True)
+    targets = sorted({w for w in widths if w < image.width}) or [image.width]
+    variants = []
+    for width in targets:
+        resized = image if width == image.width else _resize_to_width(image, width)
+        filename = f"{basename}_{width}.jpg"
+        resized.save(
+            os.path.join(out_dir, filename), "JPEG",
+            quality=THUMBNAIL_JPEG_QUALITY, optimize=True, progressive=True
+        )
+        variants.append({"width": resized.width, "height": resized.height, "filename": filename})
+
+    tiny = _resize_to_width(image, min(PLACEHOLDER_WIDTH, image.width))
+    tiny = tiny.filter(ImageFilter.GaussianBlur(PLACEHOLDER_BLUR_RADIUS))
+    buffer = io.BytesIO()
+    tiny.save(buffer, "JPEG", quality=PLACEHOLDER_JPEG_QUALITY)
+    placeholder = f"data:image/jpeg;base64,{base64.b64encode(buffer.getvalue()).decode()}"
+
+    return {"variants": variants, "placeholder": placeholder}
+
+
+class ThumbnailRenderer:
+    """
+    Schedules thumbnail jobs for freshly stored images
+
+    schedule() copies the upload to a staging file before the request's
+    spooled file is closed and returns immediately; rendering and the
+    document update happen in a background task. The pool is created lazily
+    (or by start()) so importing this module never forks.
+    """
+
+    def __init__(
+        self,
+        workers: int = THUMBNAIL_WORKERS,
+        max_concurrency: int = THUMBNAIL_MAX_CONCURRENCY,
+        max_pending: int = THUMBNAIL_MAX_PENDING,
+        out_dir: str = THUMBNAIL_DIR,
+        url_prefix: str = THUMBNAIL_URL_PREFIX
+    ):
+        self.workers = workers
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.out_dir = out_dir
+        self.url_prefix = url_prefix
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # Strong references so pending jobs aren't garbage collected
+        self._tasks: Set[asyncio.Task] = set()
+        self.rendered = 0
+        self.failed = 0
+        self.skipped = 0
+
+    def start(self):
+        if self._executor is None:
+            # spawn, not fork: the server process already runs threads and sockets
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            logger.info(f"Thumbnail pool started with {self.workers} workers")
+
+    def shutdown(self):
+        for task in list(self._tasks):
+            task.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def render(self, source_path: str, basename: str) -> dict:
+        """
+        Render one image in the pool
+
+        Returns:
+            {"thumbnails": [{"width", "height", "url"}], "placeholder": data URI}
+        """
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.start()
+        async with self._semaphore:
+            result = await asyncio.get_running_loop().run_in_executor(
+                self._executor, render_thumbnails_sync, source_path, self.out_dir, basename, THUMBNAIL_WIDTHS
+            )
+        thumbnails = [
+            {"width": v["width"], "height": v["height"], "url": f"{self.url_prefix}/{v['filename']}"}
+            for v in result["variants"]
+        ]
+        return {"thumbnails": thumbnails, "placeholder": result["placeholder"]}
+
+    async def schedule(
+        self,
+        collection,
+        query: dict,
+        media: SpooledMedia,
+        basename: str,
+        thumbnails_field: str = "thumbnails",
+        placeholder_field: str = "placeholder",
+        on_done: Optional[Callable[[], None]] = None
+    ) -> bool:
+        """
+        Render thumbnails for media in the background and $set them on the
+        document matching query
+
+        Videos are ignored. The query should pin the media it was rendered
+        for (e.g. the current profileImage) so a late job can't overwrite
+        thumbnails of a newer upload. on_done runs once the document has
+        been updated (e.g. to drop caches holding a copy of it).
+
+        Returns:
+            True if a job was scheduled
+        """
+        if media.kind != "image":
+            return False
+        if len(self._tasks) >= self.max_pending:
+            self.skipped += 1
+            logger.warning("Thumbnail queue full, skipping thumbnails for new upload")
+            return False
+        try:
+            staged = await asyncio.to_thread(self._stage, media)
+        except OSError as e:
+            self.failed += 1
+            logger.error(f"Could not stage upload for thumbnails: {e}")
+            return False
+
+        task = asyncio.create_task(
+            self._run(collection, query, staged, basename, thumbnails_field, placeholder_field, on_done)
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    def _stage(self, media: SpooledMedia) -> str:
+        staging_dir = os.path.join(self.out_dir, "tmp")
+        os.makedirs(staging_dir, exist_ok=True)
+        media.rewind()
+        with tempfile.NamedTemporaryFile(dir=staging_dir, suffix=media.extension, delete=False) as out:
+            shutil.copyfileobj(media.file, out, COPY_CHUNK_SIZE)
+        media.rewind()
+        return out.name
+
+    async def _run(
+        self, collection, query: dict, staged: str, basename: str, thumbnails_field: str, placeholder_field: str,
+        on_done: Optional[Callable[[], None]] = None
+    ):
+        try:
+            result = await self.render(staged, basename)
+            await collection.update_one(query, {"$set": {
+                thumbnails_field: result["thumbnails"],
+                placeholder_field: result["placeholder"],
+            }})
+            self.rendered += 1
+            if on_done is not None:
+                on_done()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Thumbnail rendering failed for {basename}: {e}")
+        finally:
+            try:
+                os.remove(staged)
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        """Job counters, reported by the health endpoint"""
+        return {
+            "workers": self.workers,
+            "maxConcurrency": self.max_concurrency,
+            "pending": len(self._tasks),
+            "rendered": self.rendered,
+            "failed": self.failed,
+            "skipped": self.skipped,
+        }
+
+
+thumbnail_renderer = ThumbnailRenderer()
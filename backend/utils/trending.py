@@ -0,0 +1,168 @@
+"""
+Trending Hashtags
+Hourly-bucketed hashtag counters maintained at post write time,
+with the rolling 7-day top-N served from memory
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional, Set
+import asyncio
+import logging
+import re
+import time
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+HASHTAG_PATTERN = re.compile(r'#\w+', re.IGNORECASE)
+TRENDING_WINDOW = timedelta(days=7)
+TRENDING_TOP_N = 50
+SNAPSHOT_TTL_SECONDS = 60
+
+# In-memory rolling top-N: [(hashtag, count)], refreshed from the buckets
+_snapshot: List[tuple] = []
+_snapshot_expires_at = 0.0
+_refresh_lock = asyncio.Lock()
+
+
+def extract_hashtags(caption: Optional[str]) -> Set[str]:
+    """Return the distinct lower-cased hashtags in a caption"""
+    if not caption:
+        return set()
+    return {tag.lower() for tag in HASHTAG_PATTERN.findall(caption)}
+
+
+def post_text(post: dict) -> Optional[str]:
+    """The text hashtags are read from (social router posts store it as content)"""
+    return post.get("caption") or post.get("content")
+
+
+def hour_bucket(dt: datetime) -> datetime:
+    """Floor a timestamp to its UTC hour"""
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+async def create_trending_indexes(db):
+    """Unique (tag, bucket) counters, expired once they fall out of the window"""
+    await db.hashtag_buckets.create_index([("tag", 1), ("bucket", 1)], unique=True)
+    await db.hashtag_buckets.create_index(
+        "bucket", expireAfterSeconds=int((TRENDING_WINDOW + timedelta(days=1)).total_seconds())
+    )
+
+
+async def record_hashtags(db, tags: Iterable[str], created_at: datetime, delta: int):
+    """
+    Apply a +/- delta to the hour bucket of each tag
+
+    Args:
+        db: Motor database
+        tags: Lower-cased hashtags
+        created_at: Post creation time (decides the bucket)
+        delta: +1 when a post starts counting, -1 when it stops
+    """
+    tags = list(tags)
+    if not tags or not created_at:
+        return
+    bucket = hour_bucket(created_at)
+    if bucket < hour_bucket(datetime.now(timezone.utc) - TRENDING_WINDOW):
+        return  # Outside the window; its bucket is already gone or going
+    try:
+        await db.hashtag_buckets.bulk_write(
+            [UpdateOne({"tag": tag, "bucket": bucket}, {"$inc": {"count": delta}}, upsert=True) for tag in tags],
+            ordered=False
+        )
+    except Exception as e:
+        logger.error(f"Error recording hashtags {tags}: {e}")
+
+
+async def record_post_hashtags(db, post: dict, delta: int):
+    """Count (delta=1) or uncount (delta=-1) a post's caption hashtags"""
+    await record_hashtags(db, extract_hashtags(post_text(post)), post.get("createdAt"), delta)
+
+
+async def update_post_hashtags(db, post: dict, new_caption: str):
+    """Move counts for a caption edit; only tags that actually changed are touched"""
+    old_tags = extract_hashtags(post_text(post))
+    new_tags = extract_hashtags(new_caption)
+    await record_hashtags(db, old_tags - new_tags, post.get("createdAt"), -1)
+    await record_hashtags(db, new_tags - old_tags, post.get("createdAt"), 1)
+
+
+async def rebuild_hashtag_buckets(db, force: bool = False):
+    """
+    Recount the window from posts (startup seed / repair)
+
+    Args:
+        db: Motor database
+        force: Rebuild even if buckets already exist
+    """
+    try:
+        if not force and await db.hashtag_buckets.estimated_document_count() > 0:
+            return
+        since = datetime.now(timezone.utc) - TRENDING_WINDOW
+        await db.hashtag_buckets.delete_many({})
+        counts = {}
+        cursor = db.posts.find(
+            {
+                "isArchived": {"$ne": True}, "createdAt": {"$gte": since},
+                "$or": [{"caption": {"$regex": "#"}}, {"content": {"$regex": "#"}}],
+            },
+            {"_id": 0, "caption": 1, "content": 1, "createdAt": 1}
+        )
+        async for post in cursor:
+            bucket = hour_bucket(post["createdAt"])
+            for tag in extract_hashtags(post_text(post)):
+                counts[(tag, bucket)] = counts.get((tag, bucket), 0) + 1
+        if counts:
+            await db.hashtag_buckets.bulk_write(
+                [UpdateOne({"tag": tag, "bucket": bucket}, {"$set": {"count": count}}, upsert=True)
+                 for (tag, bucket), count in counts.items()],
+                ordered=False
+            )
+        invalidate_trending_snapshot()
+        logger.info(f"Rebuilt {len(counts)} hashtag buckets")
+    except Exception as e:
+        logger.error(f"Error rebuilding hashtag buckets: {e}")
+
+
+def invalidate_trending_snapshot():
+    """Force the next request to recompute the top-N"""
+    global _snapshot_expires_at
+    _snapshot_expires_at = 0.0
+
+
+async def _refresh_snapshot(db):
+    global _snapshot, _snapshot_expires_at
+    since = hour_bucket(datetime.now(timezone.utc) - TRENDING_WINDOW)
+    pipeline = [
+        {"$match": {"bucket": {"$gte": since}}},
+        {"$group": {"_id": "$tag", "count": {"$sum": "$count"}}},
+        {"$match": {"count": {"$gt": 0}}},
+        {"$sort": {"count": -1, "_id": 1}},
+        {"$limit": TRENDING_TOP_N},
+    ]
+    rows = await db.hashtag_buckets.aggregate(pipeline).to_list(TRENDING_TOP_N)
+    _snapshot = [(row["_id"], row["count"]) for row in rows]
+    _snapshot_expires_at = time.monotonic() + SNAPSHOT_TTL_SECONDS
+
+
+async def get_trending_hashtags(db, limit: int = 20) -> List[tuple]:
+    """
+    Rolling 7-day top hashtags
+
+    Served from memory; at most one worker coroutine recomputes it from the
+    bucket counters per SNAPSHOT_TTL_SECONDS.
+
+    Returns:
+        List of (hashtag, count), highest first
+    """
+    if time.monotonic() >= _snapshot_expires_at:
+        async with _refresh_lock:
+            if time.monotonic() >= _snapshot_expires_at:
+                try:
+                    await _refresh_snapshot(db)
+                except Exception as e:
+                    logger.error(f"Error refreshing trending hashtags: {e}")
+    return _snapshot[:limit]
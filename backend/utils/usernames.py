@@ -0,0 +1,210 @@
+"""
+Username Uniqueness
+Every user carries `usernameLower` (trimmed, lower-cased username) under a
+unique index, so case-insensitive lookups are index equality matches and
+two sign-ups can't claim the same name
+"""
+from typing import Iterable, List, Optional, Set
+import logging
+
+from pymongo import UpdateOne
+from pymongo.errors import OperationFailure
+
+from utils.comments import delete_comment_thread
+from utils.follows import remove_user_follows
+from utils.likes import remove_user_likes
+from utils.notifications import delete_notifications, remove_actor_notifications
+
+logger = logging.getLogger(__name__)
+
+USERNAME_LOWER_INDEX = "username_lower_unique"
+
+# usernameLower writes per bulk_write while backfilling
+BACKFILL_BATCH_SIZE = 1000
+
+
+def normalize_username(username: str) -> str:
+    return (username or "").strip().lower()
+
+
+def with_username_lower(user: dict) -> dict:
+    """Set usernameLower from username on a user document about to be written"""
+    user["usernameLower"] = normalize_username(user.get("username"))
+    return user
+
+
+async def insert_user(db, user: dict):
+    """
+    Insert a user document with its usernameLower
+
+    Raises:
+        DuplicateKeyError: The username is taken (case-insensitively)
+    """
+    await db.users.insert_one(with_username_lower(user))
+
+
+async def find_user_by_username(db, username: str, projection: Optional[dict] = None) -> Optional[dict]:
+    return await db.users.find_one({"usernameLower": normalize_username(username)}, projection)
+
+
+async def username_taken(db, username: str, exclude_user_id: Optional[str] = None) -> bool:
+    query = {"usernameLower": normalize_username(username)}
+    if exclude_user_id:
+        query["id"] = {"$ne": exclude_user_id}
+    return await db.users.find_one(query, {"_id": 1}) is not None
+
+
+async def taken_usernames(db, candidates: Iterable[str]) -> Set[str]:
+    """Which of the candidates are taken, in one $in query on the unique index"""
+    names = list({normalize_username(c) for c in candidates})
+    if not names:
+        return set()
+    cursor = db.users.find({"usernameLower": {"$in": names}}, {"_id": 0, "usernameLower": 1})
+    return {doc["usernameLower"] for doc in await cursor.to_list(len(names))}
+
+
+async def available_username(db, base: str) -> str:
+    """base, or base1, base2, ... whichever is free first (checked ten at a time)"""
+    start = 0
+    while True:
+        candidates = [base if n == 0 else f"{base}{n}" for n in range(start, start + 10)]
+        taken = await taken_usernames(db, candidates)
+        for candidate in candidates:
+            if normalize_username(candidate) not in taken:
+                return candidate
+        start += 10
+
+
+async def backfill_username_lower(db) -> int:
+    """
+    Give users written before usernameLower existed the field, normalised
+    in Python like every other write (Mongo's $toLower only folds ASCII)
+
+    Returns:
+        Number of users backfilled
+    """
+    backfilled = 0
+    ops = []
+    cursor = db.users.find(
+        {"usernameLower": {"$exists": False}, "username": {"$type": "string"}}, {"_id": 1, "username": 1}
+    )
+    async for user in cursor:
+        ops.append(UpdateOne({"_id": user["_id"]}, {"$set": {"usernameLower": normalize_username(user["username"])}}))
+        if len(ops) >= BACKFILL_BATCH_SIZE:
+            backfilled += (await db.users.bulk_write(ops, ordered=False)).modified_count
+            ops = []
+    if ops:
+        backfilled += (await db.users.bulk_write(ops, ordered=False)).modified_count
+    return backfilled
+
+
+async def _delete_inactive_account(db, user_id: str):
+    """Remove an account without posts along with its comments, likes, follows and notifications"""
+    # Threads keep their posts' commentCount right; a reply already gone with its thread deletes nothing
+    for comment in await db.comments.find({"userId": user_id}, {"_id": 0}).to_list(None):
+        await delete_comment_thread(db, comment)
+    await remove_user_likes(db, user_id)
+    await remove_user_follows(db, user_id)
+    await delete_notifications(db, {"userId": user_id})
+    await remove_actor_notifications(db, user_id)
+    await db.users.delete_one({"id": user_id})
+
+
+async def fix_whitespace_usernames(db, delete_inactive: bool = False) -> List[str]:
+    """
+    Trim leading/trailing whitespace from usernames and full names
+
+    A trimmed name that collides with another account is renamed with a
+    number. With delete_inactive (the admin endpoint, never the startup
+    migration) a colliding account with no posts or followers is deleted
+    instead, together with its comments, likes, follows and notifications.
+
+    Returns:
+        Ids of the users changed or deleted
+    """
+    changed = []
+    users_with_whitespace = await db.users.find({
+        "$or": [
+            {"username": {"$regex": "^\\s+|\\s+$"}},  # Leading or trailing spaces
+            {"fullName": {"$regex": "^\\s+|\\s+$"}}   # Leading or trailing spaces in fullName
+        ]
+    }).to_list(1000)
+
+    for user in users_with_whitespace:
+        clean_username = user["username"].strip()
+        clean_fullname = (user.get("fullName") or "").strip()
+
+        # Case-insensitive, like the unique usernameLower index the $set below must satisfy
+        if await username_taken(db, clean_username, exclude_user_id=user["id"]):
+            if delete_inactive and not user.get("followersCount") and not await db.posts.count_documents({"userId": user["id"]}):
+                # Delete the inactive duplicate
+                await _delete_inactive_account(db, user["id"])
+                changed.append(user["id"])
+                continue
+            clean_username = await available_username(db, clean_username)
+
+        await db.users.update_one(
+            {"id": user["id"]},
+            {"$set": {
+                "username": clean_username,
+                "usernameLower": normalize_username(clean_username),
+                "fullName": clean_fullname,
+            }}
+        )
+        changed.append(user["id"])
+    return changed
+
+
+async def _rename_case_duplicates(db) -> List[str]:
+    """Keep the oldest account of each usernameLower and number the others"""
+    renamed = []
+    duplicates = db.users.aggregate([
+        {"$match": {"usernameLower": {"$type": "string"}}},
+        {"$sort": {"createdAt": 1}},
+        {"$group": {"_id": "$usernameLower", "ids": {"$push": "$id"}, "names": {"$push": "$username"}, "n": {"$sum": 1}}},
+        {"$match": {"n": {"$gt": 1}}},
+    ])
+    async for group in duplicates:
+        for user_id, username in zip(group["ids"][1:], group["names"][1:]):
+            base = (username or "").strip() or "user"
+            # Skip the duplicated name itself, which the kept account owns
+            new_username = await available_username(db, f"{base}1")
+            await db.users.update_one(
+                {"id": user_id},
+                {"$set": {"username": new_username, "usernameLower": normalize_username(new_username)}}
+            )
+            await db.posts.update_many({"userId": user_id}, {"$set": {"username": new_username}})
+            await db.stories.update_many({"userId": user_id}, {"$set": {"username": new_username}})
+            logger.warning(f"Renamed case-duplicate username '{username}' to '{new_username}' ({user_id})")
+            renamed.append(user_id)
+    return renamed
+
+
+async def migrate_username_lower(db) -> List[str]:
+    """
+    Startup migration: backfill usernameLower, trim usernames, resolve
+    case-insensitive duplicates, then build the unique index
+
+    Returns:
+        Ids of users whose documents changed shape beyond the backfill
+        (callers drop them from caches)
+    """
+    try:
+        # Runs first so the renames below can check availability on it
+        backfilled = await backfill_username_lower(db)
+        if backfilled:
+            logger.info(f"Backfilled usernameLower on {backfilled} users")
+        changed = await fix_whitespace_usernames(db)
+        changed += await _rename_case_duplicates(db)
+        await db.users.create_index(
+            "usernameLower", unique=True, name=USERNAME_LOWER_INDEX,
+            partialFilterExpression={"usernameLower": {"$type": "string"}}
+        )
+        return changed
+    except OperationFailure as e:
+        # A duplicate slipped in between the rename and the index build; next start retries
+        logger.error(f"Error building unique username index: {e}")
+        return []
+    except Exception as e:
+        logger.error(f"Error migrating usernameLower: {e}")
+        return []
@@ -0,0 +1,314 @@
+"""
+Verification Code Store
+One-time codes (Telegram/email OTPs, email and phone change verification)
+with expiry, attempt limits and per-identity send throttling, shared by
+every worker and without a sleeping task per code
+
+Selected with VERIFICATION_CODE_STORE:
+    mongo   One document per (purpose, identity) in `verification_codes`,
+            removed by a TTL index (default)
+    memory  Single process only (tests, local scripts); expired entries are
+            swept from a heap on each call
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import heapq
+import hmac
+import logging
+import os
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+VERIFICATION_CODE_STORE = os.environ.get("VERIFICATION_CODE_STORE", "mongo").lower()
+CODE_TTL_SECONDS = 10 * 60
+CODE_MAX_ATTEMPTS = 3
+# Per (purpose, identity): at most one send per interval and N per window
+RESEND_INTERVAL_SECONDS = int(os.environ.get("OTP_RESEND_INTERVAL_SECONDS", "60"))
+MAX_SENDS_PER_WINDOW = int(os.environ.get("OTP_MAX_SENDS_PER_WINDOW", "5"))
+SEND_WINDOW_SECONDS = 60 * 60
+
+
+class CodeThrottled(Exception):
+    """Too many codes requested for this identity; retry_after is in seconds"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Too many codes requested, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+def _key(purpose: str, identity) -> str:
+    return f"{purpose}:{str(identity).strip().lower()}"
+
+
+def _hash_code(key: str, code: str) -> str:
+    # Codes are never stored in clear; the key salts identical codes apart
+    return hashlib.sha256(f"{key}:{code.strip()}".encode()).hexdigest()
+
+
+def _aware(dt: Optional[datetime]) -> Optional[datetime]:
+    """Motor returns naive UTC datetimes unless the client is tz_aware"""
+    if dt is not None and dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+class VerificationCodeStore:
+    """
+    Base/in-memory store
+
+    Entry per key: codeHash (None for provider-generated codes such as
+    Twilio Verify), data, attempts, expiresAt, plus the throttling fields
+    lastSentAt, windowStartedAt and sendCount, which outlive the code
+    until purgeAt.
+    """
+
+    name = "memory"
+
+    def __init__(
+        self,
+        ttl_seconds: int = CODE_TTL_SECONDS,
+        max_attempts: int = CODE_MAX_ATTEMPTS,
+        resend_interval: int = RESEND_INTERVAL_SECONDS,
+        max_sends: int = MAX_SENDS_PER_WINDOW,
+        send_window: int = SEND_WINDOW_SECONDS
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_attempts = max_attempts
+        self.resend_interval = timedelta(seconds=resend_interval)
+        self.max_sends = max_sends
+        self.send_window = timedelta(seconds=send_window)
+        self._entries: Dict[str, dict] = {}
+        # (purgeAt, key); stale pairs are skipped when their entry was rewritten
+        self._expiry_heap: List[Tuple[datetime, str]] = []
+        self.issued = 0
+        self.throttled = 0
+        self.verified = 0
+        self.failed_attempts = 0
+
+    async def create_indexes(self):
+        pass
+
+    def _now(self) -> datetime:
+        return datetime.now(timezone.utc)
+
+    def _retry_after(self, entry: dict, now: datetime) -> int:
+        waits = [0.0]
+        if entry.get("lastSentAt"):
+            waits.append((_aware(entry["lastSentAt"]) + self.resend_interval - now).total_seconds())
+        if entry.get("windowStartedAt") and entry.get("sendCount", 0) >= self.max_sends:
+            waits.append((_aware(entry["windowStartedAt"]) + self.send_window - now).total_seconds())
+        return max(1, int(max(waits) + 0.999))
+
+    def _sweep(self, now: datetime):
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            purge_at, key = heapq.heappop(self._expiry_heap)
+            entry = self._entries.get(key)
+            if entry is not None and entry["purgeAt"] <= now:
+                del self._entries[key]
+
+    async def issue(
+        self, purpose: str, identity, code: Optional[str], data: Optional[dict] = None,
+        ttl_seconds: Optional[int] = None
+    ):
+        """
+        Record a new code for (purpose, identity), replacing any previous one
+
+        Call before sending it. Pass code=None when the provider generates
+        and checks the code itself; the send is still throttled.
+
+        Raises:
+            CodeThrottled: Sent too recently or too often for this identity
+        """
+        now = self._now()
+        self._sweep(now)
+        key = _key(purpose, identity)
+        entry = self._entries.get(key)
+        if entry is not None and not self._may_send(entry, now):
+            self.throttled += 1
+            raise CodeThrottled(self._retry_after(entry, now))
+
+        entry = dict(entry or {})
+        if not entry.get("windowStartedAt") or entry["windowStartedAt"] <= now - self.send_window:
+            entry["windowStartedAt"] = now
+            entry["sendCount"] = 1
+        else:
+            entry["sendCount"] = entry.get("sendCount", 0) + 1
+        ttl = timedelta(seconds=ttl_seconds or self.ttl_seconds)
+        entry.update({
+            "codeHash": _hash_code(key, code) if code is not None else None,
+            "data": data or {},
+            "attempts": 0,
+            "expiresAt": now + ttl,
+            "lastSentAt": now,
+            "purgeAt": now + max(ttl, self.send_window),
+        })
+        self._entries[key] = entry
+        heapq.heappush(self._expiry_heap, (entry["purgeAt"], key))
+        self.issued += 1
+
+    def _may_send(self, entry: dict, now: datetime) -> bool:
+        last_sent = _aware(entry.get("lastSentAt"))
+        if last_sent and last_sent > now - self.resend_interval:
+            return False
+        window_started = _aware(entry.get("windowStartedAt"))
+        return not (
+            window_started and window_started > now - self.send_window
+            and entry.get("sendCount", 0) >= self.max_sends
+        )
+
+    async def verify(self, purpose: str, identity, code: str) -> Optional[dict]:
+        """
+        Check and consume a code
+
+        Every check counts as an attempt; after max_attempts wrong codes the
+        code is dead until a new one is issued.
+
+        Returns:
+            The data stored with the code, or None if it is wrong, expired,
+            out of attempts or already used
+        """
+        now = self._now()
+        self._sweep(now)
+        key = _key(purpose, identity)
+        entry = self._entries.get(key)
+        if (
+            entry is None or entry.get("codeHash") is None
+            or entry["expiresAt"] <= now or entry["attempts"] >= self.max_attempts
+        ):
+            return None
+        entry["attempts"] += 1
+        if not hmac.compare_digest(entry["codeHash"], _hash_code(key, code)):
+            self.failed_attempts += 1
+            return None
+        data = entry.get("data") or {}
+        self._clear_code(entry)
+        self.verified += 1
+        return data
+
+    @staticmethod
+    def _clear_code(entry: dict):
+        # Throttling fields stay so a verified user can't immediately re-request in a loop
+        for field in ("codeHash", "data", "attempts", "expiresAt"):
+            entry.pop(field, None)
+
+    async def pending(self, purpose: str, identity) -> Optional[dict]:
+        """Data of an unexpired issued code (for provider-checked codes)"""
+        now = self._now()
+        self._sweep(now)
+        entry = self._entries.get(_key(purpose, identity))
+        if entry is None or not entry.get("expiresAt") or _aware(entry["expiresAt"]) <= now:
+            return None
+        return entry.get("data") or {}
+
+    async def discard(self, purpose: str, identity):
+        """Drop the current code, keeping the throttling state"""
+        entry = self._entries.get(_key(purpose, identity))
+        if entry is not None:
+            self._clear_code(entry)
+
+    def stats(self) -> dict:
+        """Code counters, reported by the health endpoint"""
+        return {
+            "backend": self.name,
+            "issued": self.issued,
+            "throttled": self.throttled,
+            "verified": self.verified,
+            "failedAttempts": self.failed_attempts,
+        }
+
+
+class MongoVerificationCodeStore(VerificationCodeStore):
+    """Codes in `verification_codes`, keyed by _id "<purpose>:<identity>" and purged by TTL"""
+
+    name = "mongo"
+
+    def __init__(self, db, **kwargs):
+        super().__init__(**kwargs)
+        self.collection = db.verification_codes
+
+    async def create_indexes(self):
+        await self.collection.create_index("purgeAt", expireAfterSeconds=0)
+        # Pre-TTL documents (ObjectId _id, userId/type) would never expire
+        await self.collection.delete_many({"purgeAt": {"$exists": False}})
+
+    async def issue(
+        self, purpose: str, identity, code: Optional[str], data: Optional[dict] = None,
+        ttl_seconds: Optional[int] = None
+    ):
+        now = self._now()
+        key = _key(purpose, identity)
+        ttl = timedelta(seconds=ttl_seconds or self.ttl_seconds)
+        new_window = {"$lte": [{"$ifNull": ["$windowStartedAt", None]}, now - self.send_window]}
+        # Matches only when sending is allowed; otherwise the upsert collides
+        # with the existing _id, so two workers can't both pass the throttle
+        query = {"_id": key, "$and": [
+            {"$or": [{"lastSentAt": {"$lte": now - self.resend_interval}}, {"lastSentAt": {"$exists": False}}]},
+            {"$or": [{"windowStartedAt": {"$lte": now - self.send_window}}, {"sendCount": {"$lt": self.max_sends}}]},
+        ]}
+        update = [{"$set": {
+            "codeHash": _hash_code(key, code) if code is not None else None,
+            "data": {"$literal": data or {}},
+            "attempts": 0,
+            "expiresAt": now + ttl,
+            "lastSentAt": now,
+            "windowStartedAt": {"$cond": [new_window, now, "$windowStartedAt"]},
+            "sendCount": {"$cond": [new_window, 1, {"$add": [{"$ifNull": ["$sendCount", 0]}, 1]}]},
+            "purgeAt": now + max(ttl, self.send_window),
+        }}]
+        try:
+            await self.collection.update_one(query, update, upsert=True)
+        except DuplicateKeyError:
+            self.throttled += 1
+            entry = await self.collection.find_one({"_id": key}) or {}
+            raise CodeThrottled(self._retry_after(entry, now))
+        self.issued += 1
+
+    async def verify(self, purpose: str, identity, code: str) -> Optional[dict]:
+        now = self._now()
+        key = _key(purpose, identity)
+        # Count the attempt first so concurrent guesses can't exceed the limit
+        entry = await self.collection.find_one_and_update(
+            {"_id": key, "codeHash": {"$ne": None}, "expiresAt": {"$gt": now},
+             "attempts": {"$lt": self.max_attempts}},
+            {"$inc": {"attempts": 1}},
+            return_document=ReturnDocument.AFTER
+        )
+        if entry is None:
+            return None
+        if not hmac.compare_digest(entry["codeHash"], _hash_code(key, code)):
+            self.failed_attempts += 1
+            return None
+        # Only one request can consume a given code
+        result = await self.collection.update_one(
+            {"_id": key, "codeHash": entry["codeHash"]},
+            {"$unset": {"codeHash": "", "data": "", "attempts": "", "expiresAt": ""}}
+        )
+        if result.modified_count == 0:
+            return None
+        self.verified += 1
+        return entry.get("data") or {}
+
+    async def pending(self, purpose: str, identity) -> Optional[dict]:
+        entry = await self.collection.find_one(
+            {"_id": _key(purpose, identity), "expiresAt": {"$gt": self._now()}}, {"data": 1}
+        )
+        return (entry.get("data") or {}) if entry else None
+
+    async def discard(self, purpose: str, identity):
+        await self.collection.update_one(
+            {"_id": _key(purpose, identity)},
+            {"$unset": {"codeHash": "", "data": "", "attempts": "", "expiresAt": ""}}
+        )
+
+
+def build_code_store(db, backend: str = VERIFICATION_CODE_STORE) -> VerificationCodeStore:
+    """Store for the configured backend; unknown values fall back to Mongo"""
+    if backend == "memory":
+        return VerificationCodeStore()
+    if backend != "mongo":
+        logger.warning(f"Unknown VERIFICATION_CODE_STORE '{backend}', using Mongo")
+    return MongoVerificationCodeStore(db)
@@ -2,21 +2,55 @@
 WebSocket Manager for Real-Time Mystery Match Chat
 """
 from fastapi import WebSocket, WebSocketDisconnect
-from typing import Dict, List, Set
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set
 import json
 import logging
 import asyncio
+import time
 
 logger = logging.getLogger(__name__)
 
+# Messages buffered per connection; a client this far behind is disconnected
+OUTBOUND_QUEUE_SIZE = 100
+# A single send taking longer than this counts as a dead connection
+SEND_TIMEOUT_SECONDS = 10
+# Close code for evicted slow consumers ("try again later")
+SLOW_CONSUMER_CLOSE_CODE = 1013
+# Recent send latencies kept for percentiles
+LATENCY_SAMPLES = 1000
+
+
+class _Connection:
+    """One socket plus its outbound queue and the writer task draining it"""
+
+    def __init__(self, websocket: WebSocket, queue_size: int):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.writer: Optional[asyncio.Task] = None
+
+
 class ConnectionManager:
-    """Manage WebSocket connections for real-time chat"""
+    """
+    Manage WebSocket connections for real-time chat
+
+    Sends never await the socket: messages are queued per connection and a
+    writer task per connection does the actual send_json, so one slow client
+    can't hold up a broadcast to the others.
+    """
     
-    def __init__(self):
-        # Structure: {match_id: {user_id: websocket}}
-        self.active_connections: Dict[int, Dict[int, WebSocket]] = {}
+    def __init__(self, queue_size: int = OUTBOUND_QUEUE_SIZE, send_timeout: float = SEND_TIMEOUT_SECONDS):
+        self.queue_size = queue_size
+        self.send_timeout = send_timeout
+        # Structure: {match_id: {user_id: connection}}
+        self.active_connections: Dict[int, Dict[int, _Connection]] = {}
         # Track which users are typing
         self.typing_users: Dict[int, Set[int]] = {}
+        self._closing: Set[asyncio.Task] = set()
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self.sent = 0
+        self.send_errors = 0
+        self.slow_consumers = 0
     
     async def connect(self, websocket: WebSocket, match_id: int, user_id: int):
         """Connect a user to a match chat"""
@@ -25,7 +59,14 @@ class ConnectionManager:
         if match_id not in self.active_connections:
             self.active_connections[match_id] = {}
         
-        self.active_connections[match_id][user_id] = websocket
+        # A reconnect replaces the previous socket for this user
+        previous = self.active_connections[match_id].get(user_id)
+        if previous is not None:
+            self._drop(match_id, user_id, previous, close_code=1000)
+        
+        connection = _Connection(websocket, self.queue_size)
+        connection.writer = asyncio.create_task(self._writer(match_id, user_id, connection))
+        self.active_connections[match_id][user_id] = connection
         logger.info(f"User {user_id} connected to match {match_id}")
         
         # Notify the other user that this user is online
@@ -36,45 +77,26 @@ class ConnectionManager:
     
     def disconnect(self, match_id: int, user_id: int):
         """Disconnect a user from a match chat"""
-        if match_id in self.active_connections:
-            if user_id in self.active_connections[match_id]:
-                del self.active_connections[match_id][user_id]
-                logger.info(f"User {user_id} disconnected from match {match_id}")
-                
-                # Clean up empty matches
-                if not self.active_connections[match_id]:
-                    del self.active_connections[match_id]
+        connection = self.active_connections.get(match_id, {}).get(user_id)
+        if connection is not None:
+            self._drop(match_id, user_id, connection)
     
     async def send_personal_message(self, message: dict, match_id: int, user_id: int):
         """Send a message to a specific user"""
-        if match_id in self.active_connections:
-            if user_id in self.active_connections[match_id]:
-                websocket = self.active_connections[match_id][user_id]
-                try:
-                    await websocket.send_json(message)
-                except:
-                    # Connection lost, remove it
-                    self.disconnect(match_id, user_id)
+        connection = self.active_connections.get(match_id, {}).get(user_id)
+        if connection is not None:
+            self._enqueue(match_id, user_id, connection, message)
     
     async def broadcast_to_match(self, match_id: int, message: dict, exclude_user: int = None):
         """Broadcast a message to all users in a match"""
         if match_id not in self.active_connections:
             return
         
-        disconnected_users = []
-        
-        for user_id, websocket in self.active_connections[match_id].items():
+        # Copy: enqueueing may evict a slow consumer from the dict
+        for user_id, connection in list(self.active_connections[match_id].items()):
             if user_id == exclude_user:
                 continue
-            
-            try:
-                await websocket.send_json(message)
-            except:
-                disconnected_users.append(user_id)
-        
-        # Clean up disconnected users
-        for user_id in disconnected_users:
-            self.disconnect(match_id, user_id)
+            self._enqueue(match_id, user_id, connection, message)
     
     async def send_typing_indicator(self, match_id: int, user_id: int, is_typing: bool):
         """Send typing indicator to other user"""
@@ -103,6 +125,80 @@ class ConnectionManager:
         """Check if a user is online in a match"""
         return (match_id in self.active_connections and 
                 user_id in self.active_connections[match_id])
+    
+    def stats(self) -> dict:
+        """Queue depth and send latency metrics"""
+        depths = [
+            connection.queue.qsize()
+            for connections in self.active_connections.values()
+            for connection in connections.values()
+        ]
+        latencies = sorted(self._latencies)
+        
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 2)
+        
+        return {
+            "connections": len(depths),
+            "queueDepthTotal": sum(depths),
+            "queueDepthMax": max(depths, default=0),
+            "sent": self.sent,
+            "sendErrors": self.send_errors,
+            "slowConsumersDisconnected": self.slow_consumers,
+            "sendLatencyMs": {"p50": percentile(0.5), "p95": percentile(0.95), "max": percentile(1.0)},
+        }
+    
+    def _enqueue(self, match_id: int, user_id: int, connection: _Connection, message: dict):
+        try:
+            connection.queue.put_nowait((time.monotonic(), message))
+        except asyncio.QueueFull:
+            self.slow_consumers += 1
+            logger.warning(
+                f"User {user_id} in match {match_id} is {connection.queue.qsize()} messages behind, disconnecting"
+            )
+            self._drop(match_id, user_id, connection, close_code=SLOW_CONSUMER_CLOSE_CODE)
+    
+    async def _writer(self, match_id: int, user_id: int, connection: _Connection):
+        """Drain one connection's queue; latency is measured from enqueue to sent"""
+        while True:
+            queued_at, message = await connection.queue.get()
+            try:
+                await asyncio.wait_for(connection.websocket.send_json(message), self.send_timeout)
+            except Exception as e:
+                self.send_errors += 1
+                logger.info(f"Send to user {user_id} in match {match_id} failed, disconnecting: {e!r}")
+                self._drop(match_id, user_id, connection)
+                return
+            self.sent += 1
+            self._latencies.append(time.monotonic() - queued_at)
+    
+    def _drop(self, match_id: int, user_id: int, connection: _Connection, close_code: Optional[int] = None):
+        """Forget a connection (only if it is still the current one) and stop its writer"""
+        connections = self.active_connections.get(match_id)
+        if connections is not None and connections.get(user_id) is connection:
+            del connections[user_id]
+            logger.info(f"User {user_id} disconnected from match {match_id}")
+            
+            # Clean up empty matches
+            if not connections:
+                del self.active_connections[match_id]
+        
+        if connection.writer is not None and connection.writer is not asyncio.current_task():
+            connection.writer.cancel()
+        
+        if close_code is not None:
+            task = asyncio.create_task(self._close(connection.websocket, close_code))
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+    
+    async def _close(self, websocket: WebSocket, code: int):
+        try:
+            await websocket.close(code=code)
+        except Exception:
+            # Already closed by the client
+            pass
 
 # Global connection manager instance
 manager = ConnectionManager()
@@ -113,8 +209,8 @@ async def handle_websocket_message(websocket: WebSocket, match_id: int, user_id:
     message_type = message.get("type")
     
     if message_type == "ping":
-        # Respond to ping with pong
-        await websocket.send_json({"type": "pong"})
+        # Respond to ping with pong (through the queue: one writer per socket)
+        await manager.send_personal_message({"type": "pong"}, match_id, user_id)
     
     elif message_type == "typing":
         # Handle typing indicator
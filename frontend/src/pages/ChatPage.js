@@ -18,6 +18,10 @@ const ChatPage = () => {
   const [conversationId, setConversationId] = useState(location.state?.conversationId || null);
   const messagesEndRef = useRef(null);
   const prevMessageCount = useRef(0);
+  const [olderCursor, setOlderCursor] = useState(null);
+  const [loadingOlder, setLoadingOlder] = useState(false);
+  const loadedOlder = useRef(false);
+  const skipScroll = useRef(false);
   const currentUser = getUser();
 
   // Video call state
@@ -30,6 +34,8 @@ const ChatPage = () => {
   const [showIncomingCallModal, setShowIncomingCallModal] = useState(false);
 
   useEffect(() => {
+    setOlderCursor(null);
+    loadedOlder.current = false;
     fetchMessages();
     
     // Poll for new messages every 3 seconds
@@ -41,10 +47,11 @@ const ChatPage = () => {
   }, [userId]);
 
   useEffect(() => {
-    // Only scroll if new messages were added
-    if (messages.length > prevMessageCount.current) {
+    // Only scroll if new messages were added (not when older history was prepended)
+    if (messages.length > prevMessageCount.current && !skipScroll.current) {
       scrollToBottom();
     }
+    skipScroll.current = false;
     prevMessageCount.current = messages.length;
   }, [messages]);
 
@@ -56,7 +63,15 @@ const ChatPage = () => {
     try {
       const response = await httpClient.get(`/messages/conversation/${userId}`);
       const fetchedMessages = response.data.messages || [];
-      setMessages(fetchedMessages);
+      // Polling returns the latest page; keep any older history already loaded
+      setMessages(prev => {
+        const oldest = fetchedMessages[0]?.createdAt;
+        const older = oldest ? prev.filter(m => m.createdAt < oldest) : [];
+        return [...older, ...fetchedMessages];
+      });
+      if (!loadedOlder.current) {
+        setOlderCursor(response.data.nextCursor || null);
+      }
       setOtherUser(response.data.otherUser);
       
       // Get conversation ID from response
@@ -107,6 +122,28 @@ const ChatPage = () => {
     }
   };
 
+  const loadOlderMessages = async () => {
+    if (!olderCursor || loadingOlder) return;
+    setLoadingOlder(true);
+    try {
+      const response = await httpClient.get(
+        `/messages/conversation/${userId}?before=${encodeURIComponent(olderCursor)}`
+      );
+      const olderMessages = response.data.messages || [];
+      loadedOlder.current = true;
+      skipScroll.current = true;
+      setMessages(prev => {
+        const seen = new Set(prev.map(m => m.id));
+        return [...olderMessages.filter(m => !seen.has(m.id)), ...prev];
+      });
+      setOlderCursor(response.data.nextCursor || null);
+    } catch (error) {
+      console.error('Error loading older messages:', error);
+    } finally {
+      setLoadingOlder(false);
+    }
+  };
+
   const startVideoCall = async () => {
     try {
       console.log('Starting video call with user:', userId);
@@ -409,6 +446,17 @@ const ChatPage = () => {
           </div>
         ) : (
           <>
+            {olderCursor && (
+              <div className="flex justify-center mb-4">
+                <button
+                  onClick={loadOlderMessages}
+                  disabled={loadingOlder}
+                  className="text-xs text-pink-600 hover:text-pink-700 disabled:opacity-50"
+                >
+                  {loadingOlder ? 'Loading...' : 'Load earlier messages'}
+                </button>
+              </div>
+            )}
             {/* Messages by Date */}
             {Object.keys(messageGroups).map((dateKey) => (
               <div key={dateKey}>
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useNavigate, Link, useLocation } from 'react-router-dom';
 import { httpClient } from '@/utils/authClient';
 import { getPostMediaUrl } from '@/utils/media';
@@ -36,6 +36,7 @@ const FeedPage = ({ user, onLogout }) => {
   // Infinite scroll states
   const [page, setPage] = useState(1);
   const [hasMore, setHasMore] = useState(true);
+  const feedCursor = useRef(null);
   const [loadingMore, setLoadingMore] = useState(false);
   const [seenPostIds, setSeenPostIds] = useState(new Set());
 
@@ -194,8 +195,12 @@ const FeedPage = ({ user, onLogout }) => {
       if (!append) setLoading(true);
       else setLoadingMore(true);
       
-      const response = await httpClient.get(`/posts/feed?userId=${user.id}&page=${pageNum}&limit=10`);
+      // Keyset pagination: first page has no cursor, later pages continue from nextCursor
+      if (!append) feedCursor.current = null;
+      const cursorParam = feedCursor.current ? `&cursor=${encodeURIComponent(feedCursor.current)}` : '';
+      const response = await httpClient.get(`/posts/feed?limit=10${cursorParam}`);
       const newPosts = response.data.posts || [];
+      feedCursor.current = response.data.nextCursor || null;
       
       // Mark these posts as seen
       const newSeenIds = new Set(seenPostIds);
@@ -220,9 +225,9 @@ const FeedPage = ({ user, onLogout }) => {
       }
       
       // Check if there are more posts
-      setHasMore(newPosts.length === 10);
+      setHasMore(Boolean(feedCursor.current));
       
-      console.log('✅ Fetched feed:', { page: pageNum, count: newPosts.length, hasMore: newPosts.length === 10 });
+      console.log('✅ Fetched feed:', { page: pageNum, count: newPosts.length, hasMore: Boolean(feedCursor.current) });
     } catch (error) {
       console.error("Error fetching feed:", error);
     } finally {
@@ -1,4 +1,4 @@
-import { useState, useEffect, memo, useCallback, useMemo } from "react";
+import { useState, useEffect, useRef, memo, useCallback, useMemo } from "react";
 import { Link, useNavigate } from "react-router-dom";
 import { Button } from "@/components/ui/button";
 import { Textarea } from "@/components/ui/textarea";
@@ -90,12 +90,17 @@ const HomePage = ({ user, onLogout }) => {
   const [deletingPost, setDeletingPost] = useState(null);
   const [showCommentDialog, setShowCommentDialog] = useState(false);
   const [commentingPost, setCommentingPost] = useState(null);
+  const [dialogComments, setDialogComments] = useState([]);
+  const [dialogCommentsCursor, setDialogCommentsCursor] = useState(null);
   const [commentText, setCommentText] = useState("");
   const [notificationCount, setNotificationCount] = useState(0);
   const [messageCount, setMessageCount] = useState(0);
   const [newPost, setNewPost] = useState({ mediaUrl: "", caption: "", mediaType: "image" });
   const [newStory, setNewStory] = useState({ mediaUrl: "", caption: "", mediaType: "image" });
   const [openPostMenu, setOpenPostMenu] = useState(null); // Track which post menu is open
+  const feedCursor = useRef(null);
+  const [hasMore, setHasMore] = useState(false);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     fetchFeed();
@@ -110,6 +115,22 @@ const HomePage = ({ user, onLogout }) => {
     return () => clearInterval(interval);
   }, []);
 
+  // Infinite scroll: next feed page when near the bottom
+  useEffect(() => {
+    const handleScroll = () => {
+      const scrollTop = window.pageYOffset || document.documentElement.scrollTop;
+      const scrollHeight = document.documentElement.scrollHeight;
+      const clientHeight = document.documentElement.clientHeight;
+      
+      if (scrollTop + clientHeight >= scrollHeight - 500 && hasMore && !loadingMore && !loading) {
+        fetchFeed(true);
+      }
+    };
+
+    window.addEventListener('scroll', handleScroll);
+    return () => window.removeEventListener('scroll', handleScroll);
+  }, [hasMore, loadingMore, loading]);
+
   // Close post menu when clicking outside
   useEffect(() => {
     const handleClickOutside = (event) => {
@@ -142,19 +163,34 @@ const HomePage = ({ user, onLogout }) => {
     }
   };
 
-  const fetchFeed = async () => {
+  const fetchFeed = async (append = false) => {
     try {
-      const [storiesRes, postsRes] = await Promise.all([
-        httpClient.get('/stories/feed'),
-        httpClient.get('/posts/feed')
-      ]);
-
-      setStories(storiesRes.data.stories || []);
-      setPosts(postsRes.data.posts || []);
+      if (append) {
+        // Keyset pagination: later pages continue from nextCursor
+        setLoadingMore(true);
+        const postsRes = await httpClient.get(`/posts/feed?cursor=${encodeURIComponent(feedCursor.current)}`);
+        const newPosts = postsRes.data.posts || [];
+        setPosts(prev => {
+          const existingIds = new Set(prev.map(p => p.id));
+          return [...prev, ...newPosts.filter(p => !existingIds.has(p.id))];
+        });
+        feedCursor.current = postsRes.data.nextCursor || null;
+      } else {
+        const [storiesRes, postsRes] = await Promise.all([
+          httpClient.get('/stories/feed'),
+          httpClient.get('/posts/feed')
+        ]);
+
+        setStories(storiesRes.data.stories || []);
+        setPosts(postsRes.data.posts || []);
+        feedCursor.current = postsRes.data.nextCursor || null;
+      }
+      setHasMore(Boolean(feedCursor.current));
     } catch (error) {
       console.error("Error fetching feed:", error);
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
@@ -221,9 +257,9 @@ const HomePage = ({ user, onLogout }) => {
           return {
             ...post,
             isLiked: !isLiked,
-            likes: isLiked 
-              ? post.likes.filter(id => id !== user?.id)
-              : [...post.likes, user?.id]
+            likesCount: isLiked
+              ? Math.max(0, (post.likesCount || 0) - 1)
+              : (post.likesCount || 0) + 1
           };
         }
         return post;
@@ -276,22 +312,40 @@ const HomePage = ({ user, onLogout }) => {
     }
   };
 
+  // Feed posts only carry commentsCount; the dialog pages the comments themselves
+  const fetchDialogComments = async (postId, cursor = null) => {
+    try {
+      const cursorParam = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+      const response = await httpClient.get(`/posts/${postId}/comments${cursorParam}`);
+      const page = response.data.comments || [];
+      setDialogComments(prev => cursor ? [...prev, ...page] : page);
+      setDialogCommentsCursor(response.data.nextCursor || null);
+    } catch (error) {
+      console.error("Error fetching comments:", error);
+    }
+  };
+
+  const openCommentDialog = (post) => {
+    setCommentingPost(post);
+    setDialogComments([]);
+    setDialogCommentsCursor(null);
+    setShowCommentDialog(true);
+    fetchDialogComments(post.id);
+  };
+
   const handlePostComment = async () => {
     if (!commentText.trim() || !commentingPost) return;
 
     try {
-      // For now, we'll update locally (backend endpoint can be added later)
+      const formData = new FormData();
+      formData.append('text', commentText);
+      await httpClient.post(`/posts/${commentingPost.id}/comment`, formData);
+
       setPosts(prevPosts => prevPosts.map(post => {
         if (post.id === commentingPost.id) {
           return {
             ...post,
-            comments: [...post.comments, {
-              userId: user?.id,
-              username: user?.username,
-              profileImage: user?.profileImage,
-              text: commentText,
-              createdAt: new Date().toISOString()
-            }]
+            commentsCount: (post.commentsCount || 0) + 1
           };
         }
         return post;
@@ -836,7 +890,7 @@ const HomePage = ({ user, onLogout }) => {
                           className={`w-6 h-6 ${post.isLiked ? "fill-red-500 text-red-500" : "text-gray-700"}`}
                         />
                         {!post.likesHidden && (
-                          <span className="text-sm text-gray-700">{post.likes.length}</span>
+                          <span className="text-sm text-gray-700">{post.likesCount || 0}</span>
                         )}
                       </button>
                       <button 
@@ -844,15 +898,14 @@ const HomePage = ({ user, onLogout }) => {
                           if (post.commentsDisabled) {
                             alert("Comments are turned off for this post");
                           } else {
-                            setCommentingPost(post);
-                            setShowCommentDialog(true);
+                            openCommentDialog(post);
                           }
                         }}
                         className="flex items-center gap-2 hover:scale-110 transition-transform"
                         data-testid={`comment-btn-${post.id}`}
                       >
                         <MessageCircle className="w-6 h-6 text-gray-700" />
-                        <span className="text-sm text-gray-700">{post.comments.length}</span>
+                        <span className="text-sm text-gray-700">{post.commentsCount || 0}</span>
                       </button>
                       <button
                         onClick={() => handleSharePost(post.id)}
@@ -884,6 +937,12 @@ const HomePage = ({ user, onLogout }) => {
               </div>
             ))
           )}
+
+          {loadingMore && (
+            <div className="flex justify-center py-8">
+              <div className="w-6 h-6 border-2 border-pink-500 border-t-transparent rounded-full animate-spin"></div>
+            </div>
+          )}
         </div>
       </div>
 
@@ -1227,18 +1286,12 @@ const HomePage = ({ user, onLogout }) => {
               </div>
 
               {/* Existing Comments */}
-              {commentingPost.comments.length > 0 && (
+              {dialogComments.length > 0 && (
                 <div className="mb-4 max-h-48 overflow-y-auto space-y-3">
-                  {commentingPost.comments.map((comment, index) => (
-                    <div key={index} className="flex items-start gap-2">
+                  {dialogComments.map((comment) => (
+                    <div key={comment.id} className="flex items-start gap-2">
                       <img
-                        src={
-                          comment.profileImage 
-                            ? (comment.profileImage.startsWith('http') || comment.profileImage.startsWith('data:')
-                                ? comment.profileImage 
-                                : `${comment.profileImage}`)
-                            : "https://via.placeholder.com/32"
-                        }
+                        src={comment.userProfileImage || "https://via.placeholder.com/32"}
                         alt={comment.username || 'User'}
                         className="w-8 h-8 rounded-full object-cover border-2 border-pink-200 flex-shrink-0"
                         onError={(e) => {
@@ -1253,6 +1306,14 @@ const HomePage = ({ user, onLogout }) => {
                       </div>
                     </div>
                   ))}
+                  {dialogCommentsCursor && (
+                    <button
+                      onClick={() => fetchDialogComments(commentingPost.id, dialogCommentsCursor)}
+                      className="text-sm text-gray-500 hover:text-gray-700 font-semibold"
+                    >
+                      Load more comments
+                    </button>
+                  )}
                 </div>
               )}
 
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { Link, useNavigate } from 'react-router-dom';
 import { httpClient } from '../utils/authClient';
 import { ArrowLeft, MessageCircle, Search, Check, X, ChevronDown, Pin, Trash2, BellOff, PhoneOff } from 'lucide-react';
@@ -19,6 +19,10 @@ const MessagesPage = () => {
   const [expandedRequestId, setExpandedRequestId] = useState(null); // Track expanded request
   const [deleteDialogOpen, setDeleteDialogOpen] = useState(false);
   const [selectedConversation, setSelectedConversation] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  // Conversations from pages beyond the first; polling only refreshes the first page
+  const olderConversations = useRef([]);
 
   useEffect(() => {
     fetchConversations();
@@ -28,10 +32,18 @@ const MessagesPage = () => {
     return () => clearInterval(interval);
   }, []);
 
+  const mergeConversations = (first, older) => {
+    const ids = new Set(first.map(c => c.conversationId));
+    return [...first, ...older.filter(c => !ids.has(c.conversationId))];
+  };
+
   const fetchConversations = async () => {
     try {
       const response = await httpClient.get('/messages/conversations');
-      setConversations(response.data.conversations || []);
+      setConversations(mergeConversations(response.data.conversations || [], olderConversations.current));
+      if (olderConversations.current.length === 0) {
+        setNextCursor(response.data.nextCursor || null);
+      }
       setLoading(false);
     } catch (error) {
       console.error('Error fetching conversations:', error);
@@ -39,6 +51,33 @@ const MessagesPage = () => {
     }
   };
 
+  const loadMoreConversations = async () => {
+    if (!nextCursor || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const response = await httpClient.get(`/messages/conversations?cursor=${encodeURIComponent(nextCursor)}`);
+      const page = response.data.conversations || [];
+      olderConversations.current = [...olderConversations.current, ...page];
+      setConversations(prev => mergeConversations(prev, page));
+      setNextCursor(response.data.nextCursor || null);
+    } catch (error) {
+      console.error('Error loading more conversations:', error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  const updateConversation = (conversationId, update) => {
+    const apply = list => list.map(conv => (conv.conversationId === conversationId ? update(conv) : conv));
+    olderConversations.current = apply(olderConversations.current);
+    setConversations(apply);
+  };
+
+  const forgetConversation = (conversationId) => {
+    olderConversations.current = olderConversations.current.filter(c => c.conversationId !== conversationId);
+    setConversations(prev => prev.filter(c => c.conversationId !== conversationId));
+  };
+
   // Separate conversations into messages and requests
   const regularMessages = conversations.filter(conv => !conv.isRequest);
   const requestMessages = conversations.filter(conv => conv.isRequest);
@@ -70,7 +109,7 @@ const MessagesPage = () => {
     try {
       await httpClient.post('/messages/request/decline', { conversationId });
       // Remove from local state immediately
-      setConversations(prev => prev.filter(c => c.conversationId !== conversationId));
+      forgetConversation(conversationId);
       alert('Request declined');
     } catch (error) {
       console.error('Error declining request:', error);
@@ -81,9 +120,7 @@ const MessagesPage = () => {
   const handleConversationAction = async (conversationId, action, deleteForBoth = false) => {
     try {
       // Optimistic update
-      setConversations(prev => prev.map(conv => {
-        if (conv.conversationId !== conversationId) return conv;
-        
+      updateConversation(conversationId, conv => {
         switch (action) {
           case 'pin':
           case 'unpin':
@@ -97,7 +134,7 @@ const MessagesPage = () => {
           default:
             return conv;
         }
-      }));
+      });
 
       // Make API call
       const response = await httpClient.post('/messages/conversation/action', {
@@ -108,7 +145,7 @@ const MessagesPage = () => {
 
       // If delete action, remove from list
       if (action === 'delete') {
-        setConversations(prev => prev.filter(c => c.conversationId !== conversationId));
+        forgetConversation(conversationId);
       }
 
       // Re-fetch to get latest state and proper sorting
@@ -347,6 +384,17 @@ const MessagesPage = () => {
                 </ContextMenuContent>
               </ContextMenu>
             ))}
+            {nextCursor && !searchQuery && (
+              <div className="flex justify-center pt-2">
+                <button
+                  onClick={loadMoreConversations}
+                  disabled={loadingMore}
+                  className="text-sm text-pink-600 hover:text-pink-700 disabled:opacity-50"
+                >
+                  {loadingMore ? 'Loading...' : 'Load more conversations'}
+                </button>
+              </div>
+            )}
           </div>
         )}
       </div>
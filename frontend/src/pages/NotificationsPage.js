@@ -1,4 +1,4 @@
-import { useState, useEffect } from "react";
+import { useState, useEffect, useRef } from "react";
 import { Link, useNavigate } from "react-router-dom";
 import { Button } from "@/components/ui/button";
 import { ArrowLeft, Heart, MessageCircle, UserPlus } from "lucide-react";
@@ -29,23 +29,54 @@ const getRelativeTime = (dateString) => {
 const NotificationsPage = ({ user, onLogout }) => {
   const [notifications, setNotifications] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [hasMore, setHasMore] = useState(false);
+  const notificationsCursor = useRef(null);
   const navigate = useNavigate();
 
   useEffect(() => {
     fetchNotifications();
   }, []);
 
-  const fetchNotifications = async () => {
+  // Infinite scroll: next page when near the bottom
+  useEffect(() => {
+    const handleScroll = () => {
+      const scrollTop = window.pageYOffset || document.documentElement.scrollTop;
+      const scrollHeight = document.documentElement.scrollHeight;
+      const clientHeight = document.documentElement.clientHeight;
+      
+      if (scrollTop + clientHeight >= scrollHeight - 500 && hasMore && !loadingMore && !loading) {
+        fetchNotifications(true);
+      }
+    };
+
+    window.addEventListener('scroll', handleScroll);
+    return () => window.removeEventListener('scroll', handleScroll);
+  }, [hasMore, loadingMore, loading]);
+
+  const fetchNotifications = async (append = false) => {
     try {
-      const response = await httpClient.get(`/notifications`);
-      setNotifications(response.data.notifications || []);
+      if (append) setLoadingMore(true);
+      // Keyset pagination: later pages continue from nextCursor
+      const cursorParam = append && notificationsCursor.current
+        ? `?cursor=${encodeURIComponent(notificationsCursor.current)}`
+        : '';
+      const response = await httpClient.get(`/notifications${cursorParam}`);
+      const page = response.data.notifications || [];
+      setNotifications(prev => append ? [...prev, ...page] : page);
+      notificationsCursor.current = response.data.nextCursor || null;
+      setHasMore(Boolean(notificationsCursor.current));
       
-      // Mark all as read
-      await httpClient.put(`/notifications/read-all`, {});
+      // Mark only the rows shown so far as read; later pages stay unread until scrolled to
+      const unreadIds = page.filter(n => !n.isRead).map(n => n.id);
+      if (unreadIds.length > 0) {
+        await httpClient.put(`/notifications/read-all`, { ids: unreadIds });
+      }
     } catch (error) {
       console.error("Error fetching notifications:", error);
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
@@ -205,6 +236,11 @@ const NotificationsPage = ({ user, onLogout }) => {
                       >
                         {notif.fromUsername}
                       </span>{" "}
+                      {notif.othersCount > 0 && (
+                        <span className="text-gray-600">
+                          and {notif.othersCount} {notif.othersCount === 1 ? "other" : "others"}{" "}
+                        </span>
+                      )}
                       <span className="text-gray-600">{getNotificationText(notif)}</span>
                     </p>
                     <p className="text-xs text-gray-500 mt-1">
@@ -267,6 +303,12 @@ const NotificationsPage = ({ user, onLogout }) => {
                 </div>
               </div>
             ))}
+
+            {loadingMore && (
+              <div className="flex justify-center py-6">
+                <div className="w-6 h-6 border-2 border-pink-500 border-t-transparent rounded-full animate-spin"></div>
+              </div>
+            )}
           </div>
         )}
       </div>
@@ -9,6 +9,8 @@ const PostDetailPage = ({ user }) => {
   const navigate = useNavigate();
   const [post, setPost] = useState(null);
   const [comments, setComments] = useState([]);
+  const [commentsCursor, setCommentsCursor] = useState(null);
+  const [loadingMoreComments, setLoadingMoreComments] = useState(false);
   const [newComment, setNewComment] = useState("");
   const [replyingTo, setReplyingTo] = useState(null);
   const [replyText, setReplyText] = useState("");
@@ -47,12 +49,28 @@ const PostDetailPage = ({ user }) => {
     }
   };
 
-  const fetchComments = async () => {
-    try {      const response = await httpClient.get(`posts/${postId}/comments`);
-      setComments(response.data.comments || []);
+  const fetchComments = async (cursor = null) => {
+    try {
+      if (cursor) setLoadingMoreComments(true);
+      // Oldest first; later pages continue from nextCursor
+      const cursorParam = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+      const response = await httpClient.get(`posts/${postId}/comments${cursorParam}`);
+      const page = response.data.comments || [];
+      if (cursor) {
+        // Comments added while browsing may already be on screen
+        setComments(prev => {
+          const existingIds = new Set(prev.map(c => c.id));
+          return [...prev, ...page.filter(c => !existingIds.has(c.id))];
+        });
+      } else {
+        setComments(page);
+      }
+      setCommentsCursor(response.data.nextCursor || null);
     } catch (error) {
       console.error("Error fetching comments:", error);
-      setComments([]);
+      if (!cursor) setComments([]);
+    } finally {
+      setLoadingMoreComments(false);
     }
   };
 
@@ -110,13 +128,10 @@ const PostDetailPage = ({ user }) => {
       // Optimistic update
       setComments(prev => prev.map(comment => {
         if (comment.id === commentId) {
-          const likes = comment.likes || [];
-          const userLiked = likes.includes(user.id);
+          const userLiked = Boolean(comment.userLiked);
           return {
             ...comment,
-            likes: userLiked 
-              ? likes.filter(id => id !== user.id)
-              : [...likes, user.id],
+            userLiked: !userLiked,
             likesCount: userLiked ? (comment.likesCount || 0) - 1 : (comment.likesCount || 0) + 1
           };
         }
@@ -584,8 +599,7 @@ const PostDetailPage = ({ user }) => {
                 {/* Comments */}
                 <div className="space-y-4">
                   {comments.filter(c => !c.parentCommentId).map((comment) => {
-                    const commentLikes = comment.likes || [];
-                    const userLiked = commentLikes.includes(user?.id);
+                    const userLiked = Boolean(comment.userLiked);
                     const replies = comments.filter(c => c.parentCommentId === comment.id);
                     
                     return (
@@ -719,8 +733,7 @@ const PostDetailPage = ({ user }) => {
                         {replies.length > 0 && (
                           <div className="ml-11 mt-3 space-y-3">
                             {replies.map((reply) => {
-                              const replyLikes = reply.likes || [];
-                              const userLikedReply = replyLikes.includes(user?.id);
+                              const userLikedReply = Boolean(reply.userLiked);
                               
                               return (
                                 <div key={reply.id} className="flex gap-3">
@@ -815,6 +828,16 @@ const PostDetailPage = ({ user }) => {
                       </div>
                     );
                   })}
+
+                  {commentsCursor && (
+                    <button
+                      onClick={() => fetchComments(commentsCursor)}
+                      disabled={loadingMoreComments}
+                      className="text-sm text-gray-500 hover:text-gray-700 font-semibold"
+                    >
+                      {loadingMoreComments ? "Loading..." : "Load more comments"}
+                    </button>
+                  )}
                 </div>
               </div>
 
@@ -75,6 +75,8 @@ const ProfilePage = ({ user, onLogout }) => {
   const [followersDialogType, setFollowersDialogType] = useState(null); // 'followers' or 'following'
   const [followersList, setFollowersList] = useState([]);
   const [followersLoading, setFollowersLoading] = useState(false);
+  const [followersCursor, setFollowersCursor] = useState(null);
+  const [followersLoadingMore, setFollowersLoadingMore] = useState(false);
   const [incomingRequests, setIncomingRequests] = useState([]);
   const [hasIncomingRequestFromViewedUser, setHasIncomingRequestFromViewedUser] = useState(false);
   const [error, setError] = useState(null);
@@ -269,6 +271,21 @@ const ProfilePage = ({ user, onLogout }) => {
     }
   };
 
+  // Last resort: walk the feed (following nextCursor) for this user's posts, a few pages at most
+  const fetchFeedPostsBy = async (accountId, username, maxPages = 5) => {
+    const found = [];
+    let cursor = null;
+    for (let page = 0; page < maxPages; page++) {
+      const cursorParam = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+      const feedResp = await httpClient.get(`/posts/feed${cursorParam}`);
+      const feedPosts = Array.isArray(feedResp.data.posts) ? feedResp.data.posts : [];
+      found.push(...feedPosts.filter((p) => p.userId === accountId || p.username === username));
+      cursor = feedResp.data.nextCursor;
+      if (!cursor || found.length >= (viewingUser?.postsCount || 0)) break;
+    }
+    return found;
+  };
+
   const fetchUserPosts = async (accountId, username) => {
     setPostsLoading(true);
     try {
@@ -298,11 +315,7 @@ const ProfilePage = ({ user, onLogout }) => {
       // 3. If still empty and we expect posts, load the feed and filter by this user
       if (postsData.length === 0 && viewingUser?.postsCount > 0) {
         console.warn("User posts endpoint returned nothing; falling back to feed");
-        const feedResp = await httpClient.get(`/posts/feed`);
-        const feedPosts = Array.isArray(feedResp.data.posts) ? feedResp.data.posts : [];
-        postsData = feedPosts.filter(
-          (p) => p.userId === accountId || p.username === username
-        );
+        postsData = await fetchFeedPostsBy(accountId, username);
         console.log(`Extracted ${postsData.length} posts from feed`);
       }
       
@@ -317,11 +330,7 @@ const ProfilePage = ({ user, onLogout }) => {
       if (error.response?.status === 500 || error.response?.status === 404) {
         console.warn("Primary endpoints failed, attempting feed fallback");
         try {
-          const feedResp = await httpClient.get(`/posts/feed`);
-          const feedPosts = Array.isArray(feedResp.data.posts) ? feedResp.data.posts : [];
-          const filteredPosts = feedPosts.filter(
-            (p) => p.userId === accountId || p.username === username
-          );
+          const filteredPosts = await fetchFeedPostsBy(accountId, username);
           console.log(`Feed fallback successful: extracted ${filteredPosts.length} posts`);
           setUserPosts(filteredPosts);
         } catch (feedError) {
@@ -437,17 +446,11 @@ const ProfilePage = ({ user, onLogout }) => {
     setFollowersDialogType(type);
     setShowFollowersDialog(true);
     setFollowersLoading(true);
+    setFollowersList([]);
+    setFollowersCursor(null);
 
     try {
-      const endpoint = type === 'followers' 
-        ? `/users/${viewingUser?.id}/followers` 
-        : `/users/${viewingUser?.id}/following`;
-      
-      const response = await httpClient.get(endpoint);
-
-      // Backend returns {followers: [...]} or {following: [...]}
-      const listData = type === 'followers' ? response.data.followers : response.data.following;
-      setFollowersList(listData || []);
+      await fetchFollowersPage(type);
     } catch (error) {
       console.error(`Error fetching ${type}:`, error);
       alert(`Failed to load ${type}`);
@@ -456,6 +459,35 @@ const ProfilePage = ({ user, onLogout }) => {
     }
   };
 
+  // One page of the dialog's list; later pages continue from nextCursor
+  const fetchFollowersPage = async (type, cursor = null) => {
+    const endpoint = type === 'followers' 
+      ? `/users/${viewingUser?.id}/followers` 
+      : `/users/${viewingUser?.id}/following`;
+    const cursorParam = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+    
+    const response = await httpClient.get(`${endpoint}${cursorParam}`);
+
+    // Backend returns {followers: [...], nextCursor} or {following: [...], nextCursor}
+    const listData = (type === 'followers' ? response.data.followers : response.data.following) || [];
+    setFollowersList(prev => cursor ? [...prev, ...listData] : listData);
+    setFollowersCursor(response.data.nextCursor || null);
+  };
+
+  const handleFollowersScroll = async (e) => {
+    const { scrollTop, scrollHeight, clientHeight } = e.currentTarget;
+    if (scrollTop + clientHeight < scrollHeight - 200 || !followersCursor || followersLoadingMore) return;
+
+    setFollowersLoadingMore(true);
+    try {
+      await fetchFollowersPage(followersDialogType, followersCursor);
+    } catch (error) {
+      console.error(`Error fetching more ${followersDialogType}:`, error);
+    } finally {
+      setFollowersLoadingMore(false);
+    }
+  };
+
   const acceptFollowRequest = async (fromUserId) => {
     try {
       await httpClient.post(`/users/${fromUserId}/accept-follow-request`, {});
@@ -1221,7 +1253,7 @@ const ProfilePage = ({ user, onLogout }) => {
 
         {/* Followers/Following Dialog */}
         <Dialog open={showFollowersDialog} onOpenChange={setShowFollowersDialog}>
-          <DialogContent className="max-w-md max-h-[80vh] overflow-y-auto">
+          <DialogContent className="max-w-md max-h-[80vh] overflow-y-auto" onScroll={handleFollowersScroll}>
             <DialogHeader>
               <DialogTitle className="text-xl font-bold text-gray-900">
                 {followersDialogType === 'followers' ? 'Followers' : 'Following'}
@@ -1300,6 +1332,11 @@ const ProfilePage = ({ user, onLogout }) => {
                     )}
                   </div>
                 ))}
+                {followersLoadingMore && (
+                  <div className="flex justify-center py-4">
+                    <div className="w-6 h-6 border-4 border-pink-500 border-t-transparent rounded-full animate-spin"></div>
+                  </div>
+                )}
               </div>
             )}
           </DialogContent>
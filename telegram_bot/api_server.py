@@ -1,14 +1,18 @@
-import os, hmac, hashlib, time, json
+import os, hmac, hashlib, time, json, asyncio, mimetypes
 from urllib.parse import parse_qsl
 from typing import Optional
 
-import aiohttp, httpx, uvicorn, psycopg2
+import aiohttp, uvicorn, psycopg2
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Depends, Path, Query, Request, Body
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse, Response
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 from pydantic import BaseModel
 
 import registration as reg  # provides _conn() pooled connection (present in your repo)
+from utils.media_cache import media_cache
+from utils.telegram_file_cache import TelegramFilePathCache
+
+file_info_cache = TelegramFilePathCache()
 
 # ---------- ENV ----------
 BOT_TOKEN = os.environ.get("BOT_TOKEN", "")
@@ -40,6 +44,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def start_media_cache():
+    # Index the disk cache in the background; lookups miss until it is ready
+    asyncio.create_task(media_cache.start())
+
+@app.on_event("shutdown")
+async def close_media_cache():
+    await media_cache.close()
+
 # Preflight ok for all API paths
 @app.options("/{rest_of_path:path}")
 async def options_ok(rest_of_path: str):
@@ -284,43 +297,78 @@ async def tg_upload_to_sink(file_bytes: bytes, filename: str, mime: str, caption
             data = json.loads(txt)
             return data["result"]["document"]["file_id"]
 
+async def _tg_file_info(file_id: str) -> Optional[dict]:
+    """getFile result (file_path, file_unique_id, file_size), cached ~50 minutes."""
+    async def fetch():
+        session = await media_cache.get_session()
+        async with session.get(
+            f"https://api.telegram.org/bot{BOT_TOKEN}/getFile",
+            params={"file_id": file_id},
+            timeout=aiohttp.ClientTimeout(total=10),
+        ) as r:
+            if r.status != 200:
+                return None
+            data = await r.json()
+        result = data.get("result") or {}
+        return result if data.get("ok") and result.get("file_path") else None
+    return await file_info_cache.resolve(file_id, fetch)
+
 @app.get("/api/telefile/{file_id}")
-async def telefile(file_id: str):
+async def telefile(file_id: str, request: Request):
     """
-    Resolve a Telegram file by file_id and return its bytes.  A short timeout is
-    enforced to avoid long hangs.  Demo placeholder IDs such as "demo_avatar…"
-    return 404 so the client can show a local default avatar.  Network errors
-    are caught and logged.
+    Resolve a Telegram file by file_id and return its bytes.  Files are cached
+    on local disk by file_unique_id and served with Range/ETag support; on a
+    miss the upstream bytes are streamed through (forwarding Range) while the
+    cache is filled in the background.  Demo placeholder IDs such as
+    "demo_avatar…" return 404 so the client can show a local default avatar.
+    Network errors are caught and logged.
     """
     # Early exit for demo/placeholder avatars used during onboarding. These IDs
     # are not real Telegram file IDs and would cause external calls to time out.
     if file_id.startswith("demo_avatar"):
         raise HTTPException(404, "file not found")
     try:
-        async with httpx.AsyncClient(timeout=10) as client:
-            # Request file metadata from Telegram
-            r = await client.get(
-                f"https://api.telegram.org/bot{BOT_TOKEN}/getFile",
-                params={"file_id": file_id},
-            )
-            if r.status_code != 200:
-                raise HTTPException(404, "file not found")
-            data = r.json()
-            if not data.get("ok"):
-                raise HTTPException(404, "file not found")
-            fp = data.get("result", {}).get("file_path")
-            if not fp:
-                raise HTTPException(404, "file not found")
-            # Download the actual file
-            fr = await client.get(f"https://api.telegram.org/file/bot{BOT_TOKEN}/{fp}")
-            if fr.status_code != 200:
-                raise HTTPException(404, "file stream error")
-            return Response(
-                content=fr.content,
-                media_type=fr.headers.get("content-type", "application/octet-stream"),
-                headers={"Cache-Control": "public, max-age=604800"},
-            )
-    except httpx.RequestError as exc:
+        info = await _tg_file_info(file_id)
+        if not info:
+            raise HTTPException(404, "file not found")
+        fp = info["file_path"]
+        content_type = mimetypes.guess_type(fp)[0] or "application/octet-stream"
+        unique_id = info.get("file_unique_id")
+        file_url = f"https://api.telegram.org/file/bot{BOT_TOKEN}/{fp}"
+
+        if unique_id:
+            cached = media_cache.get(unique_id)
+            if cached:
+                path, size = cached
+                return media_cache.response(unique_id, path, size, content_type, request.headers)
+            media_cache.populate_in_background(unique_id, file_url, size_hint=info.get("file_size"))
+
+        # Stream the download through instead of buffering it
+        session = await media_cache.get_session()
+        upstream_headers = {"Range": request.headers["range"]} if "range" in request.headers else {}
+        fr = await session.get(file_url, headers=upstream_headers)
+        if fr.status not in (200, 206):
+            fr.release()
+            raise HTTPException(404, "file stream error")
+
+        async def body():
+            try:
+                async for chunk in fr.content.iter_chunked(256 * 1024):
+                    yield chunk
+            finally:
+                fr.release()
+
+        headers = {"Cache-Control": "public, max-age=604800", "Accept-Ranges": "bytes"}
+        for name in ("Content-Length", "Content-Range"):
+            if name in fr.headers:
+                headers[name] = fr.headers[name]
+        return StreamingResponse(
+            body(),
+            status_code=fr.status,
+            media_type=fr.headers.get("content-type", content_type),
+            headers=headers,
+        )
+    except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
         # Log the network error and return 404 so clients show a fallback
         print(f"telefile request error: {exc}")
         raise HTTPException(404, "file not found")
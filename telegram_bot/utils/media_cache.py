@@ -0,0 +1,300 @@
+"""
+Local Disk Media Cache
+Byte-bounded LRU of Telegram media on local disk, keyed by file_unique_id
+(stable for the file's content, unlike file_id), served with Range/206,
+ETag and long-lived Cache-Control; misses are downloaded in the background
+
+Same module as backend/utils/media_cache.py (the two apps deploy separately)
+"""
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Mapping, Optional, Tuple
+import asyncio
+import logging
+import os
+import re
+import tempfile
+import uuid
+
+import aiohttp
+from starlette.responses import Response, StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+MEDIA_CACHE_DIR = os.environ.get("MEDIA_CACHE_DIR", os.path.join(tempfile.gettempdir(), "telefile_cache"))
+MEDIA_CACHE_MAX_BYTES = int(os.environ.get("MEDIA_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+# Larger files are always streamed from Telegram instead of evicting half the cache
+MEDIA_CACHE_MAX_FILE_BYTES = int(os.environ.get("MEDIA_CACHE_MAX_FILE_BYTES", str(100 * 1024 ** 2)))
+MEDIA_CACHE_CONCURRENT_DOWNLOADS = 4
+# Content is immutable per file_unique_id
+MEDIA_CACHE_CONTROL = "public, max-age=31536000, immutable"
+CHUNK_SIZE = 256 * 1024
+
+_KEY_RE = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Single byte range from a Range header
+
+    Returns:
+        Inclusive (start, end), or None to serve the whole file (no header,
+        multiple ranges, or a unit we don't support)
+
+    Raises:
+        ValueError: Range is syntactically valid but unsatisfiable (416)
+    """
+    if not header:
+        return None
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # Suffix range: the last N bytes
+        length = int(end)
+        if length == 0:
+            raise ValueError("Unsatisfiable range")
+        return max(size - length, 0), size - 1
+    first = int(start)
+    last = min(int(end), size - 1) if end else size - 1
+    if first >= size or first > last:
+        raise ValueError("Unsatisfiable range")
+    return first, last
+
+
+def _read_file(path: str, start: int, length: int) -> Iterator[bytes]:
+    # Sync generator: Starlette iterates it in its threadpool
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+class MediaDiskCache:
+    """Content-addressed files under root/<2 chars>/<file_unique_id>, evicted least recently served"""
+
+    def __init__(
+        self,
+        root: str = MEDIA_CACHE_DIR,
+        max_bytes: int = MEDIA_CACHE_MAX_BYTES,
+        max_file_bytes: int = MEDIA_CACHE_MAX_FILE_BYTES,
+        concurrent_downloads: int = MEDIA_CACHE_CONCURRENT_DOWNLOADS
+    ):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_file_bytes = min(max_file_bytes, max_bytes)
+        self.concurrent_downloads = concurrent_downloads
+        # {key: size}, least recently served first
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        # get() misses until start() has indexed what is already on disk
+        self._ready = False
+        self._scanning = False
+        self._populating: Dict[str, asyncio.Task] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.hits = 0
+        self.misses = 0
+        self.populated = 0
+        self.evicted = 0
+        self.populate_errors = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def _scan(self) -> List[Tuple[float, str, int]]:
+        """(mtime, key, size) of the files on disk, oldest first; touches no shared state"""
+        entries = []
+        if os.path.isdir(self.root):
+            for shard in os.scandir(self.root):
+                if not shard.is_dir() or shard.name == "tmp":
+                    continue
+                for entry in os.scandir(shard.path):
+                    if entry.is_file() and _KEY_RE.match(entry.name):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, entry.name, stat.st_size))
+        return sorted(entries)
+
+    async def start(self):
+        """
+        Index what is already on disk off the event loop (startup hook)
+
+        The scan runs in a thread and is merged on the loop once complete, so
+        requests never see a partial index; until then every get() is a miss.
+        """
+        if self._ready or self._scanning:
+            return
+        self._scanning = True
+        try:
+            entries = await asyncio.to_thread(self._scan)
+        except Exception as e:
+            logger.error(f"Media cache scan of {self.root} failed, starting empty: {e}")
+            entries = []
+        finally:
+            self._scanning = False
+        # Files populated while the scan ran are the most recent
+        index: "OrderedDict[str, int]" = OrderedDict(
+            (key, size) for _, key, size in entries if key not in self._index
+        )
+        index.update(self._index)
+        self._index = index
+        self._bytes = sum(index.values())
+        self._ready = True
+        self._evict()
+
+    def get(self, key: str) -> Optional[Tuple[str, int]]:
+        """(path, size) of a cached file, marking it recently used"""
+        if not self._ready:
+            self.misses += 1
+            return None
+        size = self._index.get(key)
+        if size is None or not os.path.exists(self._path(key)):
+            if size is not None:
+                # Removed behind our back
+                self._forget(key)
+            self.misses += 1
+            return None
+        self._index.move_to_end(key)
+        self.hits += 1
+        return self._path(key), size
+
+    def populate_in_background(
+        self, key: str, url: str, size_hint: Optional[int] = None,
+        session: Optional[aiohttp.ClientSession] = None
+    ):
+        """Start downloading url into the cache unless it is cached, in progress, or too large"""
+        if not _KEY_RE.match(key) or key in self._populating or key in self._index:
+            return
+        if size_hint and size_hint > self.max_file_bytes:
+            return
+        task = asyncio.create_task(self._populate(key, url, session))
+        self._populating[key] = task
+        task.add_done_callback(lambda _: self._populating.pop(key, None))
+
+    async def _populate(self, key: str, url: str, session: Optional[aiohttp.ClientSession]):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrent_downloads)
+        tmp_dir = os.path.join(self.root, "tmp")
+        tmp_path = os.path.join(tmp_dir, f"{key}.{uuid.uuid4().hex}")
+        async with self._semaphore:
+            try:
+                if session is None:
+                    session = await self.get_session()
+                await asyncio.to_thread(os.makedirs, tmp_dir, exist_ok=True)
+                size = 0
+                async with session.get(url) as response:
+                    if response.status != 200:
+                        raise RuntimeError(f"upstream status {response.status}")
+                    with open(tmp_path, "wb") as out:
+                        async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                            size += len(chunk)
+                            if size > self.max_file_bytes:
+                                raise RuntimeError("file exceeds MEDIA_CACHE_MAX_FILE_BYTES")
+                            await asyncio.to_thread(out.write, chunk)
+                final_path = self._path(key)
+                await asyncio.to_thread(os.makedirs, os.path.dirname(final_path), exist_ok=True)
+                await asyncio.to_thread(os.replace, tmp_path, final_path)
+            except Exception as e:
+                self.populate_errors += 1
+                logger.warning(f"Media cache populate failed for {key}: {e}")
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                return
+
+        if key in self._index:
+            self._bytes -= self._index[key]
+        self._index[key] = size
+        self._bytes += size
+        self.populated += 1
+        if self._ready:
+            self._evict()
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._index:
+            key, _ = next(iter(self._index.items()))
+            self._forget(key)
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            self.evicted += 1
+
+    def _forget(self, key: str):
+        size = self._index.pop(key, None)
+        if size is not None:
+            self._bytes -= size
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """Pooled session for callers that don't bring their own"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=300, connect=10))
+        return self._session
+
+    async def close(self):
+        for task in list(self._populating.values()):
+            task.cancel()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def response(
+        self, key: str, path: str, size: int, content_type: str, request_headers: Mapping[str, str]
+    ) -> Response:
+        """200/206/304/416 response for a cached file"""
+        etag = f'"{key}"'
+        headers = {"ETag": etag, "Cache-Control": MEDIA_CACHE_CONTROL, "Accept-Ranges": "bytes"}
+
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]):
+            return Response(status_code=304, headers=headers)
+
+        # If-Range with a different validator means "send the whole thing"
+        range_header = request_headers.get("range")
+        if_range = request_headers.get("if-range")
+        if if_range and if_range.strip() != etag:
+            range_header = None
+
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+        if byte_range is None:
+            headers["Content-Length"] = str(size)
+            return StreamingResponse(_read_file(path, 0, size), media_type=content_type, headers=headers)
+
+        start, end = byte_range
+        length = end - start + 1
+        headers["Content-Length"] = str(length)
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        return StreamingResponse(
+            _read_file(path, start, length), status_code=206, media_type=content_type, headers=headers
+        )
+
+    def stats(self) -> dict:
+        """Hit/miss counters and disk usage, reported by the health endpoint"""
+        return {
+            "ready": self._ready,
+            "hits": self.hits,
+            "misses": self.misses,
+            "populated": self.populated,
+            "populating": len(self._populating),
+            "populateErrors": self.populate_errors,
+            "evicted": self.evicted,
+            "files": len(self._index),
+            "bytes": self._bytes,
+            "maxBytes": self.max_bytes,
+        }
+
+
+media_cache = MediaDiskCache()
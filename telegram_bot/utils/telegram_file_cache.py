@@ -0,0 +1,96 @@
+"""
+Telegram File Path Cache
+file_id -> getFile result (file_path, file_unique_id, file_size), kept for
+less than Telegram's one-hour download link validity, with concurrent
+lookups of one file_id sharing a single upstream call
+
+Same module as backend/utils/telegram_file_cache.py (the two apps deploy separately)
+"""
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Telegram guarantees a file_path for at least an hour; stay well inside it
+FILE_PATH_TTL_SECONDS = 50 * 60
+FILE_PATH_CACHE_MAX_ENTRIES = 50000
+
+
+class TelegramFilePathCache:
+    """Per-process LRU with TTL and in-flight request coalescing"""
+
+    def __init__(self, ttl: float = FILE_PATH_TTL_SECONDS, max_entries: int = FILE_PATH_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # {file_id: (expires_at_monotonic, getFile result)}
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def resolve(self, file_id: str, fetch: Callable[[], Awaitable[Optional[Any]]]) -> Optional[Any]:
+        """
+        Cached getFile result for a file_id, calling fetch() on a miss
+
+        Failed lookups (None or an exception) are not cached; every waiter
+        on that lookup sees the same result.
+        """
+        entry = self._entries.get(file_id)
+        if entry is not None and entry[0] >= time.monotonic():
+            self._entries.move_to_end(file_id)
+            self.hits += 1
+            return entry[1]
+
+        pending = self._in_flight.get(file_id)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[file_id] = future
+        try:
+            value = await fetch()
+        except Exception as e:
+            future.set_exception(e)
+            # Retrieved here so an exception nobody else awaited isn't logged as lost
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            if value:
+                self.put(file_id, value)
+            return value
+        finally:
+            # Cancelled mid-fetch: release the waiters rather than leave them hanging
+            if not future.done():
+                future.cancel()
+            self._in_flight.pop(file_id, None)
+
+    def put(self, file_id: str, value: Any):
+        """Remember a getFile result obtained elsewhere"""
+        self._entries[file_id] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(file_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, file_id: str):
+        """Forget a file_path Telegram no longer serves"""
+        self._entries.pop(file_id, None)
+
+    def stats(self) -> dict:
+        """Hit/miss counters and current size, reported by the health endpoint"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "inFlight": len(self._in_flight),
+            "size": len(self._entries),
+        }
+
+
+telegram_file_path_cache = TelegramFilePathCache()